@@ -1,61 +1,337 @@
+import hashlib
+import json
 import os
-from flask import Flask, render_template, request, jsonify, send_file
+import shutil
+import time
+import cProfile
+import click
+from datetime import datetime
+from typing import Any, Dict, Optional
+from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify
 from flask_cors import CORS  # type: ignore
 from dotenv import load_dotenv
-from src.models.models import db
+from src.models.models import activar_llaves_foraneas, db
+from src.models.esquema import asegurar_esquema
 from src.controllers.cotizacion_controller import CotizacionController
 from src.controllers.cliente_controller import ClienteController
 from src.controllers.empresa_controller import EmpresaController
-from src.services.pdf_service import PDFService
-from src.services.excel_service import ExcelService
+from src.controllers.cambios_controller import CambiosController
+from src.controllers.analitica_controller import AnaliticaController
+from src.services.metricas import (
+    metricas, medir, iniciar_captura, tiempos_capturados, encabezado_server_timing
+)
+from src.services.monitor_sql import MonitorSQL, iniciar_conteo, conteo_actual
+from src.services.json_rapido import ProveedorJSON, fragmentos_cotizaciones
+from src.services.compresion import Compresion, enviar_archivo
+from src.services.cache_consultas import cache_listados, crear_backend, marca_para
+from src.services.cambios import depurar_eliminaciones
+from src.services.eventos import SuscripcionesAgotadas, bus_eventos, flujo_sse
+from src.services.imagenes import optimizador_imagenes
+from src.services.exportaciones import archivos_exportacion, huella_exportacion
+from src.services.prerender import prerender
+from src.services.admision import ExportacionesSaturadas, admision_exportaciones
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Inicializar Flask
-app = Flask(__name__)
-CORS(app)
+# Rutas, instrumentación, comandos y manejo de errores; se registran en create_app
+rutas = Blueprint('cotiz', __name__, cli_group=None)
+
+
+def _entero_opcional(variable: str) -> Optional[int]:
+    valor = os.getenv(variable)
+    return int(valor) if valor else None
+
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
+    """
+    Crea y configura la aplicación. ReportLab y openpyxl no se importan aquí:
+    los servicios de PDF/Excel se crean en la primera exportación (o en
+    ``precargar`` si se pide con ``PRECARGAR=1``).
+
+    Args:
+        config: valores que sobrescriben la configuración leída del entorno.
+    """
+    app = Flask(__name__)
+    # JSON con orjson si está instalado (o json estándar) y fragmentos precodificados
+    app.json = ProveedorJSON(app)
+    CORS(app)
+
+    # Configuración
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///cotizaciones.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Instrumentación: encabezado Server-Timing y perfilado cProfile bajo demanda (?perfil=1)
+    app.config['SERVER_TIMING'] = os.getenv('SERVER_TIMING', '0') == '1'
+    app.config['PERFILADO_HABILITADO'] = os.getenv('PERFILADO', '0') == '1'
+    app.config['PERFILES_DIR'] = os.getenv('PERFILES_DIR', os.path.join('exports', 'perfiles'))
+    app.config['SQL_UMBRAL_LENTA_MS'] = float(os.getenv('SQL_UMBRAL_LENTA_MS', 100))
+    app.config['JSON_CACHE_FRAGMENTOS'] = int(os.getenv('JSON_CACHE_FRAGMENTOS', 10000))
+    # Compresión brotli/gzip negociada con Accept-Encoding
+    app.config['COMPRESION'] = os.getenv('COMPRESION', '1') == '1'
+    app.config['COMPRESION_MIN_BYTES'] = int(os.getenv('COMPRESION_MIN_BYTES', 1024))
+    # Exportaciones (None = default de cada servicio)
+    app.config['PDF_UMBRAL_TABLA_RAPIDA'] = _entero_opcional('PDF_UMBRAL_TABLA_RAPIDA')
+    app.config['PDF_UMBRAL_PARALELO'] = _entero_opcional('PDF_UMBRAL_PARALELO')
+    app.config['PDF_PROCESOS'] = _entero_opcional('PDF_PROCESOS') or None
+    app.config['PDF_LOTE_MAX'] = int(os.getenv('PDF_LOTE_MAX', 500))
+    # Motor del Excel: 'openpyxl', 'xml' (partes SpreadsheetML escritas directo) o
+    # 'plantilla' (xml con el encabezado de la empresa armado una vez por proceso)
+    app.config['EXCEL_MOTOR'] = os.getenv('EXCEL_MOTOR', 'openpyxl')
+    app.config['PRECARGAR'] = os.getenv('PRECARGAR', '0') == '1'
+    # Logo e iconos reducidos a la resolución de impresión (caché en disco compartida)
+    app.config['IMAGENES_OPTIMIZAR'] = os.getenv('IMAGENES_OPTIMIZAR', '1') == '1'
+    app.config['IMAGENES_DPI'] = int(os.getenv('IMAGENES_DPI', 300))
+    app.config['IMAGENES_CACHE_DIR'] = os.getenv('IMAGENES_CACHE_DIR', os.path.join('exports', 'cache', 'imagenes'))
+    # Pre-render en segundo plano del PDF y el Excel al guardar una cotización
+    app.config['PRERENDER'] = os.getenv('PRERENDER', '0') == '1'
+    app.config['PRERENDER_HILOS'] = int(os.getenv('PRERENDER_HILOS', 2))
+    # Archivos exportados por versión de cotización (compartidos por los workers)
+    app.config['EXPORTACIONES_DIR'] = os.getenv('EXPORTACIONES_DIR', os.path.join('exports', 'versiones'))
+    # Renders de exportación simultáneos por proceso (0 = sin límite), cola y espera máxima;
+    # lo que no cabe se rechaza con 503 para no dejar sin hilos al resto de las rutas
+    app.config['EXPORTACION_CONCURRENCIA'] = int(os.getenv('EXPORTACION_CONCURRENCIA', 2))
+    app.config['EXPORTACION_COLA'] = int(os.getenv('EXPORTACION_COLA', 4))
+    app.config['EXPORTACION_ESPERA'] = float(os.getenv('EXPORTACION_ESPERA', 10))
+    # Instantánea columnar para /api/analitica (NumPy); segundos entre actualizaciones (0 = sólo manual)
+    app.config['ANALITICA_DIR'] = os.getenv('ANALITICA_DIR', os.path.join('exports', 'analitica'))
+    app.config['ANALITICA_INTERVALO'] = float(os.getenv('ANALITICA_INTERVALO', 300))
+    # Caché de listados filtrados: 'memoria', 'sqlite:///ruta.db' (compartida entre workers) u 'off'
+    app.config['CACHE_LISTADOS'] = os.getenv('CACHE_LISTADOS', 'memoria')
+    app.config['CACHE_LISTADOS_TTL'] = float(os.getenv('CACHE_LISTADOS_TTL', 300))
+    app.config['CACHE_LISTADOS_MAX'] = int(os.getenv('CACHE_LISTADOS_MAX', 256))
+    # Feed de cambios: días que se conservan los registros de eliminación
+    app.config['CAMBIOS_RETENCION_DIAS'] = int(os.getenv('CAMBIOS_RETENCION_DIAS', 90))
+    # Eventos en vivo (SSE): directorio de sockets para repartirlos entre workers
+    # ('' = uno por base de datos en el directorio temporal, 'off' = sólo este proceso)
+    app.config['EVENTOS_SOCKET_DIR'] = os.getenv('EVENTOS_SOCKET_DIR', '')
+    app.config['EVENTOS_LATIDO'] = float(os.getenv('EVENTOS_LATIDO', 15))
+    # Cada conexión de eventos ocupa un hilo del worker mientras está abierta:
+    # pasado el límite por proceso se responde 503 (0 = sin límite)
+    app.config['EVENTOS_MAX_CONEXIONES'] = int(os.getenv('EVENTOS_MAX_CONEXIONES', 50))
+    if config:
+        app.config.update(config)
+
+    fragmentos_cotizaciones.max_entradas = app.config['JSON_CACHE_FRAGMENTOS']
+    cache_listados.configurar(crear_backend(
+        app.config['CACHE_LISTADOS'],
+        max_entradas=app.config['CACHE_LISTADOS_MAX'],
+        ttl=app.config['CACHE_LISTADOS_TTL'],
+        # En memoria: escrituras de otros procesos de la misma base (workers, comandos)
+        marca=marca_para(app.config['SQLALCHEMY_DATABASE_URI']),
+    ))
+    optimizador_imagenes.configurar(
+        directorio=app.config['IMAGENES_CACHE_DIR'],
+        dpi=app.config['IMAGENES_DPI'],
+        activo=app.config['IMAGENES_OPTIMIZAR'],
+    )
+    archivos_exportacion.configurar(app.config['EXPORTACIONES_DIR'])
+    admision_exportaciones.configurar(
+        app.config['EXPORTACION_CONCURRENCIA'],
+        cola=app.config['EXPORTACION_COLA'],
+        espera=app.config['EXPORTACION_ESPERA'],
+    )
+    prerender.configurar(app if app.config['PRERENDER'] else None, hilos=app.config['PRERENDER_HILOS'])
+    directorio_eventos = app.config['EVENTOS_SOCKET_DIR']
+    max_conexiones = app.config['EVENTOS_MAX_CONEXIONES']
+    if directorio_eventos.lower() == 'off':
+        bus_eventos.configurar(None, max_suscripciones=max_conexiones)
+    else:
+        bus_eventos.configurar(
+            directorio_eventos or bus_eventos.directorio_para(app.config['SQLALCHEMY_DATABASE_URI']),
+            max_suscripciones=max_conexiones,
+        )
+
+    # Inicializar base de datos
+    db.init_app(app)
 
-# Configuración
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///cotizaciones.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Métricas de sentencias SQL y registro de consultas lentas
+    monitor_sql = MonitorSQL(umbral_lenta=app.config['SQL_UMBRAL_LENTA_MS'] / 1000)
+    with app.app_context():
+        activar_llaves_foraneas(db.engine)
+        monitor_sql.instalar(db.engine)
+    # El esquema no se toca aquí (create_app puede correr en cada worker o al
+    # importar): se crea o actualiza con init_db.py o `flask actualizar-esquema`
+    app.extensions['monitor_sql'] = monitor_sql
+
+    app.register_blueprint(rutas)
+    # Registrada después de la instrumentación para que su after_request corra antes
+    # y la latencia medida incluya la compresión
+    Compresion(app)
+
+    if app.config['PRECARGAR']:
+        precargar(app)
+    return app
+
+
+# ==================== SERVICIOS DE EXPORTACIÓN ====================
+
+def servicio_pdf():
+    """PDFService de la aplicación actual; ReportLab se importa al primer uso"""
+    servicio = current_app.extensions.get('pdf_service')
+    if servicio is None:
+        from src.services.pdf_service import PDFService
+        servicio = PDFService(
+            umbral_tabla_rapida=current_app.config['PDF_UMBRAL_TABLA_RAPIDA'],
+            umbral_paralelo=current_app.config['PDF_UMBRAL_PARALELO'],
+            procesos_paralelo=current_app.config['PDF_PROCESOS'],
+        )
+        current_app.extensions['pdf_service'] = servicio
+    return servicio
+
+
+def servicio_excel():
+    """ExcelService de la aplicación actual; openpyxl se importa al primer uso"""
+    servicio = current_app.extensions.get('excel_service')
+    if servicio is None:
+        from src.services.excel_service import ExcelService
+        servicio = ExcelService(motor=current_app.config['EXCEL_MOTOR'])
+        current_app.extensions['excel_service'] = servicio
+    return servicio
+
+
+def servicio_analitica():
+    """Instantánea analítica de la aplicación actual; NumPy se importa al primer uso"""
+    servicio = current_app.extensions.get('analitica')
+    if servicio is None:
+        from src.services.analitica import Analitica
+        servicio = Analitica(
+            current_app.config['ANALITICA_DIR'],
+            intervalo=current_app.config['ANALITICA_INTERVALO'],
+            app=current_app._get_current_object(),
+        )
+        current_app.extensions['analitica'] = servicio
+    return servicio
 
-# Inicializar base de datos
-db.init_app(app)
 
-# Servicios
-pdf_service = PDFService()
-excel_service = ExcelService()
+def _saturado(error: ExportacionesSaturadas):
+    """503 con Retry-After cuando no hubo turno para renderizar"""
+    respuesta = jsonify({'error': str(error), 'motivo': error.motivo})
+    respuesta.status_code = 503
+    respuesta.headers['Retry-After'] = str(error.reintentar)
+    return respuesta
+
+
+def precargar(app: Flask) -> None:
+    """
+    Importa y calienta los renderers (estilos, fuentes, métricas de texto)
+    para pagar ese costo una sola vez. Pensado para servidores que hacen fork
+    (p. ej. ``gunicorn --preload``): corre en el proceso maestro y los workers
+    heredan los módulos ya cargados. No abre conexiones a la base de datos.
+    """
+    with app.app_context():
+        pdf = servicio_pdf()
+        excel = servicio_excel()
+        pdf._crear_estilos()
+        excel._crear_estilos()
+        from src.services.pdf_tabla_rapida import ancho_texto, FUENTE, FUENTE_BOLD, TAM_CELDA, TAM_ENCABEZADO
+        ancho_texto('0123456789,.', FUENTE, TAM_CELDA)
+        ancho_texto('0123456789,.', FUENTE_BOLD, TAM_ENCABEZADO)
+        from openpyxl import Workbook
+        Workbook()
+
+
+# ==================== INSTRUMENTACIÓN ====================
+
+metricas.describir('cotiz_http_peticion_segundos', 'histogram',
+                   'Latencia de las peticiones HTTP por ruta, método y estatus')
+metricas.describir('cotiz_http_sql_sentencias', 'histogram',
+                   'Sentencias SQL emitidas por petición, por ruta')
+BUCKETS_SENTENCIAS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+@rutas.before_app_request
+def iniciar_instrumentacion():
+    """Abre la captura de fases de la petición y, si se pidió, el perfilador"""
+    g.inicio_peticion = time.perf_counter()
+    iniciar_captura()
+    iniciar_conteo()
+    if current_app.config['PERFILADO_HABILITADO'] and request.args.get('perfil') == '1':
+        g.perfil = cProfile.Profile()
+        g.perfil.enable()
+
+
+@rutas.after_app_request
+def cerrar_instrumentacion(response):
+    """Agrega Server-Timing y vuelca el perfil cProfile de la petición"""
+    perfil = g.pop('perfil', None)
+    if perfil is not None:
+        perfil.disable()
+        os.makedirs(current_app.config['PERFILES_DIR'], exist_ok=True)
+        nombre = f"{request.endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"
+        perfil.dump_stats(os.path.join(current_app.config['PERFILES_DIR'], nombre))
+        response.headers['X-Perfil'] = nombre
+
+    # Latencia y sentencias SQL por ruta (plantilla de la regla, no la URL concreta)
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    duracion = time.perf_counter() - g.pop('inicio_peticion', time.perf_counter())
+    metricas.observar('cotiz_http_peticion_segundos', duracion, {
+        'ruta': ruta, 'metodo': request.method, 'estatus': response.status_code,
+    })
+    conteo = conteo_actual()
+    if conteo is not None:
+        metricas.observar('cotiz_http_sql_sentencias', conteo[0], {'ruta': ruta},
+                          buckets=BUCKETS_SENTENCIAS)
+
+    if current_app.config['SERVER_TIMING']:
+        tiempos = tiempos_capturados()
+        if conteo:
+            tiempos.append((f'sql;desc="{int(conteo[0])} sentencias"', conteo[1]))
+        if tiempos:
+            response.headers['Server-Timing'] = encabezado_server_timing(tiempos)
+    return response
+
+
+@rutas.route('/metrics')
+def metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(metricas.exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@rutas.route('/debug/slow-queries')
+def debug_consultas_lentas():
+    """Últimas consultas SQL que superaron SQL_UMBRAL_LENTA_MS (parámetros redactados)"""
+    lentas = current_app.extensions['monitor_sql'].consultas_lentas()
+    return jsonify({
+        'umbral_ms': current_app.config['SQL_UMBRAL_LENTA_MS'],
+        'consultas': lentas,
+        'total': len(lentas),
+    }), 200
+
+
+@rutas.route('/debug/cache')
+def debug_cache():
+    """Aciertos, fallos y entradas de la caché de listados de cotizaciones"""
+    return jsonify({'listados': cache_listados.estadisticas()}), 200
 
 
 # ==================== RUTAS PRINCIPALES ====================
 
-@app.route('/')
+@rutas.route('/')
 def index():
     """Página principal - Dashboard"""
     return render_template('index.html')
 
 
-@app.route('/nueva-cotizacion')
+@rutas.route('/nueva-cotizacion')
 def nueva_cotizacion():
     """Página para crear nueva cotización"""
     return render_template('nueva_cotizacion.html')
 
 
-@app.route('/historial')
+@rutas.route('/historial')
 def historial():
     """Página de historial de cotizaciones"""
     return render_template('historial.html')
 
 
-@app.route('/clientes')
+@rutas.route('/clientes')
 def clientes():
     """Página de gestión de clientes"""
     return render_template('clientes.html')
 
 
-@app.route('/configuracion')
+@rutas.route('/configuracion')
 def configuracion():
     """Página de configuración de empresa"""
     return render_template('configuracion.html')
@@ -63,9 +339,31 @@ def configuracion():
 
 # ==================== API COTIZACIONES ====================
 
-@app.route('/api/cotizaciones', methods=['GET'])
-def api_obtener_cotizaciones():
-    """Obtiene todas las cotizaciones con filtros opcionales"""
+@rutas.route('/api/eventos', methods=['GET'])
+def api_eventos():
+    """Server-Sent Events con los cambios de cotizaciones (creada, actualizada, estatus, eliminada)"""
+    # Se suscribe antes de responder para poder rechazar con 503 si no hay lugar
+    try:
+        suscripcion = bus_eventos.suscribir()
+    except SuscripcionesAgotadas as e:
+        respuesta = jsonify({'error': str(e)})
+        respuesta.status_code = 503
+        respuesta.headers['Retry-After'] = '30'
+        return respuesta
+    response = Response(
+        flujo_sse(bus_eventos, request.headers.get('Last-Event-ID'),
+                  latido=current_app.config['EVENTOS_LATIDO'], suscripcion=suscripcion),
+        mimetype='text/event-stream'
+    )
+    # Si el flujo nunca llega a enviarse, su ``finally`` no corre
+    response.call_on_close(suscripcion.cerrar)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: no acumular el flujo
+    return response
+
+
+def _filtros_listado():
+    """Filtros del listado de cotizaciones tomados de la query string"""
     filtros = {}
     if request.args.get('cliente_id'):
         filtros['cliente_id'] = request.args.get('cliente_id')
@@ -75,19 +373,26 @@ def api_obtener_cotizaciones():
         filtros['fecha_desde'] = request.args.get('fecha_desde')
     if request.args.get('fecha_hasta'):
         filtros['fecha_hasta'] = request.args.get('fecha_hasta')
-    
-    result, status = CotizacionController.obtener_todas(filtros)
+    return filtros
+
+
+@rutas.route('/api/cotizaciones', methods=['GET'])
+def api_obtener_cotizaciones():
+    """Obtiene todas las cotizaciones con filtros opcionales"""
+    # Por omisión sólo se recorren las cotizaciones activas (no las archivadas)
+    incluir_archivadas = request.args.get('archivadas') == '1'
+    result, status = CotizacionController.obtener_todas(_filtros_listado(), incluir_archivadas)
     return jsonify(result), status
 
 
-@app.route('/api/cotizaciones/<int:cotizacion_id>', methods=['GET'])
+@rutas.route('/api/cotizaciones/<int:cotizacion_id>', methods=['GET'])
 def api_obtener_cotizacion(cotizacion_id):
     """Obtiene una cotización específica"""
     result, status = CotizacionController.obtener_cotizacion(cotizacion_id)
     return jsonify(result), status
 
 
-@app.route('/api/cotizaciones', methods=['POST'])
+@rutas.route('/api/cotizaciones', methods=['POST'])
 def api_crear_cotizacion():
     """Crea una nueva cotización"""
     data = request.get_json()
@@ -95,7 +400,7 @@ def api_crear_cotizacion():
     return jsonify(result), status
 
 
-@app.route('/api/cotizaciones/<int:cotizacion_id>', methods=['PUT'])
+@rutas.route('/api/cotizaciones/<int:cotizacion_id>', methods=['PUT'])
 def api_actualizar_cotizacion(cotizacion_id):
     """Actualiza una cotización existente"""
     data = request.get_json()
@@ -103,14 +408,14 @@ def api_actualizar_cotizacion(cotizacion_id):
     return jsonify(result), status
 
 
-@app.route('/api/cotizaciones/<int:cotizacion_id>', methods=['DELETE'])
+@rutas.route('/api/cotizaciones/<int:cotizacion_id>', methods=['DELETE'])
 def api_eliminar_cotizacion(cotizacion_id):
     """Elimina una cotización"""
     result, status = CotizacionController.eliminar_cotizacion(cotizacion_id)
     return jsonify(result), status
 
 
-@app.route('/api/cotizaciones/<int:cotizacion_id>/estatus', methods=['PATCH'])
+@rutas.route('/api/cotizaciones/<int:cotizacion_id>/estatus', methods=['PATCH'])
 def api_cambiar_estatus(cotizacion_id):
     """Cambia el estatus de una cotización"""
     data = request.get_json()
@@ -119,31 +424,123 @@ def api_cambiar_estatus(cotizacion_id):
     return jsonify(result), status
 
 
-@app.route('/api/cotizaciones/consecutivo', methods=['GET'])
+@rutas.route('/api/cotizaciones/purgar', methods=['POST'])
+def api_purgar_cotizaciones():
+    """Elimina en lotes las cotizaciones de un estatus con más de N días"""
+    data = request.get_json() or {}
+    result, status = CotizacionController.purgar(
+        estatus=data.get('estatus', 'Borrador'),
+        dias=data.get('dias'),
+        lote=data.get('lote', 500)
+    )
+    return jsonify(result), status
+
+
+@rutas.route('/api/cotizaciones/archivar', methods=['POST'])
+def api_archivar_cotizaciones():
+    """Mueve al archivo, en lotes, las cotizaciones cerradas con más de N días"""
+    data = request.get_json() or {}
+    result, status = CotizacionController.archivar(
+        dias=data.get('dias', 365),
+        estatus=data.get('estatus', ['Aceptada', 'Cancelada']),
+        lote=data.get('lote', 500)
+    )
+    return jsonify(result), status
+
+
+@rutas.cli.command('archivar')
+@click.option('--dias', default=365, show_default=True, help='Antigüedad mínima en días')
+@click.option('--estatus', multiple=True, default=['Aceptada', 'Cancelada'], show_default=True)
+@click.option('--lote', default=500, show_default=True, help='Cotizaciones por transacción')
+def cli_archivar(dias, estatus, lote):
+    """Mueve al archivo las cotizaciones cerradas antiguas"""
+    result, status = CotizacionController.archivar(dias=dias, estatus=estatus, lote=lote)
+    click.echo(result)
+    if status != 200:
+        raise SystemExit(1)
+
+
+@rutas.route('/api/cotizaciones/consecutivo', methods=['GET'])
 def api_obtener_consecutivo():
     """Obtiene el siguiente número consecutivo"""
     consecutivo = CotizacionController.generar_consecutivo()
     return jsonify({'numero_cotizacion': consecutivo}), 200
 
 
+def _responder_cambios(recurso):
+    """Página del feed de cambios de ``recurso`` según los parámetros de la petición"""
+    result, status = CambiosController.obtener_cambios(
+        recurso,
+        updated_since=request.args.get('updated_since'),
+        cursor=request.args.get('cursor'),
+        limite=request.args.get('limite', 500),
+        retencion_dias=current_app.config['CAMBIOS_RETENCION_DIAS']
+    )
+    return jsonify(result), status
+
+
+@rutas.route('/api/cotizaciones/cambios', methods=['GET'])
+def api_cambios_cotizaciones():
+    """Cotizaciones modificadas y eliminadas desde updated_since o cursor"""
+    return _responder_cambios('cotizaciones')
+
+
+@rutas.route('/api/cotizaciones/detalles/cambios', methods=['GET'])
+def api_cambios_detalles():
+    """Líneas de cotización modificadas y eliminadas desde updated_since o cursor"""
+    return _responder_cambios('detalles')
+
+
+@rutas.cli.command('depurar-eliminaciones')
+@click.option('--dias', default=None, type=int, help='Antigüedad mínima en días (default CAMBIOS_RETENCION_DIAS)')
+def cli_depurar_eliminaciones(dias):
+    """Borra los registros de eliminación más antiguos que la retención del feed de cambios"""
+    dias = dias if dias is not None else current_app.config['CAMBIOS_RETENCION_DIAS']
+    click.echo(f'{depurar_eliminaciones(dias)} registros de eliminación depurados')
+
+
 # ==================== API CLIENTES ====================
 
-@app.route('/api/clientes', methods=['GET'])
+@rutas.route('/api/clientes', methods=['GET'])
 def api_obtener_clientes():
     """Obtiene todos los clientes"""
     busqueda = request.args.get('busqueda')
-    result, status = ClienteController.obtener_todos(busqueda)
+    result, status = ClienteController.obtener_todos(busqueda, request.args.get('orden', 'nombre'))
     return jsonify(result), status
 
 
-@app.route('/api/clientes/<int:cliente_id>', methods=['GET'])
+@rutas.route('/api/clientes/opciones', methods=['GET'])
+def api_opciones_clientes():
+    """Clientes (id y nombre) para selectores, con ETag y filtro por prefijo"""
+    result, status = ClienteController.obtener_opciones(
+        request.args.get('prefijo', ''),
+        request.args.get('limite', 1000)
+    )
+    response = jsonify(result)
+    response.status_code = status
+    if status == 200:
+        # El contenido sólo depende de la versión del catálogo y de los parámetros
+        parametros = f"{result['version']}|{request.args.get('prefijo', '')}|{request.args.get('limite', '')}"
+        response.set_etag(hashlib.sha1(parametros.encode()).hexdigest()[:20])
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+    return response
+
+
+@rutas.route('/api/clientes/cambios', methods=['GET'])
+def api_cambios_clientes():
+    """Clientes modificados y eliminados desde updated_since o cursor"""
+    return _responder_cambios('clientes')
+
+
+@rutas.route('/api/clientes/<int:cliente_id>', methods=['GET'])
 def api_obtener_cliente(cliente_id):
     """Obtiene un cliente específico"""
     result, status = ClienteController.obtener_cliente(cliente_id)
     return jsonify(result), status
 
 
-@app.route('/api/clientes', methods=['POST'])
+@rutas.route('/api/clientes', methods=['POST'])
 def api_crear_cliente():
     """Crea un nuevo cliente"""
     data = request.get_json()
@@ -151,7 +548,7 @@ def api_crear_cliente():
     return jsonify(result), status
 
 
-@app.route('/api/clientes/<int:cliente_id>', methods=['PUT'])
+@rutas.route('/api/clientes/<int:cliente_id>', methods=['PUT'])
 def api_actualizar_cliente(cliente_id):
     """Actualiza un cliente existente"""
     data = request.get_json()
@@ -159,23 +556,40 @@ def api_actualizar_cliente(cliente_id):
     return jsonify(result), status
 
 
-@app.route('/api/clientes/<int:cliente_id>', methods=['DELETE'])
+@rutas.route('/api/clientes/<int:cliente_id>', methods=['DELETE'])
 def api_eliminar_cliente(cliente_id):
     """Elimina un cliente"""
     result, status = ClienteController.eliminar_cliente(cliente_id)
     return jsonify(result), status
 
 
+@rutas.cli.command('actualizar-esquema')
+def cli_actualizar_esquema():
+    """Crea las tablas que falten y aplica los ajustes de esquema de versiones anteriores"""
+    aplicados = asegurar_esquema(db.engine)
+    click.echo(f"Ajustes aplicados: {', '.join(aplicados)}" if aplicados else 'El esquema ya estaba al día')
+
+
+@rutas.cli.command('recalcular-estadisticas-clientes')
+def cli_recalcular_estadisticas_clientes():
+    """Rehace las estadísticas de los clientes (cotizaciones, total aceptado, última) desde las cotizaciones"""
+    result, status = ClienteController.recalcular_estadisticas()
+    if status != 200:
+        click.echo(result['error'], err=True)
+        raise SystemExit(1)
+    click.echo(f"Estadísticas recalculadas para {result['clientes']} clientes")
+
+
 # ==================== API EMPRESA ====================
 
-@app.route('/api/empresa', methods=['GET'])
+@rutas.route('/api/empresa', methods=['GET'])
 def api_obtener_empresa():
     """Obtiene datos de la empresa"""
     result, status = EmpresaController.obtener_empresa()
     return jsonify(result), status
 
 
-@app.route('/api/empresa', methods=['POST', 'PUT'])
+@rutas.route('/api/empresa', methods=['POST', 'PUT'])
 def api_guardar_empresa():
     """Crea o actualiza datos de la empresa"""
     data = request.get_json()
@@ -185,76 +599,223 @@ def api_guardar_empresa():
 
 # ==================== API EXPORTACIONES ====================
 
-@app.route('/api/cotizaciones/<int:cotizacion_id>/export/pdf', methods=['GET'])
+@rutas.route('/api/cotizaciones/<int:cotizacion_id>/export/pdf', methods=['GET'])
 def api_exportar_pdf(cotizacion_id):
     """Genera y descarga PDF de cotización"""
     try:
         # Obtener datos de cotización
-        result, status = CotizacionController.obtener_cotizacion(cotizacion_id)
+        with medir('api', 'obtener_cotizacion'):
+            result, status = CotizacionController.obtener_para_exportar(cotizacion_id)
         if status != 200:
             return jsonify(result), status
         
-        cotizacion_data = result['cotizacion']
+        cotizacion = result['cotizacion']
         
         # Obtener datos de empresa
-        empresa_result, empresa_status = EmpresaController.obtener_empresa()
-        empresa_data = empresa_result.get('empresa', {}) if empresa_status == 200 else {}
+        with medir('api', 'obtener_empresa'):
+            empresa = EmpresaController.obtener_para_exportar()
         
-        # Generar PDF
-        filepath = pdf_service.generar_cotizacion(cotizacion_data, empresa_data)  # type: ignore
+        # Generar PDF: una sola vez por versión aunque lleguen varias peticiones a la vez
+        # (o tomar el que ya dejó listo el pre-render)
+        servicio = servicio_pdf()
+        filepath, _ = archivos_exportacion.obtener_o_generar(
+            cotizacion_id, 'pdf', huella_exportacion(cotizacion, empresa, servicio.identidad()),
+            lambda: admision_exportaciones.ejecutar(servicio.generar_cotizacion, cotizacion, empresa)
+        )
         
         # Enviar archivo
-        numero_cot = cotizacion_data['numero_cotizacion'] if isinstance(cotizacion_data, dict) else 'cotizacion'
-        return send_file(
+        numero_cot = cotizacion.numero_cotizacion
+        return enviar_archivo(
             filepath,
             as_attachment=True,
             download_name=f"{numero_cot}.pdf",
             mimetype='application/pdf'
         )
         
+    except ExportacionesSaturadas as e:
+        return _saturado(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/cotizaciones/<int:cotizacion_id>/export/excel', methods=['GET'])
+def _nombre_lote(filtros):
+    """Nombre de archivo estable por combinación de filtros"""
+    clave = json.dumps(filtros, sort_keys=True)
+    return f"lote-{hashlib.sha1(clave.encode()).hexdigest()[:12]}"
+
+
+@rutas.route('/api/cotizaciones/export/pdf', methods=['GET'])
+def api_exportar_lote_pdf():
+    """Genera y descarga un solo PDF con todas las cotizaciones que cumplen los filtros del listado"""
+    try:
+        with medir('api', 'obtener_cotizaciones'):
+            result, status = CotizacionController.obtener_para_lote(
+                _filtros_listado(),
+                incluir_archivadas=request.args.get('archivadas') == '1',
+                limite=current_app.config['PDF_LOTE_MAX']
+            )
+        if status != 200:
+            return jsonify(result), status
+        
+        with medir('api', 'obtener_empresa'):
+            empresa = EmpresaController.obtener_para_exportar()
+        
+        # Peticiones iguales a la vez generan el lote una sola vez (también entre workers);
+        # la huella cubre todas las cotizaciones, así que un lote sin cambios no se rehace
+        servicio = servicio_pdf()
+        cotizaciones = result['cotizaciones']
+        nombre = _nombre_lote(result['filtros'])
+        filepath, _ = archivos_exportacion.obtener_o_generar(
+            nombre, 'pdf', huella_exportacion(cotizaciones, empresa, servicio.identidad()),
+            lambda: admision_exportaciones.ejecutar(servicio.generar_lote, cotizaciones, empresa, nombre)
+        )
+        return enviar_archivo(
+            filepath,
+            as_attachment=True,
+            download_name=f"proformas-{datetime.now():%Y%m%d}.pdf",
+            mimetype='application/pdf'
+        )
+        
+    except ExportacionesSaturadas as e:
+        return _saturado(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@rutas.cli.command('exportar-lote')
+@click.option('--cliente-id', default=None, help='Sólo las cotizaciones de este cliente')
+@click.option('--estatus', default=None, help='Borrador, Enviada, Aceptada o Cancelada')
+@click.option('--fecha-desde', default=None, help='YYYY-MM-DD')
+@click.option('--fecha-hasta', default=None, help='YYYY-MM-DD')
+@click.option('--archivadas', is_flag=True, help='Incluir las cotizaciones archivadas')
+@click.option('--salida', default=None, type=click.Path(dir_okay=False), help='Ruta del PDF (default exports/pdf)')
+def cli_exportar_lote(cliente_id, estatus, fecha_desde, fecha_hasta, archivadas, salida):
+    """Exporta en un solo PDF (con marcadores) las cotizaciones que cumplen los filtros"""
+    filtros = {'cliente_id': cliente_id, 'estatus': estatus, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta}
+    result, status = CotizacionController.obtener_para_lote(
+        filtros, incluir_archivadas=archivadas, limite=current_app.config['PDF_LOTE_MAX']
+    )
+    if status != 200:
+        click.echo(result['error'], err=True)
+        raise SystemExit(1)
+    filepath = servicio_pdf().generar_lote(
+        result['cotizaciones'], EmpresaController.obtener_para_exportar(), _nombre_lote(result['filtros'])
+    )
+    if salida:
+        filepath = shutil.move(filepath, salida)
+    click.echo(f"{len(result['cotizaciones'])} cotizaciones -> {filepath}")
+
+
+@rutas.route('/api/cotizaciones/<int:cotizacion_id>/export/excel', methods=['GET'])
 def api_exportar_excel(cotizacion_id):
-    """Genera y descarga Excel de cotización"""
+    """Genera y descarga Excel de cotización (?motor=openpyxl|xml para elegir el motor)"""
     try:
+        servicio = servicio_excel()
+        motor = request.args.get('motor') or None
+        if motor is not None and motor not in servicio.MOTORES:
+            return jsonify({'error': f'Motor inválido. Valores permitidos: {list(servicio.MOTORES)}'}), 400
+
         # Obtener datos de cotización
-        result, status = CotizacionController.obtener_cotizacion(cotizacion_id)
+        with medir('api', 'obtener_cotizacion'):
+            result, status = CotizacionController.obtener_para_exportar(cotizacion_id)
         if status != 200:
             return jsonify(result), status
         
-        cotizacion_data = result['cotizacion']
+        cotizacion = result['cotizacion']
         
         # Obtener datos de empresa
-        empresa_result, empresa_status = EmpresaController.obtener_empresa()
-        empresa_data = empresa_result.get('empresa', {}) if empresa_status == 200 else {}
+        with medir('api', 'obtener_empresa'):
+            empresa = EmpresaController.obtener_para_exportar()
         
-        # Generar Excel
-        filepath = excel_service.generar_cotizacion(cotizacion_data, empresa_data)  # type: ignore
+        # Generar Excel: una sola vez por versión. El motor (el configurado o el de
+        # ?motor=) va en la huella, y todos pasan por la misma coordinación: el
+        # servicio escribe todos los motores en el mismo archivo de trabajo
+        filepath, _ = archivos_exportacion.obtener_o_generar(
+            cotizacion_id, 'excel', huella_exportacion(cotizacion, empresa, servicio.identidad(motor)),
+            lambda: admision_exportaciones.ejecutar(servicio.generar_cotizacion, cotizacion, empresa, motor=motor)
+        )
         
         # Enviar archivo
-        numero_cot = cotizacion_data['numero_cotizacion'] if isinstance(cotizacion_data, dict) else 'cotizacion'
-        return send_file(
+        numero_cot = cotizacion.numero_cotizacion
+        return enviar_archivo(
             filepath,
             as_attachment=True,
             download_name=f"{numero_cot}.xlsx",
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
         
+    except ExportacionesSaturadas as e:
+        return _saturado(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== API ANALÍTICA ====================
+
+def _responder_analitica(result, status):
+    """JSON del controlador; mientras se genera la primera instantánea, 503 con Retry-After"""
+    respuesta = jsonify(result)
+    respuesta.status_code = status
+    if status == 503:
+        respuesta.headers['Retry-After'] = '30'
+    return respuesta
+
+
+@rutas.route('/api/analitica/ingresos', methods=['GET'])
+def api_analitica_ingresos():
+    """Ingresos por grupo, mes, cliente o concepto (?por=), con filtros de estatus y meses"""
+    analitica = servicio_analitica()
+    analitica.asegurar_actualizacion()
+    return _responder_analitica(*AnaliticaController.ingresos(
+        analitica,
+        por=request.args.get('por', 'grupo'),
+        estatus=request.args.get('estatus'),
+        desde=request.args.get('desde'),
+        hasta=request.args.get('hasta'),
+        limite=request.args.get('limite', 50)
+    ))
+
+
+@rutas.route('/api/analitica/estatus', methods=['GET'])
+def api_analitica_estatus():
+    """Cotizaciones y monto por estatus, con la tasa de aceptación"""
+    analitica = servicio_analitica()
+    analitica.asegurar_actualizacion()
+    return _responder_analitica(*AnaliticaController.estatus(
+        analitica,
+        desde=request.args.get('desde'),
+        hasta=request.args.get('hasta')
+    ))
+
+
+@rutas.route('/api/analitica/actualizar', methods=['POST'])
+def api_analitica_actualizar():
+    """Actualiza la instantánea analítica en la petición ({"completa": true} la reconstruye)"""
+    data = request.get_json(silent=True) or {}
+    result, status = AnaliticaController.actualizar(servicio_analitica(), completa=bool(data.get('completa')))
+    return jsonify(result), status
+
+
+@rutas.cli.command('actualizar-analitica')
+@click.option('--completa', is_flag=True, help='Reconstruir desde cero en lugar de incremental')
+def cli_actualizar_analitica(completa):
+    """Actualiza la instantánea columnar de /api/analitica (para cron con ANALITICA_INTERVALO=0)"""
+    result, status = AnaliticaController.actualizar(servicio_analitica(), completa=completa)
+    if status != 200:
+        click.echo(result['error'], err=True)
+        raise SystemExit(1)
+    click.echo(f"{result['tipo']}: {result['cotizaciones']} cotizaciones, {result['lineas']} líneas "
+               f"en {result['segundos']} s")
+
+
 # ==================== MANEJO DE ERRORES ====================
 
-@app.errorhandler(404)
+@rutas.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Recurso no encontrado'}), 404
 
 
-@app.errorhandler(500)
+@rutas.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return jsonify({'error': 'Error interno del servidor'}), 500
@@ -263,13 +824,15 @@ def internal_error(error):
 # ==================== EJECUCIÓN ====================
 
 if __name__ == '__main__':
+    app = create_app()
+
     # Crear directorios necesarios
     os.makedirs('exports/pdf', exist_ok=True)
     os.makedirs('exports/excel', exist_ok=True)
     
-    # Crear tablas
+    # Crear tablas y poner al día las de bases anteriores
     with app.app_context():
-        db.create_all()
+        asegurar_esquema(db.engine)
     
     # Ejecutar aplicación
     app.run(debug=True, host='0.0.0.0', port=5000)
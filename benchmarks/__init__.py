@@ -0,0 +1 @@
+# Paquete de benchmarks
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Instantánea analítica contra GROUP BY en SQL.
+
+Uso:
+    python -m benchmarks.analitica
+    python -m benchmarks.analitica --tamano mediano --repeticiones 5 --cambios 1000
+
+Sobre una copia de la base sintética del tamaño pedido mide la construcción
+completa de la instantánea, una actualización incremental después de editar
+``--cambios`` cotizaciones, y cada reporte de ``/api/analitica`` (ingresos por
+grupo, mes, cliente y concepto; cotizaciones por estatus) contra la misma
+agregación hecha con GROUP BY en SQLite. Termina con código 1 si algún
+resultado no coincide con el de SQL.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.run_benchmarks import TAMANOS, crear_app, medir, preparar_base  # noqa: E402
+
+SQL = {
+    'grupo': 'SELECT d.grupo, SUM(d.total_linea) FROM detalle_cotizacion d GROUP BY d.grupo',
+    'mes': "SELECT strftime('%Y-%m', c.fecha), SUM(d.total_linea) FROM detalle_cotizacion d "
+           'JOIN cotizacion c ON c.id = d.cotizacion_id GROUP BY 1',
+    'cliente': 'SELECT c.cliente_id, SUM(d.total_linea) FROM detalle_cotizacion d '
+               'JOIN cotizacion c ON c.id = d.cotizacion_id GROUP BY 1',
+    'concepto': 'SELECT d.descripcion, SUM(d.total_linea) FROM detalle_cotizacion d GROUP BY d.descripcion',
+    'estatus': 'SELECT estatus, COUNT(*) FROM cotizacion GROUP BY estatus',
+}
+
+
+def iguales(snapshot: Dict, sql: Dict) -> bool:
+    return snapshot.keys() == sql.keys() and all(abs(snapshot[k] - sql[k]) < 0.01 for k in sql)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamano', choices=list(TAMANOS), default='chico')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--cambios', type=int, default=500, help='Cotizaciones editadas antes de la incremental')
+    args = parser.parse_args(argv)
+
+    from datetime import datetime
+
+    from sqlalchemy import text
+
+    from src.models.models import db
+    from src.services.analitica import Analitica
+
+    ruta_db = preparar_base(args.tamano)
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-analitica-')
+    analitica = Analitica(os.path.join(temporal, 'analitica'), intervalo=0)
+    app = crear_app(ruta_db)
+    ok = True
+    try:
+        with app.app_context():
+            completa = analitica.actualizar(completa=True)
+            print(f"Instantánea completa: {completa['cotizaciones']:,} cotizaciones, {completa['lineas']:,} líneas "
+                  f"en {completa['segundos']:.2f} s")
+
+            # Cambio de estatus de --cambios cotizaciones (toca updated_at como la API)
+            db.session.execute(text(
+                "UPDATE cotizacion SET estatus = 'Aceptada', updated_at = :ahora "
+                'WHERE id IN (SELECT id FROM cotizacion ORDER BY id DESC LIMIT :n)'
+            ), {'n': args.cambios, 'ahora': datetime.utcnow()})
+            db.session.commit()
+            incremental = medir(lambda: analitica.actualizar(), 1, calentamiento=0)
+            print(f"Incremental tras editar {args.cambios:,} cotizaciones: "
+                  f"{incremental['mediana'] * 1000:.1f} ms\n")
+
+            print(f"  {'reporte':<10} {'ms instantánea':>15} {'ms SQL':>10} {'x':>7}  resultado")
+            for por, consulta in SQL.items():
+                if por == 'estatus':
+                    calcular = analitica.por_estatus
+                    a_dict = lambda filas: {f['estatus']: f['cotizaciones'] for f in filas}  # noqa: E731
+                else:
+                    calcular = lambda por=por: analitica.ingresos(por, limite=10 ** 9)  # noqa: E731
+                    a_dict = lambda filas: {f['clave']: f['ingresos'] for f in filas}  # noqa: E731
+                t_snapshot = medir(calcular, args.repeticiones)['mediana']
+                t_sql = medir(lambda: db.session.execute(text(consulta)).all(), args.repeticiones)['mediana']
+                coincide = iguales(a_dict(calcular()), dict(db.session.execute(text(consulta)).all()))
+                ok = ok and coincide
+                print(f"  {por:<10} {t_snapshot * 1000:>15.2f} {t_sql * 1000:>10.1f} {t_sql / t_snapshot:>7.1f}  "
+                      f"{'OK' if coincide else 'DISTINTO'}")
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+        shutil.rmtree(os.path.dirname(ruta_db), ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
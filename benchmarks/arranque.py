@@ -0,0 +1,93 @@
+"""
+Benchmark de arranque en frío basado en ``python -X importtime``.
+
+Uso:
+    python -m benchmarks.arranque
+    python -m benchmarks.arranque --repeticiones 10 --top 20
+
+Importa ``app``, ``wsgi`` (que además crea la aplicación, con y sin
+``PRECARGAR=1``) e ``init_db`` en procesos nuevos, y reporta la mediana del
+tiempo de importación acumulado junto con las dependencias directas más caras.
+Sirve para vigilar que ReportLab y openpyxl no vuelvan a cargarse al importar
+o crear la aplicación.
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINEA = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+MODULOS_PESADOS = ('reportlab', 'openpyxl')
+
+
+def importar(modulo: str, entorno: Dict[str, str], cwd: str) -> List[Tuple[str, int, int]]:
+    """Importa ``modulo`` en un proceso nuevo: [(paquete, profundidad, acumulado_us)]."""
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=cwd, env=entorno, capture_output=True, text=True,
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(f'No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}')
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if m:
+            filas.append((m.group(4), (len(m.group(3)) - 1) // 2, int(m.group(2))))
+    return filas
+
+
+def resumir(modulo: str, entorno: Dict[str, str], cwd: str, repeticiones: int, top: int) -> None:
+    totales: List[int] = []
+    directas: Dict[str, List[int]] = {}
+    pesados: set = set()
+    for _ in range(repeticiones):
+        filas = importar(modulo, entorno, cwd)
+        totales.append(next(us for nombre, prof, us in filas if nombre == modulo and prof == 0))
+        for nombre, prof, us in filas:
+            if prof == 1:
+                directas.setdefault(nombre, []).append(us)
+            if nombre.split('.')[0] in MODULOS_PESADOS:
+                pesados.add(nombre.split('.')[0])
+
+    print(f'  import {modulo}: mediana {statistics.median(totales) / 1000:.1f} ms '
+          f'(min {min(totales) / 1000:.1f}, max {max(totales) / 1000:.1f})')
+    print(f"  renderers cargados: {', '.join(sorted(pesados)) or 'ninguno'}")
+    caros = sorted(directas.items(), key=lambda kv: statistics.median(kv[1]), reverse=True)[:top]
+    for nombre, tiempos in caros:
+        print(f'    {statistics.median(tiempos) / 1000:8.1f} ms  {nombre}')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Dependencias directas a listar')
+    args = parser.parse_args(argv)
+
+    # Directorio y base temporales: la precarga crea exports/ en el directorio actual
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-arranque-')
+    base = dict(os.environ, PYTHONPATH=RAIZ,
+                DATABASE_URL=f"sqlite:///{os.path.join(temporal, 'arranque.db')}")
+    base.pop('PRECARGAR', None)
+
+    try:
+        print('\napp (sólo definiciones):')
+        resumir('app', base, temporal, args.repeticiones, args.top)
+        for etiqueta, entorno in (('sin precarga', base), ('PRECARGAR=1', dict(base, PRECARGAR='1'))):
+            print(f'\nwsgi (create_app) {etiqueta}:')
+            resumir('wsgi', entorno, temporal, args.repeticiones, args.top)
+        print('\ninit_db:')
+        resumir('init_db', base, temporal, args.repeticiones, args.top)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Latencia de las APIs ligeras durante una ráfaga de exportaciones.
+
+Uso:
+    python -m benchmarks.carga_exportaciones
+    python -m benchmarks.carga_exportaciones --exportadores 16 --segundos 5 --concurrencia 2 --lineas 300
+
+Genera una base temporal con cotizaciones de ``--lineas`` líneas y mide la
+latencia de ``/api/clientes`` y ``/api/cotizaciones/consecutivo`` en tres
+escenarios de ``--segundos`` cada uno:
+
+- sin exportaciones (la referencia);
+- con ``--exportadores`` hilos descargando Excel sin parar y el control de
+  admisión desactivado;
+- lo mismo con ``EXPORTACION_CONCURRENCIA=--concurrencia``.
+
+Cada hilo hace de hilo del worker (como ``gunicorn --threads``). Las descargas
+usan ``?motor=openpyxl``, que siempre renderiza, y las rechazadas con 503
+esperan 100 ms y vuelven a intentar, para mantener la presión. Con el límite,
+la latencia de las APIs debe quedar cerca de la referencia.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+APIS = ['/api/clientes', '/api/cotizaciones/consecutivo']
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else 0.0
+
+
+def escenario(app, segundos: float, exportadores: int, cotizaciones: int) -> Dict[str, float]:
+    """Corre las APIs (2 hilos) y ``exportadores`` hilos de descarga durante ``segundos``."""
+    fin = time.monotonic() + segundos
+    latencias: List[float] = []
+    conteo = {'exportadas': 0, 'rechazadas': 0, 'errores': 0}
+    lock = threading.Lock()
+
+    def api(indice: int):
+        cliente = app.test_client()
+        i = indice
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            r = cliente.get(APIS[i % len(APIS)])
+            duracion = time.perf_counter() - inicio
+            if r.status_code == 200:
+                latencias.append(duracion)
+            i += 1
+            time.sleep(0.02)
+
+    def exportador(indice: int):
+        cliente = app.test_client()
+        i = indice
+        while time.monotonic() < fin:
+            r = cliente.get(f'/api/cotizaciones/{i % cotizaciones + 1}/export/excel?motor=openpyxl')
+            with lock:
+                if r.status_code == 200:
+                    conteo['exportadas'] += 1
+                elif r.status_code == 503:
+                    conteo['rechazadas'] += 1
+                else:
+                    conteo['errores'] += 1
+            if r.status_code == 503:
+                time.sleep(0.1)
+            i += exportadores
+
+    hilos = [threading.Thread(target=api, args=(i,)) for i in range(2)]
+    hilos += [threading.Thread(target=exportador, args=(i,)) for i in range(exportadores)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return {
+        'peticiones': len(latencias),
+        'p50': percentil(latencias, 0.5),
+        'p95': percentil(latencias, 0.95),
+        'max': max(latencias, default=0.0),
+        **conteo,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exportadores', type=int, default=16, help='Hilos descargando exportaciones')
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--concurrencia', type=int, default=2, help='EXPORTACION_CONCURRENCIA del escenario limitado')
+    parser.add_argument('--cola', type=int, default=4)
+    parser.add_argument('--espera', type=float, default=2)
+    parser.add_argument('--lineas', type=int, default=300, help='Líneas por cotización')
+    args = parser.parse_args(argv)
+
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-carga-')
+    ruta_db = os.path.join(temporal, 'cotizaciones.db')
+    # Antes de crear la aplicación: create_app toma su configuración del entorno
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+    os.environ['EVENTOS_SOCKET_DIR'] = 'off'
+    actual = os.getcwd()
+    os.chdir(RAIZ)  # los servicios resuelven static/img relativo al proyecto
+    try:
+        from sqlalchemy import create_engine
+
+        from app import create_app
+        from benchmarks import datos_sinteticos
+        from src.services.admision import admision_exportaciones
+        from src.services.excel_service import ExcelService
+
+        cotizaciones = 50
+        engine = create_engine(f'sqlite:///{ruta_db}')
+        datos_sinteticos.generar(engine, 200, cotizaciones, cotizaciones * args.lineas, uniforme=True)
+        engine.dispose()
+        app = create_app({'EXPORTACIONES_DIR': os.path.join(temporal, 'versiones')})
+        app.extensions['excel_service'] = ExcelService(os.path.join(temporal, 'excel'))
+        app.test_client().get('/api/cotizaciones/1/export/excel?motor=openpyxl')  # calentar openpyxl
+
+        print(f'APIs ligeras ({", ".join(APIS)}) con {args.exportadores} hilos exportando '
+              f'Excel de {args.lineas} líneas, {args.segundos:g} s por escenario:')
+        print(f"  {'escenario':<26} {'peticiones':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+              f"{'exportadas':>10} {'503':>6}")
+        for nombre, exportadores, concurrencia in [
+            ('sin exportaciones', 0, 0),
+            ('ráfaga, sin límite', args.exportadores, 0),
+            (f'ráfaga, límite {args.concurrencia}', args.exportadores, args.concurrencia),
+        ]:
+            admision_exportaciones.configurar(concurrencia, cola=args.cola, espera=args.espera)
+            r = escenario(app, args.segundos, exportadores, cotizaciones)
+            print(f"  {nombre:<26} {r['peticiones']:>10} {r['p50'] * 1000:>8.1f} {r['p95'] * 1000:>8.1f} "
+                  f"{r['max'] * 1000:>8.1f} {r['exportadas']:>10} {r['rechazadas']:>6}")
+            if r['errores']:
+                print(f"    {r['errores']} exportaciones con error")
+    finally:
+        os.chdir(actual)
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,446 @@
+"""
+Generador de datos sintéticos para benchmarks y pruebas de escala.
+
+Uso:
+    python -m benchmarks.datos_sinteticos --tamano mediano --db mediano.db
+    python -m benchmarks.datos_sinteticos --clientes 50000 --cotizaciones 2000000 --lineas 20000000 --db big.db
+    python -m benchmarks.datos_sinteticos --tamano chico --db postgresql://usuario@localhost/cotiz_escala
+
+Inserta clientes, cotizaciones y líneas en lotes sin hidratar objetos ORM (en
+SQLite directo al driver y con los índices secundarios creados al final), de
+modo que cargar 100k clientes, 1M de cotizaciones y 10M de líneas sea cuestión
+de minutos. Con la misma semilla produce siempre los mismos datos, con
+distribuciones parecidas a las de una base real:
+
+- clientes con nombres, direcciones y teléfonos de Sonora (acentos y ñ), una
+  quinta parte empresas; pocos clientes concentran muchas cotizaciones
+- fechas de los últimos tres años en el orden del consecutivo, con más
+  cotizaciones recientes, temporada alta de abril a agosto y sin domingos
+- líneas por cotización con distribución lognormal (muchas cortas y algunas
+  de cientos de líneas), repartidas en 1 a 4 secciones (``grupo``)
+- estatus según la antigüedad (las recientes siguen en Borrador o Enviada),
+  descuento y envío en una parte de las cotizaciones
+
+``uniforme=True`` da a todas las cotizaciones el mismo número de líneas, para
+medir con un tamaño exacto.
+
+Para pruebas de escala (pytest), ``base_temporal`` entrega una copia
+desechable de una base generada una sola vez y guardada en ``benchmarks/.datos``:
+
+    @pytest.fixture(scope='session')
+    def base_grande():
+        with datos_sinteticos.base_temporal(100_000, 1_000_000, 10_000_000) as ruta:
+            yield ruta
+"""
+import argparse
+import bisect
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from sqlalchemy import bindparam, create_engine, insert, text, update  # noqa: E402
+from sqlalchemy.engine import Connection, Engine  # noqa: E402
+
+from src.models.esquema import asegurar_esquema  # noqa: E402
+from src.models.models import db, Empresa, Cliente, Cotizacion, DetalleCotizacion  # noqa: E402
+
+
+NOMBRES = [
+    'José Ángel', 'María Fernanda', 'Jesús', 'Guadalupe', 'Ramón', 'Verónica', 'Joaquín', 'Sofía',
+    'Raúl', 'Inés', 'Nicolás', 'Mónica', 'Sebastián', 'Lucía', 'Martín', 'Érika', 'Andrés', 'Zoé',
+    'Juan', 'María', 'Francisco', 'Begoña', 'Rubén', 'Citlali',
+]
+APELLIDOS = [
+    'Pérez', 'López', 'Hernández', 'González', 'Martínez', 'Ramírez', 'Núñez', 'Ibáñez', 'Peña',
+    'Muñoz', 'Ordóñez', 'Gutiérrez', 'Gómez', 'Sánchez', 'Domínguez', 'Rodríguez', 'Fernández',
+    'Jiménez', 'Álvarez', 'Vázquez', 'Castañeda', 'Barragán', 'Güemes', 'Treviño',
+]
+EMPRESAS = [
+    'Constructora', 'Clínica', 'Restaurante', 'Hotel', 'Farmacia', 'Panadería', 'Taller Mecánico',
+    'Escuela', 'Consultorio Dental', 'Abarrotes', 'Gimnasio', 'Bodega',
+]
+SOCIEDADES = ['S.A. de C.V.', 'S. de R.L. de C.V.', 'S.C.', '']
+CALLES = [
+    'Av. Reforma', 'Blvd. Kino', 'Calle Jesús García', 'Av. Álvaro Obregón', 'Calle Niños Héroes',
+    'Blvd. Luis Encinas', 'Calle Guerrero', 'Av. Juárez', 'Calle Rosales', 'Blvd. Colosio',
+]
+COLONIAS = [
+    'Centro', 'Pitic', 'San Benito', 'Modelo', 'Las Quintas', 'Villa de Seris', 'El Sahuaro',
+    'Balderrama', 'Olivares', 'Jesús García',
+]
+DOMINIOS = ['gmail.com', 'hotmail.com', 'outlook.com', 'yahoo.com.mx', 'prodigy.net.mx']
+LADAS = ['662', '642', '644', '622', '631', '653', '647']
+GRUPOS = [
+    'Hermosillo', 'Navojoa', 'Cajeme', 'Guaymas', 'Nogales', 'San Luis Río Colorado', 'Empalme',
+    'Álamos', 'Huatabampo', 'Caborca', 'Puerto Peñasco',
+]
+# (descripción, precio unitario, cantidad máxima por línea)
+CONCEPTOS = [
+    ('Bases de Herrería', 646.55, 12),
+    ('Modificaciones', 258.62, 6),
+    ('Cableado 3x12 (M)', 59.48, 120),
+    ('Térmico 2x30', 344.83, 6),
+    ('Tubería flexible metálica 1/2 (M)', 30.17, 80),
+    ('Instalación de minisplit 1.5 ton', 2500.00, 4),
+    ('Instalación de minisplit 1 ton', 2200.00, 4),
+    ('Instalación de minisplit 2 ton', 2900.00, 3),
+    ('Mantenimiento preventivo de minisplit', 650.00, 12),
+    ('Limpieza profunda de evaporador', 480.00, 12),
+    ('Recarga de gas refrigerante R410A', 1150.00, 6),
+    ('Recarga de gas refrigerante R22', 1350.00, 6),
+    ('Tubería de cobre 1/4 y 1/2 (M)', 185.00, 40),
+    ('Soporte de pared para condensadora', 420.00, 6),
+    ('Bomba de condensados', 1480.00, 3),
+    ('Reparación de tarjeta electrónica', 1890.00, 2),
+    ('Capacitor de arranque 45 µF', 310.00, 6),
+    ('Diagnóstico y revisión técnica', 350.00, 3),
+    ('Mano de obra eléctrica (hora)', 280.00, 16),
+    ('Aislamiento térmico (M)', 42.50, 60),
+    ('Ducto galvanizado calibre 24 (M)', 390.00, 40),
+    ('Rejilla de inyección 12x12', 265.00, 10),
+]
+NOTAS = [
+    '1.- Cotización válida por 30 días',
+    '1.- Cotización válida por 30 días\n2.- Precio con IVA',
+    '1.- Cotización válida por 15 días\n2.- 50% de anticipo para iniciar el trabajo',
+    '',
+]
+ESTATUS = ['Borrador', 'Enviada', 'Aceptada', 'Cancelada']
+# Pesos acumulados de ESTATUS según los días de antigüedad (hasta el límite indicado)
+ESTATUS_POR_EDAD = [(15, [40, 85, 95, 100]), (60, [15, 55, 85, 100]), (None, [5, 25, 70, 100])]
+# Cotizaciones por mes relativas al promedio: temporada alta de aire acondicionado
+TEMPORADA = {1: 0.5, 2: 0.6, 3: 0.9, 4: 1.3, 5: 1.7, 6: 1.9, 7: 1.8, 8: 1.6, 9: 1.2, 10: 0.9, 11: 0.6, 12: 0.5}
+SECCIONES = [45, 75, 90, 100]  # pesos acumulados de 1, 2, 3 y 4 secciones por cotización
+DISPERSION_LINEAS = 1.0  # sigma de la lognormal de líneas por cotización
+DIAS = 3 * 365
+
+TAMANOS = {
+    'chico': (1_000, 5_000, 50_000),
+    'mediano': (10_000, 100_000, 1_000_000),
+    'grande': (100_000, 1_000_000, 10_000_000),
+}
+DIR_CACHE = os.path.join(RAIZ, 'benchmarks', '.datos')
+# Cambia con las distribuciones: las bases en caché de otra versión se regeneran
+VERSION = 2
+
+TAMANO_LOTE = 20000
+
+
+class _Progreso:
+    """Avance de una carga larga (filas, porcentaje y filas/s), a lo más cada ``cada`` segundos."""
+
+    def __init__(self, etiqueta: str, total: int, activo: bool = True, cada: float = 2.0):
+        self.etiqueta, self.total, self.activo, self.cada = etiqueta, total, activo, cada
+        self.inicio = self.ultimo = time.perf_counter()
+        self.impreso = False
+
+    def avanzar(self, hechas: int, detalle: str = '') -> None:
+        ahora = time.perf_counter()
+        if not self.activo or (ahora - self.ultimo < self.cada and not (self.impreso and hechas >= self.total)):
+            return
+        self.ultimo, self.impreso = ahora, True
+        segundos = ahora - self.inicio
+        print(f'  {self.etiqueta}: {hechas:,}/{self.total:,} ({hechas / max(self.total, 1):.0%}, '
+              f'{hechas / max(segundos, 1e-9):,.0f}/s, {segundos:.1f} s){detalle}', flush=True)
+
+
+def _lotes(filas: Iterator[Any], tamano: int) -> Iterator[List[Any]]:
+    lote: List[Any] = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _insertador(conn: Connection, tabla, columnas: Sequence[str]) -> Callable[[List[Tuple]], None]:
+    """
+    Función que inserta una lista de tuplas (en el orden de ``columnas``). En
+    SQLite va directo al driver: sin el procesamiento de parámetros por fila de
+    SQLAlchemy, que es la mitad del tiempo de carga.
+    """
+    if conn.dialect.name == 'sqlite':
+        sql = f'INSERT INTO {tabla.name} ({", ".join(columnas)}) VALUES ({", ".join("?" * len(columnas))})'
+        return lambda filas: conn.exec_driver_sql(sql, filas)
+    sentencia = insert(tabla)
+    return lambda filas: conn.execute(sentencia, [dict(zip(columnas, f)) for f in filas])
+
+
+def _sin_acentos(texto: str) -> str:
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode().lower().replace(' ', '')
+
+
+def _pesos_dias(fecha_base: date) -> List[float]:
+    """Pesos acumulados de los DIAS anteriores a ``fecha_base`` (el último es el más reciente)."""
+    acumulado, total = [], 0.0
+    for d in range(DIAS):
+        dia = fecha_base - timedelta(days=DIAS - d)
+        peso = (0.4 + 0.6 * d / DIAS) * TEMPORADA[dia.month]  # el negocio crece
+        if dia.weekday() == 6:
+            peso = 0.0
+        elif dia.weekday() == 5:
+            peso *= 0.4
+        total += peso
+        acumulado.append(total)
+    return acumulado
+
+
+def generar(engine: Engine, clientes: int, cotizaciones: int, lineas: int,
+            semilla: int = 42, fecha_base: Optional[date] = None,
+            uniforme: bool = False, progreso: bool = True) -> Dict[str, int]:
+    """
+    Crea las tablas (si no existen) e inserta el volumen pedido en una base
+    vacía. ``lineas`` es el total esperado: el promedio por cotización es
+    ``lineas / cotizaciones`` (exacto con ``uniforme``).
+
+    Returns:
+        dict con el número de filas insertadas por tabla.
+    """
+    rnd = random.Random(semilla)
+    fecha_base = fecha_base or date(2026, 1, 1)
+    ahora = datetime.combine(fecha_base, datetime.min.time()).replace(hour=12)
+    sqlite = engine.dialect.name == 'sqlite'
+    # Por el driver de SQLite las fechas viajan como texto, en el formato que guarda SQLAlchemy
+    fecha_sql: Callable[[date], Any] = date.isoformat if sqlite else (lambda d: d)
+    momento_sql: Callable[[datetime], Any] = (lambda m: m.isoformat(' ', 'microseconds')) if sqlite else (lambda m: m)
+
+    db.metadata.create_all(engine)
+    indices = [i for m in (Cliente, Cotizacion, DetalleCotizacion) for i in m.__table__.indexes]
+
+    def filas_clientes() -> Iterator[Tuple]:
+        creado = momento_sql(ahora)
+        for i in range(1, clientes + 1):
+            apellido = rnd.choice(APELLIDOS)
+            if rnd.random() < 0.2:
+                nombre = f'{rnd.choice(EMPRESAS)} {apellido} {rnd.choice(SOCIEDADES)}'.strip()
+                email = f'contacto{i}@{_sin_acentos(apellido)}.com.mx'
+            else:
+                primero = rnd.choice(NOMBRES)
+                nombre = f'{primero} {apellido} {rnd.choice(APELLIDOS)}'
+                email = f'{_sin_acentos(primero.split()[0])}.{_sin_acentos(apellido)}{i}@{rnd.choice(DOMINIOS)}'
+            telefono = f'{rnd.choice(LADAS)} {rnd.randint(100, 999)} {rnd.randint(1000, 9999)}'
+            direccion = (f'{rnd.choice(CALLES)} {rnd.randint(1, 3999)}, Col. {rnd.choice(COLONIAS)}, '
+                         f'{rnd.choice(GRUPOS)}, Son.')
+            yield i, nombre, telefono, email, direccion, creado, creado
+
+    promedio = lineas / cotizaciones if cotizaciones else 0
+    fijas = max(1, lineas // cotizaciones) if cotizaciones else 0
+    mu = math.log(max(promedio, 1)) - DISPERSION_LINEAS ** 2 / 2  # media de la lognormal = promedio
+    tope = max(1, int(promedio * 40))
+
+    def lineas_de(cot_id: int, modificada: Any) -> List[Tuple]:
+        n = fijas if uniforme else min(tope, max(1, round(rnd.lognormvariate(mu, DISPERSION_LINEAS))))
+        secciones = min(n, bisect.bisect_right(SECCIONES, rnd.random() * 100) + 1)
+        grupos = rnd.sample(GRUPOS, secciones)
+        filas = []
+        for orden in range(n):
+            concepto, precio, maximo = CONCEPTOS[int(rnd.random() * len(CONCEPTOS))]
+            cantidad = float(1 + int(rnd.random() ** 2 * maximo))
+            precio = round(precio * (0.9 + 0.2 * rnd.random()), 2)
+            filas.append((cot_id, grupos[orden * secciones // n], cantidad, concepto, precio,
+                          cantidad * precio, orden, modificada))
+        return filas
+
+    # Pocos clientes concentran muchas cotizaciones; los frecuentes no son los primeros ids
+    frecuentes = list(range(1, clientes + 1))
+    rnd.shuffle(frecuentes)
+    pesos_dias = _pesos_dias(fecha_base)
+    # Las cotizaciones y sus líneas se generan juntas para poder calcular totales
+    pendientes_lineas: List[Tuple] = []
+    # Estadísticas de cada cliente (num_cotizaciones, total_aceptado, ultima_cotizacion)
+    estadisticas: Dict[int, List[Any]] = {}
+
+    def filas_cotizaciones() -> Iterator[Tuple]:
+        for i in range(1, cotizaciones + 1):
+            # Cuantil i/N de la distribución de días: fechas crecientes con el consecutivo
+            dia = bisect.bisect_left(pesos_dias, (i - 1 + rnd.random()) / cotizaciones * pesos_dias[-1])
+            fecha = fecha_base - timedelta(days=DIAS - min(dia, DIAS - 1))
+            creada = momento_sql(datetime.combine(fecha, datetime.min.time())
+                                 + timedelta(minutes=8 * 60 + int(rnd.random() * 11 * 60)))
+            detalle = lineas_de(i, creada)
+            pendientes_lineas.extend(detalle)
+            subtotal = sum(d[5] for d in detalle)
+            descuento = round(subtotal * rnd.choice((0.05, 0.10, 0.15)), 2) if rnd.random() < 0.15 else 0.0
+            envio = round(150 + 650 * rnd.random(), 2) if rnd.random() < 0.2 else 0.0
+            neto = subtotal - descuento
+            impuestos = neto * 0.16
+            total = neto + impuestos + envio
+            edad = (fecha_base - fecha).days
+            pesos = next(p for limite, p in ESTATUS_POR_EDAD if limite is None or edad < limite)
+            estatus = rnd.choices(ESTATUS, cum_weights=pesos)[0]
+            cliente_id = frecuentes[int(clientes * rnd.random() ** 2)]
+
+            acumulado = estadisticas.setdefault(cliente_id, [0, 0.0, fecha])
+            acumulado[0] += 1
+            if estatus == 'Aceptada':
+                acumulado[1] += total
+            acumulado[2] = max(acumulado[2], fecha)
+            yield (i, f'COT-{i:05d}', fecha_sql(fecha), cliente_id, subtotal, descuento, envio, impuestos,
+                   total, estatus, rnd.choice(NOTAS), creada, creada)
+
+    inicio = time.perf_counter()
+    insertadas_lineas = 0
+    with engine.connect() as conn:
+        if sqlite:
+            conn.execute(text('PRAGMA journal_mode=WAL'))
+            conn.execute(text('PRAGMA synchronous=OFF'))
+            conn.execute(text('PRAGMA cache_size=-200000'))  # ~200 MB para construir los índices
+        # Los índices secundarios se crean al final: construirlos de una vez es más rápido
+        for indice in indices:
+            indice.drop(conn, checkfirst=True)
+        conn.execute(insert(Empresa.__table__), [{
+            'nombre': 'Multiservicios RMG', 'direccion': 'Av. Principal #123, Col. Centro',
+            'telefono': '(555) 123-4567', 'email': 'contacto@multiserviciosrmg.com',
+            'rfc': 'MRM2501011A1', 'redes_sociales': 'Facebook: @MultiserviciosRMG',
+            'created_at': ahora, 'updated_at': ahora,
+        }])
+        conn.commit()
+
+        insertar_clientes = _insertador(conn, Cliente.__table__, [
+            'id', 'nombre', 'telefono', 'email', 'direccion', 'created_at', 'updated_at'])
+        avance = _Progreso('clientes', clientes, progreso)
+        for n, lote in enumerate(_lotes(filas_clientes(), TAMANO_LOTE), 1):
+            insertar_clientes(lote)
+            conn.commit()
+            avance.avanzar(min(n * TAMANO_LOTE, clientes))
+
+        # Se alternan lotes de cotizaciones y de sus líneas para no acumular 10M filas en memoria
+        insertar_cotizaciones = _insertador(conn, Cotizacion.__table__, [
+            'id', 'numero_cotizacion', 'fecha', 'cliente_id', 'subtotal', 'descuento', 'envio_delivery',
+            'impuestos', 'total', 'estatus', 'notas', 'created_at', 'updated_at'])
+        insertar_lineas = _insertador(conn, DetalleCotizacion.__table__, [
+            'cotizacion_id', 'grupo', 'cantidad', 'descripcion', 'precio_unitario', 'total_linea', 'orden',
+            'updated_at'])
+        avance = _Progreso('cotizaciones', cotizaciones, progreso)
+        for lote in _lotes(filas_cotizaciones(), TAMANO_LOTE):
+            insertar_cotizaciones(lote)
+            insertar_lineas(pendientes_lineas)
+            conn.commit()
+            insertadas_lineas += len(pendientes_lineas)
+            pendientes_lineas.clear()
+            avance.avanzar(lote[-1][0], f', líneas: {insertadas_lineas:,}')
+
+        cli = Cliente.__table__
+        sentencia = update(cli).where(cli.c.id == bindparam('b_id')).values(
+            num_cotizaciones=bindparam('b_n'), total_aceptado=bindparam('b_aceptado'),
+            ultima_cotizacion=bindparam('b_ultima'), updated_at=cli.c.updated_at,
+        )
+        filas_estadisticas = (
+            {'b_id': cliente_id, 'b_n': n, 'b_aceptado': aceptado, 'b_ultima': ultima}
+            for cliente_id, (n, aceptado, ultima) in estadisticas.items()
+        )
+        for lote in _lotes(filas_estadisticas, TAMANO_LOTE):
+            conn.execute(sentencia, lote)
+        conn.commit()
+
+        indexado = time.perf_counter()
+        for indice in indices:
+            indice.create(conn)
+        conn.commit()
+        if progreso and time.perf_counter() - inicio > 2:
+            print(f'  índices: {len(indices)} en {time.perf_counter() - indexado:.1f} s', flush=True)
+
+    return {'clientes': clientes, 'cotizaciones': cotizaciones, 'lineas': insertadas_lineas}
+
+
+def base_en_cache(clientes: int, cotizaciones: int, lineas: int, semilla: int = 42) -> str:
+    """
+    Ruta de la base SQLite con estos parámetros en ``benchmarks/.datos``; la
+    genera la primera vez (en un archivo temporal que se renombra al terminar,
+    así una carga interrumpida no deja una base a medias).
+    """
+    os.makedirs(DIR_CACHE, exist_ok=True)
+    ruta = os.path.join(DIR_CACHE, f'{clientes}-{cotizaciones}-{lineas}-s{semilla}-v{VERSION}.db')
+    if not os.path.exists(ruta):
+        print(f'Generando datos: {clientes:,} clientes, {cotizaciones:,} cotizaciones, {lineas:,} líneas...')
+        parcial = f'{ruta}.{os.getpid()}.tmp'
+        engine = create_engine(f'sqlite:///{parcial}')
+        try:
+            generar(engine, clientes, cotizaciones, lineas, semilla=semilla)
+        finally:
+            engine.dispose()
+        os.replace(parcial, ruta)
+    return ruta
+
+
+def copia_de_trabajo(clientes: int, cotizaciones: int, lineas: int, semilla: int = 42) -> str:
+    """
+    Copia en un directorio temporal de la base en caché con estos parámetros,
+    con el esquema al día (``asegurar_esquema``). Quien la pide borra el
+    directorio.
+    """
+    original = base_en_cache(clientes, cotizaciones, lineas, semilla)
+    destino = os.path.join(tempfile.mkdtemp(prefix='cotiz-bench-'), os.path.basename(original))
+    shutil.copyfile(original, destino)
+    engine = create_engine(f'sqlite:///{destino}')
+    asegurar_esquema(engine)
+    engine.dispose()
+    return destino
+
+
+@contextmanager
+def base_temporal(clientes: int = 1_000, cotizaciones: int = 5_000, lineas: int = 50_000,
+                  semilla: int = 42) -> Iterator[str]:
+    """``copia_de_trabajo`` que se borra al salir del bloque (para fixtures de pytest)."""
+    ruta = copia_de_trabajo(clientes, cotizaciones, lineas, semilla)
+    try:
+        yield ruta
+    finally:
+        shutil.rmtree(os.path.dirname(ruta), ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='Ruta del archivo SQLite o URL de SQLAlchemy (base vacía)')
+    parser.add_argument('--tamano', choices=list(TAMANOS), help='Volumen predefinido')
+    parser.add_argument('--clientes', type=int)
+    parser.add_argument('--cotizaciones', type=int)
+    parser.add_argument('--lineas', type=int,
+                        help='Total de líneas (promedio por cotización: lineas / cotizaciones)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--fecha-base', type=date.fromisoformat, default=None,
+                        help='Día siguiente a la cotización más reciente, YYYY-MM-DD (default 2026-01-01)')
+    parser.add_argument('--uniforme', action='store_true', help='Mismo número de líneas en todas las cotizaciones')
+    args = parser.parse_args(argv)
+
+    clientes, cotizaciones, lineas = TAMANOS[args.tamano] if args.tamano else (None, None, None)
+    clientes, cotizaciones, lineas = (args.clientes or clientes, args.cotizaciones or cotizaciones,
+                                      args.lineas or lineas)
+    if not (clientes and cotizaciones and lineas):
+        parser.error('indique --tamano o --clientes, --cotizaciones y --lineas')
+
+    if '://' in args.db:
+        url = args.db
+    else:
+        if os.path.exists(args.db):
+            parser.error(f'{args.db} ya existe; el generador carga una base vacía')
+        url = f'sqlite:///{os.path.abspath(args.db)}'
+
+    engine = create_engine(url)
+    inicio = time.perf_counter()
+    try:
+        filas = generar(engine, clientes, cotizaciones, lineas, semilla=args.semilla,
+                        fecha_base=args.fecha_base, uniforme=args.uniforme)
+    finally:
+        engine.dispose()
+    segundos = time.perf_counter() - inicio
+    print(f"{filas['clientes']:,} clientes, {filas['cotizaciones']:,} cotizaciones y {filas['lineas']:,} líneas "
+          f"en {segundos:.1f} s ({sum(filas.values()) / segundos:,.0f} filas/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
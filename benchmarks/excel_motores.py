@@ -0,0 +1,171 @@
+"""
+Verificación y benchmark de los motores de Excel (openpyxl contra XML directo
+y plantilla).
+
+Uso:
+    python -m benchmarks.excel_motores
+    python -m benchmarks.excel_motores --lineas 100,1000,10000 --repeticiones 5
+    python -m benchmarks.excel_motores --sin-benchmark
+
+Primero genera varias cotizaciones de prueba (vacía, sin notas, sin grupos,
+con caracteres especiales, cantidades fraccionarias, empresa incompleta) con
+todos los motores, las vuelve a abrir con openpyxl y compara celda por celda
+valores, fórmulas, estilos, combinaciones, alturas, anchos, imágenes y
+configuración de impresión. Después mide el tiempo de cada motor y las
+líneas por segundo para cada tamaño de ``--lineas``.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.run_benchmarks import EMPRESA, cotizacion_sintetica, medir  # noqa: E402
+
+
+def casos_verificacion() -> List[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+    """(nombre, cotización, empresa) que cubren las ramas del formato."""
+    base = cotizacion_sintetica(40)
+    sin_grupos = cotizacion_sintetica(7)
+    for d in sin_grupos['detalles']:
+        d['grupo'] = ''
+    especiales = cotizacion_sintetica(5)
+    especiales['detalles'][0]['descripcion'] = 'Tubo 1/2" <PVC> & codo  '
+    especiales['detalles'][1]['descripcion'] = ''
+    especiales['detalles'][2]['cantidad'] = 2.5
+    especiales['detalles'][3]['grupo'] = 'Ciudad Obregón & Cajeme'
+    especiales['notas'] = '  Línea con espacios  \n\n<b>sin etiquetas</b>\n'
+    especiales['descuento'] = 150.75
+    especiales['envio_delivery'] = 99
+    casos = [
+        ('completa', base, EMPRESA),
+        ('vacia', {**base, 'detalles': [], 'notas': ''}, EMPRESA),
+        ('sin_grupos', sin_grupos, EMPRESA),
+        ('especiales', especiales, EMPRESA),
+        ('empresa_incompleta', {**base, 'fecha': 'no-es-fecha'},
+         {'nombre': 'Multiservicios RMG', 'telefono': '(555) 123-4567'}),
+    ]
+    casos = [(nombre, {**cotizacion, 'numero_cotizacion': f'VERIF-{nombre}'}, empresa)
+             for nombre, cotizacion, empresa in casos]
+    casos.append(('sin_numero', {**base, 'numero_cotizacion': None}, EMPRESA))
+    return casos
+
+
+def _estilo(celda: Any) -> Tuple:
+    f, r, b, a = celda.font, celda.fill, celda.border, celda.alignment
+    return (
+        (f.name, f.sz, bool(f.b), bool(f.i), f.color.rgb if f.color is not None else None),
+        (r.fill_type, r.fgColor.rgb if r.fill_type else None),
+        # Un lado sin estilo equivale a no tener el lado
+        tuple((lado.style, lado.color.rgb if lado.color is not None else None) if lado and lado.style else None
+              for lado in (b.left, b.right, b.top, b.bottom)),
+        (a.horizontal, a.vertical, bool(a.wrap_text), a.indent),
+        celda.number_format,
+    )
+
+
+def comparar_libros(ruta_a: str, ruta_b: str) -> List[str]:
+    """Diferencias entre dos libros de una hoja (lista vacía si son iguales)."""
+    from openpyxl import load_workbook
+
+    ws_a, ws_b = load_workbook(ruta_a).active, load_workbook(ruta_b).active
+    diferencias = []
+
+    def comparar(que: str, a: Any, b: Any) -> None:
+        if a != b:
+            diferencias.append(f'{que}: {a!r} != {b!r}')
+
+    comparar('título', ws_a.title, ws_b.title)
+    comparar('dimensiones', ws_a.dimensions, ws_b.dimensions)
+    for fila in range(1, max(ws_a.max_row, ws_b.max_row) + 1):
+        comparar(f'alto fila {fila}', ws_a.row_dimensions[fila].height, ws_b.row_dimensions[fila].height)
+        for col in range(1, 6):
+            ca, cb = ws_a.cell(fila, col), ws_b.cell(fila, col)
+            # '' y None son la misma celda vacía para Excel
+            comparar(f'{ca.coordinate} valor', ca.value if ca.value != '' else None,
+                     cb.value if cb.value != '' else None)
+            comparar(f'{ca.coordinate} estilo', _estilo(ca), _estilo(cb))
+    for letra in 'ABCDE':
+        comparar(f'ancho {letra}', ws_a.column_dimensions[letra].width, ws_b.column_dimensions[letra].width)
+    comparar('combinaciones', sorted(map(str, ws_a.merged_cells.ranges)),
+             sorted(map(str, ws_b.merged_cells.ranges)))
+    comparar('área de impresión', ws_a.print_area, ws_b.print_area)
+    for atributo in ('paperSize', 'orientation', 'fitToWidth', 'fitToHeight'):
+        comparar(f'página {atributo}', getattr(ws_a.page_setup, atributo), getattr(ws_b.page_setup, atributo))
+    comparar('ajustar a página', ws_a.sheet_properties.pageSetUpPr.fitToPage,
+             ws_b.sheet_properties.pageSetUpPr.fitToPage)
+    comparar('centrado horizontal', ws_a.print_options.horizontalCentered, ws_b.print_options.horizontalCentered)
+    for atributo in ('left', 'right', 'top', 'bottom', 'header', 'footer'):
+        comparar(f'margen {atributo}', getattr(ws_a.page_margins, atributo), getattr(ws_b.page_margins, atributo))
+    comparar('líneas de cuadrícula', ws_a.sheet_view.showGridLines, ws_b.sheet_view.showGridLines)
+
+    def imagenes(ws: Any) -> List[Tuple]:
+        return [(i.anchor._from.row, i.anchor._from.col, i.anchor.ext.width, i.anchor.ext.height, i._data())
+                for i in ws._images]
+    comparar('imágenes', imagenes(ws_a), imagenes(ws_b))
+    return diferencias
+
+
+def verificar(servicio: Any) -> int:
+    """Compara cada motor contra openpyxl en los casos de prueba. Devuelve cuántos difieren."""
+    fallidos = 0
+    print('Verificación celda por celda contra openpyxl:')
+    for nombre, cotizacion, empresa in casos_verificacion():
+        ruta_ref = servicio.generar_cotizacion(cotizacion, empresa, motor='openpyxl')
+        ruta_ref = shutil.move(ruta_ref, ruta_ref + '.openpyxl.xlsx')
+        for motor in servicio.MOTORES[1:]:
+            # Dos veces: la plantilla se construye en la primera y se reutiliza en la segunda
+            for _ in range(2 if motor == 'plantilla' else 1):
+                ruta = servicio.generar_cotizacion(cotizacion, empresa, motor=motor)
+                diferencias = comparar_libros(ruta_ref, ruta)
+            if diferencias:
+                fallidos += 1
+            print(f"  {nombre:<20} {motor:<10} {'OK' if not diferencias else f'{len(diferencias)} diferencias'}")
+            for diferencia in diferencias[:10]:
+                print(f'      {diferencia}')
+    return fallidos
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lineas', default='10,100,1000,5000,20000', help='Tamaños de cotización a medir')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--sin-benchmark', action='store_true', help='Sólo verificar')
+    args = parser.parse_args(argv)
+
+    from src.services.excel_service import ExcelService
+
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-excel-')
+    servicio = ExcelService(temporal)
+    actual = os.getcwd()
+    os.chdir(RAIZ)  # los servicios resuelven static/img relativo al proyecto
+    try:
+        fallidos = verificar(servicio)
+        if fallidos or args.sin_benchmark:
+            return 1 if fallidos else 0
+
+        print(f"\n  {'líneas':>8} {'motor':<10} {'mediana ms':>11} {'líneas/s':>11} {'KiB':>8}")
+        for num_lineas in (int(n) for n in args.lineas.split(',')):
+            datos = cotizacion_sintetica(num_lineas)
+            reps = args.repeticiones if num_lineas <= 5000 else max(1, args.repeticiones // 3)
+            medianas = {}
+            for motor in ExcelService.MOTORES:
+                stats = medir(lambda m=motor: servicio.generar_cotizacion(datos, EMPRESA, motor=m), reps)
+                medianas[motor] = stats['mediana']
+                tamano = os.path.getsize(os.path.join(temporal, f'BENCH-{num_lineas}.xlsx')) / 1024
+                print(f"  {num_lineas:>8,} {motor:<10} {stats['mediana'] * 1000:>11.1f} "
+                      f"{num_lineas / stats['mediana']:>11,.0f} {tamano:>8.0f}")
+            print(f"  {'':>8} " + ', '.join(f"{m}: x{medianas['openpyxl'] / medianas[m]:.1f}"
+                                             for m in ExcelService.MOTORES[1:]) + ' más rápido')
+    finally:
+        os.chdir(actual)
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Prueba de concurrencia de las exportaciones: muchas peticiones simultáneas a
+la misma cotización deben generar el archivo una sola vez.
+
+Uso:
+    python -m benchmarks.exportacion_concurrente
+    python -m benchmarks.exportacion_concurrente --peticiones 50 --procesos 5 --formato excel
+
+Crea una base temporal con los datos de ejemplo y lanza ``--peticiones``
+descargas de la misma cotización repartidas en ``--procesos`` procesos (como
+workers de gunicorn), todas liberadas a la vez con una barrera. Cuenta cuántas
+veces se llamó al servicio de PDF/Excel y termina con código 1 si no fue
+exactamente una, si alguna respuesta no fue 200 o si no todas recibieron los
+mismos bytes. Se corre dos veces: con un solo proceso (coordinación entre
+hilos) y con ``--procesos`` (candado de archivo entre procesos).
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+RUTAS = {'pdf': '/api/cotizaciones/1/export/pdf', 'excel': '/api/cotizaciones/1/export/excel'}
+
+# Aplicación creada en main; los procesos del pool la heredan con fork
+_app = None
+
+
+def _descargar(args: Tuple) -> Tuple[int, List[Tuple[int, str]]]:
+    """Corre en cada proceso: ``hilos`` descargas simultáneas. Devuelve (renders, [(status, sha1)])."""
+    formato, hilos, barrera = args
+    from src.services.excel_service import ExcelService
+    from src.services.pdf_service import PDFService
+
+    servicio = PDFService if formato == 'pdf' else ExcelService
+    original = servicio.generar_cotizacion
+    renders: List[int] = []
+
+    def contado(self, *a, **k):
+        renders.append(1)
+        return original(self, *a, **k)
+    servicio.generar_cotizacion = contado
+
+    respuestas: List[Tuple[int, str]] = []
+    barrera_hilos = threading.Barrier(hilos)
+
+    def una():
+        cliente = _app.test_client()
+        barrera_hilos.wait()
+        r = cliente.get(RUTAS[formato])
+        respuestas.append((r.status_code, hashlib.sha1(r.data).hexdigest()))
+
+    hilos_ = [threading.Thread(target=una) for _ in range(hilos)]
+    if barrera is not None:
+        barrera.wait()  # todos los procesos arrancan a la vez
+    for h in hilos_:
+        h.start()
+    for h in hilos_:
+        h.join()
+    servicio.generar_cotizacion = original
+    return len(renders), respuestas
+
+
+def correr(formato: str, peticiones: int, procesos: int, versiones: str) -> bool:
+    shutil.rmtree(versiones, ignore_errors=True)  # que haya que generarlo
+    inicio = time.perf_counter()
+    if procesos == 1:
+        resultados = [_descargar((formato, peticiones, None))]
+    else:
+        contexto = multiprocessing.get_context('fork')
+        barrera = contexto.Manager().Barrier(procesos)
+        por_proceso = [peticiones // procesos + (1 if i < peticiones % procesos else 0) for i in range(procesos)]
+        with contexto.Pool(procesos) as pool:
+            resultados = pool.map(_descargar, [(formato, n, barrera) for n in por_proceso])
+    duracion = time.perf_counter() - inicio
+
+    renders = sum(r for r, _ in resultados)
+    respuestas = [x for _, lista in resultados for x in lista]
+    estados = {status for status, _ in respuestas}
+    contenidos = {sha for _, sha in respuestas}
+    ok = renders == 1 and estados == {200} and len(contenidos) == 1 and len(respuestas) == peticiones
+    print(f'  {formato:<6} {procesos:>2} proceso(s) {len(respuestas):>4} peticiones  renders: {renders}  '
+          f'estados: {sorted(estados)}  archivos distintos: {len(contenidos)}  '
+          f'{duracion * 1000:.0f} ms  {"OK" if ok else "FALLA"}')
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    global _app
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peticiones', type=int, default=50)
+    parser.add_argument('--procesos', type=int, default=5)
+    parser.add_argument('--formato', choices=sorted(RUTAS), default='pdf')
+    args = parser.parse_args(argv)
+
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-concurrencia-')
+    versiones = os.path.join(temporal, 'versiones')
+    # Antes de crear la aplicación: create_app toma su configuración del entorno
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(temporal, 'cotizaciones.db')}"
+    os.environ['EXPORTACIONES_DIR'] = versiones
+    os.environ['PRERENDER'] = '0'
+    actual = os.getcwd()
+    os.chdir(RAIZ)  # los servicios resuelven static/img relativo al proyecto
+    try:
+        import init_db
+        from src.services.excel_service import ExcelService
+        from src.services.pdf_service import PDFService
+
+        _app = app = init_db.init_database()
+        # Archivos de trabajo de los servicios también en el directorio temporal
+        app.extensions['pdf_service'] = PDFService(os.path.join(temporal, 'pdf'))
+        app.extensions['excel_service'] = ExcelService(os.path.join(temporal, 'excel'))
+
+        print(f'Peticiones simultáneas a {RUTAS[args.formato]}:')
+        ok = correr(args.formato, args.peticiones, 1, versiones)
+        if args.procesos > 1:
+            ok = correr(args.formato, args.peticiones, args.procesos, versiones) and ok
+    finally:
+        os.chdir(actual)
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
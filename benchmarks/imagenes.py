@@ -0,0 +1,90 @@
+"""
+Ahorro de la optimización de imágenes en las exportaciones.
+
+Uso:
+    python -m benchmarks.imagenes
+    python -m benchmarks.imagenes --lineas 20,2000 --repeticiones 5 --dpi 150
+
+Muestra primero, para el logo y cada icono, el tamaño del original y de la
+variante que se incrusta en el PDF y en el Excel. Después genera la misma
+cotización con la optimización desactivada y activada (PDF normal, PDF en
+paralelo y cada motor de Excel) y compara tamaño del archivo y mediana de
+tiempo. Las variantes se crean en un directorio temporal antes de medir, así
+que el tiempo es el de una caché ya caliente.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from typing import List, Optional
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.run_benchmarks import EMPRESA, cotizacion_sintetica, medir  # noqa: E402
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lineas', default='20,2000', help='Tamaños de cotización a medir')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--dpi', type=int, default=300)
+    args = parser.parse_args(argv)
+
+    from reportlab.lib.units import inch
+
+    from src.services.excel_service import ExcelService
+    from src.services.imagenes import PUNTOS_POR_PIXEL, optimizador_imagenes
+    from src.services.pdf_service import PDFService
+
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-imagenes-')
+    optimizador_imagenes.configurar(directorio=os.path.join(temporal, 'cache'), dpi=args.dpi)
+    pdf = PDFService(os.path.join(temporal, 'pdf'), umbral_paralelo=10 ** 9)
+    pdf_paralelo = PDFService(os.path.join(temporal, 'pdf'), umbral_tabla_rapida=0, umbral_paralelo=0,
+                              procesos_paralelo=max(2, os.cpu_count() or 1))
+    excel = ExcelService(os.path.join(temporal, 'excel'))
+    actual = os.getcwd()
+    os.chdir(RAIZ)  # los servicios resuelven static/img relativo al proyecto
+    try:
+        print(f'Variantes a {args.dpi} dpi (bytes):')
+        print(f"  {'imagen':<30} {'original':>9} {'PDF':>9} {'Excel':>9}")
+        icono_pdf = 11  # puntos, como en PDFService._bloque_encabezado
+        for ruta, (ancho_pdf, alto_pdf), (ancho_xl, alto_xl) in [
+            (PDFService.LOGO_PATH, (2.3 * inch, 1.05 * inch), (170, 72)),
+            *((icono, (icono_pdf, icono_pdf), (13, 13)) for icono in ExcelService.ICONOS.values()),
+        ]:
+            en_pdf = optimizador_imagenes.variante(ruta, ancho_pdf, alto_pdf)
+            en_excel = optimizador_imagenes.variante(ruta, ancho_xl * PUNTOS_POR_PIXEL, alto_xl * PUNTOS_POR_PIXEL)
+            print(f'  {os.path.basename(ruta):<30} {os.path.getsize(ruta):>9,} '
+                  f'{en_pdf.bytes_variante:>9,} {en_excel.bytes_variante:>9,}')
+
+        exportaciones = [
+            ('pdf', lambda c: pdf.generar_cotizacion(c, EMPRESA, paralelo=False)),
+            ('pdf paralelo', lambda c: pdf_paralelo.generar_cotizacion(c, EMPRESA, paralelo=True)),
+            *((f'excel {motor}', lambda c, m=motor: excel.generar_cotizacion(c, EMPRESA, motor=m))
+              for motor in ExcelService.MOTORES),
+        ]
+        print(f"\n  {'líneas':>7} {'exportación':<18} {'KiB sin':>9} {'KiB con':>9} {'ahorro':>8} "
+              f"{'ms sin':>8} {'ms con':>8}")
+        for num_lineas in (int(n) for n in args.lineas.split(',')):
+            datos = cotizacion_sintetica(num_lineas)
+            for nombre, exportar in exportaciones:
+                resultados = {}
+                for activo in (False, True):
+                    optimizador_imagenes.configurar(activo=activo)
+                    excel.proforma_xml.invalidar_plantilla()
+                    stats = medir(lambda: exportar(datos), args.repeticiones)
+                    resultados[activo] = (os.path.getsize(exportar(datos)), stats['mediana'])
+                (bytes_sin, t_sin), (bytes_con, t_con) = resultados[False], resultados[True]
+                print(f'  {num_lineas:>7,} {nombre:<18} {bytes_sin / 1024:>9.1f} {bytes_con / 1024:>9.1f} '
+                      f'{(1 - bytes_con / bytes_sin) * 100:>7.1f}% {t_sin * 1000:>8.1f} {t_con * 1000:>8.1f}')
+    finally:
+        os.chdir(actual)
+        optimizador_imagenes.configurar(directorio=os.path.join('exports', 'cache', 'imagenes'), activo=True)
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
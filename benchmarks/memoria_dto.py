@@ -0,0 +1,95 @@
+"""
+Benchmark de memoria: carga ORM + ``to_dict()`` contra DTOs cargados con Core.
+
+Uso:
+    python -m benchmarks.memoria_dto --lineas 5000
+
+Crea una base temporal con una cotización de ``--lineas`` líneas y mide con
+``tracemalloc`` el pico de memoria y el tiempo de cada camino de carga, y de
+cada uno seguido del render del PDF y del Excel.
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from src.models.models import db, Empresa, Cotizacion  # noqa: E402
+from src.models.dto import cargar_cotizacion, cargar_empresa  # noqa: E402
+from benchmarks import datos_sinteticos  # noqa: E402
+from benchmarks.run_benchmarks import crear_app  # noqa: E402
+
+
+def medir_memoria(func: Callable[[], Any]) -> Dict[str, float]:
+    """Pico de memoria (MiB) y tiempo (s) de una llamada, en frío para la sesión."""
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    func()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'pico_mib': pico / 2 ** 20, 'segundos': segundos}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lineas', type=int, default=5000)
+    parser.add_argument('--sin-render', action='store_true', help='Medir sólo la carga')
+    args = parser.parse_args(argv)
+
+    from src.services.pdf_service import PDFService
+    from src.services.excel_service import ExcelService
+
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-memoria-')
+    ruta_db = os.path.join(temporal, 'memoria.db')
+    engine = create_engine(f'sqlite:///{ruta_db}')
+    datos_sinteticos.generar(engine, clientes=1, cotizaciones=1, lineas=args.lineas, uniforme=True)
+    engine.dispose()
+
+    app = crear_app(ruta_db)
+    # El PDF grande se mide en un solo proceso para que tracemalloc lo vea completo
+    pdf = PDFService(os.path.join(temporal, 'pdf'), procesos_paralelo=1)
+    excel = ExcelService(os.path.join(temporal, 'excel'))
+
+    def orm() -> Any:
+        return db.session.get(Cotizacion, 1).to_dict(), Empresa.query.first().to_dict()
+
+    def dto() -> Any:
+        return cargar_cotizacion(1), cargar_empresa()
+
+    caminos = [('ORM + to_dict()', orm), ('DTO (Core)', dto)]
+    if not args.sin_render:
+        for etiqueta, carga in list(caminos):
+            caminos.append((f'{etiqueta} + PDF', lambda c=carga: pdf.generar_cotizacion(*c())))
+            caminos.append((f'{etiqueta} + Excel', lambda c=carga: excel.generar_cotizacion(*c())))
+
+    actual = os.getcwd()
+    os.chdir(RAIZ)  # los servicios resuelven static/img relativo al proyecto
+    try:
+        with app.app_context():
+            print(f'Cotización de {args.lineas:,} líneas')
+            print(f"  {'camino':<24} {'pico MiB':>10} {'segundos':>10}")
+            for etiqueta, func in caminos:
+                func()  # calentamiento: compila sentencias y carga módulos
+                r = medir_memoria(func)
+                print(f"  {etiqueta:<24} {r['pico_mib']:>10.2f} {r['segundos']:>10.3f}")
+            db.session.remove()
+    finally:
+        os.chdir(actual)
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
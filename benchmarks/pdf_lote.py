@@ -0,0 +1,65 @@
+"""
+PDF por lote contra un PDF por cotización.
+
+Uso:
+    python -m benchmarks.pdf_lote
+    python -m benchmarks.pdf_lote --cotizaciones 1,10,50,200 --lineas 15 --repeticiones 3
+
+Para cada tamaño de lote genera las mismas cotizaciones como archivos
+separados y como un solo PDF con ``PDFService.generar_lote`` y compara la
+mediana de tiempo y el tamaño total. En el lote los estilos se crean una vez
+y el logo, los iconos y las fuentes se incrustan una sola vez, así que el
+costo por cotización adicional es menor que el de un archivo suelto.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from typing import List, Optional
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.run_benchmarks import EMPRESA, cotizacion_sintetica, medir  # noqa: E402
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cotizaciones', default='1,10,50,200', help='Tamaños de lote a medir')
+    parser.add_argument('--lineas', type=int, default=15, help='Líneas por cotización')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    from src.services.pdf_service import PDFService
+
+    temporal = tempfile.mkdtemp(prefix='cotiz-bench-lote-')
+    servicio = PDFService(temporal, umbral_paralelo=10 ** 9)
+    actual = os.getcwd()
+    os.chdir(RAIZ)  # los servicios resuelven static/img relativo al proyecto
+    try:
+        print(f"  {'cotiz.':>6} {'ms separados':>13} {'ms lote':>9} {'KiB separados':>14} {'KiB lote':>9} "
+              f"{'ms/cotiz lote':>14}")
+        for num in (int(n) for n in args.cotizaciones.split(',')):
+            cotizaciones = []
+            for i in range(num):
+                cotizacion = cotizacion_sintetica(args.lineas)
+                cotizacion['numero_cotizacion'] = f'LOTE-{i:05d}'
+                cotizaciones.append(cotizacion)
+
+            separados = medir(lambda: [servicio.generar_cotizacion(c, EMPRESA) for c in cotizaciones],
+                              args.repeticiones)
+            bytes_separados = sum(os.path.getsize(servicio.generar_cotizacion(c, EMPRESA)) for c in cotizaciones)
+            lote = medir(lambda: servicio.generar_lote(cotizaciones, EMPRESA), args.repeticiones)
+            bytes_lote = os.path.getsize(servicio.generar_lote(cotizaciones, EMPRESA))
+            print(f"  {num:>6,} {separados['mediana'] * 1000:>13.1f} {lote['mediana'] * 1000:>9.1f} "
+                  f"{bytes_separados / 1024:>14.1f} {bytes_lote / 1024:>9.1f} "
+                  f"{lote['mediana'] * 1000 / num:>14.2f}")
+    finally:
+        os.chdir(actual)
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
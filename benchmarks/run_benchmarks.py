@@ -0,0 +1,250 @@
+"""
+Suite de benchmarks de controladores, serializadores y generadores de archivos.
+
+Uso:
+    python -m benchmarks.run_benchmarks --tamanos chico,mediano
+    python -m benchmarks.run_benchmarks --tamanos chico --comparar benchmarks/resultados/anterior.json
+
+Cada tamaño se genera una sola vez en ``benchmarks/.datos`` (con semilla fija,
+ver ``benchmarks/datos_sinteticos.py``) y se copia a un archivo temporal antes de medir, así que las
+escrituras de un run no afectan al siguiente. Los resultados se guardan en
+JSON en ``benchmarks/resultados/`` para comparar entre commits.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from src.models.models import db  # noqa: E402
+from src.controllers.cliente_controller import ClienteController  # noqa: E402
+from src.controllers.cotizacion_controller import CotizacionController  # noqa: E402
+from benchmarks import datos_sinteticos  # noqa: E402
+
+
+# (clientes, cotizaciones, líneas)
+TAMANOS = datos_sinteticos.TAMANOS
+# Listar sin filtros hidrata todas las cotizaciones con sus líneas: se omite arriba de esto
+MAX_COTIZACIONES_SIN_FILTRO = 20_000
+LINEAS_RENDER = (10, 100, 1000, 5000)
+
+DIR_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+
+
+def medir(func: Callable[[], Any], repeticiones: int, calentamiento: int = 1) -> Dict[str, float]:
+    """Ejecuta ``func`` y devuelve estadísticas de tiempo en segundos."""
+    for _ in range(calentamiento):
+        func()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        func()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        'repeticiones': repeticiones,
+        'min': min(tiempos),
+        'mediana': statistics.median(tiempos),
+        'media': statistics.mean(tiempos),
+        'max': max(tiempos),
+    }
+
+
+def preparar_base(tamano: str) -> str:
+    """Devuelve la ruta de una copia de trabajo de la base del tamaño pedido."""
+    return datos_sinteticos.copia_de_trabajo(*TAMANOS[tamano])
+
+
+def crear_app(ruta_db: str) -> Flask:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{ruta_db}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def cotizacion_sintetica(num_lineas: int) -> Dict[str, Any]:
+    detalles = []
+    for i in range(num_lineas):
+        concepto, precio, _ = datos_sinteticos.CONCEPTOS[i % len(datos_sinteticos.CONCEPTOS)]
+        cantidad = float(i % 50 + 1)
+        detalles.append({
+            'grupo': datos_sinteticos.GRUPOS[i * 3 // num_lineas],
+            'cantidad': cantidad, 'descripcion': concepto,
+            'precio_unitario': precio, 'total_linea': cantidad * precio, 'orden': i,
+        })
+    subtotal = sum(d['total_linea'] for d in detalles)
+    return {
+        'numero_cotizacion': f'BENCH-{num_lineas}', 'fecha': '2026-01-15', 'cliente_id': 1,
+        'subtotal': subtotal, 'descuento': 0, 'envio_delivery': 0,
+        'notas': '1.- Cotización válida por 30 días\n2.- Precio con IVA', 'detalles': detalles,
+    }
+
+
+EMPRESA = {
+    'nombre': 'Multiservicios RMG', 'direccion': 'Av. Principal #123, Col. Centro',
+    'telefono': '(555) 123-4567', 'email': 'contacto@multiserviciosrmg.com',
+    'rfc': 'MRM2501011A1', 'redes_sociales': 'Facebook: @MultiserviciosRMG',
+}
+
+
+def benchmarks_base_datos(tamano: str, repeticiones: int) -> List[Dict[str, Any]]:
+    clientes, cotizaciones, _ = TAMANOS[tamano]
+    app = crear_app(preparar_base(tamano))
+    resultados = []
+
+    def registrar(nombre: str, parametros: Dict[str, Any], func: Callable[[], Any], reps: int) -> None:
+        print(f'  [{tamano}] {nombre} {parametros or ""}')
+        stats = medir(func, reps)
+        resultados.append({'nombre': nombre, 'tamano': tamano, 'parametros': parametros, **stats})
+
+    with app.app_context():
+        if cotizaciones <= MAX_COTIZACIONES_SIN_FILTRO:
+            registrar('obtener_todas', {}, lambda: CotizacionController.obtener_todas(), 1)
+        else:
+            resultados.append({'nombre': 'obtener_todas', 'tamano': tamano, 'parametros': {},
+                               'omitido': f'más de {MAX_COTIZACIONES_SIN_FILTRO:,} cotizaciones'})
+        registrar('obtener_todas', {'cliente_id': clientes // 2},
+                  lambda: CotizacionController.obtener_todas({'cliente_id': clientes // 2}), repeticiones)
+        registrar('obtener_todas', {'estatus': 'Aceptada', 'fecha_desde': '2025-12-01'},
+                  lambda: CotizacionController.obtener_todas(
+                      {'estatus': 'Aceptada', 'fecha_desde': '2025-12-01'}), repeticiones)
+        registrar('obtener_todos', {'busqueda': 'Núñez'},
+                  lambda: ClienteController.obtener_todos('Núñez'), repeticiones)
+        registrar('obtener_todos', {'busqueda': 'Peña Ibáñez'},
+                  lambda: ClienteController.obtener_todos('Peña Ibáñez'), repeticiones)
+
+        for num_lineas in (10, 200):
+            datos = cotizacion_sintetica(num_lineas)
+            creadas: List[int] = []
+
+            def crear(datos=datos, creadas=creadas):
+                result, status = CotizacionController.crear_cotizacion(datos)
+                assert status == 201, result
+                creadas.append(result['cotizacion']['id'])
+
+            registrar('crear_cotizacion', {'lineas': num_lineas}, crear, repeticiones)
+            objetivo = creadas[-1]
+            registrar('actualizar_cotizacion', {'lineas': num_lineas},
+                      lambda datos=datos, objetivo=objetivo: CotizacionController.actualizar_cotizacion(
+                          objetivo, {'notas': 'actualizada', 'detalles': datos['detalles']}),
+                      repeticiones)
+        db.session.remove()
+    return resultados
+
+
+def benchmarks_render(repeticiones: int) -> List[Dict[str, Any]]:
+    from src.services.pdf_service import PDFService
+    from src.services.excel_service import ExcelService
+
+    salida = tempfile.mkdtemp(prefix='cotiz-bench-render-')
+    pdf = PDFService(os.path.join(salida, 'pdf'))
+    excel = ExcelService(os.path.join(salida, 'excel'))
+    excel_xml = ExcelService(os.path.join(salida, 'excel'), motor='xml')
+    resultados = []
+    actual = os.getcwd()
+    os.chdir(RAIZ)  # los servicios resuelven static/img relativo al proyecto
+    try:
+        for num_lineas in LINEAS_RENDER:
+            datos = cotizacion_sintetica(num_lineas)
+            for nombre, servicio in (('PDFService.generar_cotizacion', pdf),
+                                     ('ExcelService.generar_cotizacion', excel),
+                                     ('ExcelService[xml].generar_cotizacion', excel_xml)):
+                print(f'  {nombre} lineas={num_lineas}')
+                reps = repeticiones if num_lineas <= 1000 else max(1, repeticiones // 3)
+                stats = medir(lambda s=servicio, d=datos: s.generar_cotizacion(d, EMPRESA), reps)
+                resultados.append({'nombre': nombre, 'tamano': None,
+                                   'parametros': {'lineas': num_lineas}, **stats})
+    finally:
+        os.chdir(actual)
+        shutil.rmtree(salida, ignore_errors=True)
+    return resultados
+
+
+def commit_actual() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _clave(r: Dict[str, Any]) -> str:
+    return f"{r['nombre']}|{r['tamano']}|{json.dumps(r['parametros'], sort_keys=True)}"
+
+
+def comparar(actual: Dict[str, Any], anterior: Dict[str, Any], tolerancia: float) -> int:
+    """Imprime la razón de medianas actual/anterior. Devuelve cuántas regresiones hubo."""
+    previos = {_clave(r): r for r in anterior['resultados'] if 'mediana' in r}
+    regresiones = 0
+    print(f"\nComparación contra {anterior.get('commit')} ({anterior.get('fecha')}):")
+    for r in actual['resultados']:
+        previo = previos.get(_clave(r))
+        if 'mediana' not in r or previo is None:
+            continue
+        razon = r['mediana'] / previo['mediana'] if previo['mediana'] else float('inf')
+        marca = ''
+        if razon > 1 + tolerancia:
+            marca = '  << REGRESIÓN'
+            regresiones += 1
+        elif razon < 1 - tolerancia:
+            marca = '  mejora'
+        print(f"  {r['nombre']:<34} {str(r['tamano']):<8} {json.dumps(r['parametros']):<45} "
+              f"{previo['mediana'] * 1000:9.1f} ms -> {r['mediana'] * 1000:9.1f} ms  x{razon:.2f}{marca}")
+    return regresiones
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', default='chico',
+                        help=f"Lista separada por comas de {', '.join(TAMANOS)} (default: chico)")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--sin-render', action='store_true', help='Omitir PDF/Excel')
+    parser.add_argument('--salida', help='Archivo JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de un run anterior para detectar regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.10,
+                        help='Variación relativa tolerada antes de marcar regresión (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    resultados: List[Dict[str, Any]] = []
+    for tamano in [t.strip() for t in args.tamanos.split(',') if t.strip()]:
+        if tamano not in TAMANOS:
+            parser.error(f'Tamaño desconocido: {tamano}')
+        resultados.extend(benchmarks_base_datos(tamano, args.repeticiones))
+    if not args.sin_render:
+        resultados.extend(benchmarks_render(args.repeticiones))
+
+    commit = commit_actual()
+    reporte = {
+        'commit': commit,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': resultados,
+    }
+    salida = args.salida or os.path.join(
+        DIR_RESULTADOS, f"{commit or 'sin-commit'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(f'\nResultados guardados en {salida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            return 1 if comparar(reporte, json.load(f), args.tolerancia) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,34 @@
 """
 Script para inicializar la base de datos y crear datos de ejemplo
 """
-from app import app, db
+from typing import Optional
+
+from flask import Flask
+
+from app import create_app, db
+from src.models.esquema import asegurar_esquema
 from src.models.models import Empresa, Cliente, Cotizacion, DetalleCotizacion
+from src.services import estadisticas_clientes
+from src.services.estadisticas_clientes import Aporte
 from datetime import datetime, date
 
 
-def init_database():
-    """Inicializa la base de datos con datos de ejemplo"""
+def init_database(app: Optional[Flask] = None) -> Flask:
+    """
+    Crea las tablas (o pone al día las de una base anterior) e inserta datos de
+    ejemplo si la base está vacía. Devuelve la aplicación usada.
+    """
+    app = app or create_app()
     with app.app_context():
-        # Crear todas las tablas
+        # Crear las tablas que falten y aplicar los ajustes de versiones anteriores
         print("Creando tablas...")
-        db.create_all()
+        for ajuste in asegurar_esquema(db.engine):
+            print(f"  {ajuste}")
         
         # Verificar si ya existen datos
         if Empresa.query.first():
             print("La base de datos ya contiene datos.")
-            return
+            return app
         
         print("Insertando datos de ejemplo...")
         
@@ -95,6 +107,7 @@ def init_database():
         
         cotizacion.calcular_totales()
         db.session.add(cotizacion)
+        estadisticas_clientes.aplicar(agregar=[Aporte.de(cotizacion)])
         db.session.commit()
         
         print("✅ Base de datos inicializada correctamente!")
@@ -102,6 +115,7 @@ def init_database():
         print(f"✅ {len(clientes)} clientes creados")
         print(f"✅ 1 cotización de ejemplo creada: {cotizacion.numero_cotizacion}")
         print(f"\n💡 Puedes acceder al sistema en: http://localhost:5000")
+    return app
 
 
 if __name__ == '__main__':
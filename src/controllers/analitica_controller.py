@@ -0,0 +1,99 @@
+import re
+from sqlalchemy import select
+from src.models.models import db, Cliente
+from src.controllers.cotizacion_controller import CotizacionController
+
+
+def _mes(valor, nombre):
+    """'YYYY-MM' -> índice de mes de la instantánea; lanza ValueError si no es válido"""
+    if not valor:
+        return None
+    coincide = re.fullmatch(r'(\d{4})-(\d{2})', valor)
+    if not coincide or not 1 <= int(coincide.group(2)) <= 12:
+        raise ValueError(f'{nombre} debe tener el formato YYYY-MM')
+    return int(coincide.group(1)) * 12 + int(coincide.group(2)) - 1
+
+
+class AnaliticaController:
+    """Controlador de los reportes sobre la instantánea columnar (src/services/analitica.py)"""
+
+    AGRUPACIONES = ('grupo', 'mes', 'cliente', 'concepto')
+    NO_DISPONIBLE = {'error': 'La analítica todavía se está generando; intente de nuevo en unos segundos'}
+
+    @staticmethod
+    def ingresos(analitica, por='grupo', estatus=None, desde=None, hasta=None, limite=50):
+        """
+        Ingresos (suma de total_linea) y líneas por grupo, mes, cliente o concepto
+
+        Args:
+            analitica: servicio Analitica de la aplicación
+            por: 'grupo', 'mes', 'cliente' o 'concepto'
+            estatus: sólo cotizaciones con este estatus
+            desde, hasta: meses 'YYYY-MM' (inclusive)
+            limite: máximo de filas (1-1000; por mes se devuelven todos)
+        """
+        if por not in AnaliticaController.AGRUPACIONES:
+            return {'error': f'Agrupación inválida. Valores permitidos: {list(AnaliticaController.AGRUPACIONES)}'}, 400
+        try:
+            limite = min(max(int(limite), 1), 1000)
+        except (TypeError, ValueError):
+            return {'error': 'limite debe ser un número entero'}, 400
+        try:
+            mes_desde, mes_hasta = _mes(desde, 'desde'), _mes(hasta, 'hasta')
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        vista = analitica.vista()
+        if vista is None:
+            return AnaliticaController.NO_DISPONIBLE, 503
+        filas = analitica.ingresos(por, estatus=estatus or None, desde=mes_desde, hasta=mes_hasta, limite=limite)
+        if por == 'cliente' and filas:
+            nombres = dict(db.session.execute(
+                select(Cliente.id, Cliente.nombre).where(Cliente.id.in_([f['clave'] for f in filas]))
+            ).all())
+            for fila in filas:
+                fila['nombre'] = nombres.get(fila['clave'])
+        return {
+            'por': por,
+            'filas': filas,
+            'total': round(sum(f['ingresos'] for f in filas), 2),
+            'actualizado': vista.actualizado
+        }, 200
+
+    @staticmethod
+    def estatus(analitica, desde=None, hasta=None):
+        """
+        Cotizaciones y monto por estatus (en el orden de ``ESTATUS_VALIDOS``),
+        con la tasa de aceptación (aceptadas entre las que ya no son borrador)
+        """
+        try:
+            mes_desde, mes_hasta = _mes(desde, 'desde'), _mes(hasta, 'hasta')
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        vista = analitica.vista()
+        if vista is None:
+            return AnaliticaController.NO_DISPONIBLE, 503
+        filas = analitica.por_estatus(desde=mes_desde, hasta=mes_hasta)
+        # En el orden del flujo (el de la instantánea depende de cuándo apareció cada estatus)
+        orden = {e: i for i, e in enumerate(CotizacionController.ESTATUS_VALIDOS)}
+        filas.sort(key=lambda f: (orden.get(f['estatus'], len(orden)), f['estatus']))
+        total = sum(f['cotizaciones'] for f in filas)
+        for fila in filas:
+            fila['proporcion'] = round(fila['cotizaciones'] / total, 4) if total else 0.0
+        conteos = {f['estatus']: f['cotizaciones'] for f in filas}
+        decididas = total - conteos.get('Borrador', 0)
+        return {
+            'estatus': filas,
+            'total': total,
+            'tasa_aceptacion': round(conteos.get('Aceptada', 0) / decididas, 4) if decididas else None,
+            'actualizado': vista.actualizado
+        }, 200
+
+    @staticmethod
+    def actualizar(analitica, completa=False):
+        """Actualiza la instantánea en la petición (incremental salvo ``completa``)"""
+        try:
+            return {'success': True, **analitica.actualizar(completa=completa)}, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
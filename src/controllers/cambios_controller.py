@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from src.services.cambios import RECURSOS, CursorInvalido, leer_cambios
+
+
+class CambiosController:
+    """Controlador del feed de cambios (sincronización incremental)"""
+
+    @staticmethod
+    def obtener_cambios(recurso, updated_since=None, cursor=None, limite=500, retencion_dias=90):
+        """
+        Filas modificadas y eliminadas de un recurso desde ``updated_since`` o
+        desde la posición de ``cursor``
+
+        Args:
+            recurso: 'cotizaciones', 'detalles' o 'clientes'
+            updated_since: fecha ISO 8601 (UTC si no trae zona)
+            cursor: cursor devuelto por la página anterior (tiene prioridad)
+            limite: máximo de cambios y de eliminados por página (1-5000)
+            retencion_dias: días que se conservan los registros de eliminación
+        """
+        if recurso not in RECURSOS:
+            return {'error': f'Recurso inválido. Valores permitidos: {list(RECURSOS)}'}, 400
+        try:
+            limite = min(max(int(limite), 1), 5000)
+        except (TypeError, ValueError):
+            return {'error': 'limite debe ser un número entero'}, 400
+        desde = None
+        if updated_since and not cursor:
+            try:
+                desde = datetime.fromisoformat(updated_since)
+            except ValueError:
+                return {'error': 'updated_since debe ser una fecha ISO 8601'}, 400
+
+        try:
+            pagina = leer_cambios(recurso, desde=desde, cursor=cursor, limite=limite)
+        except CursorInvalido as e:
+            return {'error': str(e)}, 400
+
+        # Los borrados más antiguos que la retención ya se depuraron: hay que
+        # volver a descargar todo
+        resincronizar = (
+            pagina.inicio is not None
+            and pagina.inicio < datetime.utcnow() - timedelta(days=retencion_dias)
+        )
+        return {
+            'recurso': recurso,
+            'cambios': pagina.cambios,
+            'eliminados': pagina.eliminados,
+            'cursor': pagina.cursor,
+            'hay_mas': pagina.hay_mas,
+            'resincronizar': resincronizar
+        }, 200
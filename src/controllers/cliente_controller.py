@@ -1,9 +1,22 @@
-from src.models.models import db, Cliente
+from sqlalchemy import delete, exists, select
+from src.models.models import db, Cliente, Cotizacion, cotizacion_archivo
+from src.services.cache_consultas import cache_listados
+from src.services.cambios import registrar_eliminaciones
+from src.services.catalogo_clientes import catalogo_clientes
+from src.services import estadisticas_clientes
 
 
 class ClienteController:
     """Controlador para operaciones de clientes"""
     
+    # Ordenamientos de obtener_todos; las estadísticas van de mayor a menor
+    ORDENES = {
+        'nombre': (Cliente.nombre,),
+        'num_cotizaciones': (Cliente.num_cotizaciones.desc(), Cliente.nombre),
+        'total_aceptado': (Cliente.total_aceptado.desc(), Cliente.nombre),
+        'ultima_cotizacion': (Cliente.ultima_cotizacion.desc().nulls_last(), Cliente.nombre),
+    }
+    
     @staticmethod
     def crear_cliente(data):
         """
@@ -24,6 +37,7 @@ class ClienteController:
             
             db.session.add(cliente)
             db.session.commit()
+            catalogo_clientes.invalidar()
             
             return {'success': True, 'cliente': cliente.to_dict()}, 201
             
@@ -40,24 +54,51 @@ class ClienteController:
         return {'cliente': cliente.to_dict()}, 200
     
     @staticmethod
-    def obtener_todos(busqueda=None):
+    def obtener_todos(busqueda=None, orden='nombre'):
         """
         Obtiene todos los clientes con búsqueda opcional
         
         Args:
             busqueda: str para filtrar por nombre
+            orden: 'nombre', 'num_cotizaciones', 'total_aceptado' o 'ultima_cotizacion'
         """
+        criterio = ClienteController.ORDENES.get(orden or 'nombre')
+        if criterio is None:
+            return {'error': f'Orden inválido. Valores permitidos: {list(ClienteController.ORDENES)}'}, 400
+        
         query = Cliente.query
         
         if busqueda:
             query = query.filter(Cliente.nombre.ilike(f'%{busqueda}%'))
         
-        clientes = query.order_by(Cliente.nombre).all()
+        clientes = query.order_by(*criterio).all()
         return {
             'clientes': [c.to_dict() for c in clientes],
             'total': len(clientes)
         }, 200
     
+    @staticmethod
+    def obtener_opciones(prefijo='', limite=1000):
+        """
+        Clientes (sólo id y nombre) para llenar selectores, desde el catálogo
+        en memoria. Filtra por prefijo del nombre sin distinguir acentos.
+        
+        Args:
+            prefijo: inicio del nombre
+            limite: máximo de opciones (1-5000)
+        """
+        try:
+            limite = min(max(int(limite), 1), 5000)
+        except (TypeError, ValueError):
+            return {'error': 'limite debe ser un número entero'}, 400
+        version, opciones, truncado = catalogo_clientes.buscar(prefijo or '', limite)
+        return {
+            'clientes': opciones,
+            'total': len(opciones),
+            'truncado': truncado,
+            'version': version
+        }, 200
+    
     @staticmethod
     def actualizar_cliente(cliente_id, data):
         """Actualiza un cliente existente"""
@@ -76,6 +117,9 @@ class ClienteController:
                 cliente.direccion = data['direccion']
             
             db.session.commit()
+            catalogo_clientes.invalidar()
+            # Los listados incluyen los datos del cliente de cada cotización
+            cache_listados.limpiar()
             
             return {'success': True, 'cliente': cliente.to_dict()}, 200
             
@@ -87,21 +131,43 @@ class ClienteController:
     def eliminar_cliente(cliente_id):
         """Elimina un cliente"""
         try:
-            cliente = Cliente.query.get(cliente_id)
-            if not cliente:
-                return {'error': 'Cliente no encontrado'}, 404
-            
-            # Verificar si tiene cotizaciones asociadas
-            if cliente.cotizaciones:
+            # Verificar si tiene cotizaciones asociadas (EXISTS: no carga ninguna)
+            tiene_cotizaciones = db.session.execute(select(
+                exists().where(Cotizacion.cliente_id == cliente_id)
+                | exists().where(cotizacion_archivo.c.cliente_id == cliente_id)
+            )).scalar()
+            if tiene_cotizaciones:
                 return {
                     'error': 'No se puede eliminar el cliente porque tiene cotizaciones asociadas'
                 }, 400
             
-            db.session.delete(cliente)
+            registrar_eliminaciones(Cliente.__table__, Cliente.id == cliente_id)
+            resultado = db.session.execute(
+                delete(Cliente).where(Cliente.id == cliente_id),
+                execution_options={'synchronize_session': False}
+            )
+            if resultado.rowcount == 0:
+                db.session.rollback()
+                return {'error': 'Cliente no encontrado'}, 404
             db.session.commit()
+            catalogo_clientes.invalidar()
             
             return {'success': True, 'message': 'Cliente eliminado'}, 200
             
         except Exception as e:
             db.session.rollback()
             return {'error': str(e)}, 500
+    
+    @staticmethod
+    def recalcular_estadisticas():
+        """
+        Rehace desde las cotizaciones (activas y archivadas) las estadísticas
+        de todos los clientes, p. ej. después de cargar datos por fuera de la API
+        """
+        try:
+            actualizados = estadisticas_clientes.recalcular()
+            db.session.commit()
+            return {'success': True, 'clientes': actualizados}, 200
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
@@ -1,21 +1,76 @@
-from datetime import datetime
-from src.models.models import db, Cotizacion, DetalleCotizacion
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, insert, literal, select
+from src.models.models import (
+    db, Cotizacion, DetalleCotizacion, cotizacion_archivo, detalle_cotizacion_archivo
+)
+from src.models.dto import cargar_cotizacion, cargar_cotizaciones
+from src.services.cache_consultas import cache_listados
+from src.services.cambios import registrar_eliminacion_cotizaciones, registrar_eliminaciones
+from src.services import estadisticas_clientes
+from src.services.estadisticas_clientes import Aporte
+from src.services.eventos import bus_eventos
+from src.services.exportaciones import archivos_exportacion
+from src.services.json_rapido import FragmentoJSON, codificar, fragmentos_cotizaciones
+from src.services.prerender import prerender
+
+
+def _estado(cliente_id, estatus, fecha):
+    """Campos de una cotización que deciden en qué listados filtrados aparece"""
+    return {'cliente_id': cliente_id, 'estatus': estatus, 'fecha': str(fecha)[:10] if fecha else None}
+
+
+def _resumen(cotizacion):
+    """Fila del listado (sin líneas) que viaja en los eventos de cambios"""
+    datos = cotizacion.to_dict()
+    del datos['detalles']
+    if datos['cliente']:
+        datos['cliente'] = {'id': datos['cliente']['id'], 'nombre': datos['cliente']['nombre']}
+    return datos
+
+
+def _normalizar_filtros(filtros, incluir_archivadas):
+    """
+    Filtros sin valores vacíos y como texto: misma clave para el mismo listado.
+    ``cliente_id`` se lleva a su forma canónica ('01' -> '1'), igual que lo
+    compara SQLite, para que la invalidación por filtros lo reconozca.
+
+    Raises:
+        ValueError: si ``cliente_id`` no es un entero.
+    """
+    normalizados = {}
+    for clave, valor in (filtros or {}).items():
+        valor = str(valor).strip() if valor is not None else ''
+        if valor:
+            normalizados[clave] = valor
+    if 'cliente_id' in normalizados:
+        try:
+            normalizados['cliente_id'] = str(int(normalizados['cliente_id']))
+        except ValueError:
+            raise ValueError('cliente_id debe ser un número entero')
+    if incluir_archivadas:
+        normalizados['archivadas'] = '1'
+    return normalizados
 
 
 class CotizacionController:
     """Controlador para operaciones de cotizaciones"""
     
+    ESTATUS_VALIDOS = ['Borrador', 'Enviada', 'Aceptada', 'Cancelada']
+    
     @staticmethod
     def generar_consecutivo():
-        """Genera el siguiente número consecutivo de cotización"""
-        ultima_cotizacion = Cotizacion.query.order_by(Cotizacion.id.desc()).first()
+        """Genera el siguiente número consecutivo de cotización (activas y archivadas)"""
+        # La última de cada tabla: una cotización archivada puede ser la más reciente
+        numeros = [
+            db.session.execute(
+                select(tabla.c.numero_cotizacion).order_by(tabla.c.id.desc()).limit(1)
+            ).scalar()
+            for tabla in (Cotizacion.__table__, cotizacion_archivo)
+        ]
         
-        if ultima_cotizacion:
-            # Extraer número del formato COT-00001
-            ultimo_numero = int(ultima_cotizacion.numero_cotizacion.split('-')[1])
-            nuevo_numero = ultimo_numero + 1
-        else:
-            nuevo_numero = 1
+        # Extraer número del formato COT-00001
+        ultimo_numero = max((int(n.split('-')[1]) for n in numeros if n), default=0)
+        nuevo_numero = ultimo_numero + 1
         
         return f"COT-{nuevo_numero:05d}"
     
@@ -74,7 +129,13 @@ class CotizacionController:
             
             # Guardar en base de datos
             db.session.add(cotizacion)
+            estadisticas_clientes.aplicar(agregar=[Aporte.de(cotizacion)])
             db.session.commit()
+            cache_listados.invalidar_estados([
+                _estado(cotizacion.cliente_id, cotizacion.estatus, cotizacion.fecha)
+            ])
+            bus_eventos.publicar('cotizacion.creada', cotizacion=_resumen(cotizacion))
+            prerender.encolar(cotizacion.id)
             
             return {'success': True, 'cotizacion': cotizacion.to_dict()}, 201
             
@@ -85,35 +146,73 @@ class CotizacionController:
     @staticmethod
     def obtener_cotizacion(cotizacion_id):
         """Obtiene una cotización por ID"""
-        cotizacion = Cotizacion.query.get(cotizacion_id)
+        cotizacion = cargar_cotizacion(cotizacion_id)
         if not cotizacion:
             return {'error': 'Cotización no encontrada'}, 404
-        return {'cotizacion': cotizacion.to_dict()}, 200
+        return {'cotizacion': cotizacion.a_dict()}, 200
     
     @staticmethod
-    def obtener_todas(filtros=None):
+    def obtener_para_exportar(cotizacion_id):
+        """Obtiene una cotización como CotizacionDTO para los servicios de PDF/Excel"""
+        cotizacion = cargar_cotizacion(cotizacion_id)
+        if not cotizacion:
+            return {'error': 'Cotización no encontrada'}, 404
+        return {'cotizacion': cotizacion}, 200
+    
+    @staticmethod
+    def obtener_para_lote(filtros=None, incluir_archivadas=False, limite=500):
+        """
+        Cotizaciones (CotizacionDTO con líneas) que cumplen los mismos filtros
+        del listado, en el mismo orden, para exportarlas en un solo PDF
+        
+        Args:
+            filtros: dict con cliente_id, estatus, fecha_desde, fecha_hasta
+            incluir_archivadas: también recorre las tablas de archivo
+            limite: máximo de cotizaciones por lote
+        """
+        try:
+            filtros = _normalizar_filtros(filtros, incluir_archivadas)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        cotizaciones = cargar_cotizaciones(filtros, incluir_archivadas=incluir_archivadas)
+        if not cotizaciones:
+            return {'error': 'No hay cotizaciones con esos filtros'}, 404
+        if len(cotizaciones) > limite:
+            return {
+                'error': f'El lote tiene {len(cotizaciones)} cotizaciones; el máximo es {limite}. '
+                         'Acota los filtros (p. ej. por fechas)'
+            }, 400
+        return {'cotizaciones': cotizaciones, 'filtros': filtros}, 200
+    
+    @staticmethod
+    def obtener_todas(filtros=None, incluir_archivadas=False):
         """
         Obtiene todas las cotizaciones con filtros opcionales
         
         Args:
             filtros: dict con cliente_id, estatus, fecha_desde, fecha_hasta
+            incluir_archivadas: también recorre las tablas de archivo
         """
-        query = Cotizacion.query
+        try:
+            filtros = _normalizar_filtros(filtros, incluir_archivadas)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         
-        if filtros:
-            if filtros.get('cliente_id'):
-                query = query.filter_by(cliente_id=filtros['cliente_id'])
-            if filtros.get('estatus'):
-                query = query.filter_by(estatus=filtros['estatus'])
-            if filtros.get('fecha_desde'):
-                query = query.filter(Cotizacion.fecha >= filtros['fecha_desde'])
-            if filtros.get('fecha_hasta'):
-                query = query.filter(Cotizacion.fecha <= filtros['fecha_hasta'])
+        def construir():
+            # Una sola consulta con join (cliente y líneas) en vez de N+1 cargas perezosas
+            cotizaciones = cargar_cotizaciones(filtros, incluir_archivadas=incluir_archivadas)
+            # Cada resumen se codifica a JSON una sola vez por versión (updated_at de la
+            # cotización, que también cambia con sus líneas, y del cliente)
+            arreglo = codificar([
+                fragmentos_cotizaciones.obtener((c.id, c.version), c.a_dict) for c in cotizaciones
+            ])
+            return len(cotizaciones), arreglo
         
-        cotizaciones = query.order_by(Cotizacion.fecha.desc()).all()
+        # El arreglo ya codificado se reutiliza hasta que una escritura afecte estos filtros
+        total, arreglo = cache_listados.obtener(filtros, construir)
         return {
-            'cotizaciones': [c.to_dict() for c in cotizaciones],
-            'total': len(cotizaciones)
+            'cotizaciones': FragmentoJSON(arreglo),
+            'total': total
         }, 200
     
     @staticmethod
@@ -123,6 +222,8 @@ class CotizacionController:
             cotizacion = Cotizacion.query.get(cotizacion_id)
             if not cotizacion:
                 return {'error': 'Cotización no encontrada'}, 404
+            antes = _estado(cotizacion.cliente_id, cotizacion.estatus, cotizacion.fecha)
+            aporte_antes = Aporte.de(cotizacion)
             
             # Actualizar campos básicos
             if 'cliente_id' in data:
@@ -140,7 +241,9 @@ class CotizacionController:
             
             # Actualizar detalles si se proporcionan
             if 'detalles' in data:
-                # Eliminar detalles existentes
+                # Eliminar detalles existentes (quedan registradas para el feed de cambios)
+                det = DetalleCotizacion.__table__
+                registrar_eliminaciones(det, det.c.cotizacion_id == cotizacion_id)
                 DetalleCotizacion.query.filter_by(cotizacion_id=cotizacion_id).delete()
                 
                 # Agregar nuevos detalles
@@ -159,8 +262,16 @@ class CotizacionController:
                 db.session.flush()
                 cotizacion.calcular_totales()
             
-            cotizacion.updated_at = datetime.utcnow()
+            aporte = Aporte.de(cotizacion)
+            if aporte != aporte_antes:
+                estadisticas_clientes.aplicar(quitar=[aporte_antes], agregar=[aporte])
+            # updated_at lo actualizan onupdate y el evento before_flush de las líneas
             db.session.commit()
+            cache_listados.invalidar_estados([
+                antes, _estado(cotizacion.cliente_id, cotizacion.estatus, cotizacion.fecha)
+            ])
+            bus_eventos.publicar('cotizacion.actualizada', cotizacion=_resumen(cotizacion))
+            prerender.encolar(cotizacion.id)
             
             return {'success': True, 'cotizacion': cotizacion.to_dict()}, 200
             
@@ -170,14 +281,31 @@ class CotizacionController:
     
     @staticmethod
     def eliminar_cotizacion(cotizacion_id):
-        """Elimina una cotización"""
+        """Elimina una cotización (sus líneas las borra la base con ON DELETE CASCADE)"""
         try:
-            cotizacion = Cotizacion.query.get(cotizacion_id)
-            if not cotizacion:
+            registrar_eliminacion_cotizaciones([cotizacion_id])
+            # RETURNING: el estado borrado decide qué listados en caché invalidar
+            # (y lo que aportaba a las estadísticas de su cliente)
+            cot = Cotizacion.__table__
+            borrada = db.session.execute(
+                delete(cot).where(cot.c.id == cotizacion_id)
+                .returning(cot.c.cliente_id, cot.c.estatus, cot.c.fecha, cot.c.total)
+            ).first()
+            if borrada is None:
+                borrada = db.session.execute(
+                    delete(cotizacion_archivo).where(cotizacion_archivo.c.id == cotizacion_id)
+                    .returning(cotizacion_archivo.c.cliente_id, cotizacion_archivo.c.estatus,
+                               cotizacion_archivo.c.fecha, cotizacion_archivo.c.total)
+                ).first()
+            if borrada is None:
+                db.session.rollback()
                 return {'error': 'Cotización no encontrada'}, 404
-            
-            db.session.delete(cotizacion)
+            estadisticas_clientes.aplicar(quitar=[Aporte.de(borrada)])
             db.session.commit()
+            cache_listados.invalidar_estados([_estado(borrada.cliente_id, borrada.estatus, borrada.fecha)])
+            bus_eventos.publicar('cotizacion.eliminada', cotizacion_id=cotizacion_id)
+            prerender.descartar(cotizacion_id)
+            archivos_exportacion.descartar(cotizacion_id)
             
             return {'success': True, 'message': 'Cotización eliminada'}, 200
             
@@ -185,6 +313,141 @@ class CotizacionController:
             db.session.rollback()
             return {'error': str(e)}, 500
     
+    @staticmethod
+    def purgar(estatus='Borrador', dias=None, lote=500):
+        """
+        Elimina las cotizaciones con un estatus y fecha de hace más de ``dias``
+        días, en transacciones de ``lote`` cotizaciones. Cada lote son dos
+        sentencias (buscar ids y borrar) sin importar cuántas líneas tengan.
+        
+        Args:
+            estatus: estatus a purgar (default 'Borrador')
+            dias: antigüedad mínima en días (requerido)
+            lote: cotizaciones por transacción
+        """
+        estatus_validos = CotizacionController.ESTATUS_VALIDOS
+        if estatus not in estatus_validos:
+            return {'error': f'Estatus inválido. Valores permitidos: {estatus_validos}'}, 400
+        try:
+            dias = int(dias)
+            lote = int(lote)
+        except (TypeError, ValueError):
+            return {'error': 'dias y lote deben ser números enteros'}, 400
+        if dias < 0 or lote < 1:
+            return {'error': 'dias debe ser >= 0 y lote >= 1'}, 400
+        
+        limite = date.today() - timedelta(days=dias)
+        eliminadas = 0
+        try:
+            while True:
+                ids = db.session.execute(
+                    select(Cotizacion.id)
+                    .where(Cotizacion.estatus == estatus, Cotizacion.fecha < limite)
+                    .limit(lote)
+                ).scalars().all()
+                if not ids:
+                    break
+                registrar_eliminacion_cotizaciones(ids)
+                cot = Cotizacion.__table__
+                borradas = db.session.execute(
+                    delete(cot).where(cot.c.id.in_(ids))
+                    .returning(cot.c.cliente_id, cot.c.fecha, cot.c.estatus, cot.c.total)
+                ).all()
+                estadisticas_clientes.aplicar(quitar=[Aporte.de(fila) for fila in borradas])
+                db.session.commit()
+                eliminadas += len(ids)
+                for cotizacion_id in ids:
+                    prerender.descartar(cotizacion_id)
+                    archivos_exportacion.descartar(cotizacion_id)
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e), 'eliminadas': eliminadas}, 500
+        finally:
+            if eliminadas:
+                cache_listados.limpiar()
+                # Cambios masivos: las páginas abiertas vuelven a cargar su lista
+                bus_eventos.publicar('recargar', motivo='purga')
+        
+        return {
+            'success': True,
+            'eliminadas': eliminadas,
+            'estatus': estatus,
+            'anteriores_a': limite.isoformat()
+        }, 200
+    
+    @staticmethod
+    def archivar(dias=365, estatus=('Aceptada', 'Cancelada'), lote=500):
+        """
+        Mueve a las tablas de archivo las cotizaciones cerradas con fecha de
+        hace más de ``dias`` días, en transacciones de ``lote`` cotizaciones
+        (copiar cotizaciones, copiar líneas y borrar de las activas). Los ids
+        no se reutilizan: ``cotizacion`` es AUTOINCREMENT en SQLite.
+        
+        Args:
+            dias: antigüedad mínima en días
+            estatus: estatus a archivar (default Aceptada y Cancelada)
+            lote: cotizaciones por transacción
+        """
+        estatus = [estatus] if isinstance(estatus, str) else list(estatus or [])
+        invalidos = [e for e in estatus if e not in CotizacionController.ESTATUS_VALIDOS]
+        if not estatus or invalidos:
+            return {'error': f'Estatus inválido. Valores permitidos: {CotizacionController.ESTATUS_VALIDOS}'}, 400
+        try:
+            dias = int(dias)
+            lote = int(lote)
+        except (TypeError, ValueError):
+            return {'error': 'dias y lote deben ser números enteros'}, 400
+        if dias < 0 or lote < 1:
+            return {'error': 'dias debe ser >= 0 y lote >= 1'}, 400
+        
+        cot, det = Cotizacion.__table__, DetalleCotizacion.__table__
+        columnas_cot = [c.name for c in cot.columns]
+        columnas_det = [c.name for c in det.columns]
+        limite = date.today() - timedelta(days=dias)
+        archivadas = 0
+        try:
+            while True:
+                ids = db.session.execute(
+                    select(cot.c.id)
+                    .where(cot.c.estatus.in_(estatus), cot.c.fecha < limite)
+                    .order_by(cot.c.id)
+                    .limit(lote)
+                ).scalars().all()
+                if not ids:
+                    break
+                db.session.execute(insert(cotizacion_archivo).from_select(
+                    columnas_cot + ['archivada_at'],
+                    select(*[cot.c[n] for n in columnas_cot], literal(datetime.utcnow()))
+                    .where(cot.c.id.in_(ids))
+                ))
+                db.session.execute(insert(detalle_cotizacion_archivo).from_select(
+                    columnas_det,
+                    select(*[det.c[n] for n in columnas_det]).where(det.c.cotizacion_id.in_(ids))
+                ))
+                # Para el feed de cambios salen de las activas como si se hubieran borrado
+                registrar_eliminacion_cotizaciones(ids, motivo='archivada')
+                db.session.execute(
+                    delete(Cotizacion).where(Cotizacion.id.in_(ids)),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.commit()
+                archivadas += len(ids)
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e), 'archivadas': archivadas}, 500
+        finally:
+            if archivadas:
+                cache_listados.limpiar()
+                # Cambios masivos: las páginas abiertas vuelven a cargar su lista
+                bus_eventos.publicar('recargar', motivo='archivo')
+        
+        return {
+            'success': True,
+            'archivadas': archivadas,
+            'estatus': estatus,
+            'anteriores_a': limite.isoformat()
+        }, 200
+    
     @staticmethod
     def cambiar_estatus(cotizacion_id, nuevo_estatus):
         """Cambia el estatus de una cotización"""
@@ -193,13 +456,22 @@ class CotizacionController:
             if not cotizacion:
                 return {'error': 'Cotización no encontrada'}, 404
             
-            estatus_validos = ['Borrador', 'Enviada', 'Aceptada', 'Cancelada']
+            estatus_validos = CotizacionController.ESTATUS_VALIDOS
             if nuevo_estatus not in estatus_validos:
                 return {'error': f'Estatus inválido. Valores permitidos: {estatus_validos}'}, 400
             
+            antes = _estado(cotizacion.cliente_id, cotizacion.estatus, cotizacion.fecha)
+            aporte_antes = Aporte.de(cotizacion)
             cotizacion.estatus = nuevo_estatus
-            cotizacion.updated_at = datetime.utcnow()
+            if nuevo_estatus != aporte_antes.estatus:
+                estadisticas_clientes.aplicar(quitar=[aporte_antes], agregar=[Aporte.de(cotizacion)])
             db.session.commit()
+            cache_listados.invalidar_estados([
+                antes, _estado(cotizacion.cliente_id, cotizacion.estatus, cotizacion.fecha)
+            ])
+            bus_eventos.publicar('cotizacion.estatus', cotizacion_id=cotizacion.id,
+                                 estatus=nuevo_estatus, anterior=antes['estatus'])
+            prerender.encolar(cotizacion.id)
             
             return {'success': True, 'cotizacion': cotizacion.to_dict()}, 200
             
@@ -1,5 +1,6 @@
 from datetime import datetime
 from src.models.models import db, Empresa
+from src.models.dto import EmpresaDTO, cargar_empresa
 
 
 class EmpresaController:
@@ -13,6 +14,11 @@ class EmpresaController:
             return {'error': 'No hay datos de empresa configurados'}, 404
         return {'empresa': empresa.to_dict()}, 200
     
+    @staticmethod
+    def obtener_para_exportar():
+        """Datos de la empresa como EmpresaDTO; vacíos si aún no se configuran"""
+        return cargar_empresa() or EmpresaDTO()
+    
     @staticmethod
     def crear_o_actualizar_empresa(data):
         """Crea o actualiza los datos de la empresa"""
@@ -0,0 +1,261 @@
+"""
+DTOs de sólo lectura para los caminos calientes (listados y exportaciones).
+
+Se cargan con una sola sentencia ``SELECT`` de Core con join, sin hidratar
+objetos ORM ni disparar cargas perezosas, y los consumen directamente los
+serializadores JSON y los servicios de PDF/Excel. ``a_dict()`` produce
+exactamente la misma estructura que los ``to_dict()`` de los modelos.
+"""
+from datetime import date
+from itertools import chain, groupby
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.models.models import (
+    db, Empresa, Cliente, Cotizacion, DetalleCotizacion, cotizacion_archivo, detalle_cotizacion_archivo
+)
+
+
+class EmpresaDTO(NamedTuple):
+    id: Optional[int] = None
+    nombre: str = ''
+    direccion: str = ''
+    telefono: str = ''
+    email: str = ''
+    rfc: str = ''
+    redes_sociales: str = ''
+    logo: str = ''
+
+    def a_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+    @classmethod
+    def desde_dict(cls, data: Dict[str, Any]) -> 'EmpresaDTO':
+        return cls(**{campo: data.get(campo) or cls._field_defaults[campo] for campo in cls._fields})
+
+
+class ClienteDTO(NamedTuple):
+    id: int
+    nombre: str
+    telefono: Optional[str]
+    email: Optional[str]
+    direccion: Optional[str]
+
+    def a_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class LineaDTO(NamedTuple):
+    id: Optional[int]
+    cotizacion_id: Optional[int]
+    grupo: str
+    cantidad: float
+    descripcion: str
+    precio_unitario: float
+    total_linea: float
+    orden: int
+
+    def a_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+    @classmethod
+    def desde_dict(cls, data: Dict[str, Any]) -> 'LineaDTO':
+        cantidad = data.get('cantidad', 0) or 0
+        precio_unitario = data.get('precio_unitario', 0) or 0
+        total_linea = data.get('total_linea')
+        return cls(
+            id=data.get('id'),
+            cotizacion_id=data.get('cotizacion_id'),
+            grupo=data.get('grupo', '') or '',
+            cantidad=cantidad,
+            descripcion=data.get('descripcion', '') or '',
+            precio_unitario=precio_unitario,
+            total_linea=cantidad * precio_unitario if total_linea is None else total_linea,
+            orden=data.get('orden', 0) or 0,
+        )
+
+
+class CotizacionDTO(NamedTuple):
+    id: Optional[int]
+    numero_cotizacion: str
+    fecha: Any  # date, o str ya formateada cuando viene de un dict
+    cliente_id: Optional[int]
+    cliente: Optional[ClienteDTO]
+    subtotal: float
+    descuento: float
+    envio_delivery: float
+    impuestos: float
+    total: float
+    estatus: str
+    notas: str
+    detalles: Tuple[LineaDTO, ...]
+    # (updated_at de la cotización, updated_at del cliente) al cargarla de la
+    # base; no se imprime ni se serializa, sólo identifica esta versión
+    version: Any = None
+
+    def a_dict(self, incluir_detalles: bool = True) -> Dict[str, Any]:
+        """Misma estructura que ``Cotizacion.to_dict()``."""
+        return {
+            'id': self.id,
+            'numero_cotizacion': self.numero_cotizacion,
+            'fecha': self.fecha.isoformat() if isinstance(self.fecha, date) else self.fecha,
+            'cliente_id': self.cliente_id,
+            'cliente': self.cliente._asdict() if self.cliente else None,
+            'subtotal': self.subtotal,
+            'descuento': self.descuento,
+            'envio_delivery': self.envio_delivery,
+            'impuestos': self.impuestos,
+            'total': self.total,
+            'estatus': self.estatus,
+            'notas': self.notas,
+            'detalles': [d._asdict() for d in self.detalles] if incluir_detalles else [],
+        }
+
+    @classmethod
+    def desde_dict(cls, data: Dict[str, Any]) -> 'CotizacionDTO':
+        """Adapta un dict estilo ``to_dict()`` (API, pruebas, scripts) al DTO."""
+        cliente = data.get('cliente')
+        return cls(
+            id=data.get('id'),
+            numero_cotizacion=data.get('numero_cotizacion', 'SIN-NUMERO'),
+            fecha=data.get('fecha', ''),
+            cliente_id=data.get('cliente_id'),
+            cliente=ClienteDTO(**{k: cliente.get(k) for k in ClienteDTO._fields}) if cliente else None,
+            subtotal=data.get('subtotal', 0) or 0,
+            descuento=data.get('descuento', 0) or 0,
+            envio_delivery=data.get('envio_delivery', 0) or 0,
+            impuestos=data.get('impuestos', 0) or 0,
+            total=data.get('total', 0) or 0,
+            estatus=data.get('estatus', '') or '',
+            notas=data.get('notas', '') or '',
+            detalles=tuple(LineaDTO.desde_dict(d) for d in data.get('detalles', []) or []),
+        )
+
+
+def como_cotizacion_dto(cotizacion: Any) -> CotizacionDTO:
+    return cotizacion if isinstance(cotizacion, CotizacionDTO) else CotizacionDTO.desde_dict(cotizacion)
+
+
+def como_empresa_dto(empresa: Any) -> EmpresaDTO:
+    return empresa if isinstance(empresa, EmpresaDTO) else EmpresaDTO.desde_dict(empresa or {})
+
+
+# ══════════════════════════════════════════════════════════
+#  CARGA CON CORE
+# ══════════════════════════════════════════════════════════
+
+_cot = Cotizacion.__table__
+_cli = Cliente.__table__
+_det = DetalleCotizacion.__table__
+_emp = Empresa.__table__
+
+# (cotizaciones, líneas): tablas activas y de archivo, con las mismas columnas
+ACTIVAS = (_cot, _det)
+ARCHIVO = (cotizacion_archivo, detalle_cotizacion_archivo)
+
+
+def _columnas(cot, det) -> tuple:
+    return (
+        cot.c.id, cot.c.numero_cotizacion, cot.c.fecha, cot.c.cliente_id,
+        cot.c.subtotal, cot.c.descuento, cot.c.envio_delivery, cot.c.impuestos,
+        cot.c.total, cot.c.estatus, cot.c.notas,
+        _cli.c.id.label('cli_id'), _cli.c.nombre.label('cli_nombre'),
+        _cli.c.telefono.label('cli_telefono'), _cli.c.email.label('cli_email'),
+        _cli.c.direccion.label('cli_direccion'),
+        cot.c.updated_at, _cli.c.updated_at.label('cli_updated_at'),
+        det.c.id.label('det_id'), det.c.grupo, det.c.cantidad, det.c.descripcion,
+        det.c.precio_unitario, det.c.total_linea, det.c.orden,
+    )
+
+
+def _select_cotizaciones(incluir_detalles: bool = True, tablas: tuple = ACTIVAS):
+    cot, det = tablas
+    columnas = _columnas(cot, det)
+    if not incluir_detalles:
+        columnas = columnas[:18]
+    origen = cot.outerjoin(_cli, _cli.c.id == cot.c.cliente_id)
+    if incluir_detalles:
+        origen = origen.outerjoin(det, det.c.cotizacion_id == cot.c.id)
+    return select(*columnas).select_from(origen)
+
+
+def _armar(filas: Iterable[Any], incluir_detalles: bool = True) -> List[CotizacionDTO]:
+    """
+    Agrupa las filas del join (una por línea) en un DTO por cotización. Las
+    filas se consumen del cursor una a una: de cada fila sólo se conservan las
+    columnas de la línea.
+    """
+    resultado: List[CotizacionDTO] = []
+    for _, grupo in groupby(filas, key=lambda f: f[0]):
+        f = next(grupo)
+        detalles: Tuple[LineaDTO, ...] = ()
+        if incluir_detalles and f[18] is not None:
+            detalles = tuple(
+                LineaDTO(l[18], l[0], l[19], l[20], l[21], l[22], l[23], l[24])
+                for l in chain((f,), grupo)
+            )
+        cliente = ClienteDTO(f[11], f[12], f[13], f[14], f[15]) if f[11] is not None else None
+        resultado.append(CotizacionDTO(
+            f[0], f[1], f[2], f[3], cliente, f[4], f[5], f[6], f[7], f[8], f[9], f[10], detalles,
+            (f[16], f[17]),
+        ))
+    return resultado
+
+
+def cargar_cotizacion(cotizacion_id: int) -> Optional[CotizacionDTO]:
+    """
+    Cotización con cliente y líneas en una sola consulta, o None. Si no está
+    entre las activas se busca en el archivo.
+    """
+    for cot, det in (ACTIVAS, ARCHIVO):
+        stmt = (
+            _select_cotizaciones(tablas=(cot, det))
+            .where(cot.c.id == cotizacion_id)
+            .order_by(det.c.orden, det.c.id)
+        )
+        cotizaciones = _armar(db.session.execute(stmt))
+        if cotizaciones:
+            return cotizaciones[0]
+    return None
+
+
+def aplicar_filtros(stmt, filtros: Optional[Dict[str, Any]], cot=_cot):
+    """Filtros de listado (cliente_id, estatus, fecha_desde, fecha_hasta) sobre Core."""
+    if filtros:
+        if filtros.get('cliente_id'):
+            stmt = stmt.where(cot.c.cliente_id == filtros['cliente_id'])
+        if filtros.get('estatus'):
+            stmt = stmt.where(cot.c.estatus == filtros['estatus'])
+        if filtros.get('fecha_desde'):
+            stmt = stmt.where(cot.c.fecha >= filtros['fecha_desde'])
+        if filtros.get('fecha_hasta'):
+            stmt = stmt.where(cot.c.fecha <= filtros['fecha_hasta'])
+    return stmt
+
+
+def cargar_cotizaciones(filtros: Optional[Dict[str, Any]] = None,
+                        incluir_detalles: bool = True,
+                        incluir_archivadas: bool = False) -> List[CotizacionDTO]:
+    """
+    Listado filtrado, más recientes primero, en una sola consulta con join.
+    Sólo recorre las tablas activas salvo que se pida ``incluir_archivadas``.
+    """
+    resultado: List[CotizacionDTO] = []
+    for cot, det in ((ACTIVAS, ARCHIVO) if incluir_archivadas else (ACTIVAS,)):
+        stmt = aplicar_filtros(_select_cotizaciones(incluir_detalles, (cot, det)), filtros, cot)
+        orden = [cot.c.fecha.desc(), cot.c.id.desc()]
+        if incluir_detalles:
+            orden += [det.c.orden, det.c.id]
+        resultado.extend(_armar(db.session.execute(stmt.order_by(*orden)), incluir_detalles))
+    if incluir_archivadas:
+        resultado.sort(key=lambda c: (c.fecha, c.id), reverse=True)
+    return resultado
+
+
+def cargar_empresa() -> Optional[EmpresaDTO]:
+    fila = db.session.execute(
+        select(_emp.c.id, _emp.c.nombre, _emp.c.direccion, _emp.c.telefono, _emp.c.email,
+               _emp.c.rfc, _emp.c.redes_sociales, _emp.c.logo).limit(1)
+    ).first()
+    return EmpresaDTO(*fila) if fila else None
@@ -0,0 +1,246 @@
+"""
+Ajustes de esquema para bases creadas con versiones anteriores.
+
+``db.create_all()`` no modifica tablas existentes; estas funciones agregan lo
+que cambió desde entonces y no hacen nada si la base ya está al día.
+``asegurar_esquema`` las corre todas en orden; no se llaman al crear la
+aplicación sino desde ``init_db.py`` o ``flask actualizar-esquema``.
+"""
+import logging
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from src.models.models import (
+    db, Cliente, Cotizacion, DetalleCotizacion, cotizacion_archivo, detalle_cotizacion_archivo, eliminacion
+)
+
+
+logger = logging.getLogger('cotiz.esquema')
+
+
+def asegurar_cascada(engine: Engine) -> bool:
+    """
+    Reconstruye ``detalle_cotizacion`` con ``ON DELETE CASCADE`` si la tabla
+    se creó sin él. SQLite no puede alterar una llave foránea, así que la tabla
+    se renombra, se crea de nuevo desde el modelo y se copian las líneas (las
+    huérfanas de cotizaciones ya borradas se descartan).
+
+    Returns:
+        True si se reconstruyó la tabla.
+    """
+    if engine.dialect.name != 'sqlite':
+        return False  # otros motores: usar una migración (Flask-Migrate)
+
+    tabla = DetalleCotizacion.__table__
+    with engine.begin() as conn:
+        llaves = conn.execute(text(f'PRAGMA foreign_key_list({tabla.name})')).mappings().all()
+        if not llaves or any(l['table'] == 'cotizacion' and l['on_delete'] == 'CASCADE' for l in llaves):
+            return False  # tabla inexistente o ya migrada
+
+        anterior = f'{tabla.name}_anterior'
+        conn.execute(text(f'ALTER TABLE {tabla.name} RENAME TO {anterior}'))
+        # Los índices viajan con la tabla renombrada; se quitan para poder recrearlos
+        indices = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"
+        ), {'t': anterior}).scalars().all()
+        for indice in indices:
+            conn.execute(text(f'DROP INDEX "{indice}"'))
+
+        existentes = {c['name'] for c in conn.execute(text(f'PRAGMA table_info({anterior})')).mappings()}
+        tabla.create(conn)
+        columnas = ', '.join(c.name for c in tabla.columns if c.name in existentes)
+        copiadas = conn.execute(text(
+            f'INSERT INTO {tabla.name} ({columnas}) SELECT {columnas} FROM {anterior} '
+            f'WHERE cotizacion_id IN (SELECT id FROM cotizacion)'
+        )).rowcount
+        total = conn.execute(text(f'SELECT COUNT(*) FROM {anterior}')).scalar()
+        conn.execute(text(f'DROP TABLE {anterior}'))
+
+    logger.warning('detalle_cotizacion reconstruida con ON DELETE CASCADE: %s líneas copiadas, '
+                   '%s huérfanas descartadas', copiadas, total - copiadas)
+    return True
+
+
+def asegurar_autoincremento(engine: Engine) -> bool:
+    """
+    Reconstruye ``cotizacion`` como AUTOINCREMENT si se creó sin él: sin eso
+    SQLite reutiliza el id más alto cuando se borra, y una cotización nueva
+    podía tomar el id de una archivada. El contador arranca en el id más alto
+    de las activas y las archivadas.
+
+    La tabla se crea con otro nombre, se copian las filas y se reemplaza la
+    original con las llaves foráneas desactivadas: borrar ``cotizacion`` con
+    ellas activas borraría en cascada todas las líneas.
+
+    Returns:
+        True si se reconstruyó la tabla.
+    """
+    if engine.dialect.name != 'sqlite':
+        return False  # otros motores usan secuencias, que nunca reutilizan ids
+
+    tabla = Cotizacion.__table__
+    with engine.connect() as conn:
+        sql = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"
+        ), {'t': tabla.name}).scalar()
+    if sql is None or 'AUTOINCREMENT' in sql.upper():
+        return False  # tabla inexistente o ya migrada
+
+    nueva = f'{tabla.name}_nueva'
+    crudo = engine.raw_connection()
+    try:
+        cursor = crudo.cursor()
+        cursor.execute('PRAGMA foreign_keys=OFF')  # sin efecto dentro de una transacción
+        cursor.execute('BEGIN')
+        existentes = {fila[1] for fila in cursor.execute(f'PRAGMA table_info({tabla.name})')}
+        ultimo_id = cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabla.name}').fetchone()[0]
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (cotizacion_archivo.name,)).fetchone():
+            ultimo_id = max(ultimo_id, cursor.execute(
+                f'SELECT COALESCE(MAX(id), 0) FROM {cotizacion_archivo.name}'
+            ).fetchone()[0])
+        crear = str(CreateTable(tabla).compile(dialect=engine.dialect)).strip()
+        cursor.execute(crear.replace(f'CREATE TABLE {tabla.name} ', f'CREATE TABLE {nueva} ', 1))
+        columnas = ', '.join(c.name for c in tabla.columns if c.name in existentes)
+        cursor.execute(f'INSERT INTO {nueva} ({columnas}) SELECT {columnas} FROM {tabla.name}')
+        cursor.execute(f'DROP TABLE {tabla.name}')
+        cursor.execute(f'ALTER TABLE {nueva} RENAME TO {tabla.name}')
+        for indice in tabla.indexes:
+            cursor.execute(str(CreateIndex(indice).compile(dialect=engine.dialect)))
+        # El contador parte del id más alto usado, también por las archivadas
+        cursor.execute('DELETE FROM sqlite_sequence WHERE name = ?', (tabla.name,))
+        cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (tabla.name, ultimo_id))
+        huerfanas = cursor.execute(f'PRAGMA foreign_key_check({DetalleCotizacion.__tablename__})').fetchall()
+        if huerfanas:
+            raise RuntimeError(f'Llaves foráneas rotas al reconstruir {tabla.name}: {huerfanas[:5]}')
+        crudo.commit()
+    except Exception:
+        crudo.rollback()
+        raise
+    finally:
+        crudo.cursor().execute('PRAGMA foreign_keys=ON')
+        crudo.close()
+
+    logger.warning('cotizacion reconstruida como AUTOINCREMENT (los ids ya no se reutilizan)')
+    return True
+
+
+def asegurar_feed_cambios(engine: Engine) -> bool:
+    """
+    Prepara una base existente para el feed de cambios: agrega ``updated_at``
+    a las líneas (con la fecha de su cotización), rellena los ``updated_at``
+    nulos, crea los índices sobre ``updated_at`` y la tabla ``eliminacion``.
+    Conviene correrla antes de ``asegurar_cascada``: la reconstrucción sólo
+    copia las columnas que ya existen.
+
+    Returns:
+        True si se modificó el esquema.
+    """
+    modificado = False
+    ahora = datetime.utcnow().isoformat(' ')  # mismo formato que guarda SQLAlchemy
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tablas = set(inspector.get_table_names())
+        if 'cotizacion' not in tablas:
+            return False  # base nueva: db.create_all() crea todo
+
+        for tabla, origen in ((DetalleCotizacion.__table__, 'cotizacion'),
+                              (detalle_cotizacion_archivo, 'cotizacion_archivo')):
+            if tabla.name not in tablas:
+                continue
+            if 'updated_at' not in {c['name'] for c in inspector.get_columns(tabla.name)}:
+                conn.execute(text(f'ALTER TABLE {tabla.name} ADD COLUMN updated_at DATETIME'))
+                conn.execute(text(
+                    f'UPDATE {tabla.name} SET updated_at = (SELECT updated_at FROM {origen} '
+                    f'WHERE {origen}.id = {tabla.name}.cotizacion_id)'
+                ))
+                modificado = True
+
+        for modelo in (Cliente, Cotizacion, DetalleCotizacion):
+            nombre = modelo.__tablename__
+            valor = 'COALESCE(created_at, :ahora)' if 'created_at' in modelo.__table__.c else ':ahora'
+            nulos = conn.execute(
+                text(f'UPDATE {nombre} SET updated_at = {valor} WHERE updated_at IS NULL'),
+                {'ahora': ahora}
+            ).rowcount
+            existentes = {i['name'] for i in inspector.get_indexes(nombre)}
+            for indice in modelo.__table__.indexes:
+                if indice.name not in existentes:
+                    indice.create(conn)
+                    modificado = True
+            modificado = modificado or nulos > 0
+
+        if eliminacion.name not in tablas:
+            eliminacion.create(conn)
+            modificado = True
+
+    if modificado:
+        logger.warning('Esquema actualizado para el feed de cambios (updated_at indexado y tabla eliminacion)')
+    return modificado
+
+
+def asegurar_estadisticas_clientes(engine: Engine) -> bool:
+    """
+    Agrega a ``cliente`` las columnas de estadísticas (número de cotizaciones,
+    total aceptado y última cotización) y las llena desde las cotizaciones
+    activas y archivadas. Después las mantiene ``CotizacionController``.
+
+    Returns:
+        True si se modificó el esquema.
+    """
+    tabla = Cliente.__table__
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tablas = set(inspector.get_table_names())
+        if tabla.name not in tablas:
+            return False  # base nueva: db.create_all() crea todo
+
+        existentes = {c['name'] for c in inspector.get_columns(tabla.name)}
+        faltantes = [c for c in ('num_cotizaciones', 'total_aceptado', 'ultima_cotizacion') if c not in existentes]
+        if not faltantes:
+            return False
+        for nombre in faltantes:
+            columna = tabla.c[nombre]
+            tipo = columna.type.compile(dialect=engine.dialect)
+            defecto = f' NOT NULL DEFAULT {columna.server_default.arg}' if columna.server_default is not None else ''
+            conn.execute(text(f'ALTER TABLE {tabla.name} ADD COLUMN {nombre} {tipo}{defecto}'))
+
+        origen = ' UNION ALL '.join(
+            f'SELECT cliente_id, fecha, estatus, total FROM {t}'
+            for t in ('cotizacion', 'cotizacion_archivo') if t in tablas
+        )
+        if origen:
+            # Sin tocar updated_at: las estadísticas no cuentan como cambio del cliente
+            conn.execute(text(
+                f"UPDATE {tabla.name} SET "
+                f"num_cotizaciones = (SELECT COUNT(*) FROM ({origen}) t WHERE t.cliente_id = {tabla.name}.id), "
+                f"total_aceptado = (SELECT COALESCE(SUM(t.total), 0) FROM ({origen}) t "
+                f"WHERE t.cliente_id = {tabla.name}.id AND t.estatus = 'Aceptada'), "
+                f"ultima_cotizacion = (SELECT MAX(t.fecha) FROM ({origen}) t WHERE t.cliente_id = {tabla.name}.id)"
+            ))
+
+    logger.warning('Estadísticas de clientes agregadas y calculadas (%s)', ', '.join(faltantes))
+    return True
+
+
+def asegurar_esquema(engine: Engine) -> List[str]:
+    """
+    Crea las tablas que falten y aplica los ajustes anteriores, en orden: el
+    índice de updated_at y el registro de eliminaciones antes de reconstruir
+    las líneas (para conservar updated_at), y al final las estadísticas de
+    los clientes (las llena la primera vez).
+
+    Returns:
+        Nombres de los ajustes que se aplicaron (vacío si ya estaba al día).
+    """
+    db.metadata.create_all(engine)
+    aplicados = []
+    for ajuste in (asegurar_feed_cambios, asegurar_cascada, asegurar_autoincremento,
+                   asegurar_estadisticas_clientes):
+        if ajuste(engine):
+            aplicados.append(ajuste.__name__)
+    return aplicados
@@ -1,7 +1,12 @@
+import sqlite3
 from datetime import datetime
+from itertools import chain
 from typing import List, Optional, TYPE_CHECKING
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import Mapped, relationship
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapped, Session, relationship
+from sqlalchemy.orm.util import identity_key
 
 db = SQLAlchemy()
 
@@ -47,29 +52,44 @@ class Cliente(db.Model):
     email = db.Column(db.String(100))
     direccion = db.Column(db.String(300))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Indexado: lo recorre el feed de cambios (GET /api/clientes/cambios)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Estadísticas desnormalizadas (activas + archivadas); las mantiene
+    # src/services/estadisticas_clientes.py desde CotizacionController
+    num_cotizaciones = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_aceptado = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    ultima_cotizacion = db.Column(db.Date)
     
     # Relación con cotizaciones
     cotizaciones: Mapped[List["Cotizacion"]] = relationship('Cotizacion', back_populates='cliente', lazy=True)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, estadisticas=True):
+        datos = {
             'id': self.id,
             'nombre': self.nombre,
             'telefono': self.telefono,
             'email': self.email,
             'direccion': self.direccion
         }
+        if estadisticas:
+            datos['num_cotizaciones'] = self.num_cotizaciones or 0
+            datos['total_aceptado'] = round(self.total_aceptado or 0.0, 2)
+            datos['ultima_cotizacion'] = self.ultima_cotizacion.isoformat() if self.ultima_cotizacion else None
+        return datos
 
 
 class Cotizacion(db.Model):
     """Modelo para cotizaciones"""
     __tablename__ = 'cotizacion'
+    # AUTOINCREMENT: SQLite no reutiliza los ids de cotizaciones archivadas,
+    # purgadas o eliminadas (seguirían resolviendo a la cotización equivocada)
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     numero_cotizacion = db.Column(db.String(50), unique=True, nullable=False)
     fecha = db.Column(db.Date, nullable=False, default=datetime.utcnow)
-    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
+    # Indexado: recalcular la última cotización de un cliente (estadisticas_clientes)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True)
     subtotal = db.Column(db.Float, default=0.0)
     descuento = db.Column(db.Float, default=0.0)
     envio_delivery = db.Column(db.Float, default=0.0)
@@ -78,15 +98,19 @@ class Cotizacion(db.Model):
     estatus = db.Column(db.String(50), default='Borrador')  # Borrador, Enviada, Aceptada, Cancelada
     notas = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # onupdate y _tocar_cotizaciones (cambios en sus líneas) lo mantienen al día
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relaciones
     cliente: Mapped["Cliente"] = relationship('Cliente', back_populates='cotizaciones')
+    # passive_deletes: al borrar, las líneas las elimina la base (ON DELETE CASCADE)
+    # sin cargarlas en la sesión
     detalles: Mapped[List["DetalleCotizacion"]] = relationship(
         'DetalleCotizacion', 
         back_populates='cotizacion', 
         lazy=True, 
-        cascade='all, delete-orphan'
+        cascade='all, delete-orphan',
+        passive_deletes=True
     )
     
     def to_dict(self):
@@ -95,7 +119,7 @@ class Cotizacion(db.Model):
             'numero_cotizacion': self.numero_cotizacion,
             'fecha': self.fecha.isoformat() if self.fecha else None,
             'cliente_id': self.cliente_id,
-            'cliente': self.cliente.to_dict() if self.cliente else None,
+            'cliente': self.cliente.to_dict(estadisticas=False) if self.cliente else None,
             'subtotal': self.subtotal,
             'descuento': self.descuento,
             'envio_delivery': self.envio_delivery,
@@ -127,13 +151,16 @@ class DetalleCotizacion(db.Model):
     __tablename__ = 'detalle_cotizacion'
     
     id = db.Column(db.Integer, primary_key=True)
-    cotizacion_id = db.Column(db.Integer, db.ForeignKey('cotizacion.id'), nullable=False)
+    # Indexado: las líneas de una cotización (o de un grupo de ellas) se buscan por aquí
+    cotizacion_id = db.Column(db.Integer, db.ForeignKey('cotizacion.id', ondelete='CASCADE'), nullable=False,
+                              index=True)
     grupo = db.Column(db.String(100))  # Ciudad / sección (ej: "Hermosillo", "Navojoa")
     cantidad = db.Column(db.Float, nullable=False)
     descripcion = db.Column(db.String(500), nullable=False)
     precio_unitario = db.Column(db.Float, nullable=False)
     total_linea = db.Column(db.Float, nullable=False)
     orden = db.Column(db.Integer, default=0)  # Para mantener el orden
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relación
     cotizacion: Mapped["Cotizacion"] = relationship('Cotizacion', back_populates='detalles')
@@ -153,3 +180,90 @@ class DetalleCotizacion(db.Model):
     def calcular_total(self):
         """Calcula el total de la línea"""
         self.total_linea = self.cantidad * self.precio_unitario
+
+
+# ==================== ARCHIVO ====================
+# Cotizaciones cerradas antiguas, movidas fuera de las tablas activas para que los
+# listados e índices sólo recorran las vigentes. Conservan su id original; las
+# líneas se identifican por (cotizacion_id, id).
+
+cotizacion_archivo = db.Table(
+    'cotizacion_archivo',
+    db.Column('id', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('numero_cotizacion', db.String(50), unique=True, nullable=False),
+    db.Column('fecha', db.Date, nullable=False, index=True),
+    db.Column('cliente_id', db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True),
+    db.Column('subtotal', db.Float, default=0.0),
+    db.Column('descuento', db.Float, default=0.0),
+    db.Column('envio_delivery', db.Float, default=0.0),
+    db.Column('impuestos', db.Float, default=0.0),
+    db.Column('total', db.Float, default=0.0),
+    db.Column('estatus', db.String(50)),
+    db.Column('notas', db.Text),
+    db.Column('created_at', db.DateTime),
+    db.Column('updated_at', db.DateTime),
+    db.Column('archivada_at', db.DateTime, default=datetime.utcnow),
+)
+
+detalle_cotizacion_archivo = db.Table(
+    'detalle_cotizacion_archivo',
+    db.Column('cotizacion_id', db.Integer, db.ForeignKey('cotizacion_archivo.id', ondelete='CASCADE'),
+              primary_key=True),
+    db.Column('id', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('grupo', db.String(100)),
+    db.Column('cantidad', db.Float, nullable=False),
+    db.Column('descripcion', db.String(500), nullable=False),
+    db.Column('precio_unitario', db.Float, nullable=False),
+    db.Column('total_linea', db.Float, nullable=False),
+    db.Column('orden', db.Integer, default=0),
+    db.Column('updated_at', db.DateTime),
+)
+
+
+# ==================== CAMBIOS ====================
+# Registro de borrados (tombstones) para el feed de cambios: quien sincroniza con
+# ``updated_since`` no vería las filas que ya no existen. Las cotizaciones
+# archivadas también salen de las tablas activas y se registran con motivo 'archivada'.
+
+eliminacion = db.Table(
+    'eliminacion',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('tabla', db.String(50), nullable=False),
+    db.Column('registro_id', db.Integer, nullable=False),
+    db.Column('cotizacion_id', db.Integer),  # líneas: cotización a la que pertenecían
+    db.Column('motivo', db.String(20), nullable=False, default='eliminada'),
+    db.Column('eliminado_at', db.DateTime, nullable=False, default=datetime.utcnow),
+    db.Index('ix_eliminacion_tabla_eliminado_at', 'tabla', 'eliminado_at', 'id'),
+)
+
+
+@event.listens_for(Session, 'before_flush')
+def _tocar_cotizaciones(session, _contexto, _instancias):
+    """
+    Agregar, modificar o quitar líneas también actualiza ``updated_at`` de su
+    cotización (si está cargada en la sesión), aunque sus columnas no cambien.
+    """
+    ahora = datetime.utcnow()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, DetalleCotizacion) or obj.cotizacion_id is None:
+            continue
+        cotizacion = session.identity_map.get(identity_key(Cotizacion, obj.cotizacion_id))
+        if cotizacion is not None:
+            cotizacion.updated_at = ahora
+
+
+def activar_llaves_foraneas(engine: Engine) -> None:
+    """
+    SQLite no aplica llaves foráneas (ni ON DELETE CASCADE) si no se activan
+    por conexión: se activan en cada conexión nueva de ``engine`` (idempotente;
+    otros engines del proceso no se tocan).
+    """
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _activar_llaves_foraneas):
+        event.listen(engine, 'connect', _activar_llaves_foraneas)
+
+
+def _activar_llaves_foraneas(dbapi_connection, _registro):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
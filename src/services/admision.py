@@ -0,0 +1,148 @@
+"""
+Control de admisión de las exportaciones.
+
+Generar un PDF o un Excel ocupa el CPU (y el GIL) decenas o cientos de
+milisegundos. Una ráfaga de descargas puede dejar todos los hilos del worker
+renderizando, y entonces las APIs baratas (``/api/clientes``,
+``/api/cotizaciones/consecutivo``) tardan lo que tarde la ráfaga. Aquí se limita
+cuántos renders corren a la vez en el proceso; los demás esperan en una cola
+acotada y, si está llena o la espera pasa del límite, la petición se rechaza
+con ``503`` y un ``Retry-After`` estimado en lugar de seguir acumulándose.
+
+Sólo pasan por aquí los renders: una descarga que encuentra el archivo hecho o
+que espera el que otra petición está generando (``archivos_exportacion``) no
+ocupa turno. El resto de las rutas nunca espera por este límite.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from src.services.metricas import metricas
+
+
+metricas.describir('cotiz_admision_en_curso', 'gauge', 'Renders de exportación corriendo en el proceso')
+metricas.describir('cotiz_admision_en_cola', 'gauge', 'Renders de exportación esperando turno en el proceso')
+metricas.describir('cotiz_admision_espera_segundos', 'histogram',
+                   'Tiempo que un render esperó turno, por resultado (admitido/tiempo_agotado)')
+metricas.describir('cotiz_admision_rechazos_total', 'counter',
+                   'Exportaciones rechazadas con 503, por motivo (cola_llena/tiempo_agotado)')
+
+
+class ExportacionesSaturadas(Exception):
+    """No hubo turno para renderizar; ``reintentar`` son los segundos sugeridos para Retry-After."""
+
+    def __init__(self, motivo: str, reintentar: int):
+        super().__init__(f'Demasiadas exportaciones en curso ({motivo}); reintentar en {reintentar} s')
+        self.motivo = motivo
+        self.reintentar = reintentar
+
+
+class ControlAdmision:
+
+    # Peso de la última duración en el promedio móvil (para estimar Retry-After)
+    SUAVIZADO = 0.2
+
+    def __init__(self, concurrencia: int = 2, cola: int = 4, espera: float = 10.0):
+        self._condicion = threading.Condition()
+        self._en_curso = 0
+        self._en_cola = 0
+        self._duracion_media = 1.0
+        self.configurar(concurrencia, cola, espera)
+
+    def configurar(self, concurrencia: int, cola: int, espera: float) -> None:
+        """``concurrencia`` 0 desactiva el límite."""
+        with self._condicion:
+            self.concurrencia = max(0, concurrencia)
+            self.cola = max(0, cola)
+            self.espera = max(0.0, espera)
+            self._condicion.notify_all()
+
+    @property
+    def activo(self) -> bool:
+        return self.concurrencia > 0
+
+    def _reintentar(self) -> int:
+        # Lo que tardaría en vaciarse lo que ya está en curso y en cola
+        pendientes = self._en_curso + self._en_cola
+        return max(1, math.ceil(self._duracion_media * pendientes / max(1, self.concurrencia)))
+
+    def _rechazar(self, motivo: str) -> ExportacionesSaturadas:
+        metricas.incrementar('cotiz_admision_rechazos_total', 1, {'motivo': motivo})
+        return ExportacionesSaturadas(motivo, self._reintentar())
+
+    def _publicar(self) -> None:
+        metricas.fijar('cotiz_admision_en_curso', self._en_curso)
+        metricas.fijar('cotiz_admision_en_cola', self._en_cola)
+
+    @contextmanager
+    def turno(self) -> Iterator[None]:
+        """Espera un lugar para renderizar; lanza ``ExportacionesSaturadas`` si no lo hay."""
+        if not self.activo:
+            yield
+            return
+        with self._condicion:
+            if self._en_curso >= self.concurrencia:
+                if self._en_cola >= self.cola:
+                    raise self._rechazar('cola_llena')
+                self._en_cola += 1
+                self._publicar()
+                inicio = time.monotonic()
+                limite = inicio + self.espera
+                try:
+                    while self._en_curso >= self.concurrencia:
+                        restante = limite - time.monotonic()
+                        if restante <= 0:
+                            metricas.observar('cotiz_admision_espera_segundos', time.monotonic() - inicio,
+                                              {'resultado': 'tiempo_agotado'})
+                            raise self._rechazar('tiempo_agotado')
+                        self._condicion.wait(restante)
+                finally:
+                    self._en_cola -= 1
+                    self._publicar()
+                metricas.observar('cotiz_admision_espera_segundos', time.monotonic() - inicio,
+                                  {'resultado': 'admitido'})
+            self._en_curso += 1
+            self._publicar()
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            duracion = time.monotonic() - inicio
+            with self._condicion:
+                self._en_curso -= 1
+                self._duracion_media += self.SUAVIZADO * (duracion - self._duracion_media)
+                self._publicar()
+                self._condicion.notify()
+
+    @contextmanager
+    def adicionales(self, cuantos: int) -> Iterator[int]:
+        """
+        Toma sin esperar hasta ``cuantos`` turnos libres y entrega cuántos
+        obtuvo (0 si no hay). Es para los procesos hijos de un render que ya
+        tiene turno: cada proceso extra ocupa un lugar como otro render.
+        """
+        if not self.activo:
+            yield cuantos
+            return
+        with self._condicion:
+            obtenidos = max(0, min(cuantos, self.concurrencia - self._en_curso))
+            self._en_curso += obtenidos
+            self._publicar()
+        try:
+            yield obtenidos
+        finally:
+            if obtenidos:
+                with self._condicion:
+                    self._en_curso -= obtenidos
+                    self._publicar()
+                    self._condicion.notify_all()
+
+    def ejecutar(self, funcion: Callable[..., Any], *args, **kwargs) -> Any:
+        """``funcion(*args, **kwargs)`` dentro de un turno."""
+        with self.turno():
+            return funcion(*args, **kwargs)
+
+
+admision_exportaciones = ControlAdmision()
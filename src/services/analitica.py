@@ -0,0 +1,496 @@
+"""
+Instantánea columnar para la analítica de ingresos.
+
+Los reportes (ingresos por grupo, mes, cliente y concepto; cotizaciones por
+estatus) recorren todas las líneas, algo inviable con ``to_dict`` y el ORM en
+millones de filas. Aquí ``detalle_cotizacion`` unida con ``cotizacion`` (y sus
+tablas de archivo, para no perder el histórico) se materializa en arreglos de
+NumPy, una columna por archivo, que se abren con ``np.memmap``: los workers
+comparten las páginas del sistema operativo en lugar de cargar cada uno su
+copia, y una agregación es un ``np.bincount`` sobre las columnas.
+
+Los textos (estatus, grupo, concepto) se guardan codificados como enteros con
+un diccionario por columna. Cada actualización es incremental: las
+cotizaciones tocadas desde la última (``updated_at`` y la tabla
+``eliminacion``) se marcan como no vigentes y sus filas actuales se agregan al
+final de los archivos. Cuando las filas no vigentes pasan de
+``FRACCION_COMPACTAR`` se reescribe la instantánea sin ellas.
+
+Estructura en disco::
+
+    {directorio}/meta.json                 generación, filas, diccionarios y marca de tiempo
+    {directorio}/g{n}/{tabla}.{columna}.bin
+
+``meta.json`` se reemplaza de forma atómica y es lo que leen las consultas;
+una reconstrucción completa escribe una generación nueva y borra la anterior.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select, union_all
+
+from src.models.models import (
+    db, Cotizacion, DetalleCotizacion, cotizacion_archivo, detalle_cotizacion_archivo, eliminacion
+)
+from src.services.cambios import MARGEN
+from src.services.metricas import medir, metricas
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+logger = logging.getLogger('cotiz.analitica')
+
+metricas.describir('cotiz_analitica_filas', 'gauge', 'Filas de la instantánea analítica por tabla (vigentes)')
+metricas.describir('cotiz_analitica_actualizaciones_total', 'counter',
+                   'Actualizaciones de la instantánea analítica por tipo (completa/incremental/compactacion)')
+
+# Columnas y tipos de cada tabla; las de CODIFICADAS guardan el código del diccionario
+TABLAS: Dict[str, Dict[str, Any]] = {
+    'lineas': {
+        'cotizacion_id': np.int32, 'mes': np.int32, 'cliente_id': np.int32, 'estatus': np.int16,
+        'grupo': np.int32, 'concepto': np.int32, 'cantidad': np.float64, 'total': np.float64,
+        'vigente': np.bool_,
+    },
+    'cotizaciones': {
+        'id': np.int32, 'mes': np.int32, 'cliente_id': np.int32, 'estatus': np.int16,
+        'total': np.float64, 'vigente': np.bool_,
+    },
+}
+CODIFICADAS = ('estatus', 'grupo', 'concepto')
+# Columna con la que se identifican las filas de una cotización en cada tabla
+LLAVE = {'lineas': 'cotizacion_id', 'cotizaciones': 'id'}
+
+AGRUPACIONES = {'grupo': 'grupo', 'mes': 'mes', 'cliente': 'cliente_id', 'concepto': 'concepto'}
+
+LOTE_FILAS = 100_000
+LOTE_IDS = 500
+# Con más cotizaciones cambiadas que esta fracción, conviene reconstruir todo
+FRACCION_RECONSTRUIR = 0.2
+FRACCION_COMPACTAR = 0.3
+
+
+def mes_indice(anio: int, mes: int) -> int:
+    """Mes como entero consecutivo (año * 12 + mes - 1), como en la columna ``mes``."""
+    return anio * 12 + mes - 1
+
+
+def mes_texto(indice: int) -> str:
+    return f'{indice // 12:04d}-{indice % 12 + 1:02d}'
+
+
+class Diccionario:
+    """Codificación de una columna de texto: valor -> código consecutivo."""
+
+    def __init__(self, valores: Iterable[Optional[str]] = ()):
+        self.valores: List[Optional[str]] = list(valores)
+        self._codigos = {valor: codigo for codigo, valor in enumerate(self.valores)}
+
+    def codificar(self, valor: Optional[str]) -> int:
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codigo(self, valor: Optional[str]) -> Optional[int]:
+        return self._codigos.get(valor)
+
+
+class Vista(NamedTuple):
+    """Columnas de sólo lectura de una versión de ``meta.json``."""
+    columnas: Dict[str, Dict[str, np.ndarray]]
+    diccionarios: Dict[str, Diccionario]
+    actualizado: str
+
+
+class Analitica:
+
+    def __init__(self, directorio: str = os.path.join('exports', 'analitica'), intervalo: float = 300,
+                 app: Any = None):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self.app = app  # para abrir el contexto en el hilo de actualización
+        self._lock = threading.Lock()
+        self._lock_hilo = threading.Lock()
+        self._vista: Optional[Vista] = None
+        self._firma_vista: Optional[Tuple[int, int]] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    # ══════════════════════════════════════════════════════════
+    # LECTURA
+    # ══════════════════════════════════════════════════════════
+
+    @property
+    def _ruta_meta(self) -> str:
+        return os.path.join(self.directorio, 'meta.json')
+
+    def _ruta_columna(self, generacion: int, tabla: str, columna: str) -> str:
+        return os.path.join(self.directorio, f'g{generacion}', f'{tabla}.{columna}.bin')
+
+    def _leer_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._ruta_meta, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _escribir_meta(self, meta: Dict[str, Any]) -> None:
+        temporal = f'{self._ruta_meta}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temporal, self._ruta_meta)
+
+    def _abrir(self, meta: Dict[str, Any], tabla: str, columna: str, modo: str = 'r') -> np.ndarray:
+        filas = meta['filas'][tabla]
+        tipo = TABLAS[tabla][columna]
+        if filas == 0:
+            return np.zeros(0, dtype=tipo)  # np.memmap no admite archivos vacíos
+        return np.memmap(self._ruta_columna(meta['generacion'], tabla, columna), dtype=tipo, mode=modo,
+                         shape=(filas,))
+
+    def vista(self) -> Optional[Vista]:
+        """Columnas de la última instantánea (None si todavía no hay ninguna)."""
+        try:
+            estado = os.stat(self._ruta_meta)
+        except FileNotFoundError:
+            return None
+        firma = (estado.st_mtime_ns, estado.st_size)
+        if firma != self._firma_vista:
+            meta = self._leer_meta()
+            if meta is None:
+                return None
+            self._vista = Vista(
+                columnas={tabla: {columna: self._abrir(meta, tabla, columna) for columna in columnas}
+                          for tabla, columnas in TABLAS.items()},
+                diccionarios={nombre: Diccionario(valores) for nombre, valores in meta['diccionarios'].items()},
+                actualizado=meta['actualizado'],
+            )
+            self._firma_vista = firma
+        return self._vista
+
+    @property
+    def disponible(self) -> bool:
+        return os.path.exists(self._ruta_meta)
+
+    # ══════════════════════════════════════════════════════════
+    # AGREGACIONES
+    # ══════════════════════════════════════════════════════════
+
+    @staticmethod
+    def _mascara(columnas: Dict[str, np.ndarray], diccionarios: Dict[str, Diccionario],
+                 estatus: Optional[str], desde: Optional[int], hasta: Optional[int]) -> np.ndarray:
+        mascara = np.array(columnas['vigente'], dtype=bool)
+        if estatus is not None:
+            codigo = diccionarios['estatus'].codigo(estatus)
+            if codigo is None:
+                return np.zeros_like(mascara)
+            mascara &= columnas['estatus'] == codigo
+        if desde is not None:
+            mascara &= columnas['mes'] >= desde
+        if hasta is not None:
+            mascara &= columnas['mes'] <= hasta
+        return mascara
+
+    def ingresos(self, por: str, estatus: Optional[str] = None, desde: Optional[int] = None,
+                 hasta: Optional[int] = None, limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Suma de ``total_linea`` y número de líneas por ``por`` (grupo, mes,
+        cliente o concepto). Por mes en orden cronológico; las demás de mayor a
+        menor ingreso, las primeras ``limite``.
+        """
+        vista = self.vista()
+        if vista is None:
+            return []
+        with medir('analitica', f'ingresos_{por}'):
+            lineas = vista.columnas['lineas']
+            mascara = self._mascara(lineas, vista.diccionarios, estatus, desde, hasta)
+            codigos = lineas[AGRUPACIONES[por]][mascara]
+            base = int(codigos.min()) if por == 'mes' and codigos.size else 0
+            if base:
+                codigos = codigos - base  # bincount sobre meses desde el primero, no desde el año 0
+            sumas = np.bincount(codigos, weights=lineas['total'][mascara])
+            conteos = np.bincount(codigos, minlength=sumas.size)
+            presentes = np.flatnonzero(conteos)
+            if por != 'mes':
+                presentes = presentes[np.argsort(-sumas[presentes], kind='stable')][:limite]
+            if por == 'mes':
+                claves: Sequence[Any] = [mes_texto(int(c) + base) for c in presentes]
+            elif por == 'cliente':
+                claves = presentes.tolist()
+            else:
+                valores = vista.diccionarios[por].valores
+                claves = [valores[c] for c in presentes]
+            return [
+                {'clave': clave, 'ingresos': round(float(suma), 2), 'lineas': int(conteo)}
+                for clave, suma, conteo in zip(claves, sumas[presentes], conteos[presentes])
+            ]
+
+    def por_estatus(self, desde: Optional[int] = None, hasta: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Número de cotizaciones y suma de su ``total`` por estatus."""
+        vista = self.vista()
+        if vista is None:
+            return []
+        with medir('analitica', 'estatus'):
+            cotizaciones = vista.columnas['cotizaciones']
+            mascara = self._mascara(cotizaciones, vista.diccionarios, None, desde, hasta)
+            codigos = cotizaciones['estatus'][mascara]
+            sumas = np.bincount(codigos, weights=cotizaciones['total'][mascara])
+            conteos = np.bincount(codigos, minlength=sumas.size)
+            valores = vista.diccionarios['estatus'].valores
+            return [
+                {'estatus': valores[c], 'cotizaciones': int(conteos[c]), 'monto': round(float(sumas[c]), 2)}
+                for c in np.flatnonzero(conteos)
+            ]
+
+    # ══════════════════════════════════════════════════════════
+    # ACTUALIZACIÓN
+    # ══════════════════════════════════════════════════════════
+
+    def actualizar(self, completa: bool = False) -> Dict[str, Any]:
+        """
+        Lleva la instantánea al estado actual de la base. Entre workers se
+        serializa con un candado de archivo. Debe llamarse dentro de un
+        contexto de la aplicación.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        with self._lock:
+            candado = None
+            if fcntl is not None:
+                candado = open(os.path.join(self.directorio, '.lock'), 'a')
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            try:
+                with medir('analitica', 'actualizar'):
+                    return self._actualizar(completa)
+            finally:
+                if candado is not None:
+                    candado.close()
+
+    def _actualizar(self, completa: bool) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        marca = datetime.utcnow()
+        meta = self._leer_meta()
+        tipo = 'completa'
+        cambiadas: Set[int] = set()
+        if meta is not None and not completa:
+            with db.engine.connect() as conn:
+                cambiadas = self._cotizaciones_cambiadas(conn, datetime.fromisoformat(meta['marca']) - MARGEN)
+            vigentes = meta['filas']['cotizaciones'] - meta['muertas']['cotizaciones']
+            if len(cambiadas) <= max(LOTE_IDS, vigentes * FRACCION_RECONSTRUIR):
+                tipo = 'incremental'
+
+        if tipo == 'completa':
+            meta = self._reconstruir(marca)
+        else:
+            self._incremental(meta, sorted(cambiadas), marca)
+            filas = meta['filas']['lineas'] + meta['filas']['cotizaciones']
+            muertas = meta['muertas']['lineas'] + meta['muertas']['cotizaciones']
+            if muertas > filas * FRACCION_COMPACTAR:
+                meta = self._compactar(meta)
+                tipo = 'compactacion'
+
+        metricas.incrementar('cotiz_analitica_actualizaciones_total', 1, {'tipo': tipo})
+        for tabla in TABLAS:
+            metricas.fijar('cotiz_analitica_filas', meta['filas'][tabla] - meta['muertas'][tabla], {'tabla': tabla})
+        return {
+            'tipo': tipo,
+            'cotizaciones_cambiadas': len(cambiadas) if tipo != 'completa' else None,
+            'lineas': meta['filas']['lineas'] - meta['muertas']['lineas'],
+            'cotizaciones': meta['filas']['cotizaciones'] - meta['muertas']['cotizaciones'],
+            'segundos': round(time.perf_counter() - inicio, 3),
+        }
+
+    @staticmethod
+    def _cotizaciones_cambiadas(conn: Any, desde: datetime) -> Set[int]:
+        """Ids de cotizaciones creadas, editadas, eliminadas o archivadas desde ``desde``."""
+        cot, det, eli = Cotizacion.__table__, DetalleCotizacion.__table__, eliminacion
+        consultas = [
+            select(cot.c.id).where(cot.c.updated_at >= desde),
+            select(det.c.cotizacion_id).where(det.c.updated_at >= desde),
+            select(eli.c.registro_id).where(eli.c.tabla == cot.name, eli.c.eliminado_at >= desde),
+            select(eli.c.cotizacion_id).where(eli.c.tabla == det.name, eli.c.eliminado_at >= desde),
+        ]
+        return {fila[0] for consulta in consultas for fila in conn.execute(consulta) if fila[0] is not None}
+
+    # ── Lectura de la base ──
+
+    @staticmethod
+    def _consultas(ids: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """SELECT de cada tabla sobre las tablas activas y las de archivo (opcionalmente sólo ``ids``)."""
+        partes: Dict[str, List[Any]] = {'lineas': [], 'cotizaciones': []}
+        for cot, det in ((Cotizacion.__table__, DetalleCotizacion.__table__),
+                         (cotizacion_archivo, detalle_cotizacion_archivo)):
+            lineas = select(cot.c.id, cot.c.fecha, cot.c.cliente_id, cot.c.estatus, det.c.grupo,
+                            det.c.descripcion, det.c.cantidad, det.c.total_linea) \
+                .select_from(det.join(cot, det.c.cotizacion_id == cot.c.id))
+            cotizaciones = select(cot.c.id, cot.c.fecha, cot.c.cliente_id, cot.c.estatus, cot.c.total)
+            if ids is not None:
+                lineas = lineas.where(cot.c.id.in_(ids))
+                cotizaciones = cotizaciones.where(cot.c.id.in_(ids))
+            partes['lineas'].append(lineas)
+            partes['cotizaciones'].append(cotizaciones)
+        return {tabla: union_all(*consultas) for tabla, consultas in partes.items()}
+
+    @staticmethod
+    def _columnas(tabla: str, filas: List[Any], diccionarios: Dict[str, Diccionario]) -> Dict[str, np.ndarray]:
+        """Convierte filas de la consulta en arreglos de la tabla, codificando los textos."""
+        n = len(filas)
+        tipos = TABLAS[tabla]
+        cotizacion_id, fecha, cliente_id, estatus = (list(c) for c in list(zip(*filas))[:4])
+        estatus_dic = diccionarios['estatus']
+        columnas = {
+            LLAVE[tabla]: np.array(cotizacion_id, dtype=tipos[LLAVE[tabla]]),
+            'mes': np.fromiter((mes_indice(f.year, f.month) for f in fecha), dtype=np.int32, count=n),
+            'cliente_id': np.array(cliente_id, dtype=np.int32),
+            'estatus': np.fromiter((estatus_dic.codificar(e) for e in estatus), dtype=np.int16, count=n),
+            'vigente': np.ones(n, dtype=np.bool_),
+        }
+        if tabla == 'lineas':
+            grupo_dic, concepto_dic = diccionarios['grupo'], diccionarios['concepto']
+            columnas['grupo'] = np.fromiter((grupo_dic.codificar(f[4]) for f in filas), dtype=np.int32, count=n)
+            columnas['concepto'] = np.fromiter((concepto_dic.codificar(f[5]) for f in filas), dtype=np.int32,
+                                               count=n)
+            columnas['cantidad'] = np.fromiter((f[6] or 0.0 for f in filas), dtype=np.float64, count=n)
+            columnas['total'] = np.fromiter((f[7] or 0.0 for f in filas), dtype=np.float64, count=n)
+        else:
+            columnas['total'] = np.fromiter((f[4] or 0.0 for f in filas), dtype=np.float64, count=n)
+        return columnas
+
+    def _agregar(self, generacion: int, tabla: str, columnas: Dict[str, np.ndarray]) -> None:
+        for columna, tipo in TABLAS[tabla].items():
+            with open(self._ruta_columna(generacion, tabla, columna), 'ab') as f:
+                f.write(np.ascontiguousarray(columnas[columna], dtype=tipo).tobytes())
+
+    def _volcar(self, conn: Any, consulta: Any, tabla: str, generacion: int,
+                diccionarios: Dict[str, Diccionario]) -> int:
+        """Escribe al final de la generación el resultado de ``consulta``, por partes."""
+        filas = 0
+        resultado = conn.execution_options(yield_per=LOTE_FILAS).execute(consulta)
+        for particion in resultado.partitions():
+            self._agregar(generacion, tabla, self._columnas(tabla, particion, diccionarios))
+            filas += len(particion)
+        return filas
+
+    # ── Tipos de actualización ──
+
+    def _nueva_generacion(self, meta: Optional[Dict[str, Any]]) -> int:
+        generacion = (meta['generacion'] + 1) if meta else 1
+        ruta = os.path.join(self.directorio, f'g{generacion}')
+        shutil.rmtree(ruta, ignore_errors=True)  # restos de una reconstrucción interrumpida
+        os.makedirs(ruta)
+        for tabla, columnas in TABLAS.items():
+            for columna in columnas:
+                open(self._ruta_columna(generacion, tabla, columna), 'wb').close()
+        return generacion
+
+    def _publicar(self, meta: Dict[str, Any], anterior: Optional[Dict[str, Any]]) -> None:
+        """Escribe ``meta`` y, si cambió de generación, borra la anterior."""
+        meta['actualizado'] = datetime.utcnow().isoformat(timespec='seconds')
+        self._escribir_meta(meta)
+        if anterior is not None and anterior['generacion'] != meta['generacion']:
+            # Los memmap ya abiertos siguen funcionando en POSIX; en Windows puede fallar y queda para después
+            shutil.rmtree(os.path.join(self.directorio, f"g{anterior['generacion']}"), ignore_errors=True)
+
+    def _reconstruir(self, marca: datetime) -> Dict[str, Any]:
+        anterior = self._leer_meta()
+        generacion = self._nueva_generacion(anterior)
+        diccionarios = {nombre: Diccionario() for nombre in CODIFICADAS}
+        consultas = self._consultas()
+        with db.engine.connect() as conn:
+            filas = {tabla: self._volcar(conn, consultas[tabla], tabla, generacion, diccionarios)
+                     for tabla in TABLAS}
+        meta = {
+            'generacion': generacion,
+            'marca': marca.isoformat(),
+            'filas': filas,
+            'muertas': {tabla: 0 for tabla in TABLAS},
+            'diccionarios': {nombre: dic.valores for nombre, dic in diccionarios.items()},
+        }
+        self._publicar(meta, anterior)
+        return meta
+
+    def _incremental(self, meta: Dict[str, Any], ids: List[int], marca: datetime) -> None:
+        diccionarios = {nombre: Diccionario(valores) for nombre, valores in meta['diccionarios'].items()}
+        filas_previas = dict(meta['filas'])
+        # Primero se agregan las filas nuevas (fuera del alcance de quien lee el meta actual)...
+        with db.engine.connect() as conn:
+            for i in range(0, len(ids), LOTE_IDS):
+                consultas = self._consultas(ids[i:i + LOTE_IDS])
+                for tabla in TABLAS:
+                    meta['filas'][tabla] += self._volcar(conn, consultas[tabla], tabla, meta['generacion'],
+                                                         diccionarios)
+        # ...y después se retiran las anteriores de esas cotizaciones
+        if ids:
+            cambiadas = np.array(ids, dtype=np.int32)
+            for tabla in TABLAS:
+                previas = {**meta, 'filas': filas_previas}
+                vigente = self._abrir(previas, tabla, 'vigente', modo='r+')
+                if not vigente.size:
+                    continue
+                retirar = vigente & np.isin(self._abrir(previas, tabla, LLAVE[tabla]), cambiadas)
+                meta['muertas'][tabla] += int(np.count_nonzero(retirar))
+                vigente[retirar] = False
+                vigente.flush()
+                del vigente
+        meta['marca'] = marca.isoformat()
+        meta['diccionarios'] = {nombre: dic.valores for nombre, dic in diccionarios.items()}
+        self._publicar(meta, None)
+
+    def _compactar(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """Reescribe las columnas sin las filas no vigentes (sin volver a leer la base)."""
+        generacion = self._nueva_generacion(meta)
+        filas = {}
+        for tabla, columnas in TABLAS.items():
+            vigente = np.array(self._abrir(meta, tabla, 'vigente'), dtype=bool)
+            for columna in columnas:
+                datos = self._abrir(meta, tabla, columna)
+                with open(self._ruta_columna(generacion, tabla, columna), 'ab') as f:
+                    for i in range(0, vigente.size, LOTE_FILAS * 10):
+                        f.write(np.ascontiguousarray(datos[i:i + LOTE_FILAS * 10][vigente[i:i + LOTE_FILAS * 10]])
+                                .tobytes())
+                del datos
+            filas[tabla] = int(np.count_nonzero(vigente))
+        nueva = {**meta, 'generacion': generacion, 'filas': filas, 'muertas': {tabla: 0 for tabla in TABLAS}}
+        self._publicar(nueva, meta)
+        return nueva
+
+    # ══════════════════════════════════════════════════════════
+    # ACTUALIZACIÓN PERIÓDICA
+    # ══════════════════════════════════════════════════════════
+
+    def asegurar_actualizacion(self) -> None:
+        """
+        Arranca (una vez por proceso) el hilo que actualiza la instantánea cada
+        ``intervalo`` segundos. Con intervalo 0 sólo la genera si no existe.
+        """
+        if self.app is None or (not self.intervalo and self.disponible):
+            return
+        vivo = self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid()
+        if vivo:
+            return
+        with self._lock_hilo:
+            if self._hilo is None or not self._hilo.is_alive() or self._pid != os.getpid():
+                self._hilo = threading.Thread(target=self._bucle, name='cotiz-analitica', daemon=True)
+                self._pid = os.getpid()
+                self._hilo.start()
+
+    def _bucle(self) -> None:
+        while True:
+            try:
+                with self.app.app_context():
+                    self.actualizar()
+            except Exception:
+                logger.exception('No se pudo actualizar la instantánea analítica')
+            if not self.intervalo:
+                return
+            time.sleep(self.intervalo)
@@ -0,0 +1,334 @@
+"""
+Caché de resultados de consultas de listado, con expiración e invalidación
+por filtros.
+
+Cada entrada guarda, junto al valor, los filtros normalizados que la
+produjeron. Al escribir una cotización se invalidan sólo las entradas cuyos
+filtros coinciden con su estado anterior o nuevo; las demás siguen válidas.
+
+Cada invalidación o limpieza avanza la generación del backend. Un listado
+que se construyó mientras la generación cambiaba (una escritura a media
+consulta) se entrega pero no se guarda: podría ser anterior a la escritura.
+
+Backends:
+    - ``BackendMemoria``: LRU con TTL en el proceso (default). Con un archivo
+      de marca, las escrituras de otros procesos (workers, comandos ``flask``)
+      la vacían completa.
+    - ``BackendSQLite``: archivo SQLite compartido, para que varios workers
+      compartan aciertos e invalidaciones.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from src.services.metricas import metricas
+
+
+metricas.describir('cotiz_cache_consultas_total', 'counter',
+                   'Consultas a la caché de resultados por caché y resultado (acierto/fallo)')
+metricas.describir('cotiz_cache_invalidaciones_total', 'counter',
+                   'Entradas de la caché de resultados invalidadas por escrituras')
+
+Predicado = Callable[[Dict[str, Any]], bool]
+
+
+def marca_para(clave: str) -> str:
+    """Archivo de marca compartido derivado de ``clave`` (p. ej. la URL de la base)."""
+    return os.path.join(tempfile.gettempdir(), f'cotiz-cache-{hashlib.sha1(clave.encode()).hexdigest()[:10]}')
+
+
+class BackendMemoria:
+    """
+    LRU acotado con TTL, local al proceso.
+
+    Con ``marca`` (ruta de un archivo), cada invalidación o limpieza también
+    cambia la fecha de modificación del archivo; los demás procesos la revisan
+    en cada ``obtener`` (un ``stat``) y, si cambió, vacían su caché: no saben
+    qué filtros tocó el otro proceso.
+    """
+
+    def __init__(self, max_entradas: int = 256, ttl: float = 300, marca: Optional[str] = None):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.marca = marca
+        # clave -> (expira, filtros, valor)
+        self._entradas: 'OrderedDict[str, Tuple[float, Dict[str, Any], Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._vista = self._version()
+        self._generacion = 0
+
+    def _version(self) -> int:
+        if self.marca is None:
+            return 0
+        try:
+            return os.stat(self.marca).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _revisar_marca(self) -> None:
+        """Vacía la caché si otro proceso escribió desde la última revisión (con el lock tomado)."""
+        version = self._version()
+        if version != self._vista:
+            self._entradas.clear()
+            self._vista = version
+            self._generacion += 1
+
+    def _avisar(self) -> None:
+        """Marca una escritura de este proceso para los demás (con el lock tomado)."""
+        if self.marca is None:
+            return
+        self._revisar_marca()  # lo que otro escribió antes que nosotros
+        ahora = time.time_ns()
+        try:
+            with open(self.marca, 'a'):
+                pass
+            os.utime(self.marca, ns=(ahora, ahora))
+        except OSError:
+            return  # sin marca: sólo se invalida este proceso (y el TTL acota el resto)
+        self._vista = ahora
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        with self._lock:
+            self._revisar_marca()
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada[2]
+
+    def generacion(self) -> int:
+        with self._lock:
+            self._revisar_marca()
+            return self._generacion
+
+    def guardar(self, clave: str, filtros: Dict[str, Any], valor: Any,
+                generacion: Optional[int] = None) -> None:
+        """Guarda el valor; con ``generacion``, sólo si nadie invalidó desde entonces."""
+        with self._lock:
+            self._revisar_marca()
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._entradas[clave] = (time.monotonic() + self.ttl, filtros, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, predicado: Predicado) -> int:
+        with self._lock:
+            self._avisar()
+            self._generacion += 1
+            claves = [c for c, (_, filtros, _) in self._entradas.items() if predicado(filtros)]
+            for clave in claves:
+                del self._entradas[clave]
+            return len(claves)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._avisar()
+            self._generacion += 1
+            self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+class BackendSQLite:
+    """
+    Entradas en una tabla SQLite (modo WAL). Los valores se guardan con
+    pickle: el archivo es local y sólo lo escribe la propia aplicación.
+    """
+
+    def __init__(self, ruta: str, max_entradas: int = 256, ttl: float = 300):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._local = threading.local()
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        with self._conexion() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entrada ('
+                ' clave TEXT PRIMARY KEY, filtros TEXT NOT NULL, valor BLOB NOT NULL,'
+                ' expira REAL NOT NULL, uso REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS generacion (id INTEGER PRIMARY KEY, valor INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO generacion (id, valor) VALUES (1, 0)')
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        conn = self._conexion()
+        ahora = time.time()
+        fila = conn.execute('SELECT valor FROM entrada WHERE clave = ? AND expira >= ?',
+                            (clave, ahora)).fetchone()
+        if fila is None:
+            return None
+        conn.execute('UPDATE entrada SET uso = ? WHERE clave = ?', (ahora, clave))
+        return pickle.loads(fila[0])
+
+    def generacion(self) -> int:
+        return self._conexion().execute('SELECT valor FROM generacion WHERE id = 1').fetchone()[0]
+
+    @staticmethod
+    def _avanzar(conn: sqlite3.Connection) -> None:
+        conn.execute('UPDATE generacion SET valor = valor + 1 WHERE id = 1')
+
+    def guardar(self, clave: str, filtros: Dict[str, Any], valor: Any,
+                generacion: Optional[int] = None) -> None:
+        """Guarda el valor; con ``generacion``, sólo si ningún proceso invalidó desde entonces."""
+        conn = self._conexion()
+        ahora = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            actual = conn.execute('SELECT valor FROM generacion WHERE id = 1').fetchone()[0]
+            if generacion is not None and generacion != actual:
+                return
+            conn.execute(
+                'INSERT OR REPLACE INTO entrada (clave, filtros, valor, expira, uso) VALUES (?, ?, ?, ?, ?)',
+                (clave, json.dumps(filtros), pickle.dumps(valor, pickle.HIGHEST_PROTOCOL),
+                 ahora + self.ttl, ahora),
+            )
+            conn.execute('DELETE FROM entrada WHERE expira < ?', (ahora,))
+            conn.execute(
+                'DELETE FROM entrada WHERE clave IN ('
+                ' SELECT clave FROM entrada ORDER BY uso DESC LIMIT -1 OFFSET ?)',
+                (self.max_entradas,),
+            )
+
+    def invalidar(self, predicado: Predicado) -> int:
+        conn = self._conexion()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._avanzar(conn)
+            claves = [(clave,) for clave, filtros in conn.execute('SELECT clave, filtros FROM entrada')
+                      if predicado(json.loads(filtros))]
+            conn.executemany('DELETE FROM entrada WHERE clave = ?', claves)
+        return len(claves)
+
+    def limpiar(self) -> None:
+        conn = self._conexion()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._avanzar(conn)
+            conn.execute('DELETE FROM entrada')
+
+    def __len__(self) -> int:
+        return self._conexion().execute('SELECT COUNT(*) FROM entrada').fetchone()[0]
+
+
+def crear_backend(destino: str, max_entradas: int = 256, ttl: float = 300, marca: Optional[str] = None):
+    """
+    Backend según la configuración: ``memoria``, ``sqlite:///ruta.db`` o
+    ``off``/``0`` (sin caché, devuelve None). ``marca`` sólo aplica a
+    ``memoria`` (ver ``BackendMemoria``).
+    """
+    destino = (destino or 'memoria').strip()
+    if destino.lower() in ('off', '0', 'no', 'ninguno'):
+        return None
+    if destino.startswith('sqlite:///'):
+        return BackendSQLite(destino[len('sqlite:///'):], max_entradas, ttl)
+    if destino == 'memoria':
+        return BackendMemoria(max_entradas, ttl, marca)
+    raise ValueError(f'Backend de caché desconocido: {destino}')
+
+
+def filtros_coinciden(filtros: Dict[str, Any], estado: Dict[str, Any]) -> bool:
+    """
+    ¿El estado de una cotización (cliente_id, estatus, fecha ISO) entra en un
+    listado con estos filtros? Mismas reglas que ``dto.aplicar_filtros``.
+    """
+    if 'cliente_id' in filtros and str(estado.get('cliente_id')) != filtros['cliente_id']:
+        return False
+    if 'estatus' in filtros and estado.get('estatus') != filtros['estatus']:
+        return False
+    fecha = estado.get('fecha') or ''
+    if 'fecha_desde' in filtros and fecha < filtros['fecha_desde']:
+        return False
+    if 'fecha_hasta' in filtros and fecha > filtros['fecha_hasta']:
+        return False
+    return True
+
+
+class CacheConsultas:
+    """Caché de resultados con contadores de aciertos y fallos."""
+
+    def __init__(self, nombre: str, backend: Any = None):
+        self.nombre = nombre
+        self.backend = backend
+        self.aciertos = 0
+        self.fallos = 0
+
+    def configurar(self, backend: Any) -> None:
+        self.backend = backend
+        self.aciertos = self.fallos = 0
+
+    @staticmethod
+    def clave(filtros: Dict[str, Any]) -> str:
+        return json.dumps(filtros, sort_keys=True, ensure_ascii=False)
+
+    def obtener(self, filtros: Dict[str, Any], construir: Callable[[], Any]) -> Any:
+        """Valor en caché para ``filtros`` (ya normalizados), o ``construir()``."""
+        if self.backend is None:
+            return construir()
+        clave = self.clave(filtros)
+        valor = self.backend.obtener(clave)
+        if valor is not None:
+            self.aciertos += 1
+            metricas.incrementar('cotiz_cache_consultas_total', 1, {'cache': self.nombre, 'resultado': 'acierto'})
+            return valor
+        self.fallos += 1
+        metricas.incrementar('cotiz_cache_consultas_total', 1, {'cache': self.nombre, 'resultado': 'fallo'})
+        # Leída antes de consultar: si una escritura invalida mientras tanto, no se guarda
+        generacion = self.backend.generacion()
+        valor = construir()
+        self.backend.guardar(clave, filtros, valor, generacion)
+        return valor
+
+    def invalidar_estados(self, estados: Iterable[Optional[Dict[str, Any]]]) -> int:
+        """Invalida las entradas cuyos filtros coinciden con alguno de los estados."""
+        if self.backend is None:
+            return 0
+        estados = [e for e in estados if e]
+        if not estados:
+            return 0
+        invalidadas = self.backend.invalidar(
+            lambda filtros: any(filtros_coinciden(filtros, e) for e in estados))
+        if invalidadas:
+            metricas.incrementar('cotiz_cache_invalidaciones_total', invalidadas, {'cache': self.nombre})
+        return invalidadas
+
+    def limpiar(self) -> None:
+        if self.backend is not None:
+            self.backend.limpiar()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de este proceso y tamaño actual del backend."""
+        consultas = self.aciertos + self.fallos
+        return {
+            'backend': type(self.backend).__name__ if self.backend is not None else None,
+            'entradas': len(self.backend) if self.backend is not None else 0,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+        }
+
+
+# Listados de cotizaciones (CotizacionController.obtener_todas)
+cache_listados = CacheConsultas('listados', BackendMemoria())
@@ -0,0 +1,199 @@
+"""
+Feed de cambios para sincronización incremental.
+
+Cada recurso (cotizaciones, líneas, clientes) se recorre por ``updated_at``
+indexado con paginación por llave (``updated_at``, ``id``); los borrados se
+leen de la tabla ``eliminacion``. El cursor que devuelve cada página guarda la
+posición en ambos recorridos y sirve para pedir sólo lo que cambió después.
+Quien consume una página aplica primero los eliminados y después los cambios.
+
+Las filas modificadas en los últimos ``MARGEN`` segundos se dejan para la
+siguiente consulta: una transacción que todavía no confirma puede haber
+tomado su ``updated_at`` antes que otra que ya es visible.
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, insert, literal, null, or_, select
+from sqlalchemy.sql import ColumnElement
+from sqlalchemy.sql.schema import Table
+
+from src.models.models import db, Cliente, Cotizacion, DetalleCotizacion, eliminacion
+
+
+MARGEN = timedelta(seconds=2)
+
+RECURSOS: Dict[str, Table] = {
+    'cotizaciones': Cotizacion.__table__,
+    'detalles': DetalleCotizacion.__table__,
+    'clientes': Cliente.__table__,
+}
+
+Posicion = Optional[Tuple[datetime, int]]
+
+
+class CursorInvalido(ValueError):
+    """El cursor no se pudo decodificar (alterado o de otro recurso)."""
+
+
+class PaginaCambios(NamedTuple):
+    cambios: List[Dict[str, Any]]
+    eliminados: List[Dict[str, Any]]
+    cursor: str
+    hay_mas: bool
+    inicio: Optional[datetime]  # desde cuándo se leyeron borrados (None: sincronización completa)
+
+
+# ══════════════════════════════════════════════════════════
+# REGISTRO DE BORRADOS
+# ══════════════════════════════════════════════════════════
+
+def registrar_eliminaciones(tabla: Table, condicion: ColumnElement, motivo: str = 'eliminada') -> None:
+    """
+    Registra como eliminadas las filas de ``tabla`` que cumplen ``condicion``,
+    con un solo INSERT ... SELECT. Debe ejecutarse antes del DELETE, en la
+    misma transacción.
+    """
+    cotizacion_id = tabla.c.cotizacion_id if 'cotizacion_id' in tabla.c else null()
+    db.session.execute(insert(eliminacion).from_select(
+        ['tabla', 'registro_id', 'cotizacion_id', 'motivo', 'eliminado_at'],
+        select(literal(tabla.name), tabla.c.id, cotizacion_id, literal(motivo),
+               literal(datetime.utcnow(), eliminacion.c.eliminado_at.type))
+        .where(condicion)
+    ))
+
+
+def registrar_eliminacion_cotizaciones(ids: Any, motivo: str = 'eliminada') -> None:
+    """Registra las cotizaciones ``ids`` (lista o subconsulta) y todas sus líneas."""
+    cot, det = Cotizacion.__table__, DetalleCotizacion.__table__
+    registrar_eliminaciones(det, det.c.cotizacion_id.in_(ids), motivo)
+    registrar_eliminaciones(cot, cot.c.id.in_(ids), motivo)
+
+
+def depurar_eliminaciones(dias: int) -> int:
+    """Borra los registros de eliminación de hace más de ``dias`` días."""
+    limite = datetime.utcnow() - timedelta(days=dias)
+    resultado = db.session.execute(eliminacion.delete().where(eliminacion.c.eliminado_at < limite))
+    db.session.commit()
+    return resultado.rowcount
+
+
+# ══════════════════════════════════════════════════════════
+# LECTURA DEL FEED
+# ══════════════════════════════════════════════════════════
+
+def _a_utc(fecha: datetime) -> datetime:
+    """Las columnas guardan UTC sin zona; una fecha con zona se convierte."""
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def _posicion_texto(posicion: Posicion) -> Optional[list]:
+    return [posicion[0].isoformat(), posicion[1]] if posicion else None
+
+
+def _posicion_desde_texto(valor: Any) -> Posicion:
+    if valor is None:
+        return None
+    return datetime.fromisoformat(valor[0]), int(valor[1])
+
+
+def codificar_cursor(recurso: str, cambios: Posicion, eliminados: Posicion) -> str:
+    crudo = json.dumps({'r': recurso, 'c': _posicion_texto(cambios), 'e': _posicion_texto(eliminados)},
+                       separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(recurso: str, cursor: str) -> Tuple[Posicion, Posicion]:
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        datos = json.loads(crudo)
+        if datos['r'] != recurso:
+            raise CursorInvalido(f'El cursor es de otro recurso ({datos["r"]})')
+        return _posicion_desde_texto(datos['c']), _posicion_desde_texto(datos['e'])
+    except CursorInvalido:
+        raise
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        raise CursorInvalido('Cursor inválido') from e
+
+
+def _despues_de(columna_fecha: Any, columna_id: Any, posicion: Posicion) -> Any:
+    """(fecha, id) > posicion, escrito para que use el índice sobre la fecha"""
+    fecha, id_ = posicion
+    return or_(columna_fecha > fecha, and_(columna_fecha == fecha, columna_id > id_))
+
+
+def leer_cambios(recurso: str,
+                 desde: Optional[datetime] = None,
+                 cursor: Optional[str] = None,
+                 limite: int = 500) -> PaginaCambios:
+    """
+    Filas de ``recurso`` modificadas y eliminadas después de ``desde`` (o de la
+    posición de ``cursor``), hasta ``limite`` de cada tipo.
+
+    Sin ``desde`` ni ``cursor`` es una sincronización completa: devuelve todas
+    las filas vigentes y ningún borrado.
+    """
+    tabla = RECURSOS[recurso]
+    hasta = datetime.utcnow() - MARGEN
+
+    if cursor:
+        pos_cambios, pos_eliminados = decodificar_cursor(recurso, cursor)
+    elif desde is not None:
+        desde = _a_utc(desde)
+        pos_cambios = pos_eliminados = (desde, 0)
+    else:
+        # Los borrados anteriores a esta primera lectura no le interesan al cliente
+        pos_cambios, pos_eliminados = None, (hasta, 0)
+    inicio = pos_eliminados[0] if cursor or desde is not None else None
+
+    consulta = select(tabla).where(tabla.c.updated_at <= hasta)
+    if pos_cambios:
+        consulta = consulta.where(_despues_de(tabla.c.updated_at, tabla.c.id, pos_cambios))
+    filas = db.session.execute(
+        consulta.order_by(tabla.c.updated_at, tabla.c.id).limit(limite + 1)
+    ).mappings().all()
+
+    borrados = db.session.execute(
+        select(eliminacion.c.id, eliminacion.c.registro_id, eliminacion.c.cotizacion_id,
+               eliminacion.c.motivo, eliminacion.c.eliminado_at)
+        .where(eliminacion.c.tabla == tabla.name, eliminacion.c.eliminado_at <= hasta,
+               _despues_de(eliminacion.c.eliminado_at, eliminacion.c.id, pos_eliminados))
+        .order_by(eliminacion.c.eliminado_at, eliminacion.c.id)
+        .limit(limite + 1)
+    ).all()
+
+    # Si alguno de los dos recorridos no cupo, ambos se cortan en la misma fecha:
+    # un borrado nunca llega en una página posterior a un cambio más reciente
+    # (SQLite puede reutilizar el id de una fila borrada)
+    hay_mas = len(filas) > limite or len(borrados) > limite
+    corte = hasta
+    if len(filas) > limite:
+        corte = min(corte, filas[limite - 1]['updated_at'])
+    if len(borrados) > limite:
+        corte = min(corte, borrados[limite - 1].eliminado_at)
+    filas = [f for f in filas[:limite] if f['updated_at'] <= corte]
+    borrados = [b for b in borrados[:limite] if b.eliminado_at <= corte]
+    if filas:
+        pos_cambios = (filas[-1]['updated_at'], filas[-1]['id'])
+    if borrados:
+        pos_eliminados = (borrados[-1].eliminado_at, borrados[-1].id)
+    if not hay_mas:
+        # Todo lo anterior a ``hasta`` ya se entregó: la siguiente lectura parte de ahí
+        pos_cambios = max(pos_cambios or (hasta, 0), (hasta, 0))
+        pos_eliminados = max(pos_eliminados, (hasta, 0))
+
+    return PaginaCambios(
+        cambios=[dict(f) for f in filas],
+        eliminados=[
+            {'id': b.registro_id, 'cotizacion_id': b.cotizacion_id, 'motivo': b.motivo,
+             'eliminado_at': b.eliminado_at}
+            for b in borrados
+        ],
+        cursor=codificar_cursor(recurso, pos_cambios, pos_eliminados),
+        hay_mas=hay_mas,
+        inicio=inicio,
+    )
@@ -0,0 +1,88 @@
+"""
+Catálogo en memoria de clientes (id + nombre) para los selectores.
+
+La instantánea se reconstruye sólo cuando los clientes cambian: lo detecta
+una huella barata de la tabla (conteo, id máximo y última modificación), así
+que también ve los cambios hechos por otros procesos. Los nombres se guardan
+normalizados y ordenados para filtrar por prefijo con búsqueda binaria.
+"""
+import hashlib
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from src.models.models import db, Cliente
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin acentos: 'Núñez' y 'nunez' comparan igual."""
+    descompuesto = unicodedata.normalize('NFKD', texto.casefold())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).strip()
+
+
+class Instantanea(NamedTuple):
+    version: str
+    claves: Tuple[str, ...]          # nombres normalizados, ordenados
+    opciones: Tuple[Dict[str, Any], ...]  # {'id', 'nombre'} en el mismo orden
+
+
+class CatalogoClientes:
+
+    def __init__(self):
+        # (huella, instantánea): se reemplaza completo, nunca se modifica
+        self._estado: Optional[Tuple[tuple, Instantanea]] = None
+        self._lock = threading.Lock()
+
+    def invalidar(self) -> None:
+        """Fuerza la reconstrucción en la siguiente consulta."""
+        self._estado = None
+
+    def _huella_actual(self) -> tuple:
+        fila = db.session.execute(
+            select(func.count(Cliente.id), func.max(Cliente.id), func.max(Cliente.updated_at))
+        ).one()
+        return tuple(fila)
+
+    def instantanea(self) -> Instantanea:
+        huella = self._huella_actual()
+        estado = self._estado
+        if estado is not None and estado[0] == huella:
+            return estado[1]
+        with self._lock:
+            estado = self._estado
+            if estado is not None and estado[0] == huella:
+                return estado[1]
+            filas = db.session.execute(select(Cliente.id, Cliente.nombre)).all()
+            ordenadas = sorted((normalizar(nombre or ''), id_, nombre) for id_, nombre in filas)
+            instantanea = Instantanea(
+                hashlib.sha1(repr(huella).encode()).hexdigest()[:16],
+                tuple(f[0] for f in ordenadas),
+                tuple({'id': f[1], 'nombre': f[2]} for f in ordenadas),
+            )
+            self._estado = (huella, instantanea)
+            return instantanea
+
+    def buscar(self, prefijo: str = '', limite: int = 1000) -> Tuple[str, List[Dict[str, Any]], bool]:
+        """
+        Opciones cuyo nombre empieza con ``prefijo`` (sin distinguir acentos ni
+        mayúsculas), en orden alfabético.
+
+        Returns:
+            (version, opciones, truncado)
+        """
+        inst = self.instantanea()
+        clave = normalizar(prefijo)
+        inicio = bisect_left(inst.claves, clave) if clave else 0
+        opciones: List[Dict[str, Any]] = []
+        i = inicio
+        while i < len(inst.claves) and len(opciones) < limite and inst.claves[i].startswith(clave):
+            opciones.append(inst.opciones[i])
+            i += 1
+        truncado = i < len(inst.claves) and inst.claves[i].startswith(clave)
+        return inst.version, opciones, truncado
+
+
+catalogo_clientes = CatalogoClientes()
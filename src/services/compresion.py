@@ -0,0 +1,186 @@
+"""
+Compresión negociada (brotli/gzip) de las respuestas.
+
+``Compresion.init_app`` registra un ``after_request`` que comprime las
+respuestas de tipos comprimibles a partir de un tamaño mínimo, y las
+respuestas en streaming (generadores) trozo a trozo. Los archivos exportados
+se envían con ``enviar_archivo``, que guarda la variante comprimida junto al
+original (``.br`` / ``.gz``) para comprimir cada archivo una sola vez.
+"""
+import gzip
+import os
+import tempfile
+import zlib
+from typing import Any, Iterable, Iterator, Optional
+
+from flask import Flask, Response, current_app, request, send_file
+
+try:  # brotli es opcional: sin él sólo se ofrece gzip
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None  # type: ignore
+
+
+# Prefijos de Content-Type que vale la pena comprimir. XLSX, imágenes y demás
+# formatos ya comprimidos quedan fuera.
+TIPOS_COMPRIMIBLES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/pdf',
+    'image/svg+xml',
+)
+
+EXTENSIONES = {'br': '.br', 'gzip': '.gz'}
+
+
+def codificaciones_disponibles() -> tuple:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negociar(accept_encoding: Any) -> Optional[str]:
+    """Mejor codificación aceptada por el cliente (``request.accept_encodings``), o None."""
+    mejor, calidad_mejor = None, 0.0
+    for codificacion in codificaciones_disponibles():
+        calidad = accept_encoding.quality(codificacion)
+        if calidad > calidad_mejor:
+            mejor, calidad_mejor = codificacion, calidad
+    return mejor
+
+
+def es_comprimible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and mimetype.startswith(TIPOS_COMPRIMIBLES)
+
+
+def comprimir(datos: bytes, codificacion: str, nivel_gzip: int = 6, calidad_br: int = 4) -> bytes:
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=calidad_br)
+    return gzip.compress(datos, compresslevel=nivel_gzip, mtime=0)
+
+
+def comprimir_stream(trozos: Iterable[bytes], codificacion: str,
+                     nivel_gzip: int = 6, calidad_br: int = 4) -> Iterator[bytes]:
+    """
+    Comprime un iterable de trozos sin acumularlo. Cada trozo se vacía al
+    cliente en cuanto llega (SYNC_FLUSH), así los eventos en vivo no se quedan
+    esperando en el buffer del compresor.
+    """
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=calidad_br)
+        for trozo in trozos:
+            salida = compresor.process(trozo) + compresor.flush()
+            if salida:
+                yield salida
+        yield compresor.finish()
+        return
+
+    compresor = zlib.compressobj(nivel_gzip, zlib.DEFLATED, 31)  # 31: cabecera gzip
+    for trozo in trozos:
+        salida = compresor.compress(trozo) + compresor.flush(zlib.Z_SYNC_FLUSH)
+        if salida:
+            yield salida
+    yield compresor.flush()
+
+
+def _marcar(response: Response, codificacion: str) -> None:
+    response.headers['Content-Encoding'] = codificacion
+    response.vary.add('Accept-Encoding')
+
+
+def _marcar_dinamica(response: Response, codificacion: str) -> None:
+    _marcar(response, codificacion)
+    # El cuerpo ya no es byte a byte el original
+    etag, debil = response.get_etag()
+    if etag and not debil:
+        response.set_etag(etag, weak=True)
+
+
+class Compresion:
+    """Compresión de respuestas configurada desde ``app.config``:
+
+    - ``COMPRESION``: activa/desactiva (default True).
+    - ``COMPRESION_MIN_BYTES``: tamaño mínimo a comprimir (default 1024).
+    - ``COMPRESION_NIVEL_GZIP`` / ``COMPRESION_CALIDAD_BR``: para respuestas
+      dinámicas; los archivos guardados usan la compresión máxima.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.app = app
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('COMPRESION', True)
+        app.config.setdefault('COMPRESION_MIN_BYTES', 1024)
+        app.config.setdefault('COMPRESION_NIVEL_GZIP', 6)
+        app.config.setdefault('COMPRESION_CALIDAD_BR', 4)
+        app.extensions['compresion'] = self
+        app.after_request(self._despues)
+
+    def _despues(self, response: Response) -> Response:
+        config = current_app.config
+        if not config['COMPRESION']:
+            return response
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough  # archivos: ver enviar_archivo
+                or not es_comprimible(response.mimetype)):
+            return response
+        codificacion = negociar(request.accept_encodings)
+        if codificacion is None:
+            return response
+
+        nivel, calidad = config['COMPRESION_NIVEL_GZIP'], config['COMPRESION_CALIDAD_BR']
+        if response.is_streamed:
+            response.response = comprimir_stream(response.iter_encoded(), codificacion, nivel, calidad)
+            response.headers.pop('Content-Length', None)
+        else:
+            datos = response.get_data()
+            if len(datos) < config['COMPRESION_MIN_BYTES']:
+                return response
+            response.set_data(comprimir(datos, codificacion, nivel, calidad))
+        _marcar_dinamica(response, codificacion)
+        return response
+
+
+def variante_comprimida(ruta: str, codificacion: str) -> str:
+    """
+    Ruta de la variante comprimida de ``ruta``, creándola (o rehaciéndola si el
+    original es más nuevo) con la compresión máxima.
+    """
+    destino = ruta + EXTENSIONES[codificacion]
+    try:
+        if os.path.getmtime(destino) >= os.path.getmtime(ruta):
+            return destino
+    except OSError:
+        pass
+    with open(ruta, 'rb') as f:
+        datos = comprimir(f.read(), codificacion, nivel_gzip=9, calidad_br=11)
+    # Nombre único aunque dos hilos del mismo proceso compriman el mismo archivo
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(datos)
+        os.replace(temporal, destino)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    return destino
+
+
+def enviar_archivo(ruta: str, mimetype: str, **kwargs: Any) -> Response:
+    """``send_file`` que sirve la variante comprimida si el cliente la acepta."""
+    codificacion = None
+    if current_app.config.get('COMPRESION', True) and es_comprimible(mimetype):
+        codificacion = negociar(request.accept_encodings)
+    if codificacion is None or os.path.getsize(ruta) < current_app.config.get('COMPRESION_MIN_BYTES', 1024):
+        return send_file(ruta, mimetype=mimetype, **kwargs)
+
+    # La variante tiene su propio ETag (tamaño y fecha distintos al original)
+    response = send_file(variante_comprimida(ruta, codificacion), mimetype=mimetype, **kwargs)
+    _marcar(response, codificacion)
+    return response
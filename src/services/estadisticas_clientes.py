@@ -0,0 +1,150 @@
+"""
+Estadísticas por cliente mantenidas de forma incremental.
+
+``cliente`` guarda, desnormalizados, el número de cotizaciones, el total de
+las aceptadas y la fecha de la última cotización (activas y archivadas), para
+que los listados de clientes los muestren y ordenen sin joins ni cargar
+``cliente.cotizaciones``.
+
+Los caminos de escritura de ``CotizacionController`` describen cada
+cotización que agregan o quitan con un ``Aporte`` y llaman a ``aplicar``
+dentro de su misma transacción: el número y el total se ajustan con
+``x = x + delta`` y la fecha sólo se recalcula (por índice) si se quitó una
+cotización que podía ser la última. Archivar no cambia nada. ``recalcular``
+rehace todo desde las cotizaciones (``flask recalcular-estadisticas-clientes``)
+para bases cargadas por fuera de la aplicación.
+
+Estas columnas no cambian ``cliente.updated_at``: son derivadas de las
+cotizaciones (que el feed de cambios ya reporta) y así el catálogo de
+opciones de clientes no se reconstruye con cada cotización.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import bindparam, case, func, select, union_all, update
+
+from src.models.models import db, Cliente, Cotizacion, cotizacion_archivo
+
+
+ACEPTADA = 'Aceptada'
+LOTE = 5000
+
+_cli = Cliente.__table__
+
+
+class Aporte(NamedTuple):
+    """Lo que una cotización suma a las estadísticas de su cliente."""
+    cliente_id: int
+    fecha: Optional[date]
+    estatus: Optional[str]
+    total: float
+
+    @classmethod
+    def de(cls, cotizacion: Any) -> 'Aporte':
+        """Desde un objeto ``Cotizacion`` o una fila con las mismas columnas."""
+        fecha = cotizacion.fecha
+        if isinstance(fecha, datetime):
+            fecha = fecha.date()  # los controladores asignan datetime a la columna Date
+        return cls(cotizacion.cliente_id, fecha, cotizacion.estatus, cotizacion.total or 0.0)
+
+
+def aplicar(quitar: Iterable[Aporte] = (), agregar: Iterable[Aporte] = ()) -> None:
+    """Ajusta las estadísticas de los clientes afectados en la transacción de la sesión."""
+    cambios: Dict[int, Dict[str, Any]] = defaultdict(lambda: {'n': 0, 'aceptado': 0.0, 'ultima': None})
+    quitadas: List[Aporte] = list(quitar)
+    for signo, aportes in ((-1, quitadas), (1, agregar)):
+        for aporte in aportes:
+            cambio = cambios[aporte.cliente_id]
+            cambio['n'] += signo
+            if aporte.estatus == ACEPTADA:
+                cambio['aceptado'] += signo * aporte.total
+            if signo > 0 and aporte.fecha is not None:
+                if cambio['ultima'] is None or aporte.fecha > cambio['ultima']:
+                    cambio['ultima'] = aporte.fecha
+    if not cambios:
+        return
+
+    ultima = bindparam('b_ultima', type_=_cli.c.ultima_cotizacion.type)
+    db.session.execute(
+        update(_cli).where(_cli.c.id == bindparam('b_id')).values(
+            num_cotizaciones=_cli.c.num_cotizaciones + bindparam('b_n'),
+            total_aceptado=_cli.c.total_aceptado + bindparam('b_aceptado'),
+            ultima_cotizacion=case(
+                (ultima.is_(None), _cli.c.ultima_cotizacion),
+                (_cli.c.ultima_cotizacion.is_(None), ultima),
+                (_cli.c.ultima_cotizacion < ultima, ultima),
+                else_=_cli.c.ultima_cotizacion,
+            ),
+            updated_at=_cli.c.updated_at,  # sin onupdate: ver el docstring del módulo
+        ),
+        [{'b_id': cliente_id, 'b_n': c['n'], 'b_aceptado': c['aceptado'], 'b_ultima': c['ultima']}
+         for cliente_id, c in cambios.items()]
+    )
+
+    # Quitar una cotización con la fecha más reciente del cliente obliga a buscar la nueva última
+    revisar = set()
+    for aporte in quitadas:
+        agregada = cambios[aporte.cliente_id]['ultima']
+        if aporte.fecha is not None and (agregada is None or agregada < aporte.fecha):
+            revisar.add(aporte.cliente_id)
+    if revisar:
+        _recalcular_ultima(revisar)
+
+
+def _cotizaciones_de(cliente_ids: Optional[Set[int]] = None) -> Any:
+    """Cotizaciones activas y archivadas (de ``cliente_ids`` si se indica) como subconsulta."""
+    partes = []
+    for tabla in (Cotizacion.__table__, cotizacion_archivo):
+        consulta = select(tabla.c.cliente_id, tabla.c.fecha, tabla.c.estatus, tabla.c.total)
+        if cliente_ids is not None:
+            consulta = consulta.where(tabla.c.cliente_id.in_(cliente_ids))
+        partes.append(consulta)
+    return union_all(*partes).subquery()
+
+
+def _recalcular_ultima(cliente_ids: Set[int]) -> None:
+    todas = _cotizaciones_de(cliente_ids)
+    ultimas = dict(db.session.execute(
+        select(todas.c.cliente_id, func.max(todas.c.fecha)).group_by(todas.c.cliente_id)
+    ).all())
+    db.session.execute(
+        update(_cli).where(_cli.c.id == bindparam('b_id'))
+        .values(ultima_cotizacion=bindparam('b_ultima'), updated_at=_cli.c.updated_at),
+        [{'b_id': cliente_id, 'b_ultima': ultimas.get(cliente_id)} for cliente_id in cliente_ids]
+    )
+
+
+def recalcular(cliente_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Rehace desde las cotizaciones las estadísticas de ``cliente_ids`` (o de
+    todos) con una sola agregación. No confirma la transacción.
+
+    Returns:
+        Número de clientes actualizados.
+    """
+    ids = set(cliente_ids) if cliente_ids is not None else None
+    todas = _cotizaciones_de(ids)
+    filas = db.session.execute(
+        select(
+            todas.c.cliente_id,
+            func.count(),
+            func.coalesce(func.sum(case((todas.c.estatus == ACEPTADA, todas.c.total), else_=0.0)), 0.0),
+            func.max(todas.c.fecha),
+        ).group_by(todas.c.cliente_id)
+    ).all()
+    agregados = {f[0]: f[1:] for f in filas}
+
+    objetivo = ids if ids is not None else set(db.session.execute(select(_cli.c.id)).scalars())
+    parametros = [
+        {'b_id': cliente_id, 'b_n': n, 'b_aceptado': aceptado, 'b_ultima': ultima}
+        for cliente_id in objetivo
+        for n, aceptado, ultima in [agregados.get(cliente_id, (0, 0.0, None))]
+    ]
+    sentencia = update(_cli).where(_cli.c.id == bindparam('b_id')).values(
+        num_cotizaciones=bindparam('b_n'), total_aceptado=bindparam('b_aceptado'),
+        ultima_cotizacion=bindparam('b_ultima'), updated_at=_cli.c.updated_at,
+    )
+    for i in range(0, len(parametros), LOTE):
+        db.session.execute(sentencia, parametros[i:i + LOTE])
+    return len(parametros)
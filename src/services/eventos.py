@@ -0,0 +1,270 @@
+"""
+Bus de eventos para avisar a las páginas abiertas de los cambios en cotizaciones.
+
+Los controladores publican eventos compactos (``cotizacion.creada``,
+``cotizacion.estatus``, ...) después de confirmar la transacción; cada
+conexión Server-Sent Events (``GET /api/eventos``) tiene su propia
+``Suscripcion`` con una cola acotada.
+
+Con varios procesos (p. ej. workers de gunicorn) cada uno abre un socket
+Unix de datagramas en un directorio común y reenvía lo que publica a los
+sockets de los demás, así un evento llega a todas las conexiones sin un
+broker externo. Donde no hay sockets Unix (Windows) el bus es local al proceso.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from src.services.metricas import metricas
+
+
+logger = logging.getLogger('cotiz.eventos')
+
+metricas.describir('cotiz_eventos_publicados_total', 'counter', 'Eventos publicados por tipo')
+metricas.describir('cotiz_eventos_suscriptores', 'gauge', 'Conexiones de eventos abiertas en el proceso')
+metricas.describir('cotiz_eventos_descartados_total', 'counter',
+                   'Suscripciones que se saturaron y recibieron "recargar"')
+metricas.describir('cotiz_eventos_rechazados_total', 'counter',
+                   'Conexiones de eventos rechazadas con 503 por el límite del proceso')
+
+TAM_MAX_DATAGRAMA = 64 * 1024
+
+
+class SuscripcionesAgotadas(Exception):
+    """El proceso ya tiene ``max_suscripciones`` conexiones de eventos abiertas."""
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión. Si se satura, se vacía y recibe ``recargar``."""
+
+    def __init__(self, bus: 'BusEventos', max_pendientes: int):
+        self._bus = bus
+        self._cola: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=max_pendientes)
+        self._lock = threading.Lock()
+
+    def entregar(self, evento: Dict[str, Any]) -> None:
+        with self._lock:
+            try:
+                self._cola.put_nowait(evento)
+                return
+            except queue.Full:
+                pass
+            # Cliente lento: en vez de acumular, que vuelva a cargar la lista
+            while True:
+                try:
+                    self._cola.get_nowait()
+                except queue.Empty:
+                    break
+            self._cola.put_nowait({'id': evento['id'], 'tipo': 'recargar'})
+        metricas.incrementar('cotiz_eventos_descartados_total')
+
+    def obtener(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Siguiente evento, o None si no llegó ninguno en ``timeout`` segundos."""
+        try:
+            return self._cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cerrar(self) -> None:
+        self._bus.cancelar(self)
+
+
+class BusEventos:
+
+    def __init__(self, max_historial: int = 200):
+        self.directorio: Optional[str] = None
+        self.max_suscripciones = 0  # 0 = sin límite
+        self._suscripciones: Set[Suscripcion] = set()
+        self._historial: deque = deque(maxlen=max_historial)
+        self._lock = threading.Lock()
+        self._secuencia = 0
+        self._pid: Optional[int] = None
+        self._socket: Optional[socket.socket] = None
+        self._emisor: Optional[socket.socket] = None  # no bloqueante: publicar nunca espera
+
+    # ══════════════════════════════════════════════════════════
+    # CONFIGURACIÓN Y SOCKET ENTRE PROCESOS
+    # ══════════════════════════════════════════════════════════
+
+    def configurar(self, directorio: Optional[str], max_suscripciones: int = 0) -> None:
+        """
+        Directorio de los sockets compartido por los workers, o None para un
+        bus local al proceso. El socket se abre al primer uso en cada proceso
+        (después del fork). ``max_suscripciones`` limita las conexiones
+        abiertas en el proceso (0: sin límite).
+        """
+        self.max_suscripciones = max(0, max_suscripciones)
+        self.cerrar_socket()
+        self.directorio = directorio if directorio and hasattr(socket, 'AF_UNIX') else None
+
+    @staticmethod
+    def directorio_para(clave: str) -> str:
+        """Directorio de sockets derivado de ``clave`` (p. ej. la URL de la base)."""
+        return os.path.join(tempfile.gettempdir(), f'cotiz-eventos-{hashlib.sha1(clave.encode()).hexdigest()[:10]}')
+
+    def _ruta_propia(self) -> str:
+        return os.path.join(self.directorio, f'{os.getpid()}.sock')
+
+    def _asegurar_socket(self) -> None:
+        if self.directorio is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Proceso nuevo (o hijo de un fork): socket e hilo propios
+            self._socket = None
+            self._pid = os.getpid()
+            try:
+                os.makedirs(self.directorio, mode=0o700, exist_ok=True)
+                ruta = self._ruta_propia()
+                if os.path.exists(ruta):
+                    os.unlink(ruta)
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                sock.bind(ruta)
+                emisor = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                emisor.setblocking(False)
+            except OSError as e:
+                logger.warning('Eventos sólo locales: no se pudo abrir el socket en %s (%s)', self.directorio, e)
+                return
+            self._socket, self._emisor = sock, emisor
+            threading.Thread(target=self._escuchar, args=(sock,), name='cotiz-eventos', daemon=True).start()
+
+    def _escuchar(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                datos = sock.recv(TAM_MAX_DATAGRAMA)
+            except OSError:
+                return  # socket cerrado
+            try:
+                self._difundir_local(json.loads(datos))
+            except ValueError:
+                logger.warning('Datagrama de eventos inválido descartado')
+
+    def _reenviar(self, datos: bytes) -> None:
+        """Envía el evento a los sockets de los demás procesos; borra los huérfanos."""
+        propia = self._ruta_propia()
+        for ruta in glob.glob(os.path.join(self.directorio, '*.sock')):
+            if ruta == propia:
+                continue
+            try:
+                self._emisor.sendto(datos, ruta)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(ruta)  # el proceso ya terminó
+                except OSError:
+                    pass
+            except OSError as e:
+                # Cola llena del receptor (BlockingIOError): ese proceso pierde el evento
+                logger.warning('No se pudo reenviar un evento a %s: %s', ruta, e)
+
+    def cerrar_socket(self) -> None:
+        sock, emisor = self._socket, self._emisor
+        self._socket = self._emisor = None
+        if sock is not None and self._pid == os.getpid():
+            try:
+                os.unlink(self._ruta_propia())
+            except OSError:
+                pass
+            sock.close()
+            emisor.close()
+        self._pid = None
+
+    # ══════════════════════════════════════════════════════════
+    # PUBLICAR Y SUSCRIBIR
+    # ══════════════════════════════════════════════════════════
+
+    def publicar(self, tipo: str, **datos: Any) -> Dict[str, Any]:
+        """Envía un evento a todas las suscripciones de todos los procesos."""
+        self._asegurar_socket()
+        with self._lock:
+            self._secuencia += 1
+            evento = {**datos, 'id': f'{int(time.time() * 1000)}-{os.getpid()}-{self._secuencia}', 'tipo': tipo}
+        metricas.incrementar('cotiz_eventos_publicados_total', 1, {'tipo': tipo})
+        self._difundir_local(evento)
+        if self._socket is not None:
+            datos_json = json.dumps(evento, default=str, separators=(',', ':')).encode()
+            if len(datos_json) <= TAM_MAX_DATAGRAMA:
+                self._reenviar(datos_json)
+            else:
+                self._reenviar(json.dumps({'id': evento['id'], 'tipo': 'recargar'}).encode())
+        return evento
+
+    def _difundir_local(self, evento: Dict[str, Any]) -> None:
+        with self._lock:
+            self._historial.append(evento)
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(evento)
+
+    def suscribir(self, max_pendientes: int = 100) -> Suscripcion:
+        """Abre una suscripción; lanza ``SuscripcionesAgotadas`` si el proceso está en el límite."""
+        self._asegurar_socket()
+        suscripcion = Suscripcion(self, max_pendientes)
+        with self._lock:
+            if self.max_suscripciones and len(self._suscripciones) >= self.max_suscripciones:
+                metricas.incrementar('cotiz_eventos_rechazados_total')
+                raise SuscripcionesAgotadas(
+                    f'Demasiadas conexiones de eventos abiertas ({self.max_suscripciones})'
+                )
+            self._suscripciones.add(suscripcion)
+            metricas.fijar('cotiz_eventos_suscriptores', len(self._suscripciones))
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion) -> None:
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+            metricas.fijar('cotiz_eventos_suscriptores', len(self._suscripciones))
+
+    def posteriores_a(self, ultimo_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Eventos recibidos después de ``ultimo_id`` (reconexión con
+        Last-Event-ID), o None si ya no está en el historial.
+        """
+        with self._lock:
+            historial = list(self._historial)
+        for i, evento in enumerate(historial):
+            if evento['id'] == ultimo_id:
+                return historial[i + 1:]
+        return None
+
+
+def formato_sse(evento: Dict[str, Any]) -> bytes:
+    """Un evento en formato text/event-stream (el tipo va en ``event:``)."""
+    datos = json.dumps(evento, default=str, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {datos}\n\n".encode('utf-8')
+
+
+def flujo_sse(bus: BusEventos, ultimo_id: Optional[str] = None,
+              latido: float = 15, reintento_ms: int = 3000,
+              suscripcion: Optional[Suscripcion] = None) -> Iterator[bytes]:
+    """
+    Cuerpo de la respuesta SSE. La suscripción (``suscripcion``, o una nueva
+    al empezar a enviar) se cierra cuando el cliente se va (el latido lo
+    detecta). Con ``ultimo_id`` (reconexión) primero se reenvía lo que se
+    perdió, o ``recargar`` si ya no está en el historial.
+    """
+    if suscripcion is None:
+        suscripcion = bus.suscribir()
+    try:
+        yield f'retry: {reintento_ms}\n\n'.encode()
+        if ultimo_id:
+            pendientes = bus.posteriores_a(ultimo_id)
+            for evento in pendientes if pendientes is not None else [{'id': ultimo_id, 'tipo': 'recargar'}]:
+                yield formato_sse(evento)
+        while True:
+            evento = suscripcion.obtener(timeout=latido)
+            yield formato_sse(evento) if evento is not None else b': latido\n\n'
+    finally:
+        suscripcion.cerrar()
+
+
+bus_eventos = BusEventos()
@@ -1,11 +1,18 @@
 import os
-from datetime import datetime
-from typing import Dict, Any, List
+from io import BytesIO
+from typing import Dict, Any, Optional, Sequence
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.worksheet.worksheet import Worksheet
 from openpyxl.drawing.image import Image as XlImage  # type: ignore
 
+from src.models.dto import (
+    CotizacionDTO, EmpresaDTO, LineaDTO, como_cotizacion_dto, como_empresa_dto
+)
+from src.services.imagenes import optimizador_imagenes
+from src.services.metricas import fase, medir
+from src.services.xlsx_directo import ProformaXML, fecha_proforma, filas_de_relleno
+
 
 class ExcelService:
     """
@@ -18,6 +25,15 @@ class ExcelService:
         C=42  (DESCRIPCIÓN)
         D=16  (P. UNITARIO)
         E=18  (TOTAL)
+
+    Motores:
+        - ``openpyxl``: arma el libro con el modelo de objetos de openpyxl.
+        - ``xml``: escribe las partes SpreadsheetML directamente
+          (``xlsx_directo.ProformaXML``); mismo resultado, más rápido y con
+          menos memoria en cotizaciones grandes.
+        - ``plantilla``: como ``xml``, pero el encabezado, la configuración de
+          página, los estilos y las imágenes se serializan una vez por empresa
+          y se reutilizan; cada cotización sólo escribe sus filas.
     """
 
     # ── Colores corporativos ──
@@ -32,14 +48,37 @@ class ExcelService:
     # ── Ruta del logo ──
     LOGO_PATH = os.path.join('static', 'img', 'logormg.jpg')
 
-    def __init__(self, output_dir: str = 'exports/excel'):
+    # ── Iconos de los datos de la empresa ──
+    ICONS_DIR = os.path.join('static', 'img', 'icons')
+    ICONOS = {
+        'direccion': os.path.join(ICONS_DIR, 'icons8-location-pin-48.png'),
+        'telefono': os.path.join(ICONS_DIR, 'icons8-phone-48.png'),
+        'email': os.path.join(ICONS_DIR, 'icons8-email-48.png'),
+        'redes_sociales': os.path.join(ICONS_DIR, 'icons8-web-48.png'),
+        'rfc': os.path.join(ICONS_DIR, 'icons8-id-card-48.png'),
+    }
+
+    MOTORES = ('openpyxl', 'xml', 'plantilla')
+    # Subir al cambiar la hoja que produce este código (ver PDFService.VERSION_RENDER)
+    VERSION_RENDER = 1
+
+    def __init__(self, output_dir: str = 'exports/excel', motor: str = 'openpyxl'):
+        if motor not in self.MOTORES:
+            raise ValueError(f'Motor de Excel desconocido: {motor}')
         self.output_dir = output_dir
+        self.motor = motor
+        self.proforma_xml = ProformaXML(self.COL_WIDTHS.values(), self.LOGO_PATH, self.ICONOS)
         os.makedirs(self.output_dir, exist_ok=True)
 
+    def identidad(self, motor: Optional[str] = None) -> str:
+        """Versión, motor e imágenes, para la huella de los archivos exportados."""
+        return f'excel{self.VERSION_RENDER}-{motor or self.motor}-{optimizador_imagenes.identidad()}'
+
     # ══════════════════════════════════════════════════════════
     #  ESTILOS
     # ══════════════════════════════════════════════════════════
 
+    @fase('excel')
     def _crear_estilos(self) -> Dict[str, Any]:
         fill_azul = PatternFill(start_color=self.AZUL_CORP, end_color=self.AZUL_CORP, fill_type='solid')
         fill_gris = PatternFill(start_color=self.GRIS_CORP, end_color=self.GRIS_CORP, fill_type='solid')
@@ -93,6 +132,7 @@ class ExcelService:
     #  CONFIGURACIÓN DE HOJA
     # ══════════════════════════════════════════════════════════
 
+    @fase('excel')
     def _configurar_hoja(self, ws: Worksheet) -> None:
         ws.title = "Pro-Forma"
         for col_letter, width in self.COL_WIDTHS.items():
@@ -119,9 +159,10 @@ class ExcelService:
     #  ENCABEZADO: LOGO + PRO-FORMA + INFO EMPRESA + FECHA/N°
     # ══════════════════════════════════════════════════════════
 
+    @fase('excel')
     def _escribir_encabezado(
-        self, ws: Worksheet, empresa_data: Dict[str, Any],
-        cotizacion_data: Dict[str, Any], estilos: Dict[str, Any]
+        self, ws: Worksheet, empresa: EmpresaDTO,
+        cotizacion: CotizacionDTO, estilos: Dict[str, Any]
     ) -> int:
         """
         Rows 1-10 approximately:
@@ -140,7 +181,7 @@ class ExcelService:
 
         # ── Logo (anclado en A2 para que el espaciador lo centre verticalmente) ──
         if os.path.exists(self.LOGO_PATH):
-            img = XlImage(self.LOGO_PATH)
+            img = XlImage(optimizador_imagenes.ruta_pixeles(self.LOGO_PATH, 170, 72))
             img.width = 170
             img.height = 72
             ws.add_image(img, 'A2')
@@ -153,30 +194,21 @@ class ExcelService:
         cell_pf.alignment = Alignment(horizontal='right', vertical='center')
 
         # ── Company info lines (rows 5-9, cols A:C) con iconos PNG ──
-        ICONS_DIR = os.path.join('static', 'img', 'icons')
-        icon_map = {
-            'direccion': os.path.join(ICONS_DIR, 'icons8-location-pin-48.png'),
-            'telefono': os.path.join(ICONS_DIR, 'icons8-phone-48.png'),
-            'email': os.path.join(ICONS_DIR, 'icons8-email-48.png'),
-            'redes_sociales': os.path.join(ICONS_DIR, 'icons8-web-48.png'),
-            'rfc': os.path.join(ICONS_DIR, 'icons8-id-card-48.png'),
-        }
-
         campos = [
-            ('direccion', empresa_data.get('direccion', '')),
-            ('telefono', empresa_data.get('telefono', '')),
-            ('email', empresa_data.get('email', '')),
-            ('redes_sociales', empresa_data.get('redes_sociales', '')),
-            ('rfc', empresa_data.get('rfc', '')),
+            ('direccion', empresa.direccion),
+            ('telefono', empresa.telefono),
+            ('email', empresa.email),
+            ('redes_sociales', empresa.redes_sociales),
+            ('rfc', empresa.rfc),
         ]
 
         row = 5
         for campo, valor in campos:
             if valor:
                 # Icono PNG flotante en la celda A{row}
-                icon_path = icon_map.get(campo, '')
+                icon_path = self.ICONOS.get(campo, '')
                 if os.path.exists(icon_path):
-                    icon_img = XlImage(icon_path)
+                    icon_img = XlImage(optimizador_imagenes.ruta_pixeles(icon_path, 13, 13))
                     icon_img.width = 13
                     icon_img.height = 13
                     ws.add_image(icon_img, f'A{row}')
@@ -191,12 +223,7 @@ class ExcelService:
                 row += 1
 
         # ── Fecha / N° de Pro-forma boxes (D5:E6) ──
-        fecha_str = cotizacion_data.get('fecha', '')
-        try:
-            fecha_obj = datetime.strptime(str(fecha_str), '%Y-%m-%d')
-            fecha_fmt = fecha_obj.strftime('%d/%m/%Y')
-        except (ValueError, TypeError):
-            fecha_fmt = str(fecha_str) if fecha_str else datetime.now().strftime('%d/%m/%Y')
+        fecha_fmt = fecha_proforma(cotizacion.fecha)
 
         # Fecha label D5
         c_fl = ws.cell(row=5, column=4)
@@ -223,7 +250,7 @@ class ExcelService:
 
         # N° value E6
         c_nv = ws.cell(row=6, column=5)
-        c_nv.value = cotizacion_data.get('numero_cotizacion', '')  # type: ignore
+        c_nv.value = cotizacion.numero_cotizacion  # type: ignore
         c_nv.font = s['font_info_value']
         c_nv.alignment = s['align_center']
         c_nv.border = s['border_box']
@@ -241,6 +268,7 @@ class ExcelService:
     #  ENCABEZADO DE TABLA (fila azul)
     # ══════════════════════════════════════════════════════════
 
+    @fase('excel')
     def _escribir_encabezado_tabla(self, ws: Worksheet, row: int, estilos: Dict[str, Any]) -> int:
         s = estilos
         ws.row_dimensions[row].height = 24
@@ -265,8 +293,9 @@ class ExcelService:
     #  FILAS DE CONCEPTOS (con separadores de grupo/ciudad)
     # ══════════════════════════════════════════════════════════
 
+    @fase('excel')
     def _escribir_conceptos(
-        self, ws: Worksheet, start_row: int, detalles: List[Dict[str, Any]], estilos: Dict[str, Any]
+        self, ws: Worksheet, start_row: int, detalles: Sequence[LineaDTO], estilos: Dict[str, Any]
     ) -> int:
         s = estilos
         row = start_row
@@ -280,7 +309,7 @@ class ExcelService:
             return row
 
         for detalle in detalles:
-            grupo = detalle.get('grupo', '') or ''
+            grupo = detalle.grupo
 
             # Group separator row
             if grupo and grupo != current_grupo:
@@ -298,8 +327,8 @@ class ExcelService:
 
             # Data row
             ws.row_dimensions[row].height = 20
-            cantidad = detalle.get('cantidad', 0)
-            precio_unitario = detalle.get('precio_unitario', 0)
+            cantidad = detalle.cantidad
+            precio_unitario = detalle.precio_unitario
 
             # A: IVA = TOTAL × 1.16 (formula)
             c_iva = ws.cell(row=row, column=1)
@@ -318,7 +347,7 @@ class ExcelService:
 
             # C: DESCRIPCIÓN
             c_desc = ws.cell(row=row, column=3)
-            c_desc.value = detalle.get('descripcion', '')  # type: ignore
+            c_desc.value = detalle.descripcion  # type: ignore
             c_desc.font = s['font_data']
             c_desc.alignment = s['align_center']
             c_desc.border = s['border_thin']
@@ -342,12 +371,7 @@ class ExcelService:
             row += 1
 
         # Rellenar hasta mínimo 18 filas de tabla (se comprimirá con fitToPage si excede)
-        data_count = sum(1 for d in detalles if d.get('cantidad'))
-        group_count = len(set(d.get('grupo', '') for d in detalles if d.get('grupo', '')))
-        total_rows = data_count + group_count
-        min_rows = 18
-        filas_extra = max(0, min_rows - total_rows)
-        for _ in range(filas_extra):
+        for _ in range(filas_de_relleno(detalles)):
             self._fila_vacia(ws, row, s)
             row += 1
 
@@ -379,17 +403,18 @@ class ExcelService:
     #  BLOQUE DE TOTALES
     # ══════════════════════════════════════════════════════════
 
+    @fase('excel')
     def _escribir_totales(
         self, ws: Worksheet, row: int, data_start: int, data_end: int,
-        cotizacion_data: Dict[str, Any], estilos: Dict[str, Any]
+        cotizacion: CotizacionDTO, estilos: Dict[str, Any]
     ) -> int:
         s = estilos
         last = data_end - 1
 
         row += 1  # space row
 
-        descuento = cotizacion_data.get('descuento', 0) or 0
-        envio = cotizacion_data.get('envio_delivery', 0) or 0
+        descuento = cotizacion.descuento or 0
+        envio = cotizacion.envio_delivery or 0
 
         # Helper to write a totals row: label in C:D merged, value in E
         def _totals_row(r: int, label: str, formula_or_value: Any,
@@ -470,14 +495,15 @@ class ExcelService:
     #  TÉRMINOS Y CONDICIONES + PIE
     # ══════════════════════════════════════════════════════════
 
+    @fase('excel')
     def _escribir_terminos_y_pie(
-        self, ws: Worksheet, row: int, cotizacion_data: Dict[str, Any],
-        empresa_data: Dict[str, Any], estilos: Dict[str, Any]
+        self, ws: Worksheet, row: int, cotizacion: CotizacionDTO,
+        empresa: EmpresaDTO, estilos: Dict[str, Any]
     ) -> int:
         s = estilos
 
         # ── Términos y Condiciones (left side A:C) ──
-        notas = cotizacion_data.get('notas', '')
+        notas = cotizacion.notas
         if notas:
             ws.merge_cells(f'A{row}:C{row}')
             c_t = ws.cell(row=row, column=1)
@@ -501,7 +527,7 @@ class ExcelService:
         # ── Footer ──
         ws.merge_cells(f'A{row}:E{row}')
         c = ws.cell(row=row, column=1)
-        c.value = empresa_data.get('nombre', '')  # type: ignore
+        c.value = empresa.nombre  # type: ignore
         c.font = s['font_footer']
         c.alignment = Alignment(horizontal='center', vertical='center')
         row += 1
@@ -525,11 +551,31 @@ class ExcelService:
     #  MÉTODO PRINCIPAL
     # ══════════════════════════════════════════════════════════
 
-    def generar_cotizacion(self, cotizacion_data: Dict[str, Any], empresa_data: Dict[str, Any]) -> str:
-        numero = cotizacion_data.get('numero_cotizacion', 'SIN-NUMERO')
+    def generar_cotizacion(self, cotizacion: Any, empresa: Any, motor: Optional[str] = None) -> str:
+        """
+        Genera el Excel y devuelve su ruta.
+
+        Args:
+            cotizacion: CotizacionDTO (o dict estilo ``to_dict()``).
+            empresa: EmpresaDTO (o dict estilo ``to_dict()``).
+            motor: 'openpyxl', 'xml' o 'plantilla'; None usa el del servicio.
+        """
+        motor = motor or self.motor
+        if motor not in self.MOTORES:
+            raise ValueError(f'Motor de Excel desconocido: {motor}')
+        cotizacion = como_cotizacion_dto(cotizacion)
+        empresa = como_empresa_dto(empresa)
+        numero = cotizacion.numero_cotizacion or 'SIN-NUMERO'
         filename = f"{str(numero).replace('/', '-')}.xlsx"
         filepath = os.path.join(self.output_dir, filename)
 
+        if motor != 'openpyxl':
+            contenido = self.proforma_xml.generar(cotizacion, empresa, plantilla=motor == 'plantilla')
+            with medir('excel', 'escritura'):
+                with open(filepath, 'wb') as f:
+                    f.write(contenido)
+            return filepath
+
         wb = Workbook()
         ws: Worksheet = wb.active  # type: ignore
         estilos = self._crear_estilos()
@@ -538,25 +584,30 @@ class ExcelService:
         self._configurar_hoja(ws)
 
         # 2. Encabezado (logo, pro-forma, empresa, fecha/numero)
-        row = self._escribir_encabezado(ws, empresa_data, cotizacion_data, estilos)
+        row = self._escribir_encabezado(ws, empresa, cotizacion, estilos)
 
         # 3. Encabezado de tabla
         row = self._escribir_encabezado_tabla(ws, row, estilos)
 
         # 4. Conceptos
         data_start = row
-        detalles = cotizacion_data.get('detalles', [])
+        detalles = cotizacion.detalles
         row = self._escribir_conceptos(ws, row, detalles, estilos)
         data_end = row
 
         # 5. Totales
-        row = self._escribir_totales(ws, row, data_start, data_end, cotizacion_data, estilos)
+        row = self._escribir_totales(ws, row, data_start, data_end, cotizacion, estilos)
 
         # 6. Términos y pie
-        last_row = self._escribir_terminos_y_pie(ws, row, cotizacion_data, empresa_data, estilos)
+        last_row = self._escribir_terminos_y_pie(ws, row, cotizacion, empresa, estilos)
 
         # 7. Área de impresión para que solo se imprima el contenido real
         ws.print_area = f'A1:E{last_row}'  # type: ignore
 
-        wb.save(filepath)
+        with medir('excel', 'serializacion'):
+            buffer = BytesIO()
+            wb.save(buffer)
+        with medir('excel', 'escritura'):
+            with open(filepath, 'wb') as f:
+                f.write(buffer.getvalue())
         return filepath
@@ -0,0 +1,145 @@
+"""
+Archivos de exportación por versión, generados una sola vez.
+
+Cada PDF/Excel se guarda como ``{id}-{huella}.{ext}``, donde la huella
+resume todo lo que se imprime (cotización y empresa) y la configuración del
+servicio que lo dibuja (motor, umbrales, imágenes). Cuando varias
+peticiones piden a la vez la misma cotización (un enlace compartido), sólo
+una renderiza y las demás esperan y envían el mismo archivo:
+
+- dentro del proceso, las demás esperan un ``threading.Event`` del que
+  renderiza;
+- entre procesos (workers de gunicorn), quien renderiza tiene un candado de
+  archivo (``fcntl.flock``) por cotización y formato; al obtenerlo, un
+  segundo worker encuentra el archivo ya hecho.
+
+Los PDF por lote (``/api/cotizaciones/export/pdf``) usan la misma
+coordinación con su nombre (``lote-<filtros>``) en lugar del id.
+
+Donde no hay ``fcntl`` (Windows) la coordinación es sólo dentro del proceso.
+Al generar una versión nueva se borran las anteriores de la misma cotización
+(con sus variantes comprimidas), así que queda un archivo por cotización y
+formato, como antes.
+"""
+import glob
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Tuple, Union
+
+from src.services.compresion import EXTENSIONES as EXTENSIONES_COMPRIMIDAS
+from src.services.metricas import medir, metricas
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+logger = logging.getLogger('cotiz.exportaciones')
+
+metricas.describir('cotiz_exportaciones_total', 'counter',
+                   'Exportaciones por formato según de dónde salió el archivo (existente/generado/esperado)')
+
+EXTENSIONES = {'pdf': 'pdf', 'excel': 'xlsx'}
+
+# Id de la cotización, o nombre del lote
+Clave = Union[int, str]
+
+
+def huella_exportacion(cotizacion: Any, empresa: Any, render: str) -> str:
+    """
+    Resumen de todo lo que aparece en el documento (una cotización o las de
+    un lote) y de cómo se dibuja (``render``: la ``identidad()`` del
+    servicio, con su motor, umbrales e imágenes): si algo cambia, cambia la
+    huella.
+    """
+    datos = (tuple(cotizacion), tuple(empresa), render)
+    return hashlib.sha1(repr(datos).encode('utf-8')).hexdigest()[:20]
+
+
+class ArchivosExportacion:
+
+    def __init__(self, directorio: str = os.path.join('exports', 'versiones')):
+        self.directorio = directorio
+        self._en_curso: Dict[Tuple[Clave, str], threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def configurar(self, directorio: str) -> None:
+        self.directorio = directorio
+
+    def ruta(self, cotizacion_id: Clave, formato: str, huella: str) -> str:
+        return os.path.join(self.directorio, f'{cotizacion_id}-{huella}.{EXTENSIONES[formato]}')
+
+    def obtener_o_generar(self, cotizacion_id: Clave, formato: str, huella: str,
+                          generar: Callable[[], str]) -> Tuple[str, str]:
+        """
+        Ruta del archivo de esta versión y de dónde salió ('existente',
+        'generado' o 'esperado'). ``generar`` renderiza y devuelve la ruta
+        del archivo nuevo; sólo se llama si nadie más lo está haciendo.
+        """
+        ruta = self.ruta(cotizacion_id, formato, huella)
+        clave = (cotizacion_id, formato)
+        resultado = 'existente'
+        # La clave es por cotización (no por versión): dos versiones de la misma
+        # cotización tampoco se renderizan a la vez, porque el servicio escribe
+        # ambas en el mismo archivo de trabajo
+        while not os.path.exists(ruta):
+            with self._lock:
+                evento = self._en_curso.get(clave)
+                propio = evento is None
+                if propio:
+                    evento = self._en_curso[clave] = threading.Event()
+            if not propio:
+                with medir('exportacion', 'espera'):
+                    evento.wait()
+                resultado = 'esperado'
+                continue  # si era otra versión, ahora toca renderizar ésta
+            try:
+                resultado = self._generar_con_candado(cotizacion_id, formato, ruta, generar)
+            finally:
+                with self._lock:
+                    del self._en_curso[clave]
+                evento.set()
+            break
+        metricas.incrementar('cotiz_exportaciones_total', 1, {'formato': formato, 'resultado': resultado})
+        return ruta, resultado
+
+    def _generar_con_candado(self, cotizacion_id: Clave, formato: str, ruta: str,
+                             generar: Callable[[], str]) -> str:
+        os.makedirs(self.directorio, exist_ok=True)
+        candado = None
+        if fcntl is not None:
+            candado = open(os.path.join(self.directorio, f'.{cotizacion_id}-{formato}.lock'), 'a')
+            with medir('exportacion', 'espera'):
+                fcntl.flock(candado, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(ruta):
+                return 'esperado'  # lo generó otro worker mientras esperábamos el candado
+            os.replace(generar(), ruta)  # atómico: nunca se envía un archivo a medias
+            self._borrar_anteriores(cotizacion_id, formato, ruta)
+            return 'generado'
+        finally:
+            if candado is not None:
+                candado.close()  # cerrar libera el flock
+
+    def _borrar_anteriores(self, cotizacion_id: Clave, formato: str, vigente: str) -> None:
+        patron = os.path.join(glob.escape(self.directorio), f'{cotizacion_id}-*.{EXTENSIONES[formato]}')
+        for ruta in glob.glob(patron):
+            if ruta == vigente:
+                continue
+            # También las variantes comprimidas que dejó enviar_archivo (.br / .gz)
+            for archivo in [ruta] + [ruta + ext for ext in EXTENSIONES_COMPRIMIDAS.values()]:
+                try:
+                    os.remove(archivo)
+                except OSError:
+                    pass  # se está enviando (Windows) o ya no existe
+
+    def descartar(self, cotizacion_id: int) -> None:
+        """Borra los archivos de una cotización eliminada."""
+        for formato in EXTENSIONES:
+            self._borrar_anteriores(cotizacion_id, formato, '')
+
+
+archivos_exportacion = ArchivosExportacion()
@@ -0,0 +1,168 @@
+"""
+Variantes optimizadas del logo y los iconos que se incrustan en las exportaciones.
+
+Cada imagen se reduce a la resolución que de verdad se imprime (tamaño en
+puntos × ``dpi``, sin agrandar nunca) y se vuelve a codificar en su mismo
+formato (JPEG optimizado o PNG optimizado, sin metadatos). Las variantes se
+guardan en disco con un nombre derivado del contenido del archivo original y
+del tamaño pedido, así que las comparten los workers y sobreviven a un
+reinicio; dentro del proceso se memorizan por (ruta, mtime, tamaño) para no
+leer el original en cada exportación. Si la variante no resulta más chica que
+el original, se usa el original.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+from io import BytesIO
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from src.services.metricas import metricas
+
+
+logger = logging.getLogger('cotiz.imagenes')
+
+metricas.describir('cotiz_imagenes_variantes_total', 'counter',
+                   'Variantes de imagen pedidas por resultado (memoria/disco/creada/original)')
+
+PUNTOS_POR_PULGADA = 72
+# Píxeles de pantalla (Excel mide las imágenes en px a 96 dpi) a puntos
+PUNTOS_POR_PIXEL = 0.75
+CALIDAD_JPEG = 90
+
+_FORMATOS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG'}
+
+
+class Variante(NamedTuple):
+    ruta: str
+    bytes_original: int
+    bytes_variante: int
+
+
+class OptimizadorImagenes:
+
+    def __init__(self, directorio: str = os.path.join('exports', 'cache', 'imagenes'),
+                 dpi: int = 300, activo: bool = True):
+        self.directorio = directorio
+        self.dpi = dpi
+        self.activo = activo
+        self._memo: Dict[Tuple, Variante] = {}
+        self._lock = threading.Lock()
+
+    def identidad(self) -> str:
+        """Configuración que cambia las imágenes incrustadas (para las huellas de exportación)."""
+        return f'img{int(self.activo)}-{self.dpi}dpi' if self.activo else 'img0'
+
+    def configurar(self, directorio: Optional[str] = None, dpi: Optional[int] = None,
+                   activo: Optional[bool] = None) -> None:
+        if directorio is not None:
+            self.directorio = directorio
+        if dpi is not None:
+            self.dpi = dpi
+        if activo is not None:
+            self.activo = activo
+        with self._lock:
+            self._memo.clear()
+
+    def ruta(self, origen: str, ancho_pt: float, alto_pt: float) -> str:
+        """Ruta a incrustar para ``origen`` dibujada a ``ancho_pt`` × ``alto_pt`` puntos."""
+        return self.variante(origen, ancho_pt, alto_pt).ruta
+
+    def ruta_pixeles(self, origen: str, ancho_px: int, alto_px: int) -> str:
+        """Igual que ``ruta`` para una imagen de Excel, que se mide en píxeles."""
+        return self.ruta(origen, ancho_px * PUNTOS_POR_PIXEL, alto_px * PUNTOS_POR_PIXEL)
+
+    def variante(self, origen: str, ancho_pt: float, alto_pt: float) -> Variante:
+        if not self.activo:
+            return Variante(origen, 0, 0)
+        try:
+            st = os.stat(origen)
+        except OSError:
+            return Variante(origen, 0, 0)
+        objetivo = (math.ceil(ancho_pt / PUNTOS_POR_PULGADA * self.dpi),
+                    math.ceil(alto_pt / PUNTOS_POR_PULGADA * self.dpi))
+        memo = (origen, st.st_mtime_ns, st.st_size, objetivo)
+        variante = self._memo.get(memo)
+        if variante is not None and os.path.exists(variante.ruta):
+            metricas.incrementar('cotiz_imagenes_variantes_total', 1, {'resultado': 'memoria'})
+            return variante
+        variante = self._preparar(origen, st.st_size, objetivo)
+        with self._lock:
+            self._memo[memo] = variante
+        return variante
+
+    def _preparar(self, origen: str, bytes_original: int, objetivo: Tuple[int, int]) -> Variante:
+        from PIL import Image as PILImage
+
+        with open(origen, 'rb') as f:
+            datos = f.read()
+        extension = os.path.splitext(origen)[1].lower()
+        if extension not in _FORMATOS:
+            return Variante(origen, bytes_original, bytes_original)
+        try:
+            with PILImage.open(BytesIO(datos)) as imagen:  # sólo lee la cabecera
+                tamano = (min(imagen.width, objetivo[0]), min(imagen.height, objetivo[1]))
+        except OSError as e:
+            logger.warning('No se pudo leer %s (%s); se usa el original', origen, e)
+            return Variante(origen, bytes_original, bytes_original)
+
+        # El nombre depende del tamaño final: si no hay que reducir, todos los
+        # tamaños pedidos comparten la misma variante
+        huella = hashlib.sha1(datos + f'|{tamano[0]}x{tamano[1]}'.encode()).hexdigest()[:20]
+        destino = os.path.join(self.directorio, f'{huella}{extension}')
+        if os.path.exists(destino):
+            metricas.incrementar('cotiz_imagenes_variantes_total', 1, {'resultado': 'disco'})
+            return self._elegir(origen, destino, bytes_original)
+
+        try:
+            contenido = _reducir(datos, _FORMATOS[extension], tamano)
+        except (OSError, ValueError) as e:
+            logger.warning('No se pudo optimizar %s (%s); se usa el original', origen, e)
+            contenido = None
+        if contenido is None or len(contenido) >= bytes_original:
+            metricas.incrementar('cotiz_imagenes_variantes_total', 1, {'resultado': 'original'})
+            return Variante(origen, bytes_original, bytes_original)
+
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = f'{destino}.{os.getpid()}.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, destino)  # atómico: otro worker nunca ve un archivo a medias
+        metricas.incrementar('cotiz_imagenes_variantes_total', 1, {'resultado': 'creada'})
+        logger.info('Variante de %s a %dx%d px: %d -> %d bytes', origen, *tamano, bytes_original, len(contenido))
+        return Variante(destino, bytes_original, len(contenido))
+
+    @staticmethod
+    def _elegir(origen: str, destino: str, bytes_original: int) -> Variante:
+        bytes_variante = os.path.getsize(destino)
+        if bytes_variante >= bytes_original:
+            return Variante(origen, bytes_original, bytes_original)
+        return Variante(destino, bytes_original, bytes_variante)
+
+    def limpiar(self) -> None:
+        """Olvida las variantes memorizadas (los archivos en disco se quedan)."""
+        with self._lock:
+            self._memo.clear()
+
+
+def _reducir(datos: bytes, formato: str, tamano: Tuple[int, int]) -> bytes:
+    """Imagen llevada a ``tamano`` px (nunca más grande que el original) y recodificada."""
+    from PIL import Image as PILImage
+
+    with PILImage.open(BytesIO(datos)) as imagen:
+        imagen.load()
+        # Se dibuja estirada al tamaño pedido: cada eje se reduce por separado
+        if tamano != imagen.size:
+            imagen = imagen.resize(tamano, PILImage.LANCZOS)
+        salida = BytesIO()
+        opciones: Dict[str, Any] = {'optimize': True}
+        if formato == 'JPEG':
+            if imagen.mode not in ('RGB', 'L'):
+                imagen = imagen.convert('RGB')
+            opciones['quality'] = CALIDAD_JPEG
+        imagen.save(salida, formato, **opciones)
+        return salida.getvalue()
+
+
+optimizador_imagenes = OptimizadorImagenes()
@@ -0,0 +1,144 @@
+"""
+Serialización JSON de las respuestas de la API.
+
+``ProveedorJSON`` sustituye al proveedor de Flask: usa orjson cuando está
+instalado y, si no, el módulo ``json`` de la biblioteca estándar, con la misma
+salida en ambos casos (UTF-8, fechas ISO 8601, Decimal como número).
+
+``FragmentoJSON`` envuelve JSON ya codificado que se inserta tal cual en la
+respuesta; ``CacheFragmentos`` los guarda por clave para no volver a codificar
+los resúmenes de cotizaciones que no cambiaron entre peticiones.
+"""
+import json
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Hashable, List
+
+from flask.json.provider import DefaultJSONProvider
+
+try:  # orjson es opcional: sin él se usa json de la biblioteca estándar
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+# orjson >= 3.9 inserta fragmentos de forma nativa; antes se usan marcadores
+_FRAGMENTO_NATIVO = orjson is not None and hasattr(orjson, 'Fragment')
+
+_NONCE = secrets.token_hex(8)
+_MARCA = re.compile(rb'"@@fragmento-' + _NONCE.encode() + rb'-(\d+)@@"')
+
+
+class FragmentoJSON:
+    """JSON ya codificado (bytes UTF-8) que se inserta sin volver a codificar."""
+
+    __slots__ = ('contenido',)
+
+    def __init__(self, contenido: bytes):
+        self.contenido = contenido
+
+
+def _convertir(obj: Any, fragmentos: List[bytes]) -> Any:
+    """``default`` común a ambos backends para los tipos que no saben codificar."""
+    if isinstance(obj, FragmentoJSON):
+        if _FRAGMENTO_NATIVO:
+            return orjson.Fragment(obj.contenido)
+        fragmentos.append(obj.contenido)
+        return f'@@fragmento-{_NONCE}-{len(fragmentos) - 1}@@'
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (tuple, set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Objeto de tipo {type(obj).__name__} no es serializable a JSON')
+
+
+def codificar(obj: Any, ordenar: bool = True, indentar: bool = False) -> bytes:
+    """Codifica ``obj`` a JSON en bytes UTF-8."""
+    fragmentos: List[bytes] = []
+
+    def default(o: Any) -> Any:
+        return _convertir(o, fragmentos)
+
+    if orjson is not None:
+        opciones = orjson.OPT_NON_STR_KEYS
+        if ordenar:
+            opciones |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opciones |= orjson.OPT_INDENT_2
+        salida = orjson.dumps(obj, default=default, option=opciones)
+    else:
+        salida = json.dumps(
+            obj, default=default, ensure_ascii=False, sort_keys=ordenar,
+            indent=2 if indentar else None, separators=None if indentar else (',', ':'),
+        ).encode('utf-8')
+
+    if fragmentos:
+        salida = _MARCA.sub(lambda m: fragmentos[int(m.group(1))], salida)
+    return salida
+
+
+class CacheFragmentos:
+    """
+    LRU de ``FragmentoJSON`` por clave. La clave debe ser chica y cambiar
+    cuando cambia el contenido (p. ej. id y ``updated_at``), así una entrada
+    nunca queda obsoleta: sólo deja de pedirse y sale por antigüedad.
+    """
+
+    def __init__(self, max_entradas: int = 10000):
+        self.max_entradas = max_entradas
+        self._entradas: 'OrderedDict[Hashable, FragmentoJSON]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: Hashable, construir: Callable[[], Any]) -> FragmentoJSON:
+        """Fragmento de ``clave``; si no está, codifica ``construir()`` y lo guarda."""
+        with self._lock:
+            fragmento = self._entradas.get(clave)
+            if fragmento is not None:
+                self._entradas.move_to_end(clave)
+                return fragmento
+        fragmento = FragmentoJSON(codificar(construir()))
+        if self.max_entradas > 0:
+            with self._lock:
+                self._entradas[clave] = fragmento
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return fragmento
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    """Proveedor JSON de Flask respaldado por ``codificar``."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return codificar(
+            obj, ordenar=kwargs.get('sort_keys', self.sort_keys),
+            indentar=kwargs.get('indent') is not None,
+        ).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            codificar(obj, ordenar=self.sort_keys, indentar=indentar) + b'\n',
+            mimetype=self.mimetype,
+        )
+
+
+# Resúmenes de cotizaciones del listado, por (id, versión)
+fragmentos_cotizaciones = CacheFragmentos()
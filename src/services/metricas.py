@@ -0,0 +1,186 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# Buckets por defecto (segundos), iguales a los del cliente oficial de Prometheus
+BUCKETS_DEFAULT = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+
+
+class _Histograma:
+    """Histograma acumulado de una serie (nombre + etiquetas)."""
+    __slots__ = ('buckets', 'conteos', 'suma', 'total')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.conteos = [0] * len(buckets)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.suma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[i] += 1
+
+
+class RegistroMetricas:
+    """
+    Registro en memoria de contadores, gauges e histogramas, exportable en el
+    formato de texto de Prometheus. Es por proceso: cada worker expone el suyo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ayuda: Dict[str, Tuple[str, str]] = {}
+        self._contadores: Dict[str, Dict[Etiquetas, float]] = {}
+        self._gauges: Dict[str, Dict[Etiquetas, float]] = {}
+        self._histogramas: Dict[str, Dict[Etiquetas, _Histograma]] = {}
+
+    @staticmethod
+    def _clave(etiquetas: Optional[Dict[str, Any]]) -> Etiquetas:
+        return tuple(sorted((k, str(v)) for k, v in (etiquetas or {}).items()))
+
+    def describir(self, nombre: str, tipo: str, ayuda: str) -> None:
+        self._ayuda[nombre] = (tipo, ayuda)
+
+    def incrementar(self, nombre: str, valor: float = 1, etiquetas: Optional[Dict[str, Any]] = None) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._contadores.setdefault(nombre, {})
+            serie[clave] = serie.get(clave, 0) + valor
+
+    def fijar(self, nombre: str, valor: float, etiquetas: Optional[Dict[str, Any]] = None) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._gauges.setdefault(nombre, {})[clave] = valor
+
+    def observar(self, nombre: str, valor: float, etiquetas: Optional[Dict[str, Any]] = None,
+                 buckets: Tuple[float, ...] = BUCKETS_DEFAULT) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._histogramas.setdefault(nombre, {})
+            hist = serie.get(clave)
+            if hist is None:
+                hist = serie[clave] = _Histograma(buckets)
+            hist.observar(valor)
+
+    def valor(self, nombre: str, etiquetas: Optional[Dict[str, Any]] = None) -> float:
+        """Valor actual de un contador o gauge (0 si no existe)."""
+        clave = self._clave(etiquetas)
+        with self._lock:
+            for tabla in (self._contadores, self._gauges):
+                if nombre in tabla and clave in tabla[nombre]:
+                    return tabla[nombre][clave]
+        return 0
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._contadores.clear()
+            self._gauges.clear()
+            self._histogramas.clear()
+
+    # ── Exportación ──
+
+    @staticmethod
+    def _formatear_etiquetas(etiquetas: Etiquetas, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pares = etiquetas + extra
+        if not pares:
+            return ''
+        cuerpo = ','.join(
+            '{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in pares
+        )
+        return '{' + cuerpo + '}'
+
+    def _encabezado(self, lineas: List[str], nombre: str, tipo: str) -> None:
+        tipo_declarado, ayuda = self._ayuda.get(nombre, (tipo, ''))
+        if ayuda:
+            lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo_declarado}')
+
+    def exportar_prometheus(self) -> str:
+        """Serializa todas las series en el formato de exposición de texto 0.0.4."""
+        lineas: List[str] = []
+        with self._lock:
+            for nombre, serie in sorted(self._contadores.items()):
+                self._encabezado(lineas, nombre, 'counter')
+                for clave, valor in sorted(serie.items()):
+                    lineas.append(f'{nombre}{self._formatear_etiquetas(clave)} {valor:g}')
+            for nombre, serie in sorted(self._gauges.items()):
+                self._encabezado(lineas, nombre, 'gauge')
+                for clave, valor in sorted(serie.items()):
+                    lineas.append(f'{nombre}{self._formatear_etiquetas(clave)} {valor:g}')
+            for nombre, serie in sorted(self._histogramas.items()):
+                self._encabezado(lineas, nombre, 'histogram')
+                for clave, hist in sorted(serie.items()):
+                    for limite, conteo in zip(hist.buckets, hist.conteos):
+                        le = self._formatear_etiquetas(clave, (('le', f'{limite:g}'),))
+                        lineas.append(f'{nombre}_bucket{le} {conteo}')
+                    inf = self._formatear_etiquetas(clave, (('le', '+Inf'),))
+                    lineas.append(f'{nombre}_bucket{inf} {hist.total}')
+                    lineas.append(f'{nombre}_sum{self._formatear_etiquetas(clave)} {hist.suma:.6f}')
+                    lineas.append(f'{nombre}_count{self._formatear_etiquetas(clave)} {hist.total}')
+        return '\n'.join(lineas) + '\n'
+
+
+# Registro global del proceso
+metricas = RegistroMetricas()
+metricas.describir('cotiz_export_fase_segundos', 'histogram',
+                   'Duración de cada fase de las exportaciones PDF/Excel')
+
+
+# ══════════════════════════════════════════════════════════
+#  TIEMPOS POR PETICIÓN (Server-Timing)
+# ══════════════════════════════════════════════════════════
+
+_tiempos_peticion: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('_tiempos_peticion', default=None)
+
+
+def iniciar_captura() -> None:
+    """Empieza a acumular las fases medidas en el contexto actual (una petición)."""
+    _tiempos_peticion.set([])
+
+
+def tiempos_capturados() -> List[Tuple[str, float]]:
+    """Fases medidas desde ``iniciar_captura`` como (nombre, segundos)."""
+    return list(_tiempos_peticion.get() or [])
+
+
+def encabezado_server_timing(tiempos: List[Tuple[str, float]]) -> str:
+    """Formatea las fases para el encabezado HTTP ``Server-Timing`` (duración en ms)."""
+    return ', '.join(f'{nombre};dur={segundos * 1000:.1f}' for nombre, segundos in tiempos)
+
+
+@contextmanager
+def medir(servicio: str, fase: str) -> Iterator[None]:
+    """
+    Mide un bloque como fase ``servicio.fase``: lo suma al histograma global y,
+    si hay una captura activa, lo agrega a los tiempos de la petición.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        metricas.observar('cotiz_export_fase_segundos', duracion, {'servicio': servicio, 'fase': fase})
+        capturados = _tiempos_peticion.get()
+        if capturados is not None:
+            capturados.append((f'{servicio}.{fase}', duracion))
+
+
+def fase(servicio: str) -> Callable:
+    """Decorador: mide el método como una fase con el nombre de la función."""
+    def decorador(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            with medir(servicio, func.__name__):
+                return func(*args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.services.metricas import metricas
+
+
+logger = logging.getLogger('cotiz.sql')
+
+metricas.describir('cotiz_sql_sentencia_segundos', 'histogram',
+                   'Duración de cada sentencia SQL por tipo de operación')
+metricas.describir('cotiz_sql_sentencias_total', 'counter',
+                   'Sentencias SQL ejecutadas por tipo de operación')
+metricas.describir('cotiz_sql_lentas_total', 'counter',
+                   'Sentencias SQL que superaron el umbral de consulta lenta')
+
+# Sentencias y segundos acumulados por la petición en curso
+_conteo_peticion: ContextVar[Optional[List[float]]] = ContextVar('_conteo_peticion', default=None)
+
+
+def iniciar_conteo() -> None:
+    """Empieza a contar las sentencias SQL del contexto actual (una petición)."""
+    _conteo_peticion.set([0, 0.0])
+
+
+def conteo_actual() -> Optional[List[float]]:
+    """[sentencias, segundos] desde ``iniciar_conteo``, o None si no hay conteo activo."""
+    return _conteo_peticion.get()
+
+
+def _redactar(parametros: Any) -> Any:
+    """Sustituye cada valor enlazado por su tipo: nunca se registran datos de clientes."""
+    if isinstance(parametros, dict):
+        return {k: type(v).__name__ for k, v in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        if parametros and isinstance(parametros[0], (list, tuple, dict)):
+            # executemany: basta con el primer juego y el número de filas
+            return {'filas': len(parametros), 'primera': _redactar(parametros[0])}
+        return [type(v).__name__ for v in parametros]
+    return type(parametros).__name__ if parametros is not None else None
+
+
+class MonitorSQL:
+    """
+    Escucha los eventos ``before/after_cursor_execute`` de un Engine de
+    SQLAlchemy para medir cada sentencia, contar las de la petición en curso
+    y guardar en un buffer circular las que superan ``umbral_lenta`` (segundos)
+    con sus parámetros redactados.
+    """
+
+    def __init__(self, umbral_lenta: float = 0.1, max_lentas: int = 100):
+        self.umbral_lenta = umbral_lenta
+        self._lentas: deque = deque(maxlen=max_lentas)
+        self._lock = threading.Lock()
+        self._engines: set = set()
+
+    def instalar(self, engine: Engine) -> None:
+        """Registra los listeners en el engine (idempotente)."""
+        if id(engine) in self._engines:
+            return
+        event.listen(engine, 'before_cursor_execute', self._antes)
+        event.listen(engine, 'after_cursor_execute', self._despues)
+        self._engines.add(id(engine))
+
+    def consultas_lentas(self) -> List[Dict[str, Any]]:
+        """Consultas lentas registradas, de la más reciente a la más antigua."""
+        with self._lock:
+            return list(reversed(self._lentas))
+
+    # ── Listeners ──
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('cotiz_inicio_sql', []).append(time.perf_counter())
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info['cotiz_inicio_sql'].pop()
+        duracion = time.perf_counter() - inicio
+        operacion = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTRA'
+
+        metricas.incrementar('cotiz_sql_sentencias_total', 1, {'operacion': operacion})
+        metricas.observar('cotiz_sql_sentencia_segundos', duracion, {'operacion': operacion})
+
+        conteo = _conteo_peticion.get()
+        if conteo is not None:
+            conteo[0] += 1
+            conteo[1] += duracion
+
+        if duracion >= self.umbral_lenta:
+            registro = {
+                'fecha': datetime.utcnow().isoformat(timespec='seconds'),
+                'duracion_ms': round(duracion * 1000, 2),
+                'operacion': operacion,
+                'sentencia': ' '.join(statement.split()),
+                'parametros': _redactar(parameters),
+            }
+            with self._lock:
+                self._lentas.append(registro)
+            metricas.incrementar('cotiz_sql_lentas_total', 1, {'operacion': operacion})
+            logger.warning('Consulta lenta (%.1f ms): %s | parámetros: %s',
+                           registro['duracion_ms'], registro['sentencia'], registro['parametros'])
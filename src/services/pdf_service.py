@@ -1,13 +1,35 @@
+import multiprocessing
 import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from io import BytesIO
+from typing import Any, List, Optional, Sequence
+from xml.sax.saxutils import escape as xml_escape
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import (
-    SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, HRFlowable, Image
+    SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, HRFlowable, Image, Flowable, PageBreak
 )
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from reportlab.pdfgen.canvas import Canvas
+
+from src.models.dto import (
+    CotizacionDTO, EmpresaDTO, LineaDTO, como_cotizacion_dto, como_empresa_dto
+)
+from src.services.admision import admision_exportaciones
+from src.services.imagenes import optimizador_imagenes
+from src.services.metricas import fase, medir
+from src.services.pdf_tabla_rapida import TablaConceptosRapida, FilaConceptos
+
+try:  # pypdf sólo se necesita para unir los fragmentos del render en paralelo
+    from pypdf import PdfWriter
+except ImportError:  # pragma: no cover
+    PdfWriter = None  # type: ignore
 
 
 class PDFService:
@@ -27,14 +49,34 @@ class PDFService:
     # ── Ruta del logo ──
     LOGO_PATH = os.path.join('static', 'img', 'logormg.jpg')
 
-    def __init__(self, output_dir: str = 'exports/pdf'):
+    # ── A partir de cuántas líneas se usa el motor de canvas directo ──
+    UMBRAL_TABLA_RAPIDA = 400
+    # ── A partir de cuántas líneas se reparte el render entre procesos ──
+    UMBRAL_PARALELO = 3000
+    # ── Subir al cambiar el documento que produce este código: los archivos ya
+    #    guardados en EXPORTACIONES_DIR dejan de servirse ──
+    VERSION_RENDER = 1
+
+    def __init__(self, output_dir: str = 'exports/pdf', umbral_tabla_rapida: Optional[int] = None,
+                 umbral_paralelo: Optional[int] = None, procesos_paralelo: Optional[int] = None):
         self.output_dir = output_dir
+        self.umbral_tabla_rapida = (
+            self.UMBRAL_TABLA_RAPIDA if umbral_tabla_rapida is None else umbral_tabla_rapida
+        )
+        self.umbral_paralelo = self.UMBRAL_PARALELO if umbral_paralelo is None else umbral_paralelo
+        self.procesos_paralelo = procesos_paralelo  # None = os.cpu_count()
         os.makedirs(self.output_dir, exist_ok=True)
 
+    def identidad(self) -> str:
+        """Versión y configuración del render, para la huella de los archivos exportados."""
+        return (f'pdf{self.VERSION_RENDER}-t{self.umbral_tabla_rapida}-p{self.umbral_paralelo}'
+                f'x{self.procesos_paralelo or 0}-{optimizador_imagenes.identidad()}')
+
     # ══════════════════════════════════════════════════════════
     #  ESTILOS
     # ══════════════════════════════════════════════════════════
 
+    @fase('pdf')
     def _crear_estilos(self) -> dict:
         base = getSampleStyleSheet()
         return {
@@ -129,16 +171,18 @@ class PDFService:
     #  ENCABEZADO: LOGO + PRO-FORMA + INFO + FECHA/N°
     # ══════════════════════════════════════════════════════════
 
-    def _bloque_encabezado(self, empresa_data: dict, cotizacion_data: dict, estilos: dict) -> list:
+    @fase('pdf')
+    def _bloque_encabezado(self, empresa: EmpresaDTO, cotizacion: CotizacionDTO, estilos: dict) -> list:
         elements: list = []
         s = estilos
         page_width = letter[0] - 0.7 * inch  # ancho útil con márgenes 0.35+0.35
         # ── Row 1: Logo left + PRO-FORMA right ──
         logo_cell: object
         if os.path.exists(self.LOGO_PATH):
-            logo_cell = Image(self.LOGO_PATH, width=2.3 * inch, height=1.05 * inch)
+            logo_cell = Image(optimizador_imagenes.ruta(self.LOGO_PATH, 2.3 * inch, 1.05 * inch),
+                              width=2.3 * inch, height=1.05 * inch)
         else:
-            logo_cell = Paragraph(empresa_data.get('nombre', ''), s['proforma_title'])
+            logo_cell = Paragraph(empresa.nombre, s['proforma_title'])
 
         header_data = [[
             logo_cell,
@@ -174,17 +218,18 @@ class PDFService:
 
         info_rows: list = []
         campos = [
-            ('direccion', empresa_data.get('direccion', '')),
-            ('telefono', empresa_data.get('telefono', '')),
-            ('email', empresa_data.get('email', '')),
-            ('redes_sociales', empresa_data.get('redes_sociales', '')),
-            ('rfc', empresa_data.get('rfc', '')),
+            ('direccion', empresa.direccion),
+            ('telefono', empresa.telefono),
+            ('email', empresa.email),
+            ('redes_sociales', empresa.redes_sociales),
+            ('rfc', empresa.rfc),
         ]
         for campo, valor in campos:
             if valor:
                 icon_path = icon_map.get(campo, '')
                 if os.path.exists(icon_path):
-                    icon_img = Image(icon_path, width=icon_size, height=icon_size)
+                    icon_img = Image(optimizador_imagenes.ruta(icon_path, icon_size, icon_size),
+                                     width=icon_size, height=icon_size)
                 else:
                     icon_img = Paragraph('', s['empresa_dato'])
                 info_rows.append([icon_img, Paragraph(valor, s['empresa_dato'])])
@@ -203,7 +248,7 @@ class PDFService:
             info_mini_table = Paragraph('', s['empresa_dato'])
 
         # Fecha / N° as small table
-        fecha_str = cotizacion_data.get('fecha', '')
+        fecha_str = cotizacion.fecha
         try:
             fecha_obj = datetime.strptime(str(fecha_str), '%Y-%m-%d')
             fecha_fmt = fecha_obj.strftime('%d/%m/%Y')
@@ -214,7 +259,7 @@ class PDFService:
             [Paragraph('Fecha', s['info_label']),
              Paragraph(fecha_fmt, s['info_value'])],
             [Paragraph('N° de Pro-forma', s['info_label']),
-             Paragraph(cotizacion_data.get('numero_cotizacion', ''), s['info_value'])],
+             Paragraph(cotizacion.numero_cotizacion, s['info_value'])],
         ]
         fecha_table = Table(fecha_n_data, colWidths=[1.4 * inch, 1.2 * inch])
         fecha_table.setStyle(TableStyle([
@@ -240,13 +285,10 @@ class PDFService:
     #  TABLA DE CONCEPTOS
     # ══════════════════════════════════════════════════════════
 
-    def _tabla_conceptos(self, cotizacion_data: dict, estilos: dict) -> list:
-        elements: list = []
-        s = estilos
+    def _col_widths_conceptos(self) -> List[float]:
         page_width = letter[0] - 0.7 * inch  # ancho útil con márgenes 0.35+0.35
-
         # Column widths: IVA | CANT | DESC | P.U. | TOTAL
-        col_widths = [
+        return [
             page_width * 0.13,
             page_width * 0.08,
             page_width * 0.39,
@@ -254,58 +296,88 @@ class PDFService:
             page_width * 0.22,
         ]
 
-        # Headers
-        headers = [
-            Paragraph('IVA', s['table_header']),
-            Paragraph('CANT.', s['table_header']),
-            Paragraph('DESCRIPCIÓN', s['table_header']),
-            Paragraph('P. UNITARIO', s['table_header']),
-            Paragraph('TOTAL', s['table_header']),
-        ]
-        table_data: list = [headers]
+    def _filas_conceptos(self, detalles: Sequence[LineaDTO], markup: bool = False) -> List[FilaConceptos]:
+        """
+        Filas de la tabla como texto ya formateado, con los separadores de
+        grupo marcados por tipo: ('grupo', nombre) o ('linea', (5 celdas)).
+        Incluye las filas vacías de relleno hasta el mínimo de 10.
 
-        # Data rows (with group separators)
-        detalles = cotizacion_data.get('detalles', [])
+        Con ``markup`` el grupo y la descripción se escapan para Paragraph
+        (``&``, ``<``, ``>``), así ambos motores imprimen el texto tal cual.
+        """
+        filas: List[FilaConceptos] = []
         current_grupo = None
+        texto = xml_escape if markup else str
 
         for det in detalles:
-            grupo = det.get('grupo', '') or ''
+            grupo = det.grupo
 
             # Group separator
             if grupo and grupo != current_grupo:
                 current_grupo = grupo
-                table_data.append([
-                    Paragraph(grupo, s['grupo']), '', '', '', ''
-                ])
+                filas.append(('grupo', texto(grupo)))
 
-            cantidad = det.get('cantidad', 0)
-            precio_unitario = det.get('precio_unitario', 0)
+            cantidad = det.cantidad
+            precio_unitario = det.precio_unitario
             importe = cantidad * precio_unitario
             iva_total = importe * 1.16
 
-            table_data.append([
-                Paragraph(f'{iva_total:,.2f}', s['cell_right']),
-                Paragraph(f'{int(cantidad)}' if cantidad == int(cantidad) else f'{cantidad}', s['cell_center']),
-                Paragraph(det.get('descripcion', ''), s['cell_center']),
-                Paragraph(f'{precio_unitario:,.2f}', s['cell_right']),
-                Paragraph(f'{importe:,.2f}', s['cell_right']),
-            ])
+            filas.append(('linea', (
+                f'{iva_total:,.2f}',
+                f'{int(cantidad)}' if cantidad == int(cantidad) else f'{cantidad}',
+                texto(det.descripcion),
+                f'{precio_unitario:,.2f}',
+                f'{importe:,.2f}',
+            )))
 
-        # Empty rows to fill min 15 rows
-        data_row_count = len(table_data) - 1  # minus header
-        filas_extra = max(0, 10 - data_row_count)
+        # Empty rows to fill min 10 rows
+        filas_extra = max(0, 10 - len(filas))
         for _ in range(filas_extra):
+            filas.append(('linea', ('0.00', '', '', '0.00', '0.00')))
+
+        return filas
+
+    @fase('pdf')
+    def _tabla_conceptos(self, cotizacion: CotizacionDTO, estilos: dict) -> list:
+        detalles = cotizacion.detalles
+        col_widths = self._col_widths_conceptos()
+
+        if len(detalles) >= self.umbral_tabla_rapida:
+            # El canvas dibuja el texto tal cual: sin escapar
+            return [TablaConceptosRapida(self._filas_conceptos(detalles), col_widths,
+                                         self.AZUL, self.GRIS, self.AZUL)]
+
+        filas = self._filas_conceptos(detalles, markup=True)
+        elements: list = []
+        s = estilos
+
+        # Headers
+        headers = [
+            Paragraph('IVA', s['table_header']),
+            Paragraph('CANT.', s['table_header']),
+            Paragraph('DESCRIPCIÓN', s['table_header']),
+            Paragraph('P. UNITARIO', s['table_header']),
+            Paragraph('TOTAL', s['table_header']),
+        ]
+        table_data: list = [headers]
+        filas_grupo: List[int] = []
+
+        for tipo, contenido in filas:
+            if tipo == 'grupo':
+                filas_grupo.append(len(table_data))
+                table_data.append([Paragraph(contenido, s['grupo']), '', '', '', ''])
+                continue
+            iva_total, cantidad, descripcion, precio_unitario, importe = contenido  # type: ignore
             table_data.append([
-                Paragraph('0.00', s['cell_right']),
-                Paragraph('', s['cell_center']),
-                Paragraph('', s['cell_center']),
-                Paragraph('0.00', s['cell_right']),
-                Paragraph('0.00', s['cell_right']),
+                Paragraph(iva_total, s['cell_right']),
+                Paragraph(cantidad, s['cell_center']),
+                Paragraph(descripcion, s['cell_center']),
+                Paragraph(precio_unitario, s['cell_right']),
+                Paragraph(importe, s['cell_right']),
             ])
 
         conceptos = Table(table_data, colWidths=col_widths, repeatRows=1)
 
-        num_rows = len(table_data)
         style_cmds = [
             # Header row
             ('BACKGROUND', (0, 0), (-1, 0), self.AZUL),
@@ -331,15 +403,10 @@ class PDFService:
             style_cmds.append(('BOX', (i, 0), (i, 0), 1, self.BLANCO))
 
         # Group separator rows: span all columns, gray background
-        for row_idx in range(1, num_rows):
-            row_data = table_data[row_idx]
-            if isinstance(row_data[1], str) and row_data[1] == '' and isinstance(row_data[0], Paragraph):
-                # Check if it's a grupo row (only first cell has content)
-                txt = row_data[0].text if hasattr(row_data[0], 'text') else ''  # type: ignore
-                if txt and not any(c in txt for c in ['0.00', ',']):
-                    style_cmds.append(('SPAN', (0, row_idx), (4, row_idx)))
-                    style_cmds.append(('BACKGROUND', (0, row_idx), (-1, row_idx), self.GRIS))
-                    style_cmds.append(('ALIGN', (0, row_idx), (-1, row_idx), 'CENTER'))
+        for row_idx in filas_grupo:
+            style_cmds.append(('SPAN', (0, row_idx), (4, row_idx)))
+            style_cmds.append(('BACKGROUND', (0, row_idx), (-1, row_idx), self.GRIS))
+            style_cmds.append(('ALIGN', (0, row_idx), (-1, row_idx), 'CENTER'))
 
         conceptos.setStyle(TableStyle(style_cmds))
         elements.append(conceptos)
@@ -350,14 +417,15 @@ class PDFService:
     #  BLOQUE DE TOTALES
     # ══════════════════════════════════════════════════════════
 
-    def _bloque_totales(self, cotizacion_data: dict, estilos: dict) -> list:
+    @fase('pdf')
+    def _bloque_totales(self, cotizacion: CotizacionDTO, estilos: dict) -> list:
         elements: list = []
         s = estilos
         page_width = letter[0] - 0.7 * inch  # ancho útil con márgenes 0.35+0.35
 
-        subtotal = cotizacion_data.get('subtotal', 0) or 0
-        descuento = cotizacion_data.get('descuento', 0) or 0
-        envio = cotizacion_data.get('envio_delivery', 0) or 0
+        subtotal = cotizacion.subtotal or 0
+        descuento = cotizacion.descuento or 0
+        envio = cotizacion.envio_delivery or 0
         neto = subtotal - descuento
         impuestos = neto * 0.16
         pagado = neto + impuestos + envio
@@ -401,10 +469,11 @@ class PDFService:
     #  TÉRMINOS Y PIE
     # ══════════════════════════════════════════════════════════
 
-    def _bloque_terminos(self, cotizacion_data: dict, estilos: dict) -> list:
+    @fase('pdf')
+    def _bloque_terminos(self, cotizacion: CotizacionDTO, estilos: dict) -> list:
         elements: list = []
         s = estilos
-        notas = cotizacion_data.get('notas', '')
+        notas = cotizacion.notas
         if not notas:
             return elements
 
@@ -416,7 +485,8 @@ class PDFService:
 
         return elements
 
-    def _bloque_pie(self, empresa_data: dict, estilos: dict) -> list:
+    @fase('pdf')
+    def _bloque_pie(self, empresa: EmpresaDTO, estilos: dict) -> list:
         elements: list = []
         s = estilos
 
@@ -426,7 +496,7 @@ class PDFService:
             spaceBefore=0, spaceAfter=6
         ))
 
-        nombre = empresa_data.get('nombre', '')
+        nombre = empresa.nombre
         elements.append(Paragraph(nombre, s['footer']))
         elements.append(Paragraph("Quedo a sus ordenes", s['footer_sub']))
         elements.append(Paragraph("Saludos!", s['footer_sub']))
@@ -437,37 +507,337 @@ class PDFService:
     #  MÉTODO PRINCIPAL
     # ══════════════════════════════════════════════════════════
 
-    def generar_cotizacion(self, cotizacion_data: dict, empresa_data: dict) -> str:
-        numero = cotizacion_data.get('numero_cotizacion', 'SIN-NUMERO')
-        filename = f"{str(numero).replace('/', '-')}.pdf"
-        filepath = os.path.join(self.output_dir, filename)
-
-        doc = SimpleDocTemplate(
-            filepath,
+    def _crear_documento(self, destino) -> SimpleDocTemplate:
+        return SimpleDocTemplate(
+            destino,
             pagesize=letter,
             rightMargin=0.35 * inch,
             leftMargin=0.35 * inch,
             topMargin=0.3 * inch,
             bottomMargin=0.3 * inch,
+            pageCompression=1,  # flujos de página con Flate (explícito: no depender de rl_config)
         )
 
-        estilos = self._crear_estilos()
+    def _construir_elementos(self, cotizacion: CotizacionDTO, empresa: EmpresaDTO, estilos: dict) -> list:
         elements: list = []
 
         # 1. Encabezado
-        elements.extend(self._bloque_encabezado(empresa_data, cotizacion_data, estilos))
+        elements.extend(self._bloque_encabezado(empresa, cotizacion, estilos))
 
         # 2. Tabla de conceptos
-        elements.extend(self._tabla_conceptos(cotizacion_data, estilos))
+        elements.extend(self._tabla_conceptos(cotizacion, estilos))
 
         # 3. Totales
-        elements.extend(self._bloque_totales(cotizacion_data, estilos))
+        elements.extend(self._bloque_totales(cotizacion, estilos))
 
         # 4. Términos y condiciones
-        elements.extend(self._bloque_terminos(cotizacion_data, estilos))
+        elements.extend(self._bloque_terminos(cotizacion, estilos))
 
         # 5. Pie
-        elements.extend(self._bloque_pie(empresa_data, estilos))
+        elements.extend(self._bloque_pie(empresa, estilos))
 
-        doc.build(elements)
+        return elements
+
+    def generar_cotizacion(self, cotizacion: Any, empresa: Any,
+                           paralelo: Optional[bool] = None) -> str:
+        """
+        Genera el PDF y devuelve su ruta.
+
+        Args:
+            cotizacion: CotizacionDTO (o dict estilo ``to_dict()``).
+            empresa: EmpresaDTO (o dict estilo ``to_dict()``).
+            paralelo: True/False fuerza o desactiva el render por fragmentos en
+                procesos; None lo decide según ``umbral_paralelo``.
+        """
+        cotizacion = como_cotizacion_dto(cotizacion)
+        empresa = como_empresa_dto(empresa)
+        numero = cotizacion.numero_cotizacion or 'SIN-NUMERO'
+        filename = f"{str(numero).replace('/', '-')}.pdf"
+        filepath = os.path.join(self.output_dir, filename)
+
+        num_lineas = len(cotizacion.detalles)
+        if paralelo is None:
+            paralelo = num_lineas >= self.umbral_paralelo
+        # El render en paralelo necesita el motor de canvas (plan de páginas barato) y pypdf
+        if paralelo and PdfWriter is not None and num_lineas >= self.umbral_tabla_rapida:
+            if self._generar_en_paralelo(cotizacion, empresa, filepath):
+                return filepath
+
+        buffer = BytesIO()
+        doc = self._crear_documento(buffer)
+        estilos = self._crear_estilos()
+        elements = self._construir_elementos(cotizacion, empresa, estilos)
+        with medir('pdf', 'layout'):
+            doc.build(elements, canvasmaker=canvas_numerado())
+        with medir('pdf', 'escritura'):
+            with open(filepath, 'wb') as f:
+                f.write(buffer.getvalue())
+        return filepath
+
+    # ══════════════════════════════════════════════════════════
+    #  LOTE DE IMPRESIÓN
+    # ══════════════════════════════════════════════════════════
+
+    def generar_lote(self, cotizaciones: Sequence[Any], empresa: Any, nombre: str = 'lote') -> str:
+        """
+        Genera un solo PDF con varias cotizaciones y devuelve su ruta.
+
+        Cada cotización empieza en página nueva, lleva su propia numeración
+        ("Página N de M" de esa cotización) y un marcador con su número y
+        cliente. Todo sale de un solo documento: los estilos se crean una vez
+        y el logo, los iconos y las fuentes se incrustan una sola vez para
+        todo el lote.
+        """
+        if not cotizaciones:
+            raise ValueError('El lote no tiene cotizaciones')
+        empresa = como_empresa_dto(empresa)
+        filepath = os.path.join(self.output_dir, f"{nombre.replace('/', '-')}.pdf")
+
+        estilos = self._crear_estilos()
+        elements: list = []
+        for i, cotizacion in enumerate(cotizaciones):
+            cotizacion = como_cotizacion_dto(cotizacion)
+            if i:
+                elements.append(PageBreak())
+            titulo = cotizacion.numero_cotizacion or 'SIN-NUMERO'
+            if cotizacion.cliente and cotizacion.cliente.nombre:
+                titulo = f'{titulo} · {cotizacion.cliente.nombre}'
+            elements.append(MarcaDocumento(f'cotizacion-{i}', titulo))
+            elements.extend(self._construir_elementos(cotizacion, empresa, estilos))
+
+        buffer = BytesIO()
+        doc = self._crear_documento(buffer)
+        doc.title = f'Pro-Formas ({len(cotizaciones)})'
+        with medir('pdf', 'layout'):
+            doc.build(elements, canvasmaker=canvas_numerado())
+        with medir('pdf', 'escritura'):
+            # Nombre temporal único: otro lote con los mismos filtros (otro hilo,
+            # worker o `flask exportar-lote`) nunca ve ni deja un archivo a medias
+            descriptor, temporal = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as f:
+                    f.write(buffer.getvalue())
+                os.replace(temporal, filepath)
+            except BaseException:
+                try:
+                    os.remove(temporal)
+                except OSError:
+                    pass
+                raise
         return filepath
+
+    # ══════════════════════════════════════════════════════════
+    #  RENDER EN PARALELO POR FRAGMENTOS DE PÁGINAS
+    # ══════════════════════════════════════════════════════════
+
+    def _planificar_paginas(self, cotizacion: CotizacionDTO, empresa: EmpresaDTO):
+        """
+        Maqueta el documento completo sin dibujar la tabla y devuelve
+        (tabla, fragmentos, total_paginas), donde cada fragmento es
+        (pagina, fila_inicio, fila_fin) tal como quedará en el render normal.
+        """
+        estilos = self._crear_estilos()
+        elements = self._construir_elementos(cotizacion, empresa, estilos)
+        tabla = next(e for e in elements if isinstance(e, TablaConceptosRapida))
+        fragmentos: list = []
+        tabla.registro = fragmentos
+
+        doc = self._crear_documento(BytesIO())
+        doc.build(elements)
+        tabla.registro = None
+        return tabla, fragmentos, doc.page
+
+    def _generar_en_paralelo(self, cotizacion: CotizacionDTO, empresa: EmpresaDTO, filepath: str) -> bool:
+        """
+        Reparte las páginas de la tabla en bloques contiguos, renderiza cada
+        bloque en un proceso y une los PDFs. Cada bloque (salvo el primero)
+        empieza en el tope de una página, igual que la continuación de la tabla
+        en el render de un solo proceso, así que la paginación es idéntica.
+        Devuelve False si no hay páginas suficientes para repartir.
+        """
+        max_procesos = self.procesos_paralelo or os.cpu_count() or 1
+        if max_procesos < 2:
+            return False
+        with medir('pdf', 'plan_paginas'):
+            tabla, fragmentos, total_paginas = self._planificar_paginas(cotizacion, empresa)
+        if len(fragmentos) < 2:
+            return False
+
+        # El render ya tiene su turno (un proceso); cada proceso extra ocupa otro
+        with admision_exportaciones.adicionales(min(max_procesos, len(fragmentos)) - 1) as extra:
+            procesos = 1 + extra
+            if procesos < 2:
+                return False
+
+            # Cortes sólo en fragmentos de continuación (siempre arrancan en página nueva)
+            cortes = [round(i * len(fragmentos) / procesos) for i in range(procesos + 1)]
+            medidas = tabla.medidas
+            # Los procesos no necesitan las líneas: reciben las filas ya medidas
+            datos_ligeros = cotizacion._replace(detalles=())
+            # Los hijos no heredan la configuración del worker: viaja con el trabajo
+            imagenes = (optimizador_imagenes.directorio, optimizador_imagenes.dpi, optimizador_imagenes.activo)
+
+            trabajos = []
+            for k in range(procesos):
+                primero, ultimo = fragmentos[cortes[k]], fragmentos[cortes[k + 1] - 1]
+                fila_fin = ultimo[2] if k < procesos - 1 else len(medidas)
+                trabajos.append((
+                    datos_ligeros, empresa, medidas[primero[1]:fila_fin],
+                    k == 0, k == procesos - 1, primero[0], total_paginas, imagenes,
+                ))
+
+            pool = _pool_render(max_procesos)
+            try:
+                with medir('pdf', 'render_paralelo'):
+                    partes = list(pool.map(_renderizar_fragmento, trabajos))
+            except BrokenProcessPool:
+                # Un hijo murió (p. ej. por memoria): se descarta el pool y se
+                # renderiza en un solo proceso
+                _descartar_pool(pool)
+                return False
+
+        with medir('pdf', 'escritura'):
+            writer = PdfWriter()
+            for parte in partes:
+                writer.append(BytesIO(parte))
+            # Cada fragmento trae su propia copia de las fuentes e imágenes: una sola
+            writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+            with open(filepath, 'wb') as f:
+                writer.write(f)
+        return True
+
+
+# Pool del render en paralelo: uno por proceso del servidor, creado al primer uso
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_procesos = 0
+_pool_lock = threading.Lock()
+
+
+def _pool_render(procesos: int) -> ProcessPoolExecutor:
+    """
+    Pool de larga vida para ``_renderizar_fragmento`` (se recrea si se piden
+    más procesos). Los hijos salen de ``forkserver`` (``spawn`` donde no
+    existe): nunca se hace fork del worker, que tiene otros hilos corriendo.
+    """
+    global _pool, _pool_procesos
+    with _pool_lock:
+        if _pool is None or _pool_procesos < procesos:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            contexto = multiprocessing.get_context(metodo)
+            if metodo == 'forkserver':
+                contexto.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=procesos, mp_context=contexto)
+            _pool_procesos = procesos
+        return _pool
+
+
+def _descartar_pool(pool: ProcessPoolExecutor) -> None:
+    """Olvida ``pool`` (roto) para que el siguiente render cree otro."""
+    global _pool, _pool_procesos
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_procesos = None, 0
+    pool.shutdown(wait=False)
+
+
+def _renderizar_fragmento(trabajo: tuple) -> bytes:
+    """Renderiza un bloque de páginas en un proceso hijo y devuelve el PDF en bytes."""
+    cotizacion, empresa, medidas, es_primero, es_ultimo, primera_pagina, total, imagenes = trabajo
+    if (optimizador_imagenes.directorio, optimizador_imagenes.dpi, optimizador_imagenes.activo) != imagenes:
+        optimizador_imagenes.configurar(*imagenes)
+    servicio = PDFService.__new__(PDFService)  # sin crear directorios en el proceso hijo
+    estilos = servicio._crear_estilos()
+
+    elements: list = []
+    if es_primero:
+        elements.extend(servicio._bloque_encabezado(empresa, cotizacion, estilos))
+    elements.append(TablaConceptosRapida(
+        (), servicio._col_widths_conceptos(), PDFService.AZUL, PDFService.GRIS, PDFService.AZUL,
+        _medidas=medidas,
+    ))
+    if es_ultimo:
+        elements.extend(servicio._bloque_totales(cotizacion, estilos))
+        elements.extend(servicio._bloque_terminos(cotizacion, estilos))
+        elements.extend(servicio._bloque_pie(empresa, estilos))
+
+    buffer = BytesIO()
+    doc = servicio._crear_documento(buffer)
+    doc.build(elements, canvasmaker=canvas_numerado(primera_pagina, total))
+    return buffer.getvalue()
+
+
+class MarcaDocumento(Flowable):
+    """
+    Marca invisible al inicio de cada cotización de un lote: agrega su
+    marcador y reinicia la numeración de páginas de ``canvas_numerado``.
+    """
+
+    def __init__(self, clave: str, titulo: str):
+        Flowable.__init__(self)
+        self.clave = clave
+        self.titulo = titulo
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        iniciar = getattr(self.canv, 'iniciar_documento', None)
+        if iniciar is not None:
+            iniciar(self.clave, self.titulo)
+        else:
+            _agregar_marcador(self.canv, self.clave, self.titulo)
+
+
+def _agregar_marcador(canv: Canvas, clave: str, titulo: str) -> None:
+    """Marcador en la página actual del canvas (visible en el panel de marcadores)."""
+    canv.bookmarkPage(clave)
+    canv.addOutlineEntry(titulo, clave, level=0)
+    canv.showOutline()
+
+
+def canvas_numerado(primera_pagina: int = 1, total_paginas: Optional[int] = None):
+    """
+    Canvas que escribe "Página N de M" en el margen inferior de documentos de
+    más de una página. ``primera_pagina``/``total_paginas`` permiten numerar un
+    fragmento como parte de un documento mayor (render en paralelo); en un
+    lote, cada ``MarcaDocumento`` empieza una numeración nueva.
+    """
+
+    class _CanvasNumerado(Canvas):
+        def __init__(self, *args, **kwargs):
+            Canvas.__init__(self, *args, **kwargs)
+            self._estados_pagina: list = []
+            self._inicios: list = []  # (índice de página, clave, título) de cada documento del lote
+
+        def showPage(self):
+            self._estados_pagina.append(dict(self.__dict__))
+            self._startPage()
+
+        def iniciar_documento(self, clave: str, titulo: str):
+            # El marcador apunta a la página en curso, que aquí todavía no se
+            # emite: se agrega en save() justo antes de emitirla
+            self._inicios.append((len(self._estados_pagina), clave, titulo))
+
+        def save(self):
+            estados = self._estados_pagina
+            marcadores: dict = {}
+            for indice, clave, titulo in self._inicios:
+                marcadores.setdefault(indice, []).append((clave, titulo))
+            cortes = sorted({0, len(estados), *marcadores})
+            for inicio, fin in zip(cortes, cortes[1:]):
+                total = total_paginas or fin - inicio
+                primera = primera_pagina if inicio == 0 else 1
+                for n, estado in enumerate(estados[inicio:fin], start=primera):
+                    self.__dict__.update(estado)
+                    for clave, titulo in marcadores.get(inicio + n - primera, ()):
+                        _agregar_marcador(self, clave, titulo)
+                    if total > 1:
+                        self.setFont('Helvetica', 7)
+                        self.setFillColor(PDFService.GRIS_CLARO)
+                        self.drawCentredString(letter[0] / 2.0, 0.12 * inch, f'Página {n} de {total}')
+                    Canvas.showPage(self)
+            Canvas.save(self)
+
+    return _CanvasNumerado
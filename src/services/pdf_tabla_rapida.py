@@ -0,0 +1,245 @@
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable
+
+
+# ── Geometría (replica el TableStyle de PDFService._tabla_conceptos) ──
+LEADING = 12            # leading heredado del estilo 'Normal'
+PAD_X = 4               # LEFTPADDING / RIGHTPADDING
+PAD_Y_ENCABEZADO = 7    # TOPPADDING / BOTTOMPADDING de la fila azul
+PAD_Y_FILA = 4          # TOPPADDING / BOTTOMPADDING del contenido
+
+FUENTE = 'Helvetica'
+FUENTE_BOLD = 'Helvetica-Bold'
+TAM_ENCABEZADO = 10
+TAM_CELDA = 9
+
+ENCABEZADOS = ('IVA', 'CANT.', 'DESCRIPCIÓN', 'P. UNITARIO', 'TOTAL')
+# Alineación por columna: IVA | CANT | DESC | P.U. | TOTAL
+ALINEACIONES = ('R', 'C', 'C', 'R', 'R')
+
+COLOR_GRID = colors.HexColor('#CCCCCC')
+
+# Fila estructural: ('grupo', texto) o ('linea', (iva, cant, desc, pu, total))
+FilaConceptos = Tuple[str, object]
+
+
+@lru_cache(maxsize=65536)
+def ancho_texto(texto: str, fuente: str, tam: float) -> float:
+    """Ancho de un texto en puntos (memoizado: las descripciones se repiten mucho)."""
+    return stringWidth(texto, fuente, tam)
+
+
+def partir_texto(texto: str, fuente: str, tam: float, ancho_max: float) -> List[str]:
+    """
+    Parte un texto en líneas por palabras, igual que un Paragraph sin markup.
+    Una palabra más ancha que la celda se deja completa en su propia línea.
+    """
+    palabras = texto.split()
+    if not palabras:
+        return ['']
+
+    espacio = ancho_texto(' ', fuente, tam)
+    lineas: List[str] = []
+    actual: List[str] = []
+    ancho_actual = 0.0
+    for palabra in palabras:
+        w = ancho_texto(palabra, fuente, tam)
+        if actual and ancho_actual + espacio + w > ancho_max:
+            lineas.append(' '.join(actual))
+            actual = [palabra]
+            ancho_actual = w
+        else:
+            ancho_actual += (espacio + w) if actual else w
+            actual.append(palabra)
+    lineas.append(' '.join(actual))
+    return lineas
+
+
+class _Fila:
+    """Fila ya medida: texto por celda, líneas partidas y altura total."""
+    __slots__ = ('es_grupo', 'celdas', 'lineas', 'alto')
+
+    def __init__(self, es_grupo: bool, celdas: Sequence[str], lineas: List[List[str]], alto: float):
+        self.es_grupo = es_grupo
+        self.celdas = celdas
+        self.lineas = lineas
+        self.alto = alto
+
+
+class TablaConceptosRapida(Flowable):
+    """
+    Motor alterno para la tabla de conceptos de cotizaciones muy grandes.
+
+    Dibuja directamente en el canvas en lugar de construir un ``Table`` de
+    Platypus con un ``Paragraph`` por celda. Las filas se miden una sola vez
+    (anchos de texto memoizados), se parten entre páginas con ``split`` y la
+    fila azul de encabezados se repite en cada fragmento. Las filas de grupo
+    se identifican por su tipo, no por su texto.
+
+    Si ``registro`` es una lista, la tabla no dibuja nada y en su lugar anota
+    ``(pagina, fila_inicio, fila_fin)`` por cada fragmento colocado; así se
+    obtiene el plan de paginación sin pagar el dibujo.
+    """
+
+    def __init__(self, filas: Sequence[FilaConceptos], col_widths: Sequence[float],
+                 color_encabezado, color_grupo, color_texto_grupo,
+                 _medidas: Optional[List[_Fila]] = None, inicio: int = 0,
+                 registro: Optional[list] = None):
+        Flowable.__init__(self)
+        self.inicio = inicio
+        self.registro = registro
+        self.hAlign = 'CENTER'  # igual que Table: centrada aunque exceda el frame
+        self.col_widths = list(col_widths)
+        self.color_encabezado = color_encabezado
+        self.color_grupo = color_grupo
+        self.color_texto_grupo = color_texto_grupo
+        self.alto_encabezado = LEADING + 2 * PAD_Y_ENCABEZADO
+        self._filas = _medidas if _medidas is not None else self._medir(filas)
+        self.width = sum(self.col_widths)
+        self.height = self.alto_encabezado + sum(f.alto for f in self._filas)
+
+    # ── Medición ──
+
+    def _medir(self, filas: Sequence[FilaConceptos]) -> List[_Fila]:
+        medidas: List[_Fila] = []
+        ancho_total = sum(self.col_widths)
+        for tipo, contenido in filas:
+            if tipo == 'grupo':
+                lineas = partir_texto(str(contenido), FUENTE_BOLD, TAM_CELDA, ancho_total - 2 * PAD_X)
+                medidas.append(_Fila(True, (str(contenido),), [lineas],
+                                     len(lineas) * LEADING + 2 * PAD_Y_FILA))
+                continue
+            celdas: Sequence[str] = contenido  # type: ignore
+            por_celda = [
+                partir_texto(texto, FUENTE, TAM_CELDA, w - 2 * PAD_X)
+                for texto, w in zip(celdas, self.col_widths)
+            ]
+            max_lineas = max(len(l) for l in por_celda)
+            medidas.append(_Fila(False, celdas, por_celda, max_lineas * LEADING + 2 * PAD_Y_FILA))
+        return medidas
+
+    @property
+    def medidas(self) -> List[_Fila]:
+        """Filas ya medidas (se pueden enviar a otro proceso sin volver a medir)."""
+        return self._filas
+
+    def _copia(self, medidas: List[_Fila], inicio: int) -> 'TablaConceptosRapida':
+        return TablaConceptosRapida(
+            (), self.col_widths, self.color_encabezado, self.color_grupo,
+            self.color_texto_grupo, _medidas=medidas, inicio=inicio, registro=self.registro,
+        )
+
+    # ── Protocolo Flowable ──
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        if self.height <= availHeight:
+            return [self]
+        usado = self.alto_encabezado
+        corte = 0
+        for fila in self._filas:
+            if usado + fila.alto > availHeight:
+                break
+            usado += fila.alto
+            corte += 1
+        if corte == 0:
+            return []
+        return [
+            self._copia(self._filas[:corte], self.inicio),
+            self._copia(self._filas[corte:], self.inicio + corte),
+        ]
+
+    def draw(self):
+        canv = self.canv
+        if self.registro is not None:
+            self.registro.append((canv.getPageNumber(), self.inicio, self.inicio + len(self._filas)))
+            return
+        widths = self.col_widths
+        xs = [0.0]
+        for w in widths:
+            xs.append(xs[-1] + w)
+        ancho = xs[-1]
+
+        # 1. Fondos (encabezado azul + filas de grupo grises)
+        top = self.height
+        canv.setFillColor(self.color_encabezado)
+        canv.rect(0, top - self.alto_encabezado, ancho, self.alto_encabezado, stroke=0, fill=1)
+        y = top - self.alto_encabezado
+        canv.setFillColor(self.color_grupo)
+        for fila in self._filas:
+            if fila.es_grupo:
+                canv.rect(0, y - fila.alto, ancho, fila.alto, stroke=0, fill=1)
+            y -= fila.alto
+
+        # 2. Cuadrícula (las filas de grupo abarcan las 5 columnas)
+        canv.setStrokeColor(COLOR_GRID)
+        canv.setLineWidth(0.5)
+        lineas = []
+        y = top - self.alto_encabezado
+        lineas.append((0, top, ancho, top))
+        lineas.append((0, y, ancho, y))
+        for fila in self._filas:
+            y_inf = y - fila.alto
+            lineas.append((0, y_inf, ancho, y_inf))
+            bordes = (xs[0], xs[-1]) if fila.es_grupo else xs
+            for x in bordes:
+                lineas.append((x, y, x, y_inf))
+            y = y_inf
+        canv.lines(lineas)
+
+        # 3. Encabezados (texto blanco + caja blanca por celda)
+        canv.setFillColor(colors.white)
+        canv.setFont(FUENTE_BOLD, TAM_ENCABEZADO)
+        base = top - PAD_Y_ENCABEZADO - TAM_ENCABEZADO
+        for i, texto in enumerate(ENCABEZADOS):
+            w = ancho_texto(texto, FUENTE_BOLD, TAM_ENCABEZADO)
+            canv.drawString(xs[i] + (widths[i] - w) / 2.0, base, texto)
+        canv.setStrokeColor(colors.white)
+        canv.setLineWidth(1)
+        for i in range(len(widths)):
+            canv.rect(xs[i], top - self.alto_encabezado, widths[i], self.alto_encabezado, stroke=1, fill=0)
+
+        # 4. Contenido
+        y = top - self.alto_encabezado
+        fuente_actual = None
+        color_actual = None
+        for fila in self._filas:
+            if fila.es_grupo:
+                if color_actual is not self.color_texto_grupo:
+                    canv.setFillColor(self.color_texto_grupo)
+                    color_actual = self.color_texto_grupo
+                if fuente_actual != FUENTE_BOLD:
+                    canv.setFont(FUENTE_BOLD, TAM_CELDA)
+                    fuente_actual = FUENTE_BOLD
+                base = y - PAD_Y_FILA - TAM_CELDA
+                for linea in fila.lineas[0]:
+                    w = ancho_texto(linea, FUENTE_BOLD, TAM_CELDA)
+                    canv.drawString((ancho - w) / 2.0, base, linea)
+                    base -= LEADING
+            else:
+                if color_actual is not colors.black:
+                    canv.setFillColor(colors.black)
+                    color_actual = colors.black
+                if fuente_actual != FUENTE:
+                    canv.setFont(FUENTE, TAM_CELDA)
+                    fuente_actual = FUENTE
+                # valign MIDDLE: cada celda se centra en el alto de la fila
+                for i, lineas_celda in enumerate(fila.lineas):
+                    alto_texto = len(lineas_celda) * LEADING
+                    base = y - (fila.alto - alto_texto) / 2.0 - TAM_CELDA
+                    for linea in lineas_celda:
+                        if linea:
+                            w = ancho_texto(linea, FUENTE, TAM_CELDA)
+                            if ALINEACIONES[i] == 'R':
+                                x = xs[i + 1] - PAD_X - w
+                            else:
+                                x = xs[i] + (widths[i] - w) / 2.0
+                            canv.drawString(x, base, linea)
+                        base -= LEADING
+            y -= fila.alto
@@ -0,0 +1,155 @@
+"""
+Pre-render de exportaciones en segundo plano.
+
+Cuando se crea, edita o cambia de estatus una cotización, el controlador
+llama a ``prerender.encolar``: un pool de hilos genera el PDF y el Excel en
+cuanto puede, para que la descarga que casi siempre sigue (el formulario
+redirige directo a ``/export/pdf``) ya encuentre el archivo hecho.
+
+Los archivos van a ``archivos_exportacion`` (uno por versión de la
+cotización): la descarga entrega el que ya está, espera el que se está
+generando o lo genera ella misma si el trabajo ni siquiera empezó. Si llega
+otra edición de la misma cotización antes de que el trabajo anterior
+empiece, el anterior se descarta.
+
+Desactivado por omisión (``PRERENDER=1`` lo activa).
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from src.services.exportaciones import EXTENSIONES, archivos_exportacion, huella_exportacion
+from src.services.metricas import metricas
+
+
+logger = logging.getLogger('cotiz.prerender')
+
+metricas.describir('cotiz_prerender_trabajos_total', 'counter',
+                   'Trabajos de pre-render por formato y resultado (generado/vigente/descartado/error)')
+
+
+class Trabajo(NamedTuple):
+    cotizacion_id: int
+    formato: str
+
+
+class PreRender:
+
+    def __init__(self):
+        self.app: Any = None  # None = desactivado
+        self.hilos = 2
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._trabajos: Dict[Tuple[int, str], Trabajo] = {}  # el último encolado de cada cotización y formato
+        self._servicios = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self) -> bool:
+        return self.app is not None
+
+    def configurar(self, app: Any, hilos: int = 2) -> None:
+        """``app`` es la aplicación Flask (los hilos abren su contexto), o None para desactivarlo."""
+        self.apagar()
+        self.app = app
+        self.hilos = max(1, hilos)
+        with self._lock:
+            self._trabajos.clear()
+        self._servicios = threading.local()
+
+    def apagar(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _asegurar_pool(self) -> ThreadPoolExecutor:
+        # Un pool por proceso: el de un proceso padre no sobrevive al fork
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='cotiz-prerender')
+                    self._pid = os.getpid()
+        return self._pool
+
+    # ══════════════════════════════════════════════════════════
+    # ENCOLAR Y EJECUTAR
+    # ══════════════════════════════════════════════════════════
+
+    def encolar(self, cotizacion_id: int) -> None:
+        """Programa el PDF y el Excel de la cotización; reemplaza lo que siguiera pendiente."""
+        if not self.activo:
+            return
+        pool = self._asegurar_pool()
+        for formato in EXTENSIONES:
+            # Una instancia nueva por edición: el trabajo anterior deja de ser el vigente
+            trabajo = Trabajo(cotizacion_id, formato)
+            with self._lock:
+                self._trabajos[(cotizacion_id, formato)] = trabajo
+            pool.submit(self._ejecutar, trabajo)
+
+    def descartar(self, cotizacion_id: int) -> None:
+        """Olvida los trabajos pendientes de una cotización eliminada."""
+        with self._lock:
+            for formato in EXTENSIONES:
+                self._trabajos.pop((cotizacion_id, formato), None)
+
+    def _tomar(self, trabajo: Trabajo) -> bool:
+        """True si ``trabajo`` sigue siendo el último encolado (y deja de estar pendiente)."""
+        clave = (trabajo.cotizacion_id, trabajo.formato)
+        with self._lock:
+            if self._trabajos.get(clave) is not trabajo:
+                return False
+            del self._trabajos[clave]
+            return True
+
+    def _ejecutar(self, trabajo: Trabajo) -> None:
+        etiquetas = {'formato': trabajo.formato}
+        if not self._tomar(trabajo):
+            # Llegó otra edición mientras esperaba en la cola
+            metricas.incrementar('cotiz_prerender_trabajos_total', 1, {**etiquetas, 'resultado': 'descartado'})
+            return
+        try:
+            with self.app.app_context():
+                from src.models.dto import cargar_cotizacion, cargar_empresa, EmpresaDTO
+                cotizacion = cargar_cotizacion(trabajo.cotizacion_id)
+                if cotizacion is None:
+                    return
+                empresa = cargar_empresa() or EmpresaDTO()
+                servicio = self._servicio(trabajo.formato)
+                _, origen = archivos_exportacion.obtener_o_generar(
+                    trabajo.cotizacion_id, trabajo.formato,
+                    huella_exportacion(cotizacion, empresa, servicio.identidad()),
+                    lambda: servicio.generar_cotizacion(cotizacion, empresa),
+                )
+            # existente/esperado: ya lo había generado una descarga u otro worker
+            resultado = 'generado' if origen == 'generado' else 'vigente'
+            metricas.incrementar('cotiz_prerender_trabajos_total', 1, {**etiquetas, 'resultado': resultado})
+        except Exception:
+            logger.exception('Pre-render de la cotización %s (%s) falló', trabajo.cotizacion_id, trabajo.formato)
+            metricas.incrementar('cotiz_prerender_trabajos_total', 1, {**etiquetas, 'resultado': 'error'})
+
+    def _servicio(self, formato: str) -> Any:
+        """Servicio propio de cada hilo, con su carpeta de trabajo (los nombres no chocan)."""
+        servicio = getattr(self._servicios, formato, None)
+        if servicio is None:
+            config = self.app.config
+            temporal = os.path.join(archivos_exportacion.directorio,
+                                    f'.prerender-{os.getpid()}-{threading.get_ident()}')
+            if formato == 'pdf':
+                from src.services.pdf_service import PDFService
+                servicio = PDFService(
+                    temporal,
+                    umbral_tabla_rapida=config['PDF_UMBRAL_TABLA_RAPIDA'],
+                    umbral_paralelo=config['PDF_UMBRAL_PARALELO'],
+                    procesos_paralelo=config['PDF_PROCESOS'],
+                )
+            else:
+                from src.services.excel_service import ExcelService
+                servicio = ExcelService(temporal, motor=config['EXCEL_MOTOR'])
+            setattr(self._servicios, formato, servicio)
+        return servicio
+
+
+prerender = PreRender()
@@ -0,0 +1,708 @@
+"""
+Motor XLSX directo para el formato Pro-Forma.
+
+Escribe las partes SpreadsheetML (hoja, estilos, cadenas compartidas, dibujo
+con el logo y los iconos) como texto y las empaqueta con ``zipfile``, sin
+crear el modelo de objetos de openpyxl: cada celda es un fragmento de XML que
+apunta a un estilo ya registrado en ``ESTILOS_XML``, que se arma una sola vez.
+
+Produce la misma hoja que ``ExcelService`` con openpyxl (valores, fórmulas,
+estilos, combinaciones, alturas, anchos, imágenes y configuración de
+impresión); ``python -m benchmarks.excel_motores`` lo verifica celda por celda.
+Con ``plantilla=True`` la parte que sólo depende de la empresa (encabezado,
+iconos, configuración de página, estilos, imágenes y demás partes fijas del
+paquete) se arma una vez y se reutiliza ya serializada; en cada cotización
+sólo se escriben las filas variables. La plantilla se reconstruye cuando
+cambian los datos de la empresa o los archivos del logo y los iconos.
+
+Dos diferencias deliberadas: un texto que empieza con ``=`` se escribe como
+texto (openpyxl lo convertiría en fórmula) y los caracteres de control que XML
+no admite se quitan (openpyxl levanta ``IllegalCharacterError``).
+"""
+import os
+import re
+import threading
+import zipfile
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from src.models.dto import CotizacionDTO, EmpresaDTO, LineaDTO
+from src.services.imagenes import optimizador_imagenes
+from src.services.metricas import medir, metricas
+
+
+# ── Mismos colores corporativos que ExcelService ──
+AZUL_CORP = '08568D'
+GRIS_CORP = 'F3F3F3'
+
+COLUMNAS = 'ABCDE'
+EMU_POR_PIXEL = 9525
+
+# Filas mínimas de la tabla de conceptos (se rellenan con filas vacías)
+MIN_FILAS_TABLA = 18
+
+
+def fecha_proforma(fecha: Any) -> str:
+    """Fecha de la cotización como dd/mm/aaaa (o tal cual si no es ISO)."""
+    try:
+        return datetime.strptime(str(fecha), '%Y-%m-%d').strftime('%d/%m/%Y')
+    except (ValueError, TypeError):
+        return str(fecha) if fecha else datetime.now().strftime('%d/%m/%Y')
+
+
+def filas_de_relleno(detalles: Sequence[LineaDTO]) -> int:
+    """Filas vacías que completan la tabla hasta ``MIN_FILAS_TABLA``."""
+    data_count = sum(1 for d in detalles if d.cantidad)
+    group_count = len(set(d.grupo for d in detalles if d.grupo))
+    return max(0, MIN_FILAS_TABLA - (data_count + group_count))
+
+
+metricas.describir('cotiz_excel_plantilla_total', 'counter',
+                   'Usos de la plantilla del Excel por resultado (reutilizada/construida)')
+
+
+# ══════════════════════════════════════════════════════════
+#  ESTILOS (styles.xml precalculado)
+# ══════════════════════════════════════════════════════════
+
+def _color(rgb: str) -> str:
+    # ARGB con alfa 00, igual que openpyxl
+    return f'<color rgb="00{rgb}"/>'
+
+
+def _fuente(tam: int, color: str, negrita: bool = False, cursiva: bool = False) -> str:
+    estilo = ('<b val="1"/>' if negrita else '') + ('<i val="1"/>' if cursiva else '')
+    return f'<font>{estilo}<sz val="{tam}"/>{_color(color)}<name val="Arial"/></font>'
+
+
+def _borde(estilo: str, color: str, lados: Tuple[str, ...] = ('left', 'right', 'top', 'bottom')) -> str:
+    partes = ''.join(
+        f'<{lado} style="{estilo}">{_color(color)}</{lado}>' if lado in lados else f'<{lado}/>'
+        for lado in ('left', 'right', 'top', 'bottom')
+    )
+    return f'<border>{partes}<diagonal/></border>'
+
+
+def _relleno(rgb: str) -> str:
+    return (f'<fill><patternFill patternType="solid"><fgColor rgb="00{rgb}"/>'
+            f'<bgColor rgb="00{rgb}"/></patternFill></fill>')
+
+
+FUENTES = (
+    '<font><sz val="11"/><color theme="1"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font>',
+    _fuente(22, AZUL_CORP, negrita=True),       # 1 PRO-FORMA
+    _fuente(9, '555555'),                       # 2 datos de la empresa
+    _fuente(10, AZUL_CORP, negrita=True),       # 3 etiquetas Fecha/N°, grupo
+    _fuente(10, '000000'),                      # 4 datos de la tabla y totales
+    _fuente(11, 'FFFFFF', negrita=True),        # 5 encabezado azul y Pagado
+    _fuente(10, '000000', negrita=True),        # 6 etiquetas de totales
+    _fuente(9, AZUL_CORP, negrita=True),        # 7 título de términos y pie
+    _fuente(8, '555555'),                       # 8 términos
+    _fuente(8, '888888', cursiva=True),         # 9 pie secundario
+)
+RELLENOS = (
+    '<fill><patternFill patternType="none"/></fill>',
+    '<fill><patternFill patternType="gray125"/></fill>',
+    _relleno(GRIS_CORP),                        # 2
+    _relleno(AZUL_CORP),                        # 3
+)
+BORDES = (
+    '<border><left/><right/><top/><bottom/><diagonal/></border>',
+    _borde('thin', AZUL_CORP),                  # 1 cajas Fecha/N°
+    _borde('thin', 'FFFFFF'),                   # 2 encabezado de tabla
+    _borde('thin', 'CCCCCC'),                   # 3 celdas de la tabla
+    _borde('thin', 'CCCCCC', ('bottom',)),      # 4 valores de totales
+    _borde('medium', AZUL_CORP),                # 5 Pagado
+)
+
+_CENTRO = '<alignment horizontal="center" vertical="center" wrapText="1"/>'
+_IZQUIERDA = '<alignment horizontal="left" vertical="center" wrapText="1"/>'
+_DERECHA = '<alignment horizontal="right" vertical="center"/>'
+_CENTRO_SIN_AJUSTE = '<alignment horizontal="center" vertical="center"/>'
+FORMATO_MONEDA = 4  # '#,##0.00' (formato integrado)
+
+
+def _xf(fuente: int = 0, relleno: int = 0, borde: int = 0, formato: int = 0, alineacion: str = '') -> str:
+    atributos = f'numFmtId="{formato}" fontId="{fuente}" fillId="{relleno}" borderId="{borde}" xfId="0"'
+    if formato:
+        atributos += ' applyNumberFormat="1"'
+    if alineacion:
+        return f'<xf {atributos} applyAlignment="1">{alineacion}</xf>'
+    return f'<xf {atributos}/>'
+
+
+# Índices de cellXfs que usan las celdas
+(XF_NORMAL, XF_PROFORMA, XF_EMPRESA, XF_INFO_ETIQUETA, XF_INFO_VALOR, XF_ENCABEZADO,
+ XF_GRUPO, XF_BORDE, XF_MONEDA, XF_TEXTO, XF_MONEDA_VACIA, XF_TOTAL_ETIQUETA,
+ XF_TOTAL_VALOR, XF_PAGADO_ETIQUETA, XF_PAGADO_RELLENO, XF_PAGADO_VALOR,
+ XF_TERMINOS_TITULO, XF_TERMINOS, XF_PIE, XF_PIE_SUB) = range(20)
+
+FORMATOS_CELDA = (
+    _xf(),
+    _xf(fuente=1, alineacion=_DERECHA),
+    _xf(fuente=2, alineacion='<alignment horizontal="left" vertical="center" wrapText="1" indent="2"/>'),
+    _xf(fuente=3, relleno=2, borde=1, alineacion=_CENTRO),
+    _xf(fuente=4, borde=1, alineacion=_CENTRO),
+    _xf(fuente=5, relleno=3, borde=2, alineacion=_CENTRO),
+    _xf(fuente=3, relleno=2, borde=3, alineacion=_CENTRO),
+    _xf(borde=3),
+    _xf(fuente=4, borde=3, formato=FORMATO_MONEDA, alineacion=_DERECHA),
+    _xf(fuente=4, borde=3, alineacion=_CENTRO),
+    _xf(borde=3, formato=FORMATO_MONEDA),
+    _xf(fuente=6, alineacion=_DERECHA),
+    _xf(fuente=4, borde=4, formato=FORMATO_MONEDA, alineacion=_DERECHA),
+    _xf(fuente=5, relleno=3, borde=5, alineacion=_DERECHA),
+    _xf(relleno=3, borde=5),
+    _xf(fuente=5, relleno=3, borde=5, formato=FORMATO_MONEDA, alineacion=_DERECHA),
+    _xf(fuente=7, alineacion=_IZQUIERDA),
+    _xf(fuente=8, alineacion=_IZQUIERDA),
+    _xf(fuente=7, alineacion=_CENTRO_SIN_AJUSTE),
+    _xf(fuente=9, alineacion=_CENTRO_SIN_AJUSTE),
+)
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+ESTILOS_XML = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet xmlns="{NS_MAIN}">'
+    f'<fonts count="{len(FUENTES)}">{"".join(FUENTES)}</fonts>'
+    f'<fills count="{len(RELLENOS)}">{"".join(RELLENOS)}</fills>'
+    f'<borders count="{len(BORDES)}">{"".join(BORDES)}</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    f'<cellXfs count="{len(FORMATOS_CELDA)}">{"".join(FORMATOS_CELDA)}</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+).encode('utf-8')
+
+
+# ══════════════════════════════════════════════════════════
+#  CADENAS COMPARTIDAS
+# ══════════════════════════════════════════════════════════
+
+_ILEGALES = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _si(texto: str) -> str:
+    texto = _ILEGALES.sub('', texto)
+    preservar = texto != texto.strip() or '\n' in texto
+    espacio = ' xml:space="preserve"' if preservar else ''
+    return f'<si><t{espacio}>{escape(texto)}</t></si>'
+
+
+ENCABEZADOS_TABLA = ('IVA', 'CANT.', 'DESCRIPCIÓN', 'P. UNITARIO', 'TOTAL')
+ETIQUETAS_TOTALES = ('Total parcial', 'Descuento ($)', 'NETO', 'Impuesto (IVA)', 'Envío Delivery', 'Pagado')
+
+# Textos fijos del formato: siempre ocupan los primeros índices de la tabla
+CADENAS_FIJAS = (
+    'PRO-FORMA', 'Fecha', 'N° de Pro-forma', *ENCABEZADOS_TABLA, *ETIQUETAS_TOTALES,
+    'Términos y Condiciones:', 'Quedo a sus ordenes', 'Saludos!',
+)
+_INDICES_FIJOS = {texto: i for i, texto in enumerate(CADENAS_FIJAS)}
+_SI_FIJAS = ''.join(_si(texto) for texto in CADENAS_FIJAS)
+
+
+class TablaCadenas:
+    """sharedStrings.xml: cada texto distinto se guarda una vez."""
+
+    def __init__(self):
+        self._indices: Dict[str, int] = dict(_INDICES_FIJOS)
+        self._nuevas: List[str] = []
+        self.referencias = 0
+
+    def indice(self, texto: str) -> int:
+        self.referencias += 1
+        i = self._indices.get(texto)
+        if i is None:
+            i = self._indices[texto] = len(self._indices)
+            self._nuevas.append(_si(texto))
+        return i
+
+    def copia(self) -> 'TablaCadenas':
+        tabla = TablaCadenas.__new__(TablaCadenas)
+        tabla._indices = dict(self._indices)
+        tabla._nuevas = list(self._nuevas)
+        tabla.referencias = self.referencias
+        return tabla
+
+    def xml(self) -> bytes:
+        return (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<sst xmlns="{NS_MAIN}" count="{self.referencias}" uniqueCount="{len(self._indices)}">'
+            f'{_SI_FIJAS}{"".join(self._nuevas)}</sst>'
+        ).encode('utf-8')
+
+
+# ══════════════════════════════════════════════════════════
+#  HOJA
+# ══════════════════════════════════════════════════════════
+
+def _numero(valor: Any) -> str:
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class HojaDirecta:
+    """Celdas (ya como XML), alturas, combinaciones e imágenes de una hoja."""
+
+    def __init__(self):
+        self.cadenas = TablaCadenas()
+        self.filas: Dict[int, List[Tuple[int, str]]] = {}
+        self.alturas: Dict[int, float] = {}
+        self.combinadas: List[str] = []
+        self.imagenes: List[Tuple[str, int, int, int]] = []  # (ruta, fila, ancho px, alto px)
+
+    def copia(self) -> 'HojaDirecta':
+        hoja = HojaDirecta.__new__(HojaDirecta)
+        hoja.cadenas = self.cadenas.copia()
+        hoja.filas = {fila: list(celdas) for fila, celdas in self.filas.items()}
+        hoja.alturas = dict(self.alturas)
+        hoja.combinadas = list(self.combinadas)
+        hoja.imagenes = list(self.imagenes)
+        return hoja
+
+    def _celda(self, fila: int, col: int, xml: str) -> None:
+        celdas = self.filas.get(fila)
+        if celdas is None:
+            celdas = self.filas[fila] = []
+        celdas.append((col, xml))
+
+    def texto(self, fila: int, col: int, valor: Any, estilo: int) -> None:
+        if valor is None:
+            self.vacia(fila, col, estilo)
+            return
+        ref = f'{COLUMNAS[col - 1]}{fila}'
+        self._celda(fila, col, f'<c r="{ref}" s="{estilo}" t="s"><v>{self.cadenas.indice(str(valor))}</v></c>')
+
+    def numero(self, fila: int, col: int, valor: Any, estilo: int) -> None:
+        if valor is None:
+            self.vacia(fila, col, estilo)
+            return
+        self._celda(fila, col, f'<c r="{COLUMNAS[col - 1]}{fila}" s="{estilo}"><v>{_numero(valor)}</v></c>')
+
+    def formula(self, fila: int, col: int, formula: str, estilo: int) -> None:
+        self._celda(fila, col, f'<c r="{COLUMNAS[col - 1]}{fila}" s="{estilo}"><f>{escape(formula)}</f></c>')
+
+    def vacia(self, fila: int, col: int, estilo: int) -> None:
+        self._celda(fila, col, f'<c r="{COLUMNAS[col - 1]}{fila}" s="{estilo}"/>')
+
+    def combinar(self, rango: str) -> None:
+        self.combinadas.append(rango)
+
+    def xml(self, fijas: 'PartesFijas', ultima_fila: int) -> bytes:
+        partes = [fijas.inicio_hoja, f'<dimension ref="A1:E{ultima_fila}"/>', fijas.columnas_hoja]
+        for fila in sorted(self.filas.keys() | self.alturas.keys()):
+            alto = self.alturas.get(fila)
+            atributos = f' ht="{_numero(alto)}" customHeight="1"' if alto is not None else ''
+            celdas = self.filas.get(fila, ())
+            if len(celdas) > 1:
+                celdas = sorted(celdas)
+            partes.append(f'<row r="{fila}"{atributos}>')
+            partes.extend(xml for _, xml in celdas)
+            partes.append('</row>')
+        partes.append('</sheetData>')
+        if self.combinadas:
+            partes.append(f'<mergeCells count="{len(self.combinadas)}">')
+            partes.extend(f'<mergeCell ref="{rango}"/>' for rango in self.combinadas)
+            partes.append('</mergeCells>')
+        partes.append(fijas.cierre_hoja)
+        return ''.join(partes).encode('utf-8')
+
+
+# ══════════════════════════════════════════════════════════
+#  EMPAQUETADO
+# ══════════════════════════════════════════════════════════
+
+_TIPOS_IMAGEN = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png', '.gif': 'gif'}
+
+
+def _relaciones(relaciones: Sequence[Tuple[str, str]]) -> bytes:
+    """Parte .rels con (tipo, destino); los Id son rId1, rId2, ..."""
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="{NS_PKG_REL}">'
+        + ''.join(f'<Relationship Id="rId{i}" Type="{tipo}" Target="{destino}"/>'
+                  for i, (tipo, destino) in enumerate(relaciones, start=1))
+        + '</Relationships>'
+    ).encode('utf-8')
+
+
+def _dibujo(imagenes: Sequence[Tuple[str, int, int, int]]) -> bytes:
+    anclas = []
+    for i, (_, fila, ancho, alto) in enumerate(imagenes, start=1):
+        anclas.append(
+            f'<xdr:oneCellAnchor><xdr:from><xdr:col>0</xdr:col><xdr:colOff>0</xdr:colOff>'
+            f'<xdr:row>{fila - 1}</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:from>'
+            f'<xdr:ext cx="{ancho * EMU_POR_PIXEL}" cy="{alto * EMU_POR_PIXEL}"/>'
+            f'<xdr:pic><xdr:nvPicPr><xdr:cNvPr id="{i}" name="Image {i}" descr="Picture"/><xdr:cNvPicPr/>'
+            f'</xdr:nvPicPr><xdr:blipFill><a:blip r:embed="rId{i}" cstate="print"/>'
+            f'<a:stretch><a:fillRect/></a:stretch></xdr:blipFill>'
+            f'<xdr:spPr><a:prstGeom prst="rect"/></xdr:spPr></xdr:pic><xdr:clientData/></xdr:oneCellAnchor>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<xdr:wsDr xmlns:xdr="http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing"'
+        ' xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+        f' xmlns:r="{NS_REL}">{"".join(anclas)}</xdr:wsDr>'
+    ).encode('utf-8')
+
+
+REL_DOCUMENTO = f'{NS_REL}/officeDocument'
+REL_HOJA = f'{NS_REL}/worksheet'
+REL_ESTILOS = f'{NS_REL}/styles'
+REL_CADENAS = f'{NS_REL}/sharedStrings'
+REL_DIBUJO = f'{NS_REL}/drawing'
+REL_IMAGEN = f'{NS_REL}/image'
+REL_CORE = 'http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties'
+
+_TIPO_OFFICE = 'application/vnd.openxmlformats-officedocument'
+
+
+class PartesFijas(NamedTuple):
+    """Lo que no depende de la cotización, ya serializado."""
+    archivos: Tuple[Tuple[str, bytes, int], ...]  # (nombre, contenido, compresión)
+    inicio_hoja: str    # <worksheet> hasta antes de <dimension>
+    columnas_hoja: str  # de <sheetViews> hasta <sheetData>
+    cierre_hoja: str    # de <printOptions> hasta </worksheet>
+
+
+def partes_fijas(imagenes: Sequence[Tuple[str, int, int, int]], anchos: Sequence[float]) -> PartesFijas:
+    """Tipos de contenido, relaciones, estilos, dibujo, imágenes y marco de la hoja."""
+    # Imágenes con el mismo contenido comparten una sola parte en xl/media
+    medios: List[Tuple[str, bytes]] = []
+    destinos: List[str] = []
+    por_contenido: Dict[bytes, str] = {}
+    for ruta, _, _, _ in imagenes:
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        nombre = por_contenido.get(datos)
+        if nombre is None:
+            extension = _TIPOS_IMAGEN.get(os.path.splitext(ruta)[1].lower(), 'png')
+            nombre = por_contenido[datos] = f'image{len(medios) + 1}.{extension}'
+            medios.append((nombre, datos))
+        destinos.append(nombre)
+
+    tipos_imagen = sorted({nombre.rsplit('.', 1)[1] for nombre, _ in medios})
+    overrides = [
+        ('/xl/workbook.xml', f'{_TIPO_OFFICE}.spreadsheetml.sheet.main+xml'),
+        ('/xl/worksheets/sheet1.xml', f'{_TIPO_OFFICE}.spreadsheetml.worksheet+xml'),
+        ('/xl/styles.xml', f'{_TIPO_OFFICE}.spreadsheetml.styles+xml'),
+        ('/xl/sharedStrings.xml', f'{_TIPO_OFFICE}.spreadsheetml.sharedStrings+xml'),
+        ('/docProps/core.xml', 'application/vnd.openxmlformats-package.core-properties+xml'),
+    ]
+    if medios:
+        overrides.append(('/xl/drawings/drawing1.xml', f'{_TIPO_OFFICE}.drawing+xml'))
+    tipos = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        + ''.join(f'<Default Extension="{ext}" ContentType="image/{ext}"/>' for ext in tipos_imagen)
+        + ''.join(f'<Override PartName="{parte}" ContentType="{tipo}"/>' for parte, tipo in overrides)
+        + '</Types>'
+    ).encode('utf-8')
+
+    deflate, stored = zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED
+    archivos = [
+        ('[Content_Types].xml', tipos, deflate),
+        ('_rels/.rels', _relaciones([(REL_DOCUMENTO, 'xl/workbook.xml'), (REL_CORE, 'docProps/core.xml')]), deflate),
+        ('xl/_rels/workbook.xml.rels', _relaciones([
+            (REL_HOJA, 'worksheets/sheet1.xml'), (REL_ESTILOS, 'styles.xml'), (REL_CADENAS, 'sharedStrings.xml'),
+        ]), deflate),
+        ('xl/styles.xml', ESTILOS_XML, deflate),
+    ]
+    if medios:
+        archivos += [
+            ('xl/worksheets/_rels/sheet1.xml.rels', _relaciones([(REL_DIBUJO, '../drawings/drawing1.xml')]), deflate),
+            ('xl/drawings/drawing1.xml', _dibujo(imagenes), deflate),
+            ('xl/drawings/_rels/drawing1.xml.rels',
+             _relaciones([(REL_IMAGEN, f'../media/{nombre}') for nombre in destinos]), deflate),
+        ]
+        # JPEG/PNG ya vienen comprimidos
+        archivos += [(f'xl/media/{nombre}', datos, stored) for nombre, datos in medios]
+
+    return PartesFijas(
+        archivos=tuple(archivos),
+        inicio_hoja=(
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+            '<sheetPr><pageSetUpPr fitToPage="1"/></sheetPr>'
+        ),
+        columnas_hoja=(
+            '<sheetViews><sheetView showGridLines="0" workbookViewId="0"/></sheetViews>'
+            '<sheetFormatPr defaultRowHeight="15"/><cols>'
+            + ''.join(f'<col min="{i}" max="{i}" width="{_numero(ancho)}" customWidth="1"/>'
+                      for i, ancho in enumerate(anchos, start=1))
+            + '</cols><sheetData>'
+        ),
+        cierre_hoja=(
+            '<printOptions horizontalCentered="1"/>'
+            '<pageMargins left="0.35" right="0.35" top="0.3" bottom="0.3" header="0.1" footer="0.1"/>'
+            '<pageSetup paperSize="1" orientation="portrait" fitToWidth="1" fitToHeight="1"/>'
+            + ('<drawing r:id="rId1"/>' if medios else '')
+            + '</worksheet>'
+        ),
+    )
+
+
+def empaquetar(hoja: HojaDirecta, fijas: PartesFijas, ultima_fila: int) -> bytes:
+    """Arma el .xlsx completo (zip) de un libro con una sola hoja."""
+    libro = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_REL}"><bookViews><workbookView/></bookViews>'
+        '<sheets><sheet name="Pro-Forma" sheetId="1" r:id="rId1"/></sheets>'
+        '<definedNames><definedName name="_xlnm.Print_Area" localSheetId="0">'
+        f"'Pro-Forma'!$A$1:$E${ultima_fila}</definedName></definedNames>"
+        '<calcPr calcId="124519" fullCalcOnLoad="1"/></workbook>'
+    )
+    ahora = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    core = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties"'
+        ' xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/"'
+        ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        f'<dcterms:created xsi:type="dcterms:W3CDTF">{ahora}</dcterms:created>'
+        f'<dcterms:modified xsi:type="dcterms:W3CDTF">{ahora}</dcterms:modified></cp:coreProperties>'
+    )
+
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+        for nombre, contenido, compresion in fijas.archivos:
+            z.writestr(nombre, contenido, compress_type=compresion)
+        z.writestr('docProps/core.xml', core)
+        z.writestr('xl/workbook.xml', libro)
+        z.writestr('xl/worksheets/sheet1.xml', hoja.xml(fijas, ultima_fila))
+        # Después de la hoja: la tabla de cadenas se llena al escribir las celdas
+        z.writestr('xl/sharedStrings.xml', hoja.cadenas.xml())
+    return buffer.getvalue()
+
+
+# ══════════════════════════════════════════════════════════
+#  FORMATO PRO-FORMA
+# ══════════════════════════════════════════════════════════
+
+class PlantillaProforma(NamedTuple):
+    clave: Tuple             # empresa + firma de los archivos de imagen
+    hoja: HojaDirecta        # encabezado y encabezado de tabla, sin fecha ni número
+    siguiente_fila: int      # primera fila de conceptos
+    fijas: PartesFijas
+
+
+class ProformaXML:
+    """
+    Misma maquetación que ``ExcelService`` (filas, combinaciones, fórmulas y
+    estilos), escrita sobre una ``HojaDirecta``.
+    """
+
+    def __init__(self, anchos: Sequence[float], logo_path: str, iconos: Dict[str, str]):
+        self.anchos = tuple(anchos)
+        self.logo_path = logo_path
+        self.iconos = iconos
+        self._plantilla: Optional[PlantillaProforma] = None
+        self._lock = threading.Lock()
+
+    # ══════════════════════════════════════════════════════════
+    #  PLANTILLA POR EMPRESA
+    # ══════════════════════════════════════════════════════════
+
+    def _firma_imagenes(self) -> Tuple:
+        """(ruta, mtime, tamaño) del logo y los iconos: si cambia un archivo, cambia la firma."""
+        firma = []
+        for ruta in (self.logo_path, *self.iconos.values()):
+            try:
+                st = os.stat(ruta)
+                firma.append((ruta, st.st_mtime_ns, st.st_size))
+            except OSError:
+                firma.append((ruta, None, None))
+        # También cambia si se reconfigura la optimización de imágenes
+        return (*firma, optimizador_imagenes.activo, optimizador_imagenes.dpi)
+
+    def _construir_plantilla(self, empresa: EmpresaDTO, clave: Tuple) -> PlantillaProforma:
+        hoja = HojaDirecta()
+        row = self._encabezado(hoja, empresa)
+        row = self._encabezado_tabla(hoja, row)
+        return PlantillaProforma(clave, hoja, row, partes_fijas(hoja.imagenes, self.anchos))
+
+    def plantilla(self, empresa: EmpresaDTO) -> PlantillaProforma:
+        """Plantilla de ``empresa``; se reconstruye si la empresa o las imágenes cambiaron."""
+        clave = (empresa, self._firma_imagenes())
+        plantilla = self._plantilla
+        if plantilla is not None and plantilla.clave == clave:
+            metricas.incrementar('cotiz_excel_plantilla_total', 1, {'resultado': 'reutilizada'})
+            return plantilla
+        with self._lock:
+            plantilla = self._plantilla
+            if plantilla is None or plantilla.clave != clave:
+                with medir('excel', 'plantilla'):
+                    plantilla = self._plantilla = self._construir_plantilla(empresa, clave)
+                metricas.incrementar('cotiz_excel_plantilla_total', 1, {'resultado': 'construida'})
+        return plantilla
+
+    def invalidar_plantilla(self) -> None:
+        self._plantilla = None
+
+    # ══════════════════════════════════════════════════════════
+    #  SECCIONES
+    # ══════════════════════════════════════════════════════════
+
+    def _encabezado(self, hoja: HojaDirecta, empresa: EmpresaDTO) -> int:
+        hoja.alturas[1] = 10
+        for r in range(2, 5):
+            hoja.alturas[r] = 25
+        if os.path.exists(self.logo_path):
+            hoja.imagenes.append((optimizador_imagenes.ruta_pixeles(self.logo_path, 170, 72), 2, 170, 72))
+
+        hoja.combinar('D1:E4')
+        hoja.texto(1, 4, 'PRO-FORMA', XF_PROFORMA)
+
+        campos = [
+            ('direccion', empresa.direccion),
+            ('telefono', empresa.telefono),
+            ('email', empresa.email),
+            ('redes_sociales', empresa.redes_sociales),
+            ('rfc', empresa.rfc),
+        ]
+        row = 5
+        for campo, valor in campos:
+            if valor:
+                icono = self.iconos.get(campo, '')
+                if os.path.exists(icono):
+                    hoja.imagenes.append((optimizador_imagenes.ruta_pixeles(icono, 13, 13), row, 13, 13))
+                hoja.combinar(f'A{row}:C{row}')
+                hoja.texto(row, 1, f"   {valor}", XF_EMPRESA)
+                hoja.alturas[row] = 15
+                row += 1
+
+        hoja.texto(5, 4, 'Fecha', XF_INFO_ETIQUETA)
+        hoja.texto(6, 4, 'N° de Pro-forma', XF_INFO_ETIQUETA)
+
+        next_row = max(row, 8) + 1
+        hoja.alturas[next_row] = 6
+        return next_row + 1
+
+    @staticmethod
+    def _datos_cotizacion(hoja: HojaDirecta, cotizacion: CotizacionDTO) -> None:
+        """Valores de las cajas Fecha / N° de Pro-forma (D5:E6)."""
+        hoja.texto(5, 5, fecha_proforma(cotizacion.fecha), XF_INFO_VALOR)
+        hoja.texto(6, 5, cotizacion.numero_cotizacion, XF_INFO_VALOR)
+
+    def _encabezado_tabla(self, hoja: HojaDirecta, row: int) -> int:
+        hoja.alturas[row] = 24
+        for col, texto in enumerate(ENCABEZADOS_TABLA, start=1):
+            hoja.texto(row, col, texto, XF_ENCABEZADO)
+        return row + 1
+
+    def _conceptos(self, hoja: HojaDirecta, row: int, detalles: Sequence[LineaDTO]) -> int:
+        if not detalles:
+            for _ in range(5):
+                self._fila_vacia(hoja, row)
+                row += 1
+            return row
+
+        alturas, celda = hoja.alturas, hoja._celda
+        texto, numero = hoja.texto, hoja.numero
+        current_grupo = None
+        for detalle in detalles:
+            grupo = detalle.grupo
+            if grupo and grupo != current_grupo:
+                current_grupo = grupo
+                hoja.combinar(f'A{row}:E{row}')
+                texto(row, 1, grupo, XF_GRUPO)
+                for col in range(2, 6):
+                    hoja.vacia(row, col, XF_BORDE)
+                alturas[row] = 20
+                row += 1
+
+            alturas[row] = 20
+            cantidad = detalle.cantidad
+            celda(row, 1, f'<c r="A{row}" s="{XF_MONEDA}"><f>E{row}*1.16</f></c>')
+            numero(row, 2, int(cantidad) if cantidad == int(cantidad) else cantidad, XF_TEXTO)
+            texto(row, 3, detalle.descripcion, XF_TEXTO)
+            numero(row, 4, detalle.precio_unitario, XF_MONEDA)
+            celda(row, 5, f'<c r="E{row}" s="{XF_MONEDA}"><f>B{row}*D{row}</f></c>')
+            row += 1
+
+        for _ in range(filas_de_relleno(detalles)):
+            self._fila_vacia(hoja, row)
+            row += 1
+        return row
+
+    @staticmethod
+    def _fila_vacia(hoja: HojaDirecta, row: int) -> None:
+        hoja.alturas[row] = 18
+        hoja.formula(row, 1, f'E{row}*1.16', XF_MONEDA)
+        hoja.vacia(row, 2, XF_BORDE)
+        hoja.vacia(row, 3, XF_BORDE)
+        hoja.vacia(row, 4, XF_MONEDA_VACIA)
+        hoja.numero(row, 5, 0, XF_MONEDA)
+
+    def _totales(self, hoja: HojaDirecta, row: int, data_start: int, data_end: int,
+                 cotizacion: CotizacionDTO) -> int:
+        row += 1
+        descuento = cotizacion.descuento or 0
+        envio = cotizacion.envio_delivery or 0
+        primera = row
+        valores = (
+            f'=SUM(E{data_start}:E{data_end - 1})', descuento, f'=E{primera}-E{primera + 1}',
+            f'=E{primera + 2}*16%', envio, f'=E{primera + 2}+E{primera + 3}+E{primera + 4}',
+        )
+        for i, (etiqueta, valor) in enumerate(zip(ETIQUETAS_TOTALES, valores)):
+            pagado = i == len(ETIQUETAS_TOTALES) - 1
+            hoja.alturas[row] = 20
+            hoja.combinar(f'C{row}:D{row}')
+            hoja.texto(row, 3, etiqueta, XF_PAGADO_ETIQUETA if pagado else XF_TOTAL_ETIQUETA)
+            if pagado:
+                hoja.vacia(row, 4, XF_PAGADO_RELLENO)
+            estilo = XF_PAGADO_VALOR if pagado else XF_TOTAL_VALOR
+            if isinstance(valor, str):
+                hoja.formula(row, 5, valor[1:], estilo)
+            else:
+                hoja.numero(row, 5, valor, estilo)
+            row += 1
+        return row + 1
+
+    def _terminos_y_pie(self, hoja: HojaDirecta, row: int, cotizacion: CotizacionDTO,
+                        empresa: EmpresaDTO) -> int:
+        notas = cotizacion.notas
+        if notas:
+            hoja.combinar(f'A{row}:C{row}')
+            hoja.texto(row, 1, 'Términos y Condiciones:', XF_TERMINOS_TITULO)
+            row += 1
+            for linea in notas.split('\n'):
+                if linea.strip():
+                    hoja.combinar(f'A{row}:C{row}')
+                    hoja.texto(row, 1, linea.strip(), XF_TERMINOS)
+                    hoja.alturas[row] = 14
+                    row += 1
+
+        row += 2
+        for texto, estilo in ((empresa.nombre, XF_PIE), ('Quedo a sus ordenes', XF_PIE_SUB),
+                              ('Saludos!', XF_PIE_SUB)):
+            hoja.combinar(f'A{row}:E{row}')
+            hoja.texto(row, 1, texto, estilo)
+            row += 1
+        return row - 1
+
+    def generar(self, cotizacion: CotizacionDTO, empresa: EmpresaDTO, plantilla: bool = False) -> bytes:
+        """
+        Contenido del .xlsx de la cotización. Con ``plantilla`` el encabezado
+        y las partes fijas salen de la plantilla en caché de la empresa.
+        """
+        if plantilla:
+            base = self.plantilla(empresa)
+        with medir('excel', 'maquetado'):
+            if plantilla:
+                hoja, row, fijas = base.hoja.copia(), base.siguiente_fila, base.fijas
+            else:
+                hoja = HojaDirecta()
+                row = self._encabezado(hoja, empresa)
+                row = self._encabezado_tabla(hoja, row)
+            self._datos_cotizacion(hoja, cotizacion)
+            data_start = row
+            row = self._conceptos(hoja, row, cotizacion.detalles)
+            row = self._totales(hoja, row, data_start, row, cotizacion)
+            last_row = self._terminos_y_pie(hoja, row, cotizacion, empresa)
+        with medir('excel', 'serializacion'):
+            if not plantilla:
+                fijas = partes_fijas(hoja.imagenes, self.anchos)
+            return empaquetar(hoja, fijas, last_row)
@@ -1,8 +1,20 @@
 // JavaScript para Historial de Cotizaciones
 
+// Cotizaciones mostradas y filtros con los que se cargaron; los eventos en vivo
+// las modifican sin volver a pedir la lista
+let historial = [];
+let filtrosAplicados = {};
+
 $(document).ready(function() {
     cargarClientesSelect('filtro-cliente');
     cargarHistorial();
+    suscribirEventos({
+        'cotizacion.creada': function(e) { aplicarCotizacion(e.cotizacion); },
+        'cotizacion.actualizada': function(e) { aplicarCotizacion(e.cotizacion); },
+        'cotizacion.estatus': aplicarEstatus,
+        'cotizacion.eliminada': function(e) { quitarCotizacion(e.cotizacion_id); },
+        'recargar': cargarHistorial
+    });
 });
 
 function aplicarFiltros() {
@@ -28,52 +40,97 @@ function cargarHistorial() {
     
     // Cargar cotizaciones
     $.get('/api/cotizaciones', params, function(data) {
-        const tbody = $('#tabla-historial tbody');
-        tbody.empty();
-        
-        $('#total-resultados').text(`${data.total} resultados`);
-        
-        if (data.cotizaciones.length === 0) {
-            tbody.append(`
-                <tr>
-                    <td colspan="8" class="text-center text-muted">
-                        No hay cotizaciones que coincidan con los filtros
-                    </td>
-                </tr>
-            `);
-            return;
-        }
-        
-        data.cotizaciones.forEach(function(cot) {
-            const estatusBadge = getEstatusBadge(cot.estatus);
-            tbody.append(`
-                <tr>
-                    <td><strong>${cot.numero_cotizacion}</strong></td>
-                    <td>${formatearFecha(cot.fecha)}</td>
-                    <td>${cot.cliente.nombre}</td>
-                    <td>$${formatearMonto(cot.subtotal)}</td>
-                    <td>$${formatearMonto(cot.impuestos)}</td>
-                    <td><strong>$${formatearMonto(cot.total)}</strong></td>
-                    <td>${estatusBadge}</td>
-                    <td>
-                        <div class="btn-group btn-group-sm" role="group">
-                            <button class="btn btn-outline-primary" onclick="verDetalle(${cot.id})" title="Ver detalle">
-                                <i class="bi bi-eye"></i>
-                            </button>
-                            <a href="/api/cotizaciones/${cot.id}/export/pdf" class="btn btn-outline-danger" title="PDF">
-                                <i class="bi bi-file-pdf"></i>
-                            </a>
-                            <a href="/api/cotizaciones/${cot.id}/export/excel" class="btn btn-outline-success" title="Excel">
-                                <i class="bi bi-file-excel"></i>
-                            </a>
-                            <button class="btn btn-outline-danger" onclick="eliminarCotizacion(${cot.id})" title="Eliminar">
-                                <i class="bi bi-trash"></i>
-                            </button>
-                        </div>
-                    </td>
-                </tr>
-            `);
-        });
+        historial = data.cotizaciones;
+        filtrosAplicados = params;
+        renderHistorial();
+    });
+}
+
+// ¿La cotización entra en la lista con los filtros cargados?
+function coincideConFiltros(cot) {
+    const f = filtrosAplicados;
+    if (f.cliente_id && String(cot.cliente_id) !== String(f.cliente_id)) return false;
+    if (f.estatus && cot.estatus !== f.estatus) return false;
+    if (f.fecha_desde && cot.fecha < f.fecha_desde) return false;
+    if (f.fecha_hasta && cot.fecha > f.fecha_hasta) return false;
+    return true;
+}
+
+// Agrega o reemplaza una cotización recibida por evento
+function aplicarCotizacion(cot) {
+    historial = historial.filter(c => c.id !== cot.id);
+    if (coincideConFiltros(cot)) {
+        historial.push(cot);
+        ordenarCotizaciones(historial);
+    }
+    renderHistorial();
+}
+
+function aplicarEstatus(evento) {
+    const cot = historial.find(c => c.id === evento.cotizacion_id);
+    if (!cot) {
+        // Puede entrar al filtro por estatus, pero no tenemos sus datos
+        if (filtrosAplicados.estatus === evento.estatus) cargarHistorial();
+        return;
+    }
+    cot.estatus = evento.estatus;
+    if (!coincideConFiltros(cot)) {
+        historial = historial.filter(c => c.id !== cot.id);
+    }
+    renderHistorial();
+}
+
+function quitarCotizacion(cotizacionId) {
+    historial = historial.filter(c => c.id !== cotizacionId);
+    renderHistorial();
+}
+
+function renderHistorial() {
+    const tbody = $('#tabla-historial tbody');
+    tbody.empty();
+    
+    $('#total-resultados').text(`${historial.length} resultados`);
+    
+    if (historial.length === 0) {
+        tbody.append(`
+            <tr>
+                <td colspan="8" class="text-center text-muted">
+                    No hay cotizaciones que coincidan con los filtros
+                </td>
+            </tr>
+        `);
+        return;
+    }
+    
+    historial.forEach(function(cot) {
+        const estatusBadge = getEstatusBadge(cot.estatus);
+        tbody.append(`
+            <tr>
+                <td><strong>${cot.numero_cotizacion}</strong></td>
+                <td>${formatearFecha(cot.fecha)}</td>
+                <td>${cot.cliente.nombre}</td>
+                <td>$${formatearMonto(cot.subtotal)}</td>
+                <td>$${formatearMonto(cot.impuestos)}</td>
+                <td><strong>$${formatearMonto(cot.total)}</strong></td>
+                <td>${estatusBadge}</td>
+                <td>
+                    <div class="btn-group btn-group-sm" role="group">
+                        <button class="btn btn-outline-primary" onclick="verDetalle(${cot.id})" title="Ver detalle">
+                            <i class="bi bi-eye"></i>
+                        </button>
+                        <a href="/api/cotizaciones/${cot.id}/export/pdf" class="btn btn-outline-danger" title="PDF">
+                            <i class="bi bi-file-pdf"></i>
+                        </a>
+                        <a href="/api/cotizaciones/${cot.id}/export/excel" class="btn btn-outline-success" title="Excel">
+                            <i class="bi bi-file-excel"></i>
+                        </a>
+                        <button class="btn btn-outline-danger" onclick="eliminarCotizacion(${cot.id})" title="Eliminar">
+                            <i class="bi bi-trash"></i>
+                        </button>
+                    </div>
+                </td>
+            </tr>
+        `);
     });
 }
 
@@ -164,7 +221,7 @@ function eliminarCotizacion(cotizacionId) {
             method: 'DELETE',
             success: function() {
                 mostrarNotificacion('Cotización eliminada exitosamente', 'success');
-                cargarHistorial();
+                quitarCotizacion(cotizacionId);
             },
             error: function(error) {
                 manejarErrorAPI(error);
@@ -134,18 +134,95 @@ function scrollAlInicio() {
     window.scrollTo({ top: 0, behavior: 'smooth' });
 }
 
-// Cargar clientes para select
-function cargarClientesSelect(elementId, valorSeleccionado = null) {
-    $.get('/api/clientes', function(data) {
-        const select = $(`#${elementId}`);
+// Opciones por consulta del selector de clientes; con más, se pide refinar la búsqueda
+const LIMITE_OPCIONES_CLIENTES = 200;
+
+// Cargar clientes para select (sólo id y nombre; el navegador revalida con ETag).
+// Se piden sólo los que empiezan con lo escrito en el buscador que se agrega
+// junto al select, así el selector funciona con cualquier número de clientes.
+function cargarClientesSelect(elementId, valorSeleccionado = null, prefijo = null) {
+    const select = $(`#${elementId}`);
+    const buscador = prepararBuscadorClientes(select, elementId);
+    if (prefijo === null) prefijo = buscador.val().trim();
+    const seleccionado = valorSeleccionado || select.val();
+    // Sólo la respuesta de la consulta más reciente llena el select
+    const consulta = (select.data('consulta') || 0) + 1;
+    select.data('consulta', consulta);
+    
+    $.get('/api/clientes/opciones', { prefijo: prefijo, limite: LIMITE_OPCIONES_CLIENTES }, function(data) {
+        if (select.data('consulta') !== consulta) return;
         select.empty();
-        select.append('<option value="">Seleccionar cliente...</option>');
-        
+        select.append(new Option(select.data('vacio'), ''));
         data.clientes.forEach(function(cliente) {
-            const selected = valorSeleccionado && cliente.id == valorSeleccionado ? 'selected' : '';
-            select.append(`<option value="${cliente.id}" ${selected}>${cliente.nombre}</option>`);
+            select.append(new Option(cliente.nombre, cliente.id));
+        });
+        $(`#${elementId}-aviso`).toggleClass('d-none', !data.truncado);
+        
+        // El cliente ya elegido se conserva aunque no coincida con la búsqueda
+        if (seleccionado && !data.clientes.some(function(c) { return c.id == seleccionado; })) {
+            $.get(`/api/clientes/${seleccionado}`, function(respuesta) {
+                if (select.data('consulta') !== consulta || !respuesta.cliente) return;
+                select.find('option').first().after(new Option(respuesta.cliente.nombre, respuesta.cliente.id));
+                select.val(String(seleccionado));
+            });
+        } else {
+            select.val(seleccionado ? String(seleccionado) : '');
+        }
+    });
+}
+
+// Agrega (una sola vez) el buscador y el aviso de resultados truncados de un select de clientes
+function prepararBuscadorClientes(select, elementId) {
+    let buscador = $(`#${elementId}-buscar`);
+    if (buscador.length) return buscador;
+    
+    select.data('vacio', select.find('option').first().text() || 'Seleccionar cliente...');
+    const contenedor = select.closest('.input-group').length ? select.closest('.input-group') : select;
+    buscador = $(`<input type="search" class="form-control form-control-sm mb-1" id="${elementId}-buscar"
+                         placeholder="Buscar cliente por nombre..." autocomplete="off">`);
+    contenedor.before(buscador);
+    contenedor.after(`<div class="form-text d-none" id="${elementId}-aviso">
+        Se muestran los primeros ${LIMITE_OPCIONES_CLIENTES} clientes; escriba más letras del nombre para refinar la búsqueda.
+    </div>`);
+    
+    let espera = null;
+    buscador.on('input', function() {
+        clearTimeout(espera);
+        espera = setTimeout(function() { cargarClientesSelect(elementId); }, 250);
+    });
+    return buscador;
+}
+
+// Eventos en vivo de cotizaciones (Server-Sent Events). `manejadores` tiene una
+// función por tipo: 'cotizacion.creada', 'cotizacion.actualizada',
+// 'cotizacion.estatus', 'cotizacion.eliminada' y 'recargar'
+function suscribirEventos(manejadores, reintento) {
+    if (!window.EventSource) return null;
+    const fuente = new EventSource('/api/eventos');
+    Object.keys(manejadores).forEach(function(tipo) {
+        fuente.addEventListener(tipo, function(e) {
+            manejadores[tipo](JSON.parse(e.data));
         });
     });
+    // Lo que cambió mientras no hubo conexión no llega como evento
+    if (reintento && manejadores.recargar) {
+        fuente.addEventListener('open', function() { manejadores.recargar({}); });
+    }
+    fuente.onerror = function() {
+        // Con 503 (servidor sin lugar para más conexiones) el navegador no reintenta solo
+        if (fuente.readyState === EventSource.CLOSED) {
+            setTimeout(function() { suscribirEventos(manejadores, true); }, 30000);
+        }
+    };
+    return fuente;
+}
+
+// Ordena cotizaciones como el listado de la API: más recientes primero
+function ordenarCotizaciones(cotizaciones) {
+    return cotizaciones.sort(function(a, b) {
+        if (a.fecha !== b.fecha) return a.fecha < b.fecha ? 1 : -1;
+        return b.id - a.id;
+    });
 }
 
 // Event listener para cambios en select de cliente
@@ -0,0 +1,136 @@
+"""
+Fixtures compartidas de las pruebas.
+
+``base_sintetica`` entrega una base SQLite con datos sintéticos
+(``benchmarks.datos_sinteticos``): se genera una sola vez en
+``benchmarks/.datos`` y se copia una vez por sesión y tamaño. El tamaño por
+defecto es chico para que la suite corra en segundos; se cambia para toda la
+sesión con una opción o para una prueba con el marcador::
+
+    pytest --datos-sinteticos mediano
+    pytest --datos-sinteticos 10000,100000,1000000
+
+    @pytest.mark.datos_sinteticos(clientes=10_000, cotizaciones=100_000, lineas=1_000_000)
+    def test_escala(base_sintetica): ...
+
+Las pruebas con el mismo tamaño comparten la copia: las que escriben en la
+base piden ``app_sintetica_propia``, con su propia copia del mismo tamaño.
+"""
+import os
+import sys
+from contextlib import ExitStack
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from app import create_app  # noqa: E402
+from benchmarks import datos_sinteticos  # noqa: E402
+
+# (clientes, cotizaciones, líneas) de base_sintetica sin opción ni marcador
+TAMANO_PRUEBAS = (200, 1_000, 10_000)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--datos-sinteticos', default=None,
+        help='Tamaño de base_sintetica: chico, mediano, grande o CLIENTES,COTIZACIONES,LINEAS',
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        "datos_sinteticos(tamano=None, clientes=, cotizaciones=, lineas=): tamaño de base_sintetica "
+        "('chico'/'mediano'/'grande' o los tres números)",
+    )
+
+
+def _tamano(valor):
+    """(clientes, cotizaciones, lineas) de un nombre de ``TAMANOS`` o de 'C,Q,L'."""
+    if valor in datos_sinteticos.TAMANOS:
+        return datos_sinteticos.TAMANOS[valor]
+    try:
+        clientes, cotizaciones, lineas = (int(x) for x in valor.split(','))
+    except ValueError:
+        raise pytest.UsageError(f'--datos-sinteticos inválido: {valor!r}')
+    return clientes, cotizaciones, lineas
+
+
+def crear_app_pruebas(ruta_db, directorio, **config):
+    """Aplicación sobre ``ruta_db`` con todo lo que escribe en ``directorio``."""
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{ruta_db}',
+        'EXPORTACIONES_DIR': os.path.join(directorio, 'versiones'),
+        'IMAGENES_CACHE_DIR': os.path.join(directorio, 'imagenes'),
+        'ANALITICA_DIR': os.path.join(directorio, 'analitica'),
+        'PERFILES_DIR': os.path.join(directorio, 'perfiles'),
+        'EVENTOS_SOCKET_DIR': 'off',
+        'PRERENDER': False,
+        **config,
+    })
+
+
+@pytest.fixture(scope='session')
+def bases_sinteticas(pytestconfig):
+    """
+    Función ``tamano -> ruta`` (None: el de la sesión). Cada tamaño se copia
+    con ``base_temporal`` al primer uso y se borra al terminar la sesión.
+    """
+    opcion = pytestconfig.getoption('datos_sinteticos')
+    por_defecto = _tamano(opcion) if opcion else TAMANO_PRUEBAS
+    rutas = {}
+    with ExitStack() as pila:
+        def obtener(tamano=None):
+            tamano = tamano or por_defecto
+            if tamano not in rutas:
+                rutas[tamano] = pila.enter_context(datos_sinteticos.base_temporal(*tamano))
+            return rutas[tamano]
+        yield obtener
+
+
+def _tamano_pedido(request):
+    """Tamaño del marcador ``datos_sinteticos``, o None (el de la sesión)."""
+    marcador = request.node.get_closest_marker('datos_sinteticos')
+    if marcador is None:
+        return None
+    if marcador.args:
+        return _tamano(marcador.args[0])
+    return tuple(marcador.kwargs[k] for k in ('clientes', 'cotizaciones', 'lineas'))
+
+
+@pytest.fixture
+def base_sintetica(request, bases_sinteticas):
+    """Ruta de la base sintética del tamaño del marcador ``datos_sinteticos`` (o el de la sesión)."""
+    return bases_sinteticas(_tamano_pedido(request))
+
+
+@pytest.fixture
+def app_sintetica(base_sintetica, tmp_path):
+    """Aplicación sobre ``base_sintetica``."""
+    return crear_app_pruebas(base_sintetica, str(tmp_path))
+
+
+@pytest.fixture
+def app_sintetica_propia(request, pytestconfig, tmp_path):
+    """Aplicación sobre una copia de la base sintética sólo para esta prueba (puede escribir)."""
+    opcion = pytestconfig.getoption('datos_sinteticos')
+    tamano = _tamano_pedido(request) or (_tamano(opcion) if opcion else TAMANO_PRUEBAS)
+    with datos_sinteticos.base_temporal(*tamano) as ruta:
+        yield crear_app_pruebas(ruta, str(tmp_path))
+
+
+@pytest.fixture
+def app_ejemplo(tmp_path):
+    """Aplicación sobre una base nueva con los datos de ejemplo de ``init_db`` (cotización 1)."""
+    import init_db
+    from src.services.excel_service import ExcelService
+    from src.services.pdf_service import PDFService
+
+    app = init_db.init_database(crear_app_pruebas(tmp_path / 'cotizaciones.db', str(tmp_path)))
+    # Archivos de trabajo de los servicios también en el directorio temporal
+    app.extensions['pdf_service'] = PDFService(str(tmp_path / 'pdf'))
+    app.extensions['excel_service'] = ExcelService(str(tmp_path / 'excel'))
+    return app
@@ -0,0 +1,12 @@
+from src.controllers.cotizacion_controller import CotizacionController
+
+
+def test_estatus_en_el_orden_del_flujo(app_sintetica):
+    cliente = app_sintetica.test_client()
+    assert cliente.post('/api/analitica/actualizar', json={'completa': True}).status_code == 200
+
+    datos = cliente.get('/api/analitica/estatus').get_json()
+    estatus = [f['estatus'] for f in datos['estatus']]
+    # El diccionario de la instantánea los tiene en el orden en que aparecieron
+    assert estatus == CotizacionController.ESTATUS_VALIDOS
+    assert sum(f['cotizaciones'] for f in datos['estatus']) == datos['total']
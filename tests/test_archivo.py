@@ -0,0 +1,35 @@
+import sqlite3
+
+
+def _ruta(app):
+    return app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///')
+
+
+def test_archivar_y_consultar_archivadas(app_sintetica_propia):
+    cliente = app_sintetica_propia.test_client()
+    total = cliente.get('/api/cotizaciones').get_json()['total']
+
+    respuesta = cliente.post('/api/cotizaciones/archivar', json={'dias': 180, 'lote': 100})
+    assert respuesta.status_code == 200
+    archivadas = respuesta.get_json()['archivadas']
+    assert 0 < archivadas < total
+
+    activas = cliente.get('/api/cotizaciones').get_json()
+    assert activas['total'] == total - archivadas
+    assert all(c['estatus'] in ('Borrador', 'Enviada') or c['fecha'] >= respuesta.get_json()['anteriores_a']
+               for c in activas['cotizaciones'])
+    todas = cliente.get('/api/cotizaciones?archivadas=1').get_json()
+    assert todas['total'] == total
+
+    # Una archivada se sigue abriendo, con sus líneas
+    with sqlite3.connect(_ruta(app_sintetica_propia)) as conn:
+        cotizacion_id, lineas = conn.execute(
+            'SELECT cotizacion_id, COUNT(*) FROM detalle_cotizacion_archivo '
+            'GROUP BY cotizacion_id ORDER BY cotizacion_id LIMIT 1'
+        ).fetchone()
+        assert conn.execute('SELECT COUNT(*) FROM cotizacion WHERE id = ?', (cotizacion_id,)).fetchone()[0] == 0
+    cotizacion = cliente.get(f'/api/cotizaciones/{cotizacion_id}').get_json()['cotizacion']
+    assert cotizacion['estatus'] in ('Aceptada', 'Cancelada')
+    assert len(cotizacion['detalles']) == lineas
+    assert cotizacion_id in {c['id'] for c in todas['cotizaciones']}
+    assert cotizacion_id not in {c['id'] for c in activas['cotizaciones']}
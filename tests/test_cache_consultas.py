@@ -0,0 +1,73 @@
+import pytest
+
+from src.services.cache_consultas import BackendMemoria, BackendSQLite, CacheConsultas
+
+LISTADOS = [
+    {},
+    {'estatus': 'Enviada'},
+    {'estatus': 'Borrador'},
+    {'cliente_id': '1'},
+    {'cliente_id': '2'},
+    {'fecha_desde': '2025-06-01'},
+]
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def cache(request, tmp_path):
+    if request.param == 'memoria':
+        backend = BackendMemoria()
+    else:
+        backend = BackendSQLite(str(tmp_path / 'cache.db'))
+    return CacheConsultas('pruebas', backend)
+
+
+def _llenar(cache):
+    for filtros in LISTADOS:
+        cache.obtener(filtros, lambda: 'valor')
+    assert len(cache.backend) == len(LISTADOS)
+
+
+def _en_cache(cache):
+    return [f for f in LISTADOS if cache.backend.obtener(cache.clave(f)) is not None]
+
+
+def test_escritura_invalida_solo_los_filtros_que_coinciden(cache):
+    _llenar(cache)
+    # Cotización del cliente 1 que pasó de Borrador a Enviada, fechada antes del 1 de junio
+    anterior = {'cliente_id': '1', 'estatus': 'Borrador', 'fecha': '2025-05-10'}
+    nuevo = {'cliente_id': '1', 'estatus': 'Enviada', 'fecha': '2025-05-10'}
+
+    assert cache.invalidar_estados([anterior, nuevo]) == 4
+    assert _en_cache(cache) == [{'cliente_id': '2'}, {'fecha_desde': '2025-06-01'}]
+
+
+def test_listado_construido_durante_una_escritura_no_se_guarda(cache):
+    def construir():
+        # Otra petición escribe y invalida mientras esta consulta corre
+        cache.invalidar_estados([{'cliente_id': '1', 'estatus': 'Enviada', 'fecha': '2025-05-10'}])
+        return 'anterior a la escritura'
+
+    assert cache.obtener({'cliente_id': '2'}, construir) == 'anterior a la escritura'
+    assert len(cache.backend) == 0
+    assert cache.obtener({'cliente_id': '2'}, lambda: 'nuevo') == 'nuevo'
+    assert len(cache.backend) == 1
+
+
+def test_limpiar_tambien_descarta_la_consulta_en_curso(cache):
+    def construir():
+        cache.limpiar()
+        return 'anterior'
+
+    cache.obtener({}, construir)
+    assert len(cache.backend) == 0
+
+
+def test_cliente_id_se_normaliza_para_invalidar(app_ejemplo):
+    cliente = app_ejemplo.test_client()
+    assert cliente.get('/api/cotizaciones?cliente_id=01').get_json()['cotizaciones'][0]['estatus'] == 'Enviada'
+
+    assert cliente.patch('/api/cotizaciones/1/estatus', json={'estatus': 'Aceptada'}).status_code == 200
+
+    listado = cliente.get('/api/cotizaciones?cliente_id=01').get_json()
+    assert listado['cotizaciones'][0]['estatus'] == 'Aceptada'
+    assert cliente.get('/api/cotizaciones?cliente_id=uno').status_code == 400
@@ -0,0 +1,68 @@
+import sqlite3
+from datetime import timedelta
+
+import pytest
+
+from src.services import cambios
+
+
+@pytest.fixture(autouse=True)
+def sin_margen(monkeypatch):
+    # Que lo recién escrito entre en la siguiente página sin esperar MARGEN
+    monkeypatch.setattr(cambios, 'MARGEN', timedelta(0))
+
+
+def _sincronizar(cliente, local, cursor=None, limite=50):
+    """Aplica a ``local`` todas las páginas desde ``cursor``: (cursor nuevo, páginas, eliminados)."""
+    paginas, eliminados = 0, []
+    while True:
+        url = f'/api/cotizaciones/cambios?limite={limite}' + (f'&cursor={cursor}' if cursor else '')
+        pagina = cliente.get(url).get_json()
+        assert len(pagina['cambios']) <= limite and len(pagina['eliminados']) <= limite
+        for eliminado in pagina['eliminados']:
+            local.pop(eliminado['id'], None)
+            eliminados.append((eliminado['id'], eliminado['motivo']))
+        for fila in pagina['cambios']:
+            local[fila['id']] = fila
+        cursor = pagina['cursor']
+        paginas += 1
+        if not pagina['hay_mas']:
+            return cursor, paginas, eliminados
+
+
+def _activas(app):
+    ruta = app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///')
+    with sqlite3.connect(ruta) as conn:
+        return dict(conn.execute('SELECT id, estatus FROM cotizacion'))
+
+
+def test_feed_de_cambios_por_cursor_con_eliminados(app_sintetica_propia):
+    cliente = app_sintetica_propia.test_client()
+    local = {}
+    cursor, paginas, eliminados = _sincronizar(cliente, local)
+    activas = _activas(app_sintetica_propia)
+    assert paginas > 1 and eliminados == []
+    assert set(local) == set(activas)
+
+    # Sin cambios, el cursor no trae nada
+    cursor, _, eliminados = _sincronizar(cliente, local, cursor)
+    assert eliminados == [] and set(local) == set(activas)
+
+    borradores = [i for i, e in sorted(activas.items()) if e == 'Borrador']
+    for cotizacion_id in borradores[:3]:
+        assert cliente.patch(f'/api/cotizaciones/{cotizacion_id}/estatus',
+                             json={'estatus': 'Enviada'}).status_code == 200
+    borradas = borradores[3:5]
+    for cotizacion_id in borradas:
+        assert cliente.delete(f'/api/cotizaciones/{cotizacion_id}').status_code == 200
+    archivadas = cliente.post('/api/cotizaciones/archivar', json={'dias': 180}).get_json()['archivadas']
+    assert archivadas > 50  # más de una página de eliminados
+
+    cursor, paginas, eliminados = _sincronizar(cliente, local, cursor)
+    activas = _activas(app_sintetica_propia)
+    assert paginas > 1
+    assert set(local) == set(activas)
+    assert {i: f['estatus'] for i, f in local.items()} == activas
+    assert sorted(i for i, motivo in eliminados if motivo == 'eliminada') == borradas
+    assert sum(motivo == 'archivada' for _, motivo in eliminados) == archivadas
+    assert len(eliminados) == len(set(eliminados))
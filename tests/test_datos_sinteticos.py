@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+
+def _contar(ruta, tabla):
+    with sqlite3.connect(ruta) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+
+
+@pytest.mark.datos_sinteticos(clientes=20, cotizaciones=50, lineas=400)
+def test_marcador_define_el_tamano(base_sintetica):
+    assert _contar(base_sintetica, 'cliente') == 20
+    assert _contar(base_sintetica, 'cotizacion') == 50
+    # ``lineas`` es el total esperado (distribución lognormal), no exacto
+    assert _contar(base_sintetica, 'detalle_cotizacion') >= 50
+
+
+def test_listado_y_estadisticas_coinciden_con_la_base(app_sintetica, base_sintetica):
+    cliente = app_sintetica.test_client()
+
+    listado = cliente.get('/api/cotizaciones').get_json()
+    assert listado['total'] == _contar(base_sintetica, 'cotizacion')
+
+    # El cliente más frecuente: sus estadísticas contra su propio listado
+    with sqlite3.connect(base_sintetica) as conn:
+        cliente_id, = conn.execute(
+            'SELECT cliente_id FROM cotizacion GROUP BY cliente_id ORDER BY COUNT(*) DESC LIMIT 1'
+        ).fetchone()
+    datos = cliente.get(f'/api/clientes/{cliente_id}').get_json()['cliente']
+    suyas = cliente.get(f'/api/cotizaciones?cliente_id={cliente_id}').get_json()
+    assert datos['num_cotizaciones'] == suyas['total'] > 1
+    aceptadas = [c['total'] for c in suyas['cotizaciones'] if c['estatus'] == 'Aceptada']
+    assert datos['total_aceptado'] == pytest.approx(sum(aceptadas))
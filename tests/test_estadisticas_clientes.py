@@ -0,0 +1,59 @@
+import sqlite3
+
+from sqlalchemy import select
+
+from src.models.models import db, Cliente
+from src.services import estadisticas_clientes
+
+
+def _estadisticas():
+    filas = db.session.execute(select(
+        Cliente.id, Cliente.num_cotizaciones, Cliente.total_aceptado, Cliente.ultima_cotizacion
+    )).all()
+    return {f.id: (f.num_cotizaciones, round(f.total_aceptado, 6), f.ultima_cotizacion) for f in filas}
+
+
+def _cotizaciones(app, sql, *parametros):
+    ruta = app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///')
+    with sqlite3.connect(ruta) as conn:
+        return conn.execute(sql, parametros).fetchall()
+
+
+def test_estadisticas_incrementales_coinciden_con_recalcular(app_sintetica_propia):
+    app = app_sintetica_propia
+    cliente = app.test_client()
+    (origen, destino), = _cotizaciones(
+        app, 'SELECT MIN(cliente_id), MAX(cliente_id) FROM cotizacion'
+    )
+    suyas = [i for i, in _cotizaciones(app, 'SELECT id FROM cotizacion WHERE cliente_id = ? ORDER BY fecha', origen)]
+    aceptadas = [i for i, in _cotizaciones(app, "SELECT id FROM cotizacion WHERE estatus = 'Aceptada' LIMIT 3")]
+    borradores = [i for i, in _cotizaciones(app, "SELECT id FROM cotizacion WHERE estatus = 'Borrador' LIMIT 3")]
+
+    def ok(respuesta):
+        assert respuesta.status_code in (200, 201), respuesta.get_json()
+
+    # Cambios de estatus hacia y desde Aceptada
+    for cotizacion_id in borradores:
+        ok(cliente.patch(f'/api/cotizaciones/{cotizacion_id}/estatus', json={'estatus': 'Aceptada'}))
+    ok(cliente.patch(f'/api/cotizaciones/{aceptadas[0]}/estatus', json={'estatus': 'Cancelada'}))
+    # Otro total en una aceptada
+    ok(cliente.put(f'/api/cotizaciones/{aceptadas[1]}', json={
+        'detalles': [{'cantidad': 3, 'descripcion': 'Servicio', 'precio_unitario': 250}],
+    }))
+    # Otro cliente, y la última del cliente que pasa a ser la más antigua
+    ok(cliente.put(f'/api/cotizaciones/{suyas[0]}', json={'cliente_id': destino, 'estatus': 'Aceptada'}))
+    ok(cliente.put(f'/api/cotizaciones/{suyas[-1]}', json={'fecha': '2000-01-01'}))
+    ok(cliente.put(f'/api/cotizaciones/{suyas[1]}', json={'fecha': '2099-12-31'}))
+    # Alta y baja
+    ok(cliente.post('/api/cotizaciones', json={
+        'cliente_id': origen, 'fecha': '2026-03-01',
+        'detalles': [{'cantidad': 1, 'descripcion': 'Nueva', 'precio_unitario': 10}],
+    }))
+    ok(cliente.delete(f'/api/cotizaciones/{suyas[1]}'))
+    ok(cliente.post('/api/cotizaciones/archivar', json={'dias': 180}))
+
+    with app.app_context():
+        incrementales = _estadisticas()
+        assert estadisticas_clientes.recalcular() == len(incrementales)
+        assert _estadisticas() == incrementales
+        db.session.rollback()
@@ -0,0 +1,23 @@
+from src.services.eventos import bus_eventos
+
+
+def test_conexiones_de_eventos_limitadas(app_ejemplo):
+    bus_eventos.configurar(None, max_suscripciones=2)
+    cliente = app_ejemplo.test_client()
+
+    abiertas = [cliente.get('/api/eventos', buffered=False) for _ in range(2)]
+    assert [r.status_code for r in abiertas] == [200, 200]
+    assert next(abiertas[0].response).startswith(b'retry:')
+
+    rechazada = cliente.get('/api/eventos')
+    assert rechazada.status_code == 503
+    assert rechazada.headers['Retry-After']
+
+    # Al cerrar una (aunque no haya empezado a enviarse) vuelve a haber lugar
+    abiertas[1].close()
+    otra = cliente.get('/api/eventos', buffered=False)
+    assert otra.status_code == 200
+    assert cliente.get('/api/eventos').status_code == 503
+    for respuesta in (abiertas[0], otra):
+        respuesta.close()
+    assert bus_eventos._suscripciones == set()
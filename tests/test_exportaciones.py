@@ -0,0 +1,133 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from src.services import exportaciones
+from src.services.excel_service import ExcelService
+from src.services.pdf_service import PDFService
+
+# Aplicación de la prueba entre procesos; los hijos la heredan con fork
+_app = None
+
+
+def _descargas_simultaneas(app, url, peticiones):
+    """``peticiones`` GET a ``url`` que arrancan a la vez, cada una con su cliente."""
+    barrera = threading.Barrier(peticiones)
+    respuestas = []
+
+    def una():
+        cliente = app.test_client()
+        barrera.wait()
+        r = cliente.get(url)
+        respuestas.append((r.status_code, r.data))
+
+    hilos = [threading.Thread(target=una) for _ in range(peticiones)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return respuestas
+
+
+@pytest.mark.parametrize('servicio, url', [
+    (PDFService, '/api/cotizaciones/1/export/pdf'),
+    (ExcelService, '/api/cotizaciones/1/export/excel'),
+    (ExcelService, '/api/cotizaciones/1/export/excel?motor=xml'),
+])
+def test_descargas_simultaneas_generan_una_vez(app_ejemplo, monkeypatch, servicio, url):
+    renders = []
+    original = servicio.generar_cotizacion
+
+    def contado(self, *args, **kwargs):
+        renders.append(1)
+        return original(self, *args, **kwargs)
+    monkeypatch.setattr(servicio, 'generar_cotizacion', contado)
+
+    respuestas = _descargas_simultaneas(app_ejemplo, url, 50)
+
+    assert len(renders) == 1
+    assert {status for status, _ in respuestas} == {200}
+    assert len({cuerpo for _, cuerpo in respuestas}) == 1
+
+
+def test_cambio_de_configuracion_genera_otra_version(app_ejemplo, monkeypatch):
+    renders = []
+    original = ExcelService.generar_cotizacion
+
+    def contado(self, *args, **kwargs):
+        renders.append(kwargs.get('motor') or self.motor)
+        return original(self, *args, **kwargs)
+    monkeypatch.setattr(ExcelService, 'generar_cotizacion', contado)
+
+    cliente = app_ejemplo.test_client()
+    servicio = app_ejemplo.extensions['excel_service']
+    assert cliente.get('/api/cotizaciones/1/export/excel').status_code == 200
+    assert cliente.get('/api/cotizaciones/1/export/excel').status_code == 200
+    # Otro EXCEL_MOTOR: el archivo guardado con openpyxl ya no sirve
+    servicio.motor = 'xml'
+    assert cliente.get('/api/cotizaciones/1/export/excel').status_code == 200
+    # ?motor= con el motor configurado es la misma versión
+    assert cliente.get('/api/cotizaciones/1/export/excel?motor=xml').status_code == 200
+
+    assert renders == ['openpyxl', 'xml']
+
+
+def _descargas_en_proceso(args):
+    """Corre en cada proceso hijo: (renders de este proceso, [(status, cuerpo)])."""
+    url, peticiones, barrera = args
+    renders = []
+    original = PDFService.generar_cotizacion
+
+    def contado(self, *a, **k):
+        renders.append(1)
+        time.sleep(0.3)  # que el otro proceso llegue mientras éste renderiza
+        return original(self, *a, **k)
+    PDFService.generar_cotizacion = contado
+
+    barrera.wait()
+    respuestas = _descargas_simultaneas(_app, url, peticiones)
+    return len(renders), respuestas
+
+
+@pytest.mark.skipif(exportaciones.fcntl is None, reason='la coordinación entre procesos usa fcntl.flock')
+def test_dos_procesos_generan_una_vez(app_ejemplo):
+    global _app
+    _app = app_ejemplo
+    contexto = multiprocessing.get_context('fork')
+    barrera = contexto.Manager().Barrier(2)
+    with contexto.Pool(2) as pool:
+        resultados = pool.map(
+            _descargas_en_proceso, [('/api/cotizaciones/1/export/pdf', 10, barrera)] * 2
+        )
+
+    assert sum(renders for renders, _ in resultados) == 1
+    respuestas = [r for _, lista in resultados for r in lista]
+    assert len(respuestas) == 20
+    assert {status for status, _ in respuestas} == {200}
+    assert len({cuerpo for _, cuerpo in respuestas}) == 1
+
+
+def test_lotes_simultaneos_generan_una_vez(app_ejemplo, monkeypatch):
+    renders = []
+    original = PDFService.generar_lote
+
+    def contado(self, *args, **kwargs):
+        renders.append(1)
+        return original(self, *args, **kwargs)
+    monkeypatch.setattr(PDFService, 'generar_lote', contado)
+
+    respuestas = _descargas_simultaneas(app_ejemplo, '/api/cotizaciones/export/pdf?estatus=Enviada', 20)
+
+    assert len(renders) == 1
+    assert {status for status, _ in respuestas} == {200}
+    assert len({cuerpo for _, cuerpo in respuestas}) == 1
+
+    # Sin cambios se envía el mismo archivo; al cambiar una cotización del lote, se rehace
+    cliente = app_ejemplo.test_client()
+    assert cliente.get('/api/cotizaciones/export/pdf?estatus=Enviada').status_code == 200
+    assert len(renders) == 1
+    assert cliente.put('/api/cotizaciones/1', json={'notas': 'Nueva nota'}).status_code == 200
+    assert cliente.get('/api/cotizaciones/export/pdf?estatus=Enviada').status_code == 200
+    assert len(renders) == 2
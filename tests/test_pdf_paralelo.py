@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+pypdf = pytest.importorskip('pypdf')
+
+from benchmarks.run_benchmarks import EMPRESA, cotizacion_sintetica  # noqa: E402
+from src.services import pdf_service  # noqa: E402
+from src.services.admision import admision_exportaciones  # noqa: E402
+from src.services.imagenes import optimizador_imagenes  # noqa: E402
+from src.services.pdf_service import PDFService  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINEAS = 600
+
+
+@pytest.fixture
+def servicio(tmp_path, monkeypatch):
+    monkeypatch.chdir(RAIZ)  # static/img relativo al proyecto
+    optimizador_imagenes.configurar(directorio=str(tmp_path / 'imagenes'))
+    admision_exportaciones.configurar(0, cola=4, espera=10.0)
+    yield PDFService(str(tmp_path / 'pdf'), umbral_tabla_rapida=0, umbral_paralelo=0, procesos_paralelo=3)
+    admision_exportaciones.configurar(2, cola=4, espera=10.0)
+
+
+def _paginas(ruta):
+    return [pagina.extract_text() for pagina in pypdf.PdfReader(ruta).pages]
+
+
+def test_render_en_paralelo_igual_al_de_un_proceso(servicio):
+    datos = cotizacion_sintetica(LINEAS)
+    serial = _paginas(servicio.generar_cotizacion(datos, EMPRESA, paralelo=False))
+    paralelo = _paginas(servicio.generar_cotizacion(datos, EMPRESA, paralelo=True))
+
+    assert len(serial) > 3
+    assert paralelo == serial
+    # El pool sobrevive al render y se reutiliza
+    pool = pdf_service._pool
+    assert pool is not None
+    servicio.generar_cotizacion(datos, EMPRESA, paralelo=True)
+    assert pdf_service._pool is pool
+
+
+def test_procesos_hijos_ocupan_turnos_de_admision(servicio, monkeypatch):
+    usados = []
+    original = pdf_service._pool_render
+
+    def pool_render(procesos):
+        pool = original(procesos)
+        usados.append(admision_exportaciones._en_curso)
+        return pool
+
+    monkeypatch.setattr(pdf_service, '_pool_render', pool_render)
+    datos = cotizacion_sintetica(LINEAS)
+
+    # Con dos turnos y uno tomado por el render, sólo queda uno para un hijo extra
+    admision_exportaciones.configurar(2, cola=4, espera=10.0)
+    with admision_exportaciones.turno():
+        paralelo = _paginas(servicio.generar_cotizacion(datos, EMPRESA, paralelo=True))
+        assert admision_exportaciones._en_curso == 1
+    assert usados == [2]
+
+    # Sin turnos libres se renderiza en el mismo proceso
+    admision_exportaciones.configurar(1, cola=4, espera=10.0)
+    with admision_exportaciones.turno():
+        serial = _paginas(servicio.generar_cotizacion(datos, EMPRESA, paralelo=True))
+    assert usados == [2]
+    assert paralelo == serial
@@ -0,0 +1,71 @@
+import glob
+import os
+import sqlite3
+
+from sqlalchemy import create_engine, text
+
+from src.services.exportaciones import archivos_exportacion
+
+
+def _lineas(app, cotizacion_id):
+    ruta = app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///')
+    with sqlite3.connect(ruta) as conn:
+        return conn.execute(
+            'SELECT COUNT(*) FROM detalle_cotizacion WHERE cotizacion_id = ?', (cotizacion_id,)
+        ).fetchone()[0]
+
+
+def _exportadas(cotizacion_id):
+    return glob.glob(os.path.join(archivos_exportacion.directorio, f'{cotizacion_id}-*'))
+
+
+def _borrador(cliente, fecha):
+    respuesta = cliente.post('/api/cotizaciones', json={
+        'cliente_id': 1, 'fecha': fecha,
+        'detalles': [{'cantidad': 2, 'descripcion': 'Servicio', 'precio_unitario': 100}],
+    })
+    assert respuesta.status_code == 201
+    return respuesta.get_json()['cotizacion']['id']
+
+
+def test_eliminar_borra_lineas_y_archivos(app_ejemplo):
+    cliente = app_ejemplo.test_client()
+    assert _lineas(app_ejemplo, 1) > 0
+    assert cliente.get('/api/cotizaciones/1/export/pdf').status_code == 200
+    assert _exportadas(1)
+
+    assert cliente.delete('/api/cotizaciones/1').status_code == 200
+    assert _lineas(app_ejemplo, 1) == 0
+    assert _exportadas(1) == []
+
+
+def test_purgar_borra_lineas_archivos_y_estadisticas(app_ejemplo):
+    cliente = app_ejemplo.test_client()
+    antiguo = _borrador(cliente, '2020-01-15')
+    reciente = _borrador(cliente, '2099-01-15')
+    for cotizacion_id in (antiguo, reciente):
+        assert cliente.get(f'/api/cotizaciones/{cotizacion_id}/export/pdf').status_code == 200
+    antes = cliente.get('/api/clientes/1').get_json()['cliente']['num_cotizaciones']
+
+    respuesta = cliente.post('/api/cotizaciones/purgar', json={'estatus': 'Borrador', 'dias': 30})
+    assert respuesta.get_json()['eliminadas'] == 1
+
+    assert cliente.get(f'/api/cotizaciones/{antiguo}').status_code == 404
+    assert _lineas(app_ejemplo, antiguo) == 0
+    assert _exportadas(antiguo) == []
+    # La reciente y la Enviada de ejemplo siguen con sus líneas y archivos
+    assert _lineas(app_ejemplo, reciente) > 0 and _exportadas(reciente)
+    assert cliente.get('/api/cotizaciones/1').status_code == 200
+    assert cliente.get('/api/clientes/1').get_json()['cliente']['num_cotizaciones'] == antes - 1
+
+
+def test_llaves_foraneas_solo_en_el_engine_de_la_aplicacion(app_ejemplo, tmp_path):
+    with app_ejemplo.app_context():
+        from src.models.models import db
+        with db.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA foreign_keys')).scalar() == 1
+
+    otro = create_engine(f"sqlite:///{tmp_path / 'otra.db'}")
+    with otro.connect() as conn:
+        assert conn.execute(text('PRAGMA foreign_keys')).scalar() == 0
+    otro.dispose()
@@ -0,0 +1,10 @@
+"""
+Punto de entrada WSGI: ``gunicorn wsgi:app`` (o ``flask --app wsgi run``).
+
+La aplicación se crea una sola vez, aquí; ``app.py`` sólo define
+``create_app``. El esquema se prepara antes, con ``python init_db.py`` o
+``flask --app wsgi actualizar-esquema``.
+"""
+from app import create_app
+
+app = create_app()